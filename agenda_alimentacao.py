@@ -0,0 +1,157 @@
+# ==================== AGENDA DE ALIMENTAÇÃO E ESTOQUE ====================
+# Os horários dos planos alimentares (texto livre, ex. "08:00, 18:00")
+# são interpretados uma vez por carga de dados. A partir deles saem as
+# próximas refeições de todos os pets (heap) e o consumo diário por marca,
+# usado para projetar em quantos dias o estoque acaba (numpy).
+
+import heapq
+import re
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# "08:00", "8:30", "8h", "8h30", "18 h"; um número solto não é horário ("2x ao dia", "3 porções")
+_HORARIO = re.compile(r'(?<!\d)(\d{1,2})\s*[:hH]\s*(\d{2})?(?!\d)')
+
+# Janela usada para distribuir refeições quando não há horários informados
+PRIMEIRA_REFEICAO = 7 * 60
+ULTIMA_REFEICAO = 21 * 60
+
+
+def interpretar_horarios(texto):
+    """Horários do texto em minutos desde a meia-noite, ordenados e sem repetição"""
+    minutos = set()
+    for hora, minuto in _HORARIO.findall(texto or ''):
+        hora, minuto = int(hora), int(minuto or 0)
+        if hora < 24 and minuto < 60:
+            minutos.add(hora * 60 + minuto)
+    return tuple(sorted(minutos))
+
+
+def horarios_padrao(frequencia):
+    """Refeições distribuídas entre PRIMEIRA_REFEICAO e ULTIMA_REFEICAO"""
+    frequencia = max(int(frequencia or 1), 1)
+    if frequencia == 1:
+        return (PRIMEIRA_REFEICAO,)
+    passo = (ULTIMA_REFEICAO - PRIMEIRA_REFEICAO) / (frequencia - 1)
+    return tuple(int(round(PRIMEIRA_REFEICAO + i * passo)) for i in range(frequencia))
+
+
+def chave_marca(marca_nome):
+    """Marca normalizada (a mesma ração escrita de formas diferentes conta junto)"""
+    return ' '.join(str(marca_nome or '').lower().split())
+
+
+def estruturar_planos(alimentacao):
+    """Planos alimentares com horários interpretados
+    Cada plano: id, pet_id, marca, marca_nome, gramas (por refeição), horarios (minutos),
+    horarios_estimados (True quando o texto não tinha horários válidos)
+    """
+    planos = []
+    for registro in alimentacao:
+        horarios = interpretar_horarios(registro.get('horarios'))
+        estimados = not horarios
+        if estimados:
+            horarios = horarios_padrao(registro.get('frequencia'))
+        planos.append({
+            'id': registro['id'],
+            'pet_id': registro.get('pet_id'),
+            'marca': chave_marca(registro.get('marca_nome')),
+            'marca_nome': registro.get('marca_nome'),
+            'gramas': float(registro.get('quantidade') or 0),
+            'horarios': horarios,
+            'horarios_estimados': estimados
+        })
+    return planos
+
+
+def _proxima_ocorrencia(horarios, agora):
+    """(datetime, índice do horário) da primeira refeição a partir de agora"""
+    minuto_atual = agora.hour * 60 + agora.minute
+    meia_noite = agora.replace(hour=0, minute=0, second=0, microsecond=0)
+    for indice, minuto in enumerate(horarios):
+        if minuto >= minuto_atual:
+            return meia_noite + timedelta(minutes=minuto), indice
+    return meia_noite + timedelta(days=1, minutes=horarios[0]), 0
+
+
+def proximas_refeicoes(planos, agora=None, limite=10):
+    """Próximas `limite` refeições de todos os planos, em ordem de horário
+    Retorna lista de (datetime, plano)
+    """
+    agora = agora or datetime.now()
+    heap = []
+    for posicao, plano in enumerate(planos):
+        if plano['horarios']:
+            momento, indice = _proxima_ocorrencia(plano['horarios'], agora)
+            heap.append((momento, posicao, indice))
+    heapq.heapify(heap)
+
+    refeicoes = []
+    while heap and len(refeicoes) < limite:
+        momento, posicao, indice = heapq.heappop(heap)
+        plano = planos[posicao]
+        refeicoes.append((momento, plano))
+        # Próxima refeição do mesmo plano (volta ao primeiro horário no dia seguinte)
+        horarios = plano['horarios']
+        dia = momento.replace(hour=0, minute=0, second=0, microsecond=0)
+        if indice + 1 < len(horarios):
+            seguinte = (dia + timedelta(minutes=horarios[indice + 1]), posicao, indice + 1)
+        else:
+            seguinte = (dia + timedelta(days=1, minutes=horarios[0]), posicao, 0)
+        heapq.heappush(heap, seguinte)
+    return refeicoes
+
+
+def consumo_por_marca(planos):
+    """(marcas, gramas por dia) somando todos os planos de cada marca"""
+    if not planos:
+        return np.array([], dtype=object), np.array([], dtype=np.float64)
+    marcas, indice = np.unique(np.array([p['marca'] for p in planos], dtype=object), return_inverse=True)
+    gramas_dia = np.array([p['gramas'] * len(p['horarios']) for p in planos], dtype=np.float64)
+    return marcas, np.bincount(indice, weights=gramas_dia, minlength=len(marcas))
+
+
+def projetar_estoques(planos, estoques, agora=None):
+    """Projeção do estoque de cada marca em uma única passada vetorizada
+    estoques: registros de estoques_alimento (marca_nome normalizada, estoque_kg, atualizado_em)
+    Retorna lista de dicionários por marca: marca, marca_nome, gramas_dia, kg_mes,
+    estoque_kg (estimado agora, ou None sem estoque informado), dias_restantes, acaba_em
+    """
+    agora = agora or datetime.now()
+    marcas, gramas_dia = consumo_por_marca(planos)
+    if len(marcas) == 0:
+        return []
+
+    por_marca = {e['marca_nome']: e for e in estoques}
+    informado = np.array([m in por_marca for m in marcas])
+    estoque_kg = np.array([float(por_marca[m]['estoque_kg']) if m in por_marca else np.nan for m in marcas])
+    dias_desde = np.array([
+        (agora - por_marca[m]['atualizado_em']).total_seconds() / 86400
+        if m in por_marca and por_marca[m].get('atualizado_em') else 0.0
+        for m in marcas
+    ])
+
+    consumo_kg_dia = gramas_dia / 1000
+    estoque_atual = np.where(informado, np.maximum(estoque_kg - consumo_kg_dia * dias_desde, 0), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dias_restantes = np.where(consumo_kg_dia > 0, np.floor(estoque_atual / consumo_kg_dia), np.inf)
+
+    nomes = {}
+    for plano in planos:
+        nomes.setdefault(plano['marca'], plano['marca_nome'])
+
+    projecao = []
+    for i, marca in enumerate(marcas):
+        dias = None if np.isnan(dias_restantes[i]) or np.isinf(dias_restantes[i]) else int(dias_restantes[i])
+        projecao.append({
+            'marca': marca,
+            'marca_nome': nomes[marca],
+            'gramas_dia': float(gramas_dia[i]),
+            'kg_mes': float(consumo_kg_dia[i] * 30),
+            'estoque_kg': None if np.isnan(estoque_atual[i]) else float(estoque_atual[i]),
+            'dias_restantes': dias,
+            'acaba_em': (agora + timedelta(days=dias)).date() if dias is not None else None
+        })
+    projecao.sort(key=lambda p: (p['dias_restantes'] is None, p['dias_restantes'] or 0))
+    return projecao
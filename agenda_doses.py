@@ -0,0 +1,130 @@
+# ==================== AGENDA DE DOSES DE MEDICAMENTOS ====================
+# A agenda de doses é derivada de data_inicio, duracao e doses_por_dia.
+# A tabela medicamentos_log guarda apenas as doses realizadas (log esparso).
+# Tratamentos terminados são compactados em medicamentos_resumo: um mapa de
+# bits com as doses realizadas (bit n-1 = dose n, começando pelo bit menos
+# significativo de cada byte, como get_bit/set_bit do Postgres).
+
+from datetime import timedelta
+from itertools import islice
+
+
+def doses_por_dia(medicamento):
+    """Quantidade de doses diárias do medicamento (padrão 1)"""
+    return max(int(medicamento.get('doses_por_dia') or 1), 1)
+
+
+def total_doses(medicamento):
+    """Total de doses do tratamento (duração × doses por dia)"""
+    return int(medicamento['duracao']) * doses_por_dia(medicamento)
+
+
+def data_da_dose(medicamento, numero_dose):
+    """Data programada da dose (numero_dose começa em 1)"""
+    dias_desde_inicio = (numero_dose - 1) // doses_por_dia(medicamento)
+    return medicamento['data_inicio'] + timedelta(days=dias_desde_inicio)
+
+
+def agrupar_doses_realizadas(medicamentos_log):
+    """Agrupar o log esparso em {medicamento_id: {numero_dose, ...}}"""
+    realizadas = {}
+    for dose in medicamentos_log:
+        if dose.get('realizado', True):
+            realizadas.setdefault(dose['medicamento_id'], set()).add(dose['numero_dose'])
+    return realizadas
+
+
+def progresso(medicamento, realizadas):
+    """Retorna (doses_realizadas, total_doses, percentual)"""
+    total = total_doses(medicamento)
+    feitas = sum(1 for n in realizadas if 1 <= n <= total)
+    percentual = (feitas / total * 100) if total > 0 else 0
+    return feitas, total, percentual
+
+
+def doses_pendentes(medicamento, realizadas):
+    """Gerar as doses pendentes em ordem, sem materializar a agenda inteira"""
+    for numero in range(1, total_doses(medicamento) + 1):
+        if numero not in realizadas:
+            yield {'numero_dose': numero, 'data_dose': data_da_dose(medicamento, numero)}
+
+
+def proximas_doses(medicamento, realizadas, limite=10):
+    """Lista com as próximas `limite` doses pendentes"""
+    return list(islice(doses_pendentes(medicamento, realizadas), limite))
+
+
+def novo_registro_dose(medicamento, numero_dose):
+    """Registro de medicamentos_log para uma dose realizada"""
+    return {
+        'medicamento_id': medicamento['id'],
+        'numero_dose': numero_dose,
+        'data_dose': data_da_dose(medicamento, numero_dose).isoformat(),
+        'realizado': True
+    }
+
+
+def progresso_agregado(medicamento, agregado):
+    """Retorna (doses_realizadas, total_doses, percentual) a partir da view medicamentos_progresso"""
+    if not agregado:
+        return progresso(medicamento, set())
+    total = agregado['total_doses']
+    feitas = agregado['doses_realizadas']
+    percentual = (feitas / total * 100) if total > 0 else 0
+    return feitas, total, percentual
+
+
+def doses_pendentes_ate(medicamento, realizadas, data_limite):
+    """Números das doses pendentes programadas até data_limite (inclusive)"""
+    if data_limite < medicamento['data_inicio']:
+        return []
+    dias = (data_limite - medicamento['data_inicio']).days + 1
+    ultima = min(dias * doses_por_dia(medicamento), total_doses(medicamento))
+    return [n for n in range(1, ultima + 1) if n not in realizadas]
+
+
+def doses_pendentes_no_intervalo(medicamento, realizadas, primeira, ultima):
+    """Números das doses pendentes entre primeira e ultima (inclusive)"""
+    ultima = min(ultima, total_doses(medicamento))
+    return [n for n in range(max(primeira, 1), ultima + 1) if n not in realizadas]
+
+
+def atualizar_agregado(medicamento, realizadas):
+    """Recalcular localmente a linha de medicamentos_progresso após marcar doses"""
+    feitas, total, _ = progresso(medicamento, realizadas)
+    proxima = proximas_doses(medicamento, realizadas, limite=1)
+    return {
+        'medicamento_id': medicamento['id'],
+        'total_doses': total,
+        'doses_realizadas': feitas,
+        'doses_pendentes': total - feitas,
+        'proxima_dose_numero': proxima[0]['numero_dose'] if proxima else None,
+        'proxima_dose_data': proxima[0]['data_dose'] if proxima else None
+    }
+
+
+def codificar_mapa(realizadas, total):
+    """Mapa de bits das doses realizadas (mesmo formato de mapa_de_doses() no banco)"""
+    mapa = bytearray((total + 7) // 8)
+    for numero in realizadas:
+        if 1 <= numero <= total:
+            mapa[(numero - 1) // 8] |= 1 << ((numero - 1) % 8)
+    return bytes(mapa)
+
+
+def decodificar_mapa(mapa, total):
+    """Números das doses realizadas no mapa de bits
+    Aceita bytes ou o texto hexadecimal ('\\x...') com que o PostgREST devolve colunas bytea
+    """
+    if isinstance(mapa, str):
+        mapa = bytes.fromhex(mapa[2:] if mapa.startswith('\\x') else mapa)
+    ultima = min(total, len(mapa) * 8)
+    return {n for n in range(1, ultima + 1) if mapa[(n - 1) // 8] >> ((n - 1) % 8) & 1}
+
+
+def doses_previstas_ate(medicamento, data_limite):
+    """Quantidade de doses programadas até data_limite (inclusive)"""
+    if data_limite < medicamento['data_inicio']:
+        return 0
+    dias = (data_limite - medicamento['data_inicio']).days + 1
+    return min(dias * doses_por_dia(medicamento), total_doses(medicamento))
@@ -3,6 +3,26 @@ from datetime import datetime, timedelta
 import locale
 import httpx
 import json
+import os
+import time
+import jwt
+import agenda_doses
+import autenticacao
+import exportacao
+import importacao
+import relatorio
+import serie_peso
+import busca
+import agenda_alimentacao
+import memoria_sessoes
+import supabase_assincrono
+import fila_escrita
+import tempo_real
+import rastreamento
+import uuid
+import pandas as pd
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 # Atualização forçada da interface
 
@@ -26,6 +46,20 @@ SUPABASE_URL = st.secrets["supabase"]["url"]
 SUPABASE_KEY = st.secrets["supabase"]["key"]
 SUPABASE_API_URL = f'{SUPABASE_URL}/rest/v1'
 SUPABASE_AUTH_URL = f'{SUPABASE_URL}/auth/v1'
+SUPABASE_JWKS_URL = f'{SUPABASE_AUTH_URL}/.well-known/jwks.json'
+# Segredo JWT legado (HS256) - opcional, necessário apenas em projetos sem chave assimétrica
+SUPABASE_JWT_SECRET = st.secrets["supabase"].get("jwt_secret")
+# Alterações em tempo real (opcional): outros dispositivos e o webhook atualizam a sessão sem recarga
+TEMPO_REAL_ATIVO = st.secrets.get("tempo_real", {}).get("ativo", False)
+TEMPO_REAL_URL = st.secrets.get("tempo_real", {}).get("url") or tempo_real.url_tempo_real(SUPABASE_URL, SUPABASE_KEY)
+# Rastreamento dos reruns (opcional): trechos de cada fase em OTLP/JSON e log de reruns lentos
+rastreamento.configurar(**st.secrets.get("rastreamento", {}))
+# Rerun anterior que terminou em st.rerun(): fechado com o último trecho medido
+rastreamento.finalizar_rerun(st.session_state.get('rastro'), interrompido=True)
+st.session_state.rastro_anterior = st.session_state.get('rastro')
+st.session_state.rastro = rastreamento.iniciar_rerun(
+    sessao=get_script_run_ctx().session_id if get_script_run_ctx() else None
+)
 
 # Headers para requisições ao Supabase (sem auth)
 SUPABASE_HEADERS = {
@@ -48,6 +82,7 @@ def get_auth_headers():
     return SUPABASE_HEADERS
 
 # ==================== FUNÇÕES DE AUTENTICAÇÃO ====================
+@rastreamento.rastrear('auth.login', tipo=rastreamento.CLIENTE)
 def auth_login(email, password):
     """Fazer login do usuário"""
     try:
@@ -66,6 +101,104 @@ def auth_login(email, password):
         st.error(f"Erro ao fazer login: {str(e)}")
         return None
 
+@rastreamento.rastrear('auth.renovar', tipo=rastreamento.CLIENTE)
+def auth_refresh(refresh_token):
+    """Renovar a sessão usando o refresh_token"""
+    if not refresh_token:
+        return None
+    try:
+        response = httpx.post(
+            f'{SUPABASE_AUTH_URL}/token?grant_type=refresh_token',
+            json={'refresh_token': refresh_token},
+            headers={'apikey': SUPABASE_KEY, 'Content-Type': 'application/json'},
+            timeout=10.0
+        )
+        if response.status_code == 200:
+            return response.json()
+        return None
+    except Exception:
+        return None
+
+@rastreamento.rastrear('auth.usuario', tipo=rastreamento.CLIENTE)
+def auth_get_user(access_token):
+    """Validar o token no servidor (usado só quando não há como validar localmente)"""
+    try:
+        response = httpx.get(
+            f'{SUPABASE_AUTH_URL}/user',
+            headers={'apikey': SUPABASE_KEY, 'Authorization': f'Bearer {access_token}'},
+            timeout=10.0
+        )
+        if response.status_code == 200:
+            return response.json()
+        return None
+    except Exception:
+        return None
+
+@rastreamento.rastrear('autenticacao.validar_token')
+def validar_token(access_token):
+    """Validar o JWT localmente (JWKS em cache ou jwt_secret) e retornar as claims"""
+    try:
+        return autenticacao.verificar_token(
+            access_token,
+            jwks_url=SUPABASE_JWKS_URL,
+            apikey=SUPABASE_KEY,
+            segredo=SUPABASE_JWT_SECRET
+        )
+    except jwt.ExpiredSignatureError:
+        return None
+    except jwt.InvalidTokenError:
+        # Token HS256 sem jwt_secret configurado: validar uma vez no servidor
+        try:
+            algoritmo = jwt.get_unverified_header(access_token).get('alg')
+        except jwt.InvalidTokenError:
+            return None
+        if algoritmo == 'HS256' and not SUPABASE_JWT_SECRET and auth_get_user(access_token):
+            return jwt.decode(access_token, options={'verify_signature': False})
+        return None
+    except Exception:
+        return None
+
+def iniciar_sessao(dados_token):
+    """Guardar tokens e claims verificadas na sessão; retorna False se o token for inválido"""
+    claims = validar_token(dados_token['access_token'])
+    if not claims:
+        return False
+    st.session_state.user = dados_token['user']
+    st.session_state.access_token = dados_token['access_token']
+    st.session_state.refresh_token = dados_token.get('refresh_token')
+    st.session_state.token_expira_em = autenticacao.expira_em(dados_token, claims)
+    st.session_state.jwt_claims = claims
+    return True
+
+@rastreamento.rastrear('autenticacao.sessao')
+def garantir_sessao_valida():
+    """Renovar o token antes de expirar (sem chamadas enquanto ele for válido)
+    Retorna False se a sessão não puder ser mantida
+    """
+    if not autenticacao.precisa_renovar(st.session_state.get('token_expira_em', 0)):
+        return True
+    dados_token = auth_refresh(st.session_state.get('refresh_token'))
+    return bool(dados_token) and iniciar_sessao(dados_token)
+
+@rastreamento.rastrear('autenticacao.perfil')
+def perfil_em_cache():
+    """Plano e status do usuário sem round-trip a cada rerun
+    Usa as claims do token (custom access token hook) ou o perfil em cache por PERFIL_TTL
+    """
+    plano_token = autenticacao.plano_das_claims(st.session_state.get('jwt_claims'))
+    if plano_token:
+        perfil = {**st.session_state.get('user_profile', {}), **plano_token}
+    elif autenticacao.perfil_expirado(st.session_state.get('perfil_verificado_em')):
+        perfil = get_user_profile()
+        st.session_state.perfil_verificado_em = time.time()
+    else:
+        perfil = st.session_state.get('user_profile')
+    # Alteração recebida em tempo real (ex.: status trocado pelo webhook) é mais nova que token e cache
+    assinatura = st.session_state.get('tempo_real')
+    if perfil and assinatura is not None and assinatura.perfil:
+        perfil = {**perfil, **{c: assinatura.perfil[c] for c in ('plano', 'status') if c in assinatura.perfil}}
+    return perfil
+
 def auth_signup(email, password):
     """Criar nova conta de usuário"""
     try:
@@ -85,14 +218,23 @@ def auth_signup(email, password):
 
 def auth_logout():
     """Fazer logout do usuário"""
-    if 'access_token' in st.session_state:
-        del st.session_state.access_token
-    if 'user' in st.session_state:
-        del st.session_state.user
-    if 'user_profile' in st.session_state:
-        del st.session_state.user_profile
-    st.session_state.data_loaded = False
-
+    for chave in ['access_token', 'refresh_token', 'token_expira_em', 'jwt_claims',
+                  'user', 'user_profile', 'perfil_verificado_em', 'administrador', 'painel_admin',
+                  'pets_no_plano', 'importacao_parcial']:
+        if chave in st.session_state:
+            del st.session_state[chave]
+    if 'tempo_real' in st.session_state:
+        st.session_state.tempo_real.parar()
+        del st.session_state['tempo_real']
+    if 'fila_escrita' in st.session_state:
+        # O que não for gravado agora fica no diário e é regravado no próximo login
+        st.session_state.fila_escrita.encerrar()
+        del st.session_state['fila_escrita']
+    if 'dados' in st.session_state:
+        memoria_sessoes.gerenciador.descartar(st.session_state.dados)
+        del st.session_state['dados']
+
+@rastreamento.rastrear('supabase.perfil', tipo=rastreamento.CLIENTE)
 def get_user_profile():
     """Buscar perfil do usuário logado"""
     if 'user' not in st.session_state:
@@ -134,7 +276,18 @@ PLANOS = {
 # WhatsApp para upgrade (formato: 5511999999999)
 WHATSAPP_NUMERO = '5591980389225'
 
+# Contagem de pets do plano reaproveitada por este tempo (a conferência final é o gatilho do banco)
+CONTAGEM_PETS_SEGUNDOS = 60
+
 # ==================== FUNÇÕES DO SUPABASE ====================
+def erro_da_resposta(response):
+    """Mensagem de erro do PostgREST (campo message do JSON) ou o corpo da resposta"""
+    try:
+        return response.json().get('message') or response.text
+    except Exception:
+        return response.text
+
+@rastreamento.rastrear('supabase.get', 'tabela', 'filtros', tipo=rastreamento.CLIENTE)
 def supabase_get(table, filters=None):
     """Buscar dados de uma tabela do Supabase"""
     try:
@@ -149,6 +302,29 @@ def supabase_get(table, filters=None):
         st.error(f"Erro ao buscar dados: {str(e)}")
         return []
 
+def supabase_get_paginado(table, filters=None, tamanho_pagina=1000):
+    """Percorrer uma tabela página por página (paginação por chave em id)
+    Gera listas de registros; erros de rede ou HTTP são propagados, para que
+    uma exportação nunca termine silenciosamente incompleta
+    """
+    ultimo_id = None
+    with httpx.Client(headers=get_auth_headers(), timeout=30.0) as cliente:
+        while True:
+            params = f'order=id.asc&limit={tamanho_pagina}'
+            if ultimo_id is not None:
+                params += f'&id=gt.{ultimo_id}'
+            if filters:
+                params += f'&{filters}'
+            response = cliente.get(f'{SUPABASE_API_URL}/{table}?{params}')
+            response.raise_for_status()
+            pagina = response.json()
+            if pagina:
+                yield pagina
+            if len(pagina) < tamanho_pagina:
+                return
+            ultimo_id = pagina[-1]['id']
+
+@rastreamento.rastrear('supabase.post', 'tabela', tipo=rastreamento.CLIENTE)
 def supabase_post(table, data):
     """Inserir dados em uma tabela do Supabase"""
     try:
@@ -160,12 +336,94 @@ def supabase_post(table, data):
         response = httpx.post(url, headers=get_auth_headers(), json=data, timeout=10.0)
         if response.status_code in [200, 201]:
             return response.json()
-        st.error(f"Erro ao salvar dados: {response.text}")
+        st.error(f"Erro ao salvar dados: {erro_da_resposta(response)}")
         return None
     except Exception as e:
         st.error(f"Erro ao salvar dados: {str(e)}")
         return None
 
+@rastreamento.rastrear('supabase.post_lote', 'tabela', tipo=rastreamento.CLIENTE)
+def supabase_post_lote(table, registros, on_conflict=None, mesclar=False):
+    """Inserir vários registros em uma única requisição (retorna as linhas gravadas)
+    Com on_conflict, registros já existentes são ignorados ou, com mesclar=True, atualizados
+    """
+    try:
+        # Adicionar user_id automaticamente
+        if 'user' in st.session_state:
+            for registro in registros:
+                registro.setdefault('user_id', st.session_state.user['id'])
+
+        url = f'{SUPABASE_API_URL}/{table}'
+        headers = get_auth_headers()
+        if on_conflict:
+            # Registros já existentes são ignorados (não entram na resposta) ou atualizados
+            url += f'?on_conflict={on_conflict}'
+            resolucao = 'merge-duplicates' if mesclar else 'ignore-duplicates'
+            headers['Prefer'] = f'return=representation,resolution={resolucao}'
+        response = httpx.post(url, headers=headers, json=registros, timeout=30.0)
+        if response.status_code in [200, 201]:
+            return response.json()
+        st.error(f"Erro ao salvar dados: {erro_da_resposta(response)}")
+        return None
+    except Exception as e:
+        st.error(f"Erro ao salvar dados: {str(e)}")
+        return None
+
+def supabase_post_em_blocos(table, registros, tamanho_bloco=500):
+    """Inserir muitos registros em blocos de tamanho_bloco (uma requisição por bloco)
+    Para no primeiro bloco com erro; retorna quantos registros foram gravados
+    """
+    gravados = 0
+    for inicio in range(0, len(registros), tamanho_bloco):
+        resultado = supabase_post_lote(table, registros[inicio:inicio + tamanho_bloco])
+        if resultado is None:
+            break
+        gravados += len(resultado)
+    return gravados
+
+@rastreamento.rastrear('supabase.rpc', 'funcao', tipo=rastreamento.CLIENTE)
+def supabase_rpc_resposta(funcao, parametros):
+    """Chamar uma função do banco (/rest/v1/rpc); retorna a resposta HTTP ou None se não houve resposta"""
+    try:
+        url = f'{SUPABASE_API_URL}/rpc/{funcao}'
+        return httpx.post(url, headers=get_auth_headers(), json=parametros, timeout=10.0)
+    except Exception:
+        return None
+
+def supabase_rpc(funcao, parametros):
+    """Chamar uma função do banco (/rest/v1/rpc); retorna a resposta ou None em caso de erro"""
+    response = supabase_rpc_resposta(funcao, parametros)
+    if response is not None and response.status_code == 200:
+        return response.json()
+    return None
+
+def funcao_ausente(response):
+    """Resposta do PostgREST para uma função que não existe no banco (PGRST202)"""
+    if response.status_code != 404:
+        return False
+    try:
+        return response.json().get('code') in (None, 'PGRST202')
+    except ValueError:
+        return True
+
+@rastreamento.rastrear('supabase.contar', 'tabela', 'filtros', tipo=rastreamento.CLIENTE)
+def supabase_contar(table, filters=None):
+    """Contar registros sem transferi-los (HEAD com Prefer: count=exact); retorna None em caso de erro"""
+    try:
+        url = f'{SUPABASE_API_URL}/{table}?select=id'
+        if filters:
+            url += f'&{filters}'
+        headers = get_auth_headers()
+        headers['Prefer'] = 'count=exact'
+        response = httpx.head(url, headers=headers, timeout=10.0)
+        if response.status_code in [200, 206]:
+            # Content-Range: 0-24/25 (ou */0 sem registros)
+            return int(response.headers['content-range'].rsplit('/', 1)[1])
+        return None
+    except Exception:
+        return None
+
+@rastreamento.rastrear('supabase.update', 'tabela', 'id', tipo=rastreamento.CLIENTE)
 def supabase_update(table, id_value, data):
     """Atualizar dados em uma tabela do Supabase"""
     try:
@@ -178,18 +436,48 @@ def supabase_update(table, id_value, data):
         st.error(f"Erro ao atualizar dados: {str(e)}")
         return False
 
+@rastreamento.rastrear('supabase.delete', 'tabela', 'id', tipo=rastreamento.CLIENTE)
 def supabase_delete(table, id_value):
     """Deletar dados de uma tabela do Supabase"""
     try:
         url = f'{SUPABASE_API_URL}/{table}?id=eq.{id_value}'
         response = httpx.delete(url, headers=get_auth_headers(), timeout=10.0)
-        if response.status_code == 204:
+        # 200 com return=representation (registros excluídos no corpo), 204 sem
+        if response.status_code in [200, 204]:
             return True
         return False
     except Exception as e:
         st.error(f"Erro ao deletar dados: {str(e)}")
         return False
 
+@rastreamento.rastrear('supabase.reunir')
+def supabase_reunir(chamadas, mensagem_erro, valor_em_erro):
+    """Executar ao mesmo tempo chamadas [(método do SupabaseAssincrono, argumentos...)] com o token do usuário
+    Resultados na mesma ordem, com valor_em_erro nas que falharem
+    """
+    cliente = supabase_assincrono.SupabaseAssincrono(SUPABASE_API_URL, get_auth_headers())
+    corrotinas = [
+        rastreamento.rastrear_corrotina(getattr(cliente, metodo)(*argumentos), f'supabase.{metodo}', tabela=argumentos[0])
+        for metodo, *argumentos in chamadas
+    ]
+    try:
+        resultados = supabase_assincrono.executar(supabase_assincrono.reunir(corrotinas))
+    except TimeoutError:
+        st.error(f"{mensagem_erro}: tempo esgotado")
+        return [valor_em_erro for _ in chamadas]
+    falhas = [r for r in resultados if isinstance(r, Exception)]
+    if falhas:
+        st.error(f"{mensagem_erro}: {str(falhas[0])}")
+    return [valor_em_erro if isinstance(r, Exception) else r for r in resultados]
+
+def supabase_get_varios(consultas):
+    """Várias consultas [(tabela, filtros)] ao mesmo tempo; listas de registros na mesma ordem"""
+    return supabase_reunir([('get', tabela, filtros) for tabela, filtros in consultas], "Erro ao buscar dados", [])
+
+def supabase_delete_varios(exclusoes):
+    """Excluir ao mesmo tempo os registros de [(tabela, filtros)]; retorna True se todas deram certo"""
+    return all(supabase_reunir([('delete', tabela, filtros) for tabela, filtros in exclusoes], "Erro ao deletar dados", False))
+
 def converter_data_para_string(obj):
     """Converter objetos date para string ISO"""
     if isinstance(obj, dict):
@@ -209,12 +497,13 @@ def converter_string_para_data(obj):
             if isinstance(v, str):
                 # Tentar converter strings que parecem datas
                 if k in ['data_nascimento', 'data_aplicacao', 'proxima_dose', 'data_consulta',
-                         'data_inicio', 'data_fim', 'data_pesagem', 'data_dose']:
+                         'data_inicio', 'data_fim', 'data_pesagem', 'data_dose', 'proxima_dose_data',
+                         'data_referencia']:
                     try:
                         result[k] = datetime.fromisoformat(v.replace('Z', '+00:00')).date()
                     except:
                         result[k] = v
-                elif k in ['data_cadastro', 'data_registro', 'data_criacao', 'created_at']:
+                elif k in ['data_cadastro', 'data_registro', 'data_criacao', 'created_at', 'atualizado_em']:
                     try:
                         result[k] = datetime.fromisoformat(v.replace('Z', '+00:00'))
                     except:
@@ -237,14 +526,6 @@ except:
     except:
         pass  # Manter padrão se não conseguir configurar
 
-# Configuração da página
-st.set_page_config(
-    page_title="PetControl",
-    page_icon="🐾",
-    layout="wide",
-    initial_sidebar_state="collapsed"
-)
-
 # CSS customizado para o estilo visual
 st.markdown("""
     <style>
@@ -531,20 +812,343 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Função para recarregar dados do Supabase
+@rastreamento.rastrear('recarregar_dados')
 def recarregar_dados():
-    """Recarregar todos os dados do Supabase"""
-    st.session_state.pets = converter_string_para_data(supabase_get('pets') or [])
-    st.session_state.vacinas = converter_string_para_data(supabase_get('vacinas') or [])
-    st.session_state.alimentacao = converter_string_para_data(supabase_get('alimentacao') or [])
-    st.session_state.veterinario = converter_string_para_data(supabase_get('veterinario') or [])
-    st.session_state.medicamentos = converter_string_para_data(supabase_get('medicamentos') or [])
-    st.session_state.preventivos = converter_string_para_data(supabase_get('preventivos') or [])
-    st.session_state.peso = converter_string_para_data(supabase_get('peso') or [])
-    st.session_state.notas = converter_string_para_data(supabase_get('notas') or [])
-    st.session_state.medicamentos_log = converter_string_para_data(supabase_get('medicamentos_log') or [])
-
-def calcular_status_saude(nome_pet):
-    """Calcular status de saúde do pet baseado em vacinas e preventivos
+    """Recarregar todos os dados do Supabase para o gerenciador de memória da sessão"""
+    # Alterações recebidas até aqui já estarão na recarga
+    if 'tempo_real' in st.session_state:
+        st.session_state.tempo_real.descartar_pendentes()
+    # Escritas pendentes são gravadas antes da leitura, para a recarga já trazer o estado novo
+    fila = st.session_state.get('fila_escrita')
+    if fila is not None:
+        with rastreamento.trecho('fila_escrita.descarregar'):
+            fila.descarregar()
+    # Tabelas independentes: buscadas ao mesmo tempo (uma requisição por tabela)
+    nomes = ['pets', 'vacinas', 'alimentacao', 'estoques_alimento', 'veterinario', 'medicamentos',
+             'preventivos', 'peso', 'notas', 'medicamentos_progresso']
+    respostas = supabase_get_varios([(nome, None) for nome in nomes])
+    with rastreamento.trecho('decodificar', registros=sum(len(registros) for registros in respostas)):
+        tabelas = {nome: converter_string_para_data(registros) for nome, registros in zip(nomes, respostas)}
+    with rastreamento.trecho('estruturas_derivadas'):
+        # Horários dos planos interpretados uma vez por carga
+        tabelas['planos_alimentacao'] = agenda_alimentacao.estruturar_planos(tabelas['alimentacao'])
+        # Pesagens em arrays colunares (pet, data, peso) para os cálculos vetorizados
+        tabelas['peso_arrays'] = serie_peso.arrays_de_pesagens(tabelas['peso'])
+        # Progresso agregado no banco (view medicamentos_progresso): uma linha por medicamento
+        tabelas['medicamentos_progresso'] = {p['medicamento_id']: p for p in tabelas['medicamentos_progresso']}
+    # Doses individuais são buscadas sob demanda (carregar_doses_medicamento)
+    tabelas['doses_medicamento'] = {}
+    # Histórico arquivado (supabase_arquivo.sql) só é buscado quando aberto (carregar_arquivo)
+    tabelas['arquivo'] = {}
+    # Índice de busca local é reconstruído sob demanda após cada recarga
+    tabelas['indice_busca'] = None
+    if fila is not None:
+        # Gravações que falharam continuam valendo na tela até serem regravadas
+        fila.aplicar_pendentes(tabelas)
+    memoria_sessoes.gerenciador.guardar(dados, tabelas)
+    # Pets podem ter mudado: a próxima conferência do limite conta de novo
+    st.session_state.pop('pets_no_plano', None)
+
+def callbacks_da_sessao():
+    """(pedir_rerun, sessao_ativa) da sessão atual, chamadas pela thread do tempo real
+    pedir_rerun agenda um rerun no loop do servidor; ambas retornam False se a aba foi fechada
+    """
+    try:
+        runtime = Runtime.instance()
+        loop = runtime._get_async_objs().eventloop
+        id_sessao = get_script_run_ctx().session_id
+    except Exception:
+        # Fora do servidor do Streamlit: eventos aplicados no próximo rerun
+        return None, None
+
+    def sessao_ativa():
+        return runtime._session_mgr.get_active_session_info(id_sessao) is not None
+
+    def pedir_rerun():
+        info = runtime._session_mgr.get_active_session_info(id_sessao)
+        if info is None:
+            return False
+        loop.call_soon_threadsafe(info.session.request_rerun, None)
+        return True
+
+    return pedir_rerun, sessao_ativa
+
+@rastreamento.rastrear('sincronizar_tempo_real')
+def sincronizar_tempo_real():
+    """Manter a assinatura de alterações da sessão e aplicar o que chegou desde o último rerun"""
+    assinatura = st.session_state.get('tempo_real')
+    if assinatura is None or assinatura.encerrada or assinatura.user_id != st.session_state.user['id']:
+        pedir_rerun, sessao_ativa = callbacks_da_sessao()
+        st.session_state.tempo_real = tempo_real.AssinaturaTempoReal(
+            TEMPO_REAL_URL, st.session_state.user['id'], st.session_state.access_token, pedir_rerun, sessao_ativa
+        ).iniciar()
+        if assinatura is not None:
+            # Assinatura anterior encerrada: o que mudou nesse intervalo só vem com uma recarga
+            assinatura.parar()
+            recarregar_dados()
+        return
+    if assinatura.token != st.session_state.access_token:
+        assinatura.atualizar_token(st.session_state.access_token)
+    if assinatura.precisa_recarregar:
+        recarregar_dados()
+        return
+
+    eventos = assinatura.drenar()
+    if not eventos:
+        return
+    colecoes = {tabela: dados.tabelas[tabela] for tabela in tempo_real.TABELAS_TEMPO_REAL if tabela in dados.tabelas}
+    alteradas = tempo_real.aplicar_eventos(colecoes, eventos, converter_string_para_data)
+    # Estruturas derivadas das tabelas alteradas
+    if 'alimentacao' in alteradas:
+        dados.planos_alimentacao = agenda_alimentacao.estruturar_planos(dados.alimentacao)
+    if 'peso' in alteradas:
+        dados.peso_arrays = serie_peso.arrays_de_pesagens(dados.peso)
+    if alteradas & {'medicamentos', 'medicamentos_log'}:
+        progresso = converter_string_para_data(supabase_get('medicamentos_progresso') or [])
+        dados.medicamentos_progresso = {p['medicamento_id']: p for p in progresso}
+        dados.doses_medicamento = {}
+    if alteradas & set(busca.CAMPOS):
+        dados.indice_busca = None
+    if alteradas & set(TABELAS_ARQUIVADAS):
+        # Exclusões podem ser o arquivamento movendo registros para o arquivo
+        dados.arquivo = {}
+    if 'pets' in alteradas:
+        st.session_state.pop('pets_no_plano', None)
+
+def contar_pets(atualizar=False):
+    """Pets cadastrados no plano do usuário, contados no banco
+    A contagem fica guardada por CONTAGEM_PETS_SEGUNDOS; atualizar=True força uma nova.
+    Sem resposta do Supabase, usa os pets carregados na sessão
+    """
+    contagem = st.session_state.get('pets_no_plano')
+    if atualizar or contagem is None or time.monotonic() - contagem[1] > CONTAGEM_PETS_SEGUNDOS:
+        total = supabase_contar('pets', f"user_id=eq.{st.session_state.user['id']}")
+        if total is None:
+            return len(dados.pets)
+        contagem = (total, time.monotonic())
+        st.session_state.pets_no_plano = contagem
+    return contagem[0]
+
+def carregar_doses_medicamento(medicamento_id):
+    """Buscar as doses realizadas de um medicamento (uma vez por recarga)"""
+    if medicamento_id not in dados.doses_medicamento:
+        dados.doses_medicamento[medicamento_id] = supabase_get(
+            'medicamentos_log',
+            f"medicamento_id=eq.{medicamento_id}&select=id,medicamento_id,numero_dose,realizado&order=numero_dose"
+        )
+    return dados.doses_medicamento[medicamento_id]
+
+def carregar_doses_finalizado(medicamento):
+    """Doses realizadas de um tratamento terminado (uma vez por recarga)
+    Tratamentos compactados por compactar_doses() vêm do mapa de bits em
+    medicamentos_resumo; os demais (ou sem supabase_compactacao_doses.sql), do log
+    """
+    if medicamento['id'] not in dados.doses_medicamento:
+        resumo = supabase_get('medicamentos_resumo', f"medicamento_id=eq.{medicamento['id']}&select=total_doses,mapa")
+        if not resumo:
+            return carregar_doses_medicamento(medicamento['id'])
+        realizadas = agenda_doses.decodificar_mapa(resumo[0]['mapa'], resumo[0]['total_doses'])
+        dados.doses_medicamento[medicamento['id']] = [
+            {'medicamento_id': medicamento['id'], 'numero_dose': numero, 'realizado': True}
+            for numero in sorted(realizadas)
+        ]
+    return dados.doses_medicamento[medicamento['id']]
+
+# Tabelas com registros frios movidos por arquivar_historico() para <tabela>_arquivo
+TABELAS_ARQUIVADAS = ['vacinas', 'preventivos', 'medicamentos']
+
+def carregar_arquivo(tabela, ordem):
+    """Buscar os registros arquivados de uma tabela (uma vez por recarga)
+    Sem supabase_arquivo.sql no banco, o arquivo fica vazio
+    """
+    if tabela not in dados.arquivo:
+        dados.arquivo[tabela] = converter_string_para_data(supabase_get(f'{tabela}_arquivo', f'order={ordem}'))
+    return dados.arquivo[tabela]
+
+def data_br(data):
+    """Data no formato DD/MM/AAAA (— quando vazia)"""
+    return data.strftime('%d/%m/%Y') if data else "—"
+
+def mostrar_historico_completo(tabela, ordem, colunas):
+    """Seção "Histórico completo": registros arquivados, buscados só quando o usuário a abre
+    colunas: {rótulo: função que extrai o valor do registro}
+    """
+    if not st.toggle("📦 Histórico completo", key=f"historico_{tabela}"):
+        return
+    registros = carregar_arquivo(tabela, ordem)
+    if not registros:
+        st.caption("Nenhum registro arquivado.")
+        return
+    st.caption(f"{len(registros)} registro(s) arquivado(s), somente leitura.")
+    st.dataframe(
+        pd.DataFrame([{rotulo: valor(registro) for rotulo, valor in colunas.items()} for registro in registros]),
+        use_container_width=True, hide_index=True
+    )
+
+def fila_de_escrita():
+    """Fila de escrita da sessão (criada após o login, recuperando diários de sessões interrompidas)"""
+    fila = st.session_state.get('fila_escrita')
+    if fila is None or fila.user_id != st.session_state.user['id']:
+        fila = fila_escrita.FilaEscrita(
+            dados.id_sessao, st.session_state.user['id'], SUPABASE_API_URL, get_auth_headers(),
+            **st.secrets.get("fila_escrita", {})
+        )
+        st.session_state.fila_escrita = fila
+        if fila.recuperar_diarios():
+            fila.descarregar()
+    # Token renovado vale para as próximas gravações
+    fila.headers = get_auth_headers()
+    return fila
+
+def atualizar_registro(tabela, registro, campos):
+    """Atualizar um registro na tela na hora e gravar pela fila de escrita
+    Alternâncias seguidas do mesmo registro viram uma única requisição
+    """
+    registro.update(campos)
+    fila_de_escrita().atualizar(tabela, registro['id'], converter_data_para_string(campos))
+
+def marcar_doses_em_lote(medicamento, numeros_doses):
+    """Registrar doses realizadas pela fila de escrita e atualizar o estado local na hora
+    Retorna a quantidade de doses novas
+    """
+    doses_log = carregar_doses_medicamento(medicamento['id'])
+    realizadas = agenda_doses.agrupar_doses_realizadas(doses_log).get(medicamento['id'], set())
+    registros = [agenda_doses.novo_registro_dose(medicamento, n) for n in numeros_doses if n not in realizadas]
+    if not registros:
+        return 0
+
+    # Doses marcadas em sequência são gravadas juntas (um POST com on_conflict)
+    fila = fila_de_escrita()
+    for registro in registros:
+        registro['user_id'] = st.session_state.user['id']
+        fila.inserir('medicamentos_log', registro, ('medicamento_id', 'numero_dose'))
+
+    # Atualizar cache de doses e agregado sem recarregar todos os dados
+    doses_log.extend(registros)
+    realizadas |= {registro['numero_dose'] for registro in registros}
+    dados.medicamentos_progresso[medicamento['id']] = agenda_doses.atualizar_agregado(medicamento, realizadas)
+    return len(registros)
+
+def excluir_medicamento(medicamento_id):
+    """Excluir um medicamento e o log de doses; retorna True se o medicamento foi excluído
+    Doses ainda na fila de escrita saem antes: gravadas depois, seriam recusadas pela
+    chave estrangeira de medicamentos_log
+    """
+    fila_de_escrita().descartar(lambda operacao: (
+        operacao['tabela'] == 'medicamentos_log' and operacao['op'] == 'insert'
+        and operacao['registro']['medicamento_id'] == medicamento_id
+    ))
+    # Log de doses primeiro (uma requisição para todas as doses)
+    supabase_delete_varios([('medicamentos_log', f"medicamento_id=eq.{medicamento_id}")])
+    return supabase_delete('medicamentos', medicamento_id)
+
+# Tabelas filhas ligadas a um pet pela chave pet_id
+TABELAS_DO_PET = ['vacinas', 'alimentacao', 'veterinario', 'medicamentos', 'preventivos', 'peso', 'notas']
+
+def agrupar_por_pet(registros):
+    """Agrupar registros pela chave inteira pet_id: {pet_id: [registros]}"""
+    grupos = {}
+    for registro in registros:
+        grupos.setdefault(registro.get('pet_id'), []).append(registro)
+    return grupos
+
+def nome_do_pet(pet_id):
+    """Nome do pet a partir do índice PETS_POR_ID"""
+    pet = PETS_POR_ID.get(pet_id)
+    return pet['nome'] if pet else "—"
+
+def rotulo_filtro_pet(pet_id):
+    """Rótulo das opções do filtro por pet (None representa 'Todos')"""
+    return "Todos" if pet_id is None else nome_do_pet(pet_id)
+
+@rastreamento.rastrear('buscar_registros')
+def buscar_registros(consulta, limite, deslocamento):
+    """Busca textual em notas, consultas e vacinas
+    Usa a função buscar_registros do banco (supabase_busca.sql); sem ela,
+    usa o índice invertido local sobre os dados da sessão
+    Retorna (resultados, busca_local)
+    """
+    if st.session_state.get('busca_remota', True):
+        response = supabase_rpc_resposta(
+            'buscar_registros', {'consulta': consulta, 'limite': limite, 'deslocamento': deslocamento}
+        )
+        if response is not None and response.status_code == 200:
+            return converter_string_para_data(response.json()), False
+        if response is not None and funcao_ausente(response):
+            # Sem supabase_busca.sql no banco: busca local no restante da sessão
+            st.session_state.busca_remota = False
+        # Prazo, 5xx ou outra falha: só esta busca usa o índice local
+
+    if dados.indice_busca is None:
+        dados.indice_busca = busca.IndiceBusca({
+            tabela: getattr(dados, tabela) for tabela in busca.CAMPOS
+        })
+    return dados.indice_busca.buscar(consulta, limite, deslocamento), True
+
+def eh_administrador():
+    """Usuário cadastrado em administradores (supabase_admin.sql); consultado uma vez por login"""
+    if 'administrador' not in st.session_state:
+        st.session_state.administrador = supabase_rpc('is_admin', {}) is True
+    return st.session_state.administrador
+
+def carregar_painel_administrativo():
+    """Agregados de todos os usuários (funções admin_* do banco); None se alguma falhar"""
+    painel = {
+        'planos': supabase_rpc('admin_planos', {'limites': PLANOS}),
+        'vacinas': supabase_rpc('admin_vacinas', {'hoje': datetime.now().date().isoformat()}),
+        'fontes': supabase_rpc('admin_fontes', {}),
+        'cadastros': supabase_rpc('admin_cadastros', {'semanas': 12})
+    }
+    if any(resultado is None for resultado in painel.values()):
+        return None
+    painel['atualizado_em'] = datetime.now()
+    return painel
+
+def paginas_opcionais(table, filters=None):
+    """Páginas de uma tabela de migração opcional (arquivo, resumos); sem ela no banco, nenhuma"""
+    try:
+        yield from supabase_get_paginado(table, filters)
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code != 404:
+            raise
+
+def paginas_para_exportacao(pet_id=None):
+    """Geradores de páginas de cada tabela (conta inteira ou um único pet)"""
+    if pet_id is None:
+        tabelas = {'pets': supabase_get_paginado('pets')}
+        for tabela in TABELAS_DO_PET:
+            tabelas[tabela] = supabase_get_paginado(tabela)
+        tabelas['medicamentos_log'] = supabase_get_paginado('medicamentos_log')
+        tabelas['medicamentos_resumo'] = paginas_opcionais('medicamentos_resumo')
+        for tabela in TABELAS_ARQUIVADAS + ['medicamentos_log']:
+            tabelas[f'{tabela}_arquivo'] = paginas_opcionais(f'{tabela}_arquivo')
+        return tabelas
+
+    tabelas = {'pets': supabase_get_paginado('pets', f'id=eq.{pet_id}')}
+    for tabela in TABELAS_DO_PET:
+        tabelas[tabela] = supabase_get_paginado(tabela, f'pet_id=eq.{pet_id}')
+    ids_medicamentos = [str(m['id']) for m in agrupar_por_pet(dados.medicamentos).get(pet_id, [])]
+    if ids_medicamentos:
+        tabelas['medicamentos_log'] = supabase_get_paginado(
+            'medicamentos_log', f"medicamento_id=in.({','.join(ids_medicamentos)})"
+        )
+        tabelas['medicamentos_resumo'] = paginas_opcionais(
+            'medicamentos_resumo', f"medicamento_id=in.({','.join(ids_medicamentos)})"
+        )
+    for tabela in TABELAS_ARQUIVADAS:
+        tabelas[f'{tabela}_arquivo'] = paginas_opcionais(f'{tabela}_arquivo', f'pet_id=eq.{pet_id}')
+    ids_arquivados = [str(m['id']) for m in supabase_get('medicamentos_arquivo', f'pet_id=eq.{pet_id}&select=id')]
+    if ids_arquivados:
+        tabelas['medicamentos_log_arquivo'] = paginas_opcionais(
+            'medicamentos_log_arquivo', f"medicamento_id=in.({','.join(ids_arquivados)})"
+        )
+    return tabelas
+
+@rastreamento.rastrear('calcular_status_saude')
+def calcular_status_saude(vacinas_pet, preventivos_pet, alerta_peso=None):
+    """Calcular status de saúde do pet baseado em vacinas, preventivos e peso
+    Recebe as listas já agrupadas por pet_id (ver agrupar_por_pet) e o alerta
+    de peso do pet (ver serie_peso.anomalias_de_peso), se houver
     Retorna: ('vermelho', mensagem) | ('amarelo', mensagem) | ('verde', mensagem)
     """
     hoje = datetime.now().date()
@@ -554,7 +1158,6 @@ def calcular_status_saude(nome_pet):
     nivel = 'verde'
 
     # Verificar vacinas
-    vacinas_pet = [v for v in st.session_state.vacinas if v['pet'] == nome_pet]
     for vacina in vacinas_pet:
         if vacina.get('proxima_dose'):
             if vacina['proxima_dose'] < hoje:
@@ -566,7 +1169,6 @@ def calcular_status_saude(nome_pet):
                 alertas.append(f"Vacina {vacina['nome_vacina']} vence em breve")
 
     # Verificar preventivos
-    preventivos_pet = [p for p in st.session_state.preventivos if p['pet'] == nome_pet]
     for preventivo in preventivos_pet:
         if preventivo.get('proxima_dose'):
             if preventivo['proxima_dose'] < hoje:
@@ -577,6 +1179,15 @@ def calcular_status_saude(nome_pet):
                     nivel = 'amarelo'
                 alertas.append(f"{preventivo['tipo_preventivo']} vence em breve")
 
+    # Verificar peso (variação semanal acima do limite da espécie)
+    if alerta_peso:
+        sentido = "Perda" if alerta_peso['variacao_semanal'] < 0 else "Ganho"
+        alertas.append(f"{sentido} de peso rápido ({alerta_peso['variacao_semanal']:+.1f}%/semana)")
+        if alerta_peso['nivel'] == 'vermelho':
+            nivel = 'vermelho'
+        elif nivel != 'vermelho':
+            nivel = 'amarelo'
+
     if nivel == 'verde':
         return ('verde', '✅ Tudo em dia')
     elif nivel == 'amarelo':
@@ -605,12 +1216,10 @@ if 'user' not in st.session_state:
                 if email and password:
                     # Tentar fazer login
                     result = auth_login(email, password)
-                    if result:
-                        st.session_state.user = result['user']
-                        st.session_state.access_token = result['access_token']
-
+                    if result and iniciar_sessao(result):
                         # Buscar perfil do usuário
                         profile = get_user_profile()
+                        st.session_state.perfil_verificado_em = time.time()
                         if profile:
                             # Verificar se está ativo
                             if profile['status'] == 'ativo':
@@ -664,30 +1273,41 @@ if 'user' not in st.session_state:
                     st.warning("Preencha todos os campos")
 
     st.markdown('</div>', unsafe_allow_html=True)
+    rastreamento.finalizar_rerun(st.session_state.rastro)
     st.stop()  # Parar execução aqui se não estiver logado
 
-# Usuário está logado - carregar dados
-# Buscar perfil e aplicar limite de plano
-if 'user_profile' not in st.session_state:
-    profile = get_user_profile()
-    if profile and profile['status'] == 'ativo':
-        st.session_state.user_profile = profile
-    else:
-        st.error("Sua conta está inativa. Faça login novamente.")
-        auth_logout()
-        st.rerun()
+# Usuário está logado - manter o token válido (renovação silenciosa antes de expirar)
+if not garantir_sessao_valida():
+    auth_logout()
+    st.rerun()
+
+# Buscar perfil (claims do token ou cache com TTL) e aplicar limite de plano
+profile = perfil_em_cache()
+if profile and profile['status'] == 'ativo':
+    st.session_state.user_profile = profile
+else:
+    st.error("Sua conta está inativa. Faça login novamente.")
+    auth_logout()
+    st.rerun()
 
 # Definir variáveis de plano baseadas no perfil do usuário
 PLANO_USUARIO = st.session_state.user_profile['plano']
 LIMITE_PETS = PLANOS[PLANO_USUARIO]
+rastreamento.anotar_rerun(usuario=st.session_state.user['id'], plano=PLANO_USUARIO)
 
-# Inicializar session state carregando dados do Supabase
-if 'data_loaded' not in st.session_state:
-    st.session_state.data_loaded = False
+# Dados da sessão no gerenciador de memória (recarregados se foram descartados)
+memoria_sessoes.gerenciador.configurar(**st.secrets.get("memoria", {}))
+if 'dados' not in st.session_state:
+    st.session_state.dados = memoria_sessoes.DadosSessao(uuid.uuid4().hex)
+dados = st.session_state.dados
 
-if not st.session_state.data_loaded:
+if not memoria_sessoes.gerenciador.usar(dados):
     recarregar_dados()
-    st.session_state.data_loaded = True
+if TEMPO_REAL_ATIVO:
+    sincronizar_tempo_real()
+
+# Índice de pets por id (chave inteira usada em todas as tabelas filhas)
+PETS_POR_ID = {pet['id']: pet for pet in dados.pets}
 
 # Header com logo e botão de logout
 col_header_1, col_header_2 = st.columns([4, 1])
@@ -714,7 +1334,7 @@ tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8, tab9 = st.tabs([
 ])
 
 # ==================== ABA INÍCIO ====================
-with tab1:
+with tab1, rastreamento.trecho('aba.inicio'):
     st.markdown('<div class="card">', unsafe_allow_html=True)
 
     col1, col2, col3 = st.columns([1, 2, 1])
@@ -724,8 +1344,8 @@ with tab1:
 
         # Botão de destaque para adicionar pet
         if st.button("➕ Adicionar Pet", use_container_width=True):
-            # Verificar se atingiu o limite do plano ao clicar
-            if len(st.session_state.pets) >= LIMITE_PETS:
+            # Verificar se atingiu o limite do plano ao clicar (contagem no banco, inclui outros dispositivos)
+            if contar_pets(atualizar=True) >= LIMITE_PETS:
                 st.error(f"🚀 Seu plano {PLANO_USUARIO} permite até {LIMITE_PETS} pet{'s' if LIMITE_PETS > 1 else ''}. Para cadastrar mais, faça o upgrade!")
             else:
                 st.session_state.show_add_pet_form = True
@@ -733,6 +1353,49 @@ with tab1:
 
     st.markdown('</div>', unsafe_allow_html=True)
 
+    # Busca textual em notas, consultas e vacinas
+    termo_busca = st.text_input(
+        "🔎 Buscar no histórico",
+        placeholder="Ex: otite, alergia, vermífugo",
+        key="termo_busca"
+    ).strip()
+    if termo_busca:
+        RESULTADOS_POR_PAGINA = 10
+        if st.session_state.get('ultimo_termo_busca') != termo_busca:
+            st.session_state.ultimo_termo_busca = termo_busca
+            st.session_state.pagina_busca = 0
+        pagina_busca = st.session_state.pagina_busca
+
+        # Um resultado a mais indica se existe próxima página
+        resultados_busca, busca_local = buscar_registros(
+            termo_busca, RESULTADOS_POR_PAGINA + 1, pagina_busca * RESULTADOS_POR_PAGINA
+        )
+        icones_busca = {'notas': "📝", 'veterinario': "🏥", 'vacinas': "💉"}
+
+        if not resultados_busca:
+            st.info("Nenhum registro encontrado.")
+        for resultado in resultados_busca[:RESULTADOS_POR_PAGINA]:
+            data_resultado = resultado.get('data_referencia')
+            st.markdown(
+                f"{icones_busca.get(resultado['tabela'], '•')} **{resultado['titulo']}** · "
+                f"{nome_do_pet(resultado.get('pet_id'))}"
+                + (f" · {data_resultado.strftime('%d/%m/%Y')}" if hasattr(data_resultado, 'strftime') else "")
+                + (f"  \n{resultado['trecho']}" if resultado.get('trecho') else "")
+            )
+
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            if pagina_busca > 0 and st.button("⬅️ Anteriores", key="busca_anterior"):
+                st.session_state.pagina_busca -= 1
+                st.rerun()
+        with col2:
+            if busca_local:
+                st.caption("Busca local (execute supabase_busca.sql para a busca no banco).")
+        with col3:
+            if len(resultados_busca) > RESULTADOS_POR_PAGINA and st.button("Próximos ➡️", key="busca_proxima"):
+                st.session_state.pagina_busca += 1
+                st.rerun()
+
     # Formulário para adicionar pet (aparece quando o botão é clicado)
     if st.session_state.get('show_add_pet_form', False):
         st.markdown('<div class="card">', unsafe_allow_html=True)
@@ -792,13 +1455,24 @@ with tab1:
         st.markdown('</div>', unsafe_allow_html=True)
 
     # Exibir lista de pets cadastrados
-    if st.session_state.pets:
+    if dados.pets:
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.markdown("### 🐾 Meus Pets")
 
-        for pet in st.session_state.pets:
+        vacinas_por_pet = agrupar_por_pet(dados.vacinas)
+        preventivos_por_pet = agrupar_por_pet(dados.preventivos)
+        # Todas as séries de peso avaliadas de uma vez
+        alertas_peso = serie_peso.anomalias_de_peso(
+            dados.peso_arrays, dados.pets, datetime.now().date()
+        )
+
+        for pet in dados.pets:
             # Calcular status de saúde
-            nivel, mensagem = calcular_status_saude(pet['nome'])
+            nivel, mensagem = calcular_status_saude(
+                vacinas_por_pet.get(pet['id'], []),
+                preventivos_por_pet.get(pet['id'], []),
+                alertas_peso.get(pet['id'])
+            )
             classe_card = f"pet-card-{nivel}"
             badge_classe = f"badge-{nivel}"
 
@@ -824,32 +1498,32 @@ with tab1:
                 if pet['observacoes']:
                     st.write(f"**Observações:** {pet['observacoes']}")
 
+                # Relatório para levar à consulta (HTML em cache enquanto os registros não mudam)
+                if st.toggle("📄 Relatório de saúde", key=f"relatorio_{pet['id']}"):
+                    conteudo_relatorio = relatorio.relatorio_html(
+                        pet,
+                        vacinas_por_pet.get(pet['id'], []),
+                        preventivos_por_pet.get(pet['id'], []),
+                        agrupar_por_pet(dados.medicamentos).get(pet['id'], []),
+                        dados.medicamentos_progresso,
+                        agrupar_por_pet(dados.peso).get(pet['id'], []),
+                        agrupar_por_pet(dados.veterinario).get(pet['id'], []),
+                        datetime.now().date()
+                    )
+                    st.download_button(
+                        "⬇️ Baixar relatório (imprima ou salve como PDF)",
+                        data=conteudo_relatorio,
+                        file_name=f"relatorio_{pet['nome']}_{datetime.now().strftime('%Y%m%d')}.html",
+                        mime="text/html",
+                        key=f"baixar_relatorio_{pet['id']}"
+                    )
+
                 st.markdown("---")
                 if st.button(f"🗑️ Excluir Pet", key=f"del_pet_{pet['id']}"):
+                    # Deletar os registros relacionados a este pet: um DELETE por tabela (chave pet_id), ao mesmo tempo
+                    supabase_delete_varios([(tabela, f"pet_id=eq.{pet['id']}") for tabela in TABELAS_DO_PET])
                     # Deletar pet do Supabase
                     if supabase_delete('pets', pet['id']):
-                        # Deletar todos os registros relacionados a este pet
-                        for v in st.session_state.vacinas:
-                            if v['pet'] == pet['nome']:
-                                supabase_delete('vacinas', v['id'])
-                        for a in st.session_state.alimentacao:
-                            if a['pet'] == pet['nome']:
-                                supabase_delete('alimentacao', a['id'])
-                        for v in st.session_state.veterinario:
-                            if v['pet'] == pet['nome']:
-                                supabase_delete('veterinario', v['id'])
-                        for m in st.session_state.medicamentos:
-                            if m['pet'] == pet['nome']:
-                                supabase_delete('medicamentos', m['id'])
-                        for p in st.session_state.preventivos:
-                            if p['pet'] == pet['nome']:
-                                supabase_delete('preventivos', p['id'])
-                        for p in st.session_state.peso:
-                            if p['pet'] == pet['nome']:
-                                supabase_delete('peso', p['id'])
-                        for n in st.session_state.notas:
-                            if n['pet'] == pet['nome']:
-                                supabase_delete('notas', n['id'])
                         # Recarregar dados
                         recarregar_dados()
                         st.rerun()
@@ -861,11 +1535,11 @@ with tab1:
         st.info("👋 Nenhum pet cadastrado ainda. Clique em 'Adicionar Pet' para começar!")
 
 # ==================== ABA VACINAS ====================
-with tab2:
+with tab2, rastreamento.trecho('aba.vacinas'):
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.markdown("### 💉 Controle de Vacinas")
 
-    if not st.session_state.pets:
+    if not dados.pets:
         st.warning("⚠️ Cadastre um pet primeiro na aba 'Início' para registrar vacinas.")
     else:
         # Formulário para adicionar vacina
@@ -877,7 +1551,8 @@ with tab2:
             with col1:
                 pet_selecionado = st.selectbox(
                     "Selecione o Pet",
-                    options=[pet['nome'] for pet in st.session_state.pets]
+                    options=list(PETS_POR_ID),
+                    format_func=nome_do_pet
                 )
                 nome_vacina = st.text_input("Nome da Vacina", placeholder="Ex: V10, Antirrábica")
                 data_aplicacao = st.date_input("Data de Aplicação", value=datetime.now(), format="DD/MM/YYYY")
@@ -895,7 +1570,7 @@ with tab2:
 
                 if submitted_vacina:
                     nova_vacina = {
-                        'pet': pet_selecionado,
+                        'pet_id': pet_selecionado,
                         'nome_vacina': nome_vacina,
                         'data_aplicacao': data_aplicacao.isoformat(),
                         'lote': lote,
@@ -907,26 +1582,27 @@ with tab2:
                     # Salvar no Supabase
                     resultado = supabase_post('vacinas', nova_vacina)
                     if resultado:
-                        st.success(f"✅ Vacina registrada para {pet_selecionado}!")
+                        st.success(f"✅ Vacina registrada para {nome_do_pet(pet_selecionado)}!")
                         recarregar_dados()
                         st.rerun()
 
         st.markdown('</div>', unsafe_allow_html=True)
 
         # Exibir histórico de vacinas
-        if st.session_state.vacinas:
+        if dados.vacinas:
             st.markdown('<div class="card">', unsafe_allow_html=True)
             st.markdown("### 📋 Histórico de Vacinas")
 
             # Filtro por pet
             pet_filtro = st.selectbox(
                 "Filtrar por Pet",
-                ["Todos"] + [pet['nome'] for pet in st.session_state.pets]
+                [None] + list(PETS_POR_ID),
+                format_func=rotulo_filtro_pet
             )
 
-            vacinas_filtradas = st.session_state.vacinas
-            if pet_filtro != "Todos":
-                vacinas_filtradas = [v for v in st.session_state.vacinas if v['pet'] == pet_filtro]
+            vacinas_filtradas = dados.vacinas
+            if pet_filtro is not None:
+                vacinas_filtradas = agrupar_por_pet(dados.vacinas).get(pet_filtro, [])
 
             for vacina in vacinas_filtradas:
                 # Selo de status no título
@@ -934,7 +1610,7 @@ with tab2:
                 selo_status = "✅ CONCLUÍDO" if status_concluido else "⚠️ PENDENTE"
                 classe_status = "status-concluido" if status_concluido else "status-pendente"
 
-                with st.expander(f"**{vacina['pet']}** - {vacina['nome_vacina']} ({vacina['data_aplicacao'].strftime('%d/%m/%Y')})"):
+                with st.expander(f"**{nome_do_pet(vacina.get('pet_id'))}** - {vacina['nome_vacina']} ({vacina['data_aplicacao'].strftime('%d/%m/%Y')})"):
                     # Exibir selo de status
                     st.markdown(f"<div class='{classe_status}'>{selo_status}</div>", unsafe_allow_html=True)
                     st.markdown("")
@@ -956,10 +1632,9 @@ with tab2:
                     # Checkbox para marcar como concluído
                     novo_status = st.checkbox("Ação realizada?", value=status_concluido, key=f"status_vac_{vacina['id']}")
                     if novo_status != status_concluido:
-                        # Atualizar no Supabase
-                        if supabase_update('vacinas', vacina['id'], {'concluido': novo_status}):
-                            recarregar_dados()
-                            st.rerun()
+                        # Atualizar na tela e gravar em segundo plano (fila de escrita)
+                        atualizar_registro('vacinas', vacina, {'concluido': novo_status})
+                        st.rerun()
 
                     if st.button(f"🗑️ Excluir", key=f"del_vac_{vacina['id']}"):
                         # Deletar do Supabase
@@ -969,12 +1644,22 @@ with tab2:
 
             st.markdown('</div>', unsafe_allow_html=True)
 
+        # Vacinas antigas movidas para o arquivo (supabase_arquivo.sql)
+        mostrar_historico_completo('vacinas', 'data_aplicacao.desc', {
+            'Pet': lambda v: nome_do_pet(v.get('pet_id')),
+            'Vacina': lambda v: v['nome_vacina'],
+            'Aplicação': lambda v: data_br(v['data_aplicacao']),
+            'Próxima Dose': lambda v: data_br(v.get('proxima_dose')),
+            'Lote': lambda v: v.get('lote') or "—",
+            'Veterinário': lambda v: v.get('veterinario') or "—"
+        })
+
 # ==================== ABA ALIMENTAÇÃO ====================
-with tab3:
+with tab3, rastreamento.trecho('aba.alimentacao'):
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.markdown("### 🍎 Controle de Alimentação")
 
-    if not st.session_state.pets:
+    if not dados.pets:
         st.warning("⚠️ Cadastre um pet primeiro na aba 'Início' para registrar a alimentação.")
     else:
         # Formulário para adicionar alimentação
@@ -986,7 +1671,8 @@ with tab3:
             with col1:
                 pet_selecionado = st.selectbox(
                     "Selecione o Pet",
-                    options=[pet['nome'] for pet in st.session_state.pets]
+                    options=list(PETS_POR_ID),
+                    format_func=nome_do_pet
                 )
                 tipo_alimento = st.selectbox("Tipo de Alimento", ["Ração", "Úmida", "Natural", "Mista"])
                 marca_nome = st.text_input("Marca/Nome", placeholder="Ex: Premier Golden")
@@ -1002,7 +1688,7 @@ with tab3:
 
                 if submitted_alimentacao:
                     nova_alimentacao = {
-                        'pet': pet_selecionado,
+                        'pet_id': pet_selecionado,
                         'tipo_alimento': tipo_alimento,
                         'marca_nome': marca_nome,
                         'quantidade': quantidade,
@@ -1013,27 +1699,84 @@ with tab3:
                     # Salvar no Supabase
                     resultado = supabase_post('alimentacao', nova_alimentacao)
                     if resultado:
-                        st.success(f"✅ Plano alimentar registrado para {pet_selecionado}!")
+                        st.success(f"✅ Plano alimentar registrado para {nome_do_pet(pet_selecionado)}!")
                         recarregar_dados()
                         st.rerun()
 
         st.markdown('</div>', unsafe_allow_html=True)
 
+        if dados.planos_alimentacao:
+            st.markdown('<div class="card">', unsafe_allow_html=True)
+            st.markdown("### 🕐 Próximas Refeições")
+
+            refeicoes = agenda_alimentacao.proximas_refeicoes(dados.planos_alimentacao, limite=8)
+            hoje = datetime.now().date()
+            for momento, plano in refeicoes:
+                dia = "Hoje" if momento.date() == hoje else "Amanhã" if momento.date() == hoje + timedelta(days=1) else momento.strftime('%d/%m')
+                estimado = " _(horário estimado)_" if plano['horarios_estimados'] else ""
+                st.write(
+                    f"**{dia} {momento.strftime('%H:%M')}** · {nome_do_pet(plano['pet_id'])} · "
+                    f"{plano['marca_nome']} ({plano['gramas']:.0f}g){estimado}"
+                )
+
+            st.markdown("### 📦 Estoque de Alimentos")
+            projecao = agenda_alimentacao.projetar_estoques(
+                dados.planos_alimentacao, dados.estoques_alimento
+            )
+            for item in projecao:
+                col1, col2, col3 = st.columns([2, 1, 1])
+                with col1:
+                    st.write(f"**{item['marca_nome']}**")
+                    st.caption(f"Consumo: {item['gramas_dia']:.0f} g/dia · {item['kg_mes']:.1f} kg/mês")
+                with col2:
+                    st.metric("Estoque", f"{item['estoque_kg']:.1f} kg" if item['estoque_kg'] is not None else "—")
+                with col3:
+                    if item['dias_restantes'] is None:
+                        st.caption("Informe o estoque abaixo")
+                    elif item['dias_restantes'] <= 7:
+                        st.error(f"⚠️ Acaba em {item['dias_restantes']} dia(s)")
+                    else:
+                        st.success(f"Acaba em {item['dias_restantes']} dias ({item['acaba_em'].strftime('%d/%m')})")
+
+            if projecao:
+                with st.form("estoque_alimento_form"):
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        marca_estoque = st.selectbox(
+                            "Marca/Nome",
+                            options=[item['marca'] for item in projecao],
+                            format_func={item['marca']: item['marca_nome'] for item in projecao}.get
+                        )
+                    with col2:
+                        estoque_kg = st.number_input("Estoque atual (kg)", min_value=0.0, step=0.5)
+                    if st.form_submit_button("💾 Atualizar Estoque", use_container_width=True):
+                        gravado = supabase_post_lote('estoques_alimento', [{
+                            'marca_nome': marca_estoque,
+                            'estoque_kg': estoque_kg,
+                            'atualizado_em': datetime.now().isoformat()
+                        }], on_conflict='user_id,marca_nome', mesclar=True)
+                        if gravado is not None:
+                            recarregar_dados()
+                            st.rerun()
+
+            st.markdown('</div>', unsafe_allow_html=True)
+
         # Exibir plano alimentar atual
-        if st.session_state.alimentacao:
+        if dados.alimentacao:
             st.markdown('<div class="card">', unsafe_allow_html=True)
             st.markdown("### 📋 Plano Alimentar Atual")
 
             # Filtro por pet
             pet_filtro = st.selectbox(
                 "Filtrar por Pet",
-                ["Todos"] + [pet['nome'] for pet in st.session_state.pets],
+                [None] + list(PETS_POR_ID),
+                format_func=rotulo_filtro_pet,
                 key="filtro_alimentacao"
             )
 
-            alimentacao_filtrada = st.session_state.alimentacao
-            if pet_filtro != "Todos":
-                alimentacao_filtrada = [a for a in st.session_state.alimentacao if a['pet'] == pet_filtro]
+            alimentacao_filtrada = dados.alimentacao
+            if pet_filtro is not None:
+                alimentacao_filtrada = agrupar_por_pet(dados.alimentacao).get(pet_filtro, [])
 
             for alimentacao in alimentacao_filtrada:
                 # Selo de status
@@ -1041,7 +1784,7 @@ with tab3:
                 selo_status = "✅ CONCLUÍDO" if status_concluido else "⚠️ PENDENTE"
                 classe_status = "status-concluido" if status_concluido else "status-pendente"
 
-                with st.expander(f"**{alimentacao['pet']}** - {alimentacao['tipo_alimento']} ({alimentacao['marca_nome']})"):
+                with st.expander(f"**{nome_do_pet(alimentacao.get('pet_id'))}** - {alimentacao['tipo_alimento']} ({alimentacao['marca_nome']})"):
                     # Exibir selo de status
                     st.markdown(f"<div class='{classe_status}'>{selo_status}</div>", unsafe_allow_html=True)
                     st.markdown("")
@@ -1061,10 +1804,9 @@ with tab3:
                     # Checkbox para marcar como concluído
                     novo_status = st.checkbox("Ação realizada?", value=status_concluido, key=f"status_alim_{alimentacao['id']}")
                     if novo_status != status_concluido:
-                        # Atualizar no Supabase
-                        if supabase_update('alimentacao', alimentacao['id'], {'concluido': novo_status}):
-                            recarregar_dados()
-                            st.rerun()
+                        # Atualizar na tela e gravar em segundo plano (fila de escrita)
+                        atualizar_registro('alimentacao', alimentacao, {'concluido': novo_status})
+                        st.rerun()
 
                     if st.button(f"🗑️ Excluir", key=f"del_alim_{alimentacao['id']}"):
                         # Deletar do Supabase
@@ -1075,11 +1817,11 @@ with tab3:
             st.markdown('</div>', unsafe_allow_html=True)
 
 # ==================== ABA VETERINÁRIO ====================
-with tab4:
+with tab4, rastreamento.trecho('aba.veterinario'):
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.markdown("### 🏥 Histórico Veterinário")
 
-    if not st.session_state.pets:
+    if not dados.pets:
         st.warning("⚠️ Cadastre um pet primeiro na aba 'Início' para registrar consultas.")
     else:
         # Formulário para adicionar consulta
@@ -1091,7 +1833,8 @@ with tab4:
             with col1:
                 pet_selecionado = st.selectbox(
                     "Selecione o Pet",
-                    options=[pet['nome'] for pet in st.session_state.pets]
+                    options=list(PETS_POR_ID),
+                    format_func=nome_do_pet
                 )
                 nome_veterinario = st.text_input("Nome do Veterinário/Clínica", placeholder="Dr. João Silva")
                 motivo = st.selectbox("Motivo da Consulta", ["Rotina", "Emergência", "Retorno", "Cirurgia", "Exame"])
@@ -1107,7 +1850,7 @@ with tab4:
 
                 if submitted_veterinario:
                     nova_consulta = {
-                        'pet': pet_selecionado,
+                        'pet_id': pet_selecionado,
                         'nome_veterinario': nome_veterinario,
                         'motivo': motivo,
                         'data_consulta': data_consulta.isoformat(),
@@ -1117,33 +1860,34 @@ with tab4:
                     # Salvar no Supabase
                     resultado = supabase_post('veterinario', nova_consulta)
                     if resultado:
-                        st.success(f"✅ Consulta registrada para {pet_selecionado}!")
+                        st.success(f"✅ Consulta registrada para {nome_do_pet(pet_selecionado)}!")
                         recarregar_dados()
                         st.rerun()
 
         st.markdown('</div>', unsafe_allow_html=True)
 
         # Exibir histórico de consultas
-        if st.session_state.veterinario:
+        if dados.veterinario:
             st.markdown('<div class="card">', unsafe_allow_html=True)
             st.markdown("### 📋 Histórico de Consultas")
 
             # Filtro por pet
             pet_filtro = st.selectbox(
                 "Filtrar por Pet",
-                ["Todos"] + [pet['nome'] for pet in st.session_state.pets],
+                [None] + list(PETS_POR_ID),
+                format_func=rotulo_filtro_pet,
                 key="filtro_veterinario"
             )
 
-            veterinario_filtrado = st.session_state.veterinario
-            if pet_filtro != "Todos":
-                veterinario_filtrado = [v for v in st.session_state.veterinario if v['pet'] == pet_filtro]
+            veterinario_filtrado = dados.veterinario
+            if pet_filtro is not None:
+                veterinario_filtrado = agrupar_por_pet(dados.veterinario).get(pet_filtro, [])
 
             # Ordenar por data (mais recente primeiro)
             veterinario_filtrado = sorted(veterinario_filtrado, key=lambda x: x['data_consulta'], reverse=True)
 
             for consulta in veterinario_filtrado:
-                with st.expander(f"**{consulta['pet']}** - {consulta['motivo']} ({consulta['data_consulta'].strftime('%d/%m/%Y')})"):
+                with st.expander(f"**{nome_do_pet(consulta.get('pet_id'))}** - {consulta['motivo']} ({consulta['data_consulta'].strftime('%d/%m/%Y')})"):
                     col1, col2 = st.columns(2)
                     with col1:
                         st.write(f"**Veterinário/Clínica:** {consulta['nome_veterinario']}")
@@ -1166,11 +1910,11 @@ with tab4:
             st.markdown('</div>', unsafe_allow_html=True)
 
 # ==================== ABA MEDICAMENTOS ====================
-with tab5:
+with tab5, rastreamento.trecho('aba.medicamentos'):
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.markdown("### 💊 Controle de Medicamentos")
 
-    if not st.session_state.pets:
+    if not dados.pets:
         st.warning("⚠️ Cadastre um pet primeiro na aba 'Início' para registrar medicamentos.")
     else:
         # Formulário para adicionar medicamento
@@ -1182,7 +1926,8 @@ with tab5:
             with col1:
                 pet_selecionado = st.selectbox(
                     "Selecione o Pet",
-                    options=[pet['nome'] for pet in st.session_state.pets]
+                    options=list(PETS_POR_ID),
+                    format_func=nome_do_pet
                 )
                 nome_remedio = st.text_input("Nome do Remédio", placeholder="Ex: Amoxicilina")
                 dosagem = st.text_input("Dosagem", placeholder="Ex: 5mg, 10ml")
@@ -1201,7 +1946,7 @@ with tab5:
                 if submitted_medicamento:
                     data_fim = datetime.combine(data_inicio, datetime.min.time()).date() + timedelta(days=duracao)
                     novo_medicamento = {
-                        'pet': pet_selecionado,
+                        'pet_id': pet_selecionado,
                         'nome_remedio': nome_remedio,
                         'dosagem': dosagem,
                         'frequencia': frequencia,
@@ -1215,41 +1960,30 @@ with tab5:
                     # Salvar no Supabase
                     resultado = supabase_post('medicamentos', novo_medicamento)
                     if resultado:
-                        # Criar log de doses (total = duracao * doses_por_dia)
-                        medicamento_id = resultado[0]['id']
-                        total_doses = duracao * doses_por_dia
-                        for i in range(1, total_doses + 1):
-                            dias_desde_inicio = (i - 1) // doses_por_dia
-                            data_dose = data_inicio + timedelta(days=dias_desde_inicio)
-                            log_dose = {
-                                'medicamento_id': medicamento_id,
-                                'numero_dose': i,
-                                'data_dose': data_dose.isoformat(),
-                                'realizado': False
-                            }
-                            supabase_post('medicamentos_log', log_dose)
-
-                        st.success(f"✅ Medicamento registrado para {pet_selecionado}!")
+                        # As doses são calculadas a partir de data_inicio, duracao e doses_por_dia;
+                        # o medicamentos_log recebe apenas as doses efetivamente realizadas
+                        st.success(f"✅ Medicamento registrado para {nome_do_pet(pet_selecionado)}!")
                         recarregar_dados()
                         st.rerun()
 
         st.markdown('</div>', unsafe_allow_html=True)
 
         # Exibir medicamentos ativos
-        if st.session_state.medicamentos:
+        if dados.medicamentos:
             st.markdown('<div class="card">', unsafe_allow_html=True)
             st.markdown("### 💊 Medicamentos Ativos")
 
             # Filtro por pet
             pet_filtro = st.selectbox(
                 "Filtrar por Pet",
-                ["Todos"] + [pet['nome'] for pet in st.session_state.pets],
+                [None] + list(PETS_POR_ID),
+                format_func=rotulo_filtro_pet,
                 key="filtro_medicamentos"
             )
 
-            medicamentos_filtrados = st.session_state.medicamentos
-            if pet_filtro != "Todos":
-                medicamentos_filtrados = [m for m in st.session_state.medicamentos if m['pet'] == pet_filtro]
+            medicamentos_filtrados = dados.medicamentos
+            if pet_filtro is not None:
+                medicamentos_filtrados = agrupar_por_pet(dados.medicamentos).get(pet_filtro, [])
 
             # Separar ativos e finalizados
             hoje = datetime.now().date()
@@ -1259,16 +1993,11 @@ with tab5:
             if medicamentos_ativos:
                 st.markdown("#### 🟢 Em Andamento")
                 for medicamento in medicamentos_ativos:
-                    # Buscar log de doses
-                    doses_log = supabase_get('medicamentos_log', f"medicamento_id=eq.{medicamento['id']}")
-                    doses_log = sorted(doses_log, key=lambda x: x['numero_dose']) if doses_log else []
+                    # Progresso vindo do agregado do banco
+                    agregado = dados.medicamentos_progresso.get(medicamento['id'])
+                    doses_realizadas, total_doses, percentual = agenda_doses.progresso_agregado(medicamento, agregado)
 
-                    # Calcular progresso
-                    total_doses = len(doses_log)
-                    doses_realizadas = sum(1 for d in doses_log if d.get('realizado', False))
-                    percentual = (doses_realizadas / total_doses * 100) if total_doses > 0 else 0
-
-                    with st.expander(f"**{medicamento['pet']}** - {medicamento['nome_remedio']} ({doses_realizadas}/{total_doses} doses)"):
+                    with st.expander(f"**{nome_do_pet(medicamento.get('pet_id'))}** - {medicamento['nome_remedio']} ({doses_realizadas}/{total_doses} doses)"):
                         # Barra de progresso
                         st.markdown(f"""
                         <div class='progress-bar-container'>
@@ -1293,57 +2022,82 @@ with tab5:
 
                         st.markdown("---")
                         st.markdown("**📋 Controle de Doses:**")
-
-                        # Exibir apenas as próximas 10 doses não realizadas
-                        doses_pendentes = [d for d in doses_log if not d.get('realizado', False)][:10]
-
-                        if doses_pendentes:
-                            for dose in doses_pendentes:
-                                col_check, col_info = st.columns([1, 4])
-                                with col_check:
-                                    realizado = st.checkbox(
-                                        "",
-                                        value=dose.get('realizado', False),
-                                        key=f"dose_{dose['id']}"
+                        if agregado and agregado.get('proxima_dose_data'):
+                            st.write(f"Próxima dose: {agregado['proxima_dose_numero']}/{total_doses} - {agregado['proxima_dose_data'].strftime('%d/%m/%Y')}")
+
+                        # As doses individuais só são buscadas quando o controle é aberto
+                        if st.toggle("Mostrar doses", key=f"mostrar_doses_{medicamento['id']}"):
+                            realizadas = agenda_doses.agrupar_doses_realizadas(carregar_doses_medicamento(medicamento['id'])).get(medicamento['id'], set())
+
+                            # Marcação em lote (uma única requisição)
+                            aviso = st.session_state.pop(f"aviso_doses_{medicamento['id']}", None)
+                            if aviso:
+                                st.success(aviso)
+
+                            col_lote1, col_lote2 = st.columns(2)
+                            numeros_lote = None
+                            with col_lote1:
+                                if st.button("✅ Marcar todas até hoje", key=f"lote_hoje_{medicamento['id']}"):
+                                    numeros_lote = agenda_doses.doses_pendentes_ate(medicamento, realizadas, hoje)
+                            with col_lote2:
+                                if total_doses > 1:
+                                    intervalo = st.slider(
+                                        "Intervalo de doses",
+                                        min_value=1,
+                                        max_value=total_doses,
+                                        value=(1, total_doses),
+                                        key=f"intervalo_doses_{medicamento['id']}"
                                     )
-                                    if realizado != dose.get('realizado', False):
-                                        # Atualizar no Supabase
-                                        if supabase_update('medicamentos_log', dose['id'], {'realizado': realizado}):
-                                            recarregar_dados()
-                                            st.rerun()
-                                with col_info:
-                                    data_dose_obj = datetime.fromisoformat(dose['data_dose'].replace('Z', '+00:00')).date() if isinstance(dose['data_dose'], str) else dose['data_dose']
-                                    st.write(f"Dose {dose['numero_dose']}/{total_doses} - {data_dose_obj.strftime('%d/%m/%Y')}")
-
-                            if len(doses_pendentes) < len([d for d in doses_log if not d.get('realizado', False)]):
-                                st.info(f"Mostrando as próximas 10 doses. Total pendentes: {len([d for d in doses_log if not d.get('realizado', False)])}")
-                        else:
-                            st.success("✅ Todas as doses foram realizadas!")
+                                else:
+                                    intervalo = (1, total_doses)
+                                if st.button("✅ Marcar intervalo", key=f"lote_intervalo_{medicamento['id']}"):
+                                    numeros_lote = agenda_doses.doses_pendentes_no_intervalo(medicamento, realizadas, intervalo[0], intervalo[1])
+
+                            if numeros_lote is not None:
+                                marcadas = marcar_doses_em_lote(medicamento, numeros_lote)
+                                st.session_state[f"aviso_doses_{medicamento['id']}"] = f"✅ Doses marcadas como realizadas: {marcadas}"
+                                st.rerun()
+
+                            # Exibir apenas as próximas 10 doses não realizadas
+                            doses_pendentes = agenda_doses.proximas_doses(medicamento, realizadas, limite=10)
+
+                            if doses_pendentes:
+                                for dose in doses_pendentes:
+                                    col_check, col_info = st.columns([1, 4])
+                                    with col_check:
+                                        realizado = st.checkbox(
+                                            "",
+                                            value=False,
+                                            key=f"dose_{medicamento['id']}_{dose['numero_dose']}"
+                                        )
+                                        if realizado:
+                                            # Registrar a dose realizada e atualizar o estado local
+                                            if marcar_doses_em_lote(medicamento, [dose['numero_dose']]):
+                                                st.rerun()
+                                    with col_info:
+                                        st.write(f"Dose {dose['numero_dose']}/{total_doses} - {dose['data_dose'].strftime('%d/%m/%Y')}")
+
+                                total_pendentes = total_doses - doses_realizadas
+                                if len(doses_pendentes) < total_pendentes:
+                                    st.info(f"Mostrando as próximas 10 doses. Total pendentes: {total_pendentes}")
+                            else:
+                                st.success("✅ Todas as doses foram realizadas!")
 
                         st.markdown("---")
 
                         if st.button(f"🗑️ Excluir Medicamento", key=f"del_med_{medicamento['id']}"):
-                            # Deletar log de doses primeiro
-                            for dose in doses_log:
-                                supabase_delete('medicamentos_log', dose['id'])
-                            # Deletar medicamento do Supabase
-                            if supabase_delete('medicamentos', medicamento['id']):
+                            if excluir_medicamento(medicamento['id']):
                                 recarregar_dados()
                                 st.rerun()
 
             if medicamentos_finalizados:
                 st.markdown("#### ⚪ Finalizados")
                 for medicamento in medicamentos_finalizados:
-                    # Buscar log de doses
-                    doses_log = supabase_get('medicamentos_log', f"medicamento_id=eq.{medicamento['id']}")
-                    doses_log = sorted(doses_log, key=lambda x: x['numero_dose']) if doses_log else []
+                    # Progresso vindo do agregado do banco
+                    agregado = dados.medicamentos_progresso.get(medicamento['id'])
+                    doses_realizadas, total_doses, percentual = agenda_doses.progresso_agregado(medicamento, agregado)
 
-                    # Calcular progresso
-                    total_doses = len(doses_log)
-                    doses_realizadas = sum(1 for d in doses_log if d.get('realizado', False))
-                    percentual = (doses_realizadas / total_doses * 100) if total_doses > 0 else 0
-
-                    with st.expander(f"**{medicamento['pet']}** - {medicamento['nome_remedio']} (Finalizado - {doses_realizadas}/{total_doses})"):
+                    with st.expander(f"**{nome_do_pet(medicamento.get('pet_id'))}** - {medicamento['nome_remedio']} (Finalizado - {doses_realizadas}/{total_doses})"):
                         # Barra de progresso
                         st.markdown(f"""
                         <div class='progress-bar-container'>
@@ -1361,25 +2115,43 @@ with tab5:
                             st.write(f"**Início:** {medicamento['data_inicio'].strftime('%d/%m/%Y')}")
                             st.write(f"**Término:** {medicamento['data_fim'].strftime('%d/%m/%Y')}")
 
+                        # O mapa de doses só é buscado e decodificado quando aberto
+                        if st.toggle("Ver doses perdidas", key=f"doses_finalizado_{medicamento['id']}"):
+                            realizadas = agenda_doses.agrupar_doses_realizadas(carregar_doses_finalizado(medicamento)).get(medicamento['id'], set())
+                            perdidas = agenda_doses.proximas_doses(medicamento, realizadas, limite=50)
+                            if perdidas:
+                                for dose in perdidas:
+                                    st.write(f"❌ Dose {dose['numero_dose']}/{total_doses} - {dose['data_dose'].strftime('%d/%m/%Y')}")
+                                if len(perdidas) < total_doses - doses_realizadas:
+                                    st.info(f"Mostrando as primeiras 50 doses perdidas. Total perdidas: {total_doses - doses_realizadas}")
+                            else:
+                                st.success("✅ Todas as doses foram realizadas!")
+
                         st.markdown("---")
 
                         if st.button(f"🗑️ Excluir", key=f"del_med_fin_{medicamento['id']}"):
-                            # Deletar log de doses primeiro
-                            for dose in doses_log:
-                                supabase_delete('medicamentos_log', dose['id'])
-                            # Deletar do Supabase
-                            if supabase_delete('medicamentos', medicamento['id']):
+                            if excluir_medicamento(medicamento['id']):
                                 recarregar_dados()
                                 st.rerun()
 
             st.markdown('</div>', unsafe_allow_html=True)
 
+        # Tratamentos terminados há mais tempo, movidos para o arquivo com as doses contadas
+        mostrar_historico_completo('medicamentos', 'data_inicio.desc', {
+            'Pet': lambda m: nome_do_pet(m.get('pet_id')),
+            'Remédio': lambda m: m['nome_remedio'],
+            'Dosagem': lambda m: m['dosagem'],
+            'Início': lambda m: data_br(m['data_inicio']),
+            'Término': lambda m: data_br(m['data_fim']),
+            'Doses': lambda m: f"{m['doses_realizadas']}/{agenda_doses.total_doses(m)}"
+        })
+
 # ==================== ABA PREVENTIVOS ====================
-with tab6:
+with tab6, rastreamento.trecho('aba.preventivos'):
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.markdown("### 🛡️ Preventivos (Antipulgas/Vermífugos)")
 
-    if not st.session_state.pets:
+    if not dados.pets:
         st.warning("⚠️ Cadastre um pet primeiro na aba 'Início' para registrar preventivos.")
     else:
         # Formulário para adicionar preventivo
@@ -1391,7 +2163,8 @@ with tab6:
             with col1:
                 pet_selecionado = st.selectbox(
                     "Selecione o Pet",
-                    options=[pet['nome'] for pet in st.session_state.pets]
+                    options=list(PETS_POR_ID),
+                    format_func=nome_do_pet
                 )
                 nome_produto = st.text_input("Nome do Produto", placeholder="Ex: Bravecto, Advocate")
                 tipo_preventivo = st.selectbox("Tipo", ["Antipulgas", "Vermífugo", "Combo"])
@@ -1406,7 +2179,7 @@ with tab6:
 
                 if submitted_preventivo:
                     novo_preventivo = {
-                        'pet': pet_selecionado,
+                        'pet_id': pet_selecionado,
                         'nome_produto': nome_produto,
                         'tipo_preventivo': tipo_preventivo,
                         'data_aplicacao': data_aplicacao.isoformat(),
@@ -1416,27 +2189,28 @@ with tab6:
                     # Salvar no Supabase
                     resultado = supabase_post('preventivos', novo_preventivo)
                     if resultado:
-                        st.success(f"✅ Preventivo registrado para {pet_selecionado}!")
+                        st.success(f"✅ Preventivo registrado para {nome_do_pet(pet_selecionado)}!")
                         recarregar_dados()
                         st.rerun()
 
         st.markdown('</div>', unsafe_allow_html=True)
 
         # Exibir histórico de preventivos
-        if st.session_state.preventivos:
+        if dados.preventivos:
             st.markdown('<div class="card">', unsafe_allow_html=True)
             st.markdown("### 📋 Histórico de Preventivos")
 
             # Filtro por pet
             pet_filtro = st.selectbox(
                 "Filtrar por Pet",
-                ["Todos"] + [pet['nome'] for pet in st.session_state.pets],
+                [None] + list(PETS_POR_ID),
+                format_func=rotulo_filtro_pet,
                 key="filtro_preventivos"
             )
 
-            preventivos_filtrados = st.session_state.preventivos
-            if pet_filtro != "Todos":
-                preventivos_filtrados = [p for p in st.session_state.preventivos if p['pet'] == pet_filtro]
+            preventivos_filtrados = dados.preventivos
+            if pet_filtro is not None:
+                preventivos_filtrados = agrupar_por_pet(dados.preventivos).get(pet_filtro, [])
 
             # Ordenar por próxima dose
             preventivos_filtrados = sorted(preventivos_filtrados, key=lambda x: x['proxima_dose'] if x['proxima_dose'] else datetime.max.date())
@@ -1449,7 +2223,7 @@ with tab6:
                 if preventivo['proxima_dose'] and preventivo['proxima_dose'] < hoje:
                     vencido = True
 
-                titulo = f"**{preventivo['pet']}** - {preventivo['nome_produto']} ({preventivo['tipo_preventivo']})"
+                titulo = f"**{nome_do_pet(preventivo.get('pet_id'))}** - {preventivo['nome_produto']} ({preventivo['tipo_preventivo']})"
 
                 # Selo de status
                 status_concluido = preventivo.get('concluido', False)
@@ -1483,10 +2257,9 @@ with tab6:
                     # Checkbox para marcar como concluído
                     novo_status = st.checkbox("Ação realizada?", value=status_concluido, key=f"status_prev_{preventivo['id']}")
                     if novo_status != status_concluido:
-                        # Atualizar no Supabase
-                        if supabase_update('preventivos', preventivo['id'], {'concluido': novo_status}):
-                            recarregar_dados()
-                            st.rerun()
+                        # Atualizar na tela e gravar em segundo plano (fila de escrita)
+                        atualizar_registro('preventivos', preventivo, {'concluido': novo_status})
+                        st.rerun()
 
                     if st.button(f"🗑️ Excluir", key=f"del_prev_{preventivo['id']}"):
                         # Deletar do Supabase
@@ -1496,12 +2269,21 @@ with tab6:
 
             st.markdown('</div>', unsafe_allow_html=True)
 
+        # Preventivos antigos movidos para o arquivo
+        mostrar_historico_completo('preventivos', 'data_aplicacao.desc', {
+            'Pet': lambda p: nome_do_pet(p.get('pet_id')),
+            'Produto': lambda p: p['nome_produto'],
+            'Tipo': lambda p: p['tipo_preventivo'],
+            'Aplicação': lambda p: data_br(p['data_aplicacao']),
+            'Próxima Dose': lambda p: data_br(p.get('proxima_dose'))
+        })
+
 # ==================== ABA PESO ====================
-with tab7:
+with tab7, rastreamento.trecho('aba.peso'):
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.markdown("### ⚖️ Controle de Peso")
 
-    if not st.session_state.pets:
+    if not dados.pets:
         st.warning("⚠️ Cadastre um pet primeiro na aba 'Início' para registrar pesagens.")
     else:
         # Formulário para adicionar pesagem
@@ -1513,7 +2295,8 @@ with tab7:
             with col1:
                 pet_selecionado = st.selectbox(
                     "Selecione o Pet",
-                    options=[pet['nome'] for pet in st.session_state.pets]
+                    options=list(PETS_POR_ID),
+                    format_func=nome_do_pet
                 )
             with col2:
                 data_pesagem = st.date_input("Data da Pesagem", value=datetime.now(), format="DD/MM/YYYY")
@@ -1526,44 +2309,72 @@ with tab7:
 
                 if submitted_peso:
                     nova_pesagem = {
-                        'pet': pet_selecionado,
+                        'pet_id': pet_selecionado,
                         'data_pesagem': data_pesagem.isoformat(),
                         'peso': peso
                     }
                     # Salvar no Supabase
                     resultado = supabase_post('peso', nova_pesagem)
                     if resultado:
-                        st.success(f"✅ Pesagem registrada para {pet_selecionado}!")
+                        st.success(f"✅ Pesagem registrada para {nome_do_pet(pet_selecionado)}!")
                         recarregar_dados()
                         st.rerun()
 
         st.markdown('</div>', unsafe_allow_html=True)
 
         # Exibir histórico de peso
-        if st.session_state.peso:
+        if dados.peso:
             st.markdown('<div class="card">', unsafe_allow_html=True)
             st.markdown("### 📊 Histórico de Peso")
 
             # Filtro por pet
             pet_filtro = st.selectbox(
                 "Filtrar por Pet",
-                ["Todos"] + [pet['nome'] for pet in st.session_state.pets],
+                [None] + list(PETS_POR_ID),
+                format_func=rotulo_filtro_pet,
                 key="filtro_peso"
             )
 
-            peso_filtrado = st.session_state.peso
-            if pet_filtro != "Todos":
-                peso_filtrado = [p for p in st.session_state.peso if p['pet'] == pet_filtro]
+            peso_filtrado = dados.peso
+            if pet_filtro is not None:
+                peso_filtrado = agrupar_por_pet(dados.peso).get(pet_filtro, [])
+
+            # Gráfico de tendência do pet selecionado (série reduzida com LTTB)
+            if pet_filtro is not None and len(peso_filtrado) >= 2:
+                peso_atual, variacao_30d, taxa = serie_peso.resumo_do_pet(peso_filtrado)
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Peso Atual", f"{peso_atual:.2f} kg")
+                col2.metric("Variação (30 dias)", f"{variacao_30d:+.2f} kg" if variacao_30d is not None else "—")
+                col3.metric("Ritmo Recente", f"{taxa:+.2f} kg/semana" if taxa is not None else "—")
+
+                serie = serie_peso.serie_do_pet(peso_filtrado)
+                st.line_chart(
+                    pd.DataFrame(
+                        {'Peso (kg)': serie['peso'], 'Média móvel 30 dias': serie['media_movel']},
+                        index=pd.to_datetime(serie['datas'])
+                    ),
+                    color=['#FF6B6B', '#4ECDC4']
+                )
+            elif pet_filtro is None:
+                st.caption("Selecione um pet para ver o gráfico de tendência.")
+
+            # Variação em relação à pesagem anterior do mesmo pet (cálculo vetorizado)
+            variacoes = serie_peso.variacoes_por_registro(peso_filtrado)
 
             # Ordenar por data (mais recente primeiro)
             peso_filtrado = sorted(peso_filtrado, key=lambda x: x['data_pesagem'], reverse=True)
 
-            for idx, pesagem in enumerate(peso_filtrado):
-                # Calcular variação em relação à pesagem anterior
+            # Históricos longos: apenas as pesagens mais recentes, a menos que o usuário peça todas
+            LIMITE_LISTA_PESO = 50
+            if len(peso_filtrado) > LIMITE_LISTA_PESO and not st.toggle(
+                f"Mostrar todas as {len(peso_filtrado)} pesagens", key="mostrar_todas_pesagens"
+            ):
+                peso_filtrado = peso_filtrado[:LIMITE_LISTA_PESO]
+
+            for pesagem in peso_filtrado:
                 variacao = ""
-                if idx < len(peso_filtrado) - 1:
-                    peso_anterior = peso_filtrado[idx + 1]['peso']
-                    diferenca = pesagem['peso'] - peso_anterior
+                diferenca = variacoes.get(pesagem['id'])
+                if diferenca is not None:
                     if diferenca > 0:
                         variacao = f"📈 +{diferenca:.2f}kg"
                     elif diferenca < 0:
@@ -1571,7 +2382,7 @@ with tab7:
                     else:
                         variacao = "➡️ Manteve"
 
-                with st.expander(f"**{pesagem['pet']}** - {pesagem['peso']}kg ({pesagem['data_pesagem'].strftime('%d/%m/%Y')}) {variacao}"):
+                with st.expander(f"**{nome_do_pet(pesagem.get('pet_id'))}** - {pesagem['peso']}kg ({pesagem['data_pesagem'].strftime('%d/%m/%Y')}) {variacao}"):
                     col1, col2 = st.columns(2)
                     with col1:
                         st.write(f"**Data:** {pesagem['data_pesagem'].strftime('%d/%m/%Y')}")
@@ -1590,11 +2401,11 @@ with tab7:
             st.markdown('</div>', unsafe_allow_html=True)
 
 # ==================== ABA NOTAS ====================
-with tab8:
+with tab8, rastreamento.trecho('aba.notas'):
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.markdown("### 📝 Notas e Observações")
 
-    if not st.session_state.pets:
+    if not dados.pets:
         st.warning("⚠️ Cadastre um pet primeiro na aba 'Início' para criar notas.")
     else:
         # Formulário para adicionar nota
@@ -1603,7 +2414,8 @@ with tab8:
 
             pet_selecionado = st.selectbox(
                 "Selecione o Pet",
-                options=[pet['nome'] for pet in st.session_state.pets]
+                options=list(PETS_POR_ID),
+                format_func=nome_do_pet
             )
             titulo_nota = st.text_input("Título da Nota", placeholder="Ex: Comportamento estranho")
             texto_nota = st.text_area("Texto da Nota", placeholder="Descreva a observação...", height=150)
@@ -1614,40 +2426,41 @@ with tab8:
 
                 if submitted_nota:
                     nova_nota = {
-                        'pet': pet_selecionado,
+                        'pet_id': pet_selecionado,
                         'titulo': titulo_nota,
                         'texto': texto_nota
                     }
                     # Salvar no Supabase (data_criacao é automático no banco)
                     resultado = supabase_post('notas', nova_nota)
                     if resultado:
-                        st.success(f"✅ Nota criada para {pet_selecionado}!")
+                        st.success(f"✅ Nota criada para {nome_do_pet(pet_selecionado)}!")
                         recarregar_dados()
                         st.rerun()
 
         st.markdown('</div>', unsafe_allow_html=True)
 
         # Exibir notas
-        if st.session_state.notas:
+        if dados.notas:
             st.markdown('<div class="card">', unsafe_allow_html=True)
             st.markdown("### 📋 Notas Salvas")
 
             # Filtro por pet
             pet_filtro = st.selectbox(
                 "Filtrar por Pet",
-                ["Todos"] + [pet['nome'] for pet in st.session_state.pets],
+                [None] + list(PETS_POR_ID),
+                format_func=rotulo_filtro_pet,
                 key="filtro_notas"
             )
 
-            notas_filtradas = st.session_state.notas
-            if pet_filtro != "Todos":
-                notas_filtradas = [n for n in st.session_state.notas if n['pet'] == pet_filtro]
+            notas_filtradas = dados.notas
+            if pet_filtro is not None:
+                notas_filtradas = agrupar_por_pet(dados.notas).get(pet_filtro, [])
 
             # Ordenar por data (mais recente primeiro)
             notas_filtradas = sorted(notas_filtradas, key=lambda x: x['data_criacao'], reverse=True)
 
             for nota in notas_filtradas:
-                with st.expander(f"**{nota['pet']}** - {nota['titulo']} ({nota['data_criacao'].strftime('%d/%m/%Y')})"):
+                with st.expander(f"**{nome_do_pet(nota.get('pet_id'))}** - {nota['titulo']} ({nota['data_criacao'].strftime('%d/%m/%Y')})"):
                     st.write(f"**Título:** {nota['titulo']}")
                     st.write(f"**Data:** {nota['data_criacao'].strftime('%d/%m/%Y')}")
                     st.markdown("**Observação:**")
@@ -1663,7 +2476,7 @@ with tab8:
             st.markdown('</div>', unsafe_allow_html=True)
 
 # ==================== ABA CONFIGURAÇÕES ====================
-with tab9:
+with tab9, rastreamento.trecho('aba.configuracoes'):
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.markdown("### ⚙️ Configurações")
 
@@ -1671,7 +2484,7 @@ with tab9:
     st.markdown("#### 💎 Plano Atual")
 
     # Card visual do plano
-    pets_cadastrados = len(st.session_state.pets)
+    pets_cadastrados = contar_pets()
     percentual_uso = (pets_cadastrados / LIMITE_PETS * 100) if LIMITE_PETS > 0 else 0
 
     st.markdown(
@@ -1729,16 +2542,190 @@ with tab9:
     col1, col2, col3 = st.columns(3)
 
     with col1:
-        st.metric("Total de Pets", len(st.session_state.pets))
-        st.metric("Vacinas", len(st.session_state.vacinas))
-        st.metric("Veterinário", len(st.session_state.veterinario))
+        st.metric("Total de Pets", len(dados.pets))
+        st.metric("Vacinas", len(dados.vacinas))
+        st.metric("Veterinário", len(dados.veterinario))
     with col2:
-        st.metric("Alimentação", len(st.session_state.alimentacao))
-        st.metric("Medicamentos", len(st.session_state.medicamentos))
-        st.metric("Preventivos", len(st.session_state.preventivos))
+        st.metric("Alimentação", len(dados.alimentacao))
+        st.metric("Medicamentos", len(dados.medicamentos))
+        st.metric("Preventivos", len(dados.preventivos))
     with col3:
-        st.metric("Pesagens", len(st.session_state.peso))
-        st.metric("Notas", len(st.session_state.notas))
+        st.metric("Pesagens", len(dados.peso))
+        st.metric("Notas", len(dados.notas))
+
+    # Uso de memória desta sessão; o servidor inteiro (todas as sessões) só para administradores
+    memoria = memoria_sessoes.gerenciador.relatorio()
+    st.caption(
+        f"💾 Memória desta sessão: {dados.tamanho / memoria_sessoes.MB:.1f} MB "
+        f"(limite {memoria['limite_sessao_mb']:.0f} MB) | Cargas: {dados.cargas} | "
+        f"Descartes por inatividade ou limite: {dados.descartes}"
+    )
+    if eh_administrador():
+        st.caption(
+            f"💾 Servidor: {len(memoria['sessoes'])} sessão(ões) com dados, "
+            f"{memoria['total_mb']:.0f} de {memoria['limite_total_mb']:.0f} MB | "
+            f"Descartes: {memoria['descartes']}"
+        )
+        with st.expander("💾 Memória por sessão"):
+            st.dataframe(pd.DataFrame(memoria['sessoes']), use_container_width=True, hide_index=True)
+    escrita = fila_de_escrita().metricas()
+    st.caption(
+        f"✍️ Fila de escrita: {escrita['pendentes']} pendente(s) | {escrita['enfileiradas']} operação(ões), "
+        f"{escrita['coalescidas']} reunida(s), {escrita['requisicoes']} requisição(ões)"
+        + (f" | Gravação p50 {escrita['latencia_p50_ms']:.0f} ms, p95 {escrita['latencia_p95_ms']:.0f} ms"
+           if escrita['latencia_p50_ms'] is not None else "")
+        + (f" | Falhas: {escrita['falhas']} ({escrita['ultimo_erro']})" if escrita['falhas'] else "")
+        + (f" | Recusadas pelo banco: {escrita['descartadas']}" if escrita['descartadas'] else "")
+    )
+    if 'tempo_real' in st.session_state:
+        assinatura = st.session_state.tempo_real
+        st.caption(
+            f"🔄 Tempo real: {assinatura.estado} | {assinatura.recebidos} alteração(ões) recebida(s)"
+            + (f" | Último erro: {assinatura.erro}" if assinatura.erro else "")
+        )
+    rastro_anterior = st.session_state.get('rastro_anterior')
+    if rastro_anterior is not None:
+        st.caption(
+            f"⏱️ Último rerun: {rastro_anterior.duracao_ms:.0f} ms | "
+            + ", ".join(f"{nome} {total:.0f} ms ({chamadas}x)"
+                        for nome, chamadas, total in rastreamento.resumo(rastro_anterior, 4))
+        )
+        with st.expander("⏱️ Trechos do último rerun"):
+            st.code(rastreamento.arvore(rastro_anterior), language=None)
+
+    st.markdown("---")
+
+    st.markdown("#### 📦 Exportar Dados")
+    st.caption("Histórico completo direto do banco, um arquivo por tabela em um .zip.")
+    col1, col2 = st.columns(2)
+    with col1:
+        pet_exportacao = st.selectbox(
+            "Dados de",
+            options=[None] + list(PETS_POR_ID),
+            format_func=lambda pet_id: "Conta inteira" if pet_id is None else nome_do_pet(pet_id),
+            key="pet_exportacao"
+        )
+    with col2:
+        formato_exportacao = st.selectbox("Formato", list(exportacao.FORMATOS), key="formato_exportacao")
+
+    # Cada exportação vai para um .zip novo, apagado assim que o botão de download o recebe:
+    # nada fica no disco nem na sessão, e o arquivo só ocupa memória no rerun em que foi gerado
+    if st.button("📦 Gerar Exportação", use_container_width=True):
+        try:
+            with st.spinner("Exportando..."):
+                caminho, contagens = exportacao.exportar_zip(
+                    paginas_para_exportacao(pet_exportacao),
+                    exportacao.FORMATOS[formato_exportacao]
+                )
+        except Exception as e:
+            st.error(f"Erro ao exportar dados: {str(e)}")
+        else:
+            try:
+                with open(caminho, 'rb') as arquivo_zip:
+                    st.download_button(
+                        f"⬇️ Baixar ({sum(contagens.values())} registros)",
+                        data=arquivo_zip,
+                        file_name=f"petcontrol_{datetime.now().strftime('%Y%m%d_%H%M')}.zip",
+                        mime="application/zip",
+                        use_container_width=True
+                    )
+            finally:
+                os.remove(caminho)
+            st.caption("Baixe agora: o arquivo não fica guardado (gere de novo se precisar).")
+
+    st.markdown("---")
+
+    st.markdown("#### 📥 Importar Dados (CSV)")
+    st.caption("Histórico de outro sistema ou clínica: um arquivo CSV por tabela. "
+               "Datas em AAAA-MM-DD ou DD/MM/AAAA; na coluna pet use o nome ou o id do pet.")
+    nomes_importacao = {
+        'pets': "🐾 Pets",
+        'vacinas': "💉 Vacinas",
+        'peso': "⚖️ Pesagens",
+        'veterinario': "🏥 Consultas",
+        'preventivos': "🛡️ Preventivos"
+    }
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        tabela_importacao = st.selectbox(
+            "Tabela", list(importacao.ESQUEMAS), format_func=nomes_importacao.get, key="tabela_importacao"
+        )
+    with col2:
+        st.download_button(
+            "📄 Baixar modelo",
+            data=importacao.modelo_csv(tabela_importacao),
+            file_name=f"modelo_{tabela_importacao}.csv",
+            mime="text/csv",
+            use_container_width=True
+        )
+    if 'aviso_importacao' in st.session_state:
+        st.success(st.session_state.pop('aviso_importacao'))
+    if 'erro_importacao' in st.session_state:
+        st.error(st.session_state.pop('erro_importacao'))
+    # A chave muda a cada importação concluída para limpar o arquivo enviado
+    arquivo_importacao = st.file_uploader(
+        "Arquivo CSV",
+        type=['csv'],
+        key=f"arquivo_importacao_{tabela_importacao}_{st.session_state.get('importacoes', 0)}"
+    )
+
+    if arquivo_importacao is not None:
+        try:
+            df_importacao = importacao.ler_csv(arquivo_importacao.getvalue())
+        except Exception as e:
+            df_importacao = None
+            st.error(f"Erro ao ler o arquivo: {str(e)}")
+
+        if df_importacao is not None:
+            vagas = max(LIMITE_PETS - contar_pets(), 0) if tabela_importacao == 'pets' else None
+            try:
+                registros_validos, linhas_validas, erros_importacao, colunas_ausentes = importacao.validar(
+                    tabela_importacao, df_importacao, importacao.mapa_de_pets(dados.pets), vagas
+                )
+            except Exception as e:
+                df_importacao = None
+                st.error(f"Erro ao validar o arquivo: {str(e)}")
+
+        if df_importacao is not None:
+            if colunas_ausentes:
+                st.error(f"❌ Colunas obrigatórias ausentes: {', '.join(colunas_ausentes)}")
+            else:
+                st.info(f"✅ {len(registros_validos)} linha(s) válida(s) | ❌ {len(erros_importacao)} erro(s)")
+                if erros_importacao:
+                    st.dataframe(erros_importacao, use_container_width=True, hide_index=True)
+                # Linhas deste arquivo já gravadas por uma importação interrompida não são enviadas de novo
+                parcial = st.session_state.get('importacao_parcial')
+                ja_importadas = parcial['linhas'] if parcial and parcial['arquivo'] == arquivo_importacao.file_id else set()
+                pendentes = [(linha, registro) for linha, registro in zip(linhas_validas, registros_validos)
+                             if linha not in ja_importadas]
+                if ja_importadas:
+                    st.warning(
+                        f"⚠️ A importação parou no meio: as linhas {importacao.faixas_de_linhas(ja_importadas)} "
+                        f"já foram gravadas. Importar de novo envia só as {len(pendentes)} restante(s); "
+                        f"se for corrigir o arquivo, retire essas linhas antes de enviá-lo outra vez."
+                    )
+                if pendentes and st.button(
+                    f"📥 Importar {len(pendentes)} registro(s)", use_container_width=True
+                ):
+                    with st.spinner("Importando..."):
+                        gravados = supabase_post_em_blocos(tabela_importacao, [registro for _, registro in pendentes])
+                    # Uma única recarga ao final da importação
+                    recarregar_dados()
+                    if gravados == len(pendentes):
+                        st.session_state.pop('importacao_parcial', None)
+                        total = len(ja_importadas) + gravados
+                        st.session_state.aviso_importacao = f"✅ {total} registro(s) importado(s)!"
+                        st.session_state.importacoes = st.session_state.get('importacoes', 0) + 1
+                    else:
+                        st.session_state.erro_importacao = (
+                            f"❌ Importados {gravados} de {len(pendentes)} registros: erro ao gravar no banco."
+                        )
+                        # Os blocos são gravados em ordem: as primeiras `gravados` linhas pendentes estão no banco
+                        st.session_state.importacao_parcial = {
+                            'arquivo': arquivo_importacao.file_id,
+                            'linhas': ja_importadas | {linha for linha, _ in pendentes[:gravados]}
+                        }
+                    st.rerun()
 
     st.markdown("---")
 
@@ -1746,29 +2733,86 @@ with tab9:
     st.warning("⚠️ Atenção: As ações abaixo são irreversíveis!")
 
     if st.button("🗑️ Limpar Todos os Dados", use_container_width=True):
-        # Deletar todos os dados do Supabase
-        for pet in st.session_state.pets:
-            supabase_delete('pets', pet['id'])
-        for vacina in st.session_state.vacinas:
-            supabase_delete('vacinas', vacina['id'])
-        for alim in st.session_state.alimentacao:
-            supabase_delete('alimentacao', alim['id'])
-        for vet in st.session_state.veterinario:
-            supabase_delete('veterinario', vet['id'])
-        for med in st.session_state.medicamentos:
-            supabase_delete('medicamentos', med['id'])
-        for prev in st.session_state.preventivos:
-            supabase_delete('preventivos', prev['id'])
-        for p in st.session_state.peso:
-            supabase_delete('peso', p['id'])
-        for nota in st.session_state.notas:
-            supabase_delete('notas', nota['id'])
+        # Deletar todos os dados do Supabase: um DELETE por tabela, ao mesmo tempo; pets por último
+        filtro_usuario = f"user_id=eq.{st.session_state.user['id']}"
+        supabase_delete_varios([
+            (tabela, filtro_usuario) for tabela in TABELAS_DO_PET + ['medicamentos_log', 'estoques_alimento']
+        ])
+        supabase_delete_varios([('pets', filtro_usuario)])
 
         # Recarregar dados
         recarregar_dados()
         st.success("✅ Todos os dados foram limpos!")
         st.rerun()
 
+    # Painel de operação (apenas administradores): só contagens, calculadas no banco
+    if eh_administrador():
+        st.markdown("---")
+        st.markdown("#### 🛠️ Administração")
+
+        if st.toggle("Mostrar painel de operação", key="mostrar_painel_admin"):
+            if st.button("🔄 Atualizar painel") or 'painel_admin' not in st.session_state:
+                st.session_state.painel_admin = carregar_painel_administrativo()
+            painel = st.session_state.painel_admin
+
+            if painel is None:
+                st.error("Não foi possível carregar o painel. Verifique se supabase_admin.sql foi executado.")
+            else:
+                st.caption(f"Atualizado em {painel['atualizado_em'].strftime('%d/%m/%Y %H:%M:%S')}")
+                planos = pd.DataFrame(painel['planos'])
+                vacinas = pd.DataFrame(painel['vacinas'])
+
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    st.metric("Perfis", int(planos['perfis'].sum()) if not planos.empty else 0)
+                with col2:
+                    st.metric("Perfis ativos", int(planos['ativos'].sum()) if not planos.empty else 0)
+                with col3:
+                    st.metric("Pets", int(planos['pets'].sum()) if not planos.empty else 0)
+                with col4:
+                    usuarios = int(vacinas['usuarios'].sum()) if not vacinas.empty else 0
+                    com_vencidas = int(vacinas['usuarios_com_vencidas'].sum()) if not vacinas.empty else 0
+                    st.metric("Com vacina vencida", f"{com_vencidas / usuarios * 100:.1f}%" if usuarios else "—")
+
+                st.markdown("**Pets por plano (limites de PLANOS)**")
+                if not planos.empty:
+                    colunas = {
+                        'plano': 'Plano', 'limite': 'Limite', 'perfis': 'Perfis', 'ativos': 'Ativos', 'pets': 'Pets',
+                        'media_pets': 'Média de pets (ativos)', 'no_limite': 'Ativos no limite',
+                        'acima_do_limite': 'Acima do limite'
+                    }
+                    planos['limite'] = planos['plano'].map(PLANOS)
+                    st.dataframe(planos[list(colunas)].rename(columns=colunas),
+                                 use_container_width=True, hide_index=True)
+
+                st.markdown("**Vacinas pendentes (usuários ativos)**")
+                if not vacinas.empty:
+                    vacinas['taxa_vencidas'] = (vacinas['vencidas'] / vacinas['pendentes'].where(vacinas['pendentes'] > 0)
+                                                * 100).round(1)
+                    colunas = {
+                        'plano': 'Plano', 'usuarios': 'Usuários', 'pendentes': 'Pendentes', 'vencidas': 'Vencidas',
+                        'taxa_vencidas': '% vencidas', 'vencendo_7_dias': 'Vencem em 7 dias',
+                        'usuarios_com_vencidas': 'Usuários com vencidas'
+                    }
+                    st.dataframe(vacinas[list(colunas)].rename(columns=colunas),
+                                 use_container_width=True, hide_index=True)
+
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.markdown("**Origem dos perfis**")
+                    fontes = pd.DataFrame(painel['fontes'])
+                    if not fontes.empty:
+                        st.dataframe(fontes.pivot_table(index='fonte', columns='status', values='perfis',
+                                                        fill_value=0, aggfunc='sum'),
+                                     use_container_width=True)
+                with col2:
+                    st.markdown("**Novos perfis por semana**")
+                    cadastros = pd.DataFrame(painel['cadastros'])
+                    if not cadastros.empty:
+                        st.bar_chart(cadastros.pivot_table(index='semana', columns='plano', values='perfis',
+                                                           fill_value=0, aggfunc='sum'))
+                        st.caption(f"Novos pets nas últimas 12 semanas: {int(cadastros['pets'].sum())}")
+
     st.markdown('</div>', unsafe_allow_html=True)
 
 # Footer
@@ -1777,3 +2821,4 @@ st.markdown(
     "<p style='text-align: center; color: #666;'>PetControl v1.0 - Desenvolvido com ❤️</p>",
     unsafe_allow_html=True
 )
+rastreamento.finalizar_rerun(st.session_state.rastro)
@@ -0,0 +1,86 @@
+# ==================== SESSÃO JWT (VERIFICAÇÃO LOCAL) ====================
+# Verifica os tokens do Supabase Auth sem chamar o servidor a cada rerun.
+# Projetos com chave assimétrica (ES256/RS256) usam o JWKS publicado em
+# /auth/v1/.well-known/jwks.json (em cache no processo); projetos com o
+# segredo legado (HS256) usam o jwt_secret configurado em st.secrets.
+
+import threading
+import time
+
+import jwt
+
+# Renovar o token quando faltar menos que isto para expirar (segundos)
+MARGEM_RENOVACAO = 120
+
+# Tempo de vida do cache de plano/status quando não vêm no próprio token (segundos)
+PERFIL_TTL = 300
+
+# Clientes JWKS compartilhados entre sessões (um por URL)
+_clientes_jwks = {}
+_trava_jwks = threading.Lock()
+
+
+def _cliente_jwks(jwks_url, apikey):
+    """Cliente JWKS com cache de chaves (compartilhado no processo)"""
+    with _trava_jwks:
+        if jwks_url not in _clientes_jwks:
+            _clientes_jwks[jwks_url] = jwt.PyJWKClient(
+                jwks_url,
+                cache_keys=True,
+                lifespan=3600,
+                headers={'apikey': apikey},
+                timeout=10
+            )
+        return _clientes_jwks[jwks_url]
+
+
+def verificar_token(token, jwks_url=None, apikey=None, segredo=None):
+    """Verificar assinatura, audiência e expiração do JWT; retorna as claims
+    Lança jwt.InvalidTokenError se o token não for válido
+    """
+    algoritmo = jwt.get_unverified_header(token).get('alg')
+    if algoritmo == 'HS256':
+        if not segredo:
+            raise jwt.InvalidTokenError("jwt_secret não configurado para tokens HS256")
+        chave = segredo
+    elif algoritmo in ('ES256', 'RS256', 'EdDSA'):
+        chave = _cliente_jwks(jwks_url, apikey).get_signing_key_from_jwt(token).key
+    else:
+        raise jwt.InvalidTokenError(f"Algoritmo não suportado: {algoritmo}")
+
+    return jwt.decode(
+        token,
+        chave,
+        algorithms=[algoritmo],
+        audience='authenticated',
+        options={'require': ['exp', 'sub']}
+    )
+
+
+def expira_em(dados_token, claims=None):
+    """Momento (epoch) de expiração a partir da resposta do /token ou das claims"""
+    if dados_token.get('expires_at'):
+        return float(dados_token['expires_at'])
+    if claims and claims.get('exp'):
+        return float(claims['exp'])
+    return time.time() + float(dados_token.get('expires_in', 3600))
+
+
+def precisa_renovar(expira, agora=None, margem=MARGEM_RENOVACAO):
+    """Indica se o token deve ser renovado agora"""
+    agora = time.time() if agora is None else agora
+    return expira - agora < margem
+
+
+def plano_das_claims(claims):
+    """Plano e status gravados no token pelo custom access token hook (ou None)"""
+    app_metadata = (claims or {}).get('app_metadata') or {}
+    if app_metadata.get('plano') and app_metadata.get('status'):
+        return {'plano': app_metadata['plano'], 'status': app_metadata['status']}
+    return None
+
+
+def perfil_expirado(verificado_em, agora=None, ttl=PERFIL_TTL):
+    """Indica se o plano/status em cache precisa ser consultado novamente"""
+    agora = time.time() if agora is None else agora
+    return verificado_em is None or agora - verificado_em >= ttl
@@ -0,0 +1,123 @@
+# ==================== BUSCA TEXTUAL LOCAL ====================
+# Índice invertido em memória sobre os dados já carregados na sessão.
+# Usado quando a função buscar_registros (supabase_busca.sql) não está
+# disponível no banco. Mesmo formato de resultado da função do banco.
+
+import math
+import re
+import unicodedata
+
+# Campos indexados por tabela: (campo do título, campos do corpo com peso, campo de data)
+CAMPOS = {
+    'notas': ('titulo', {'titulo': 1.0, 'texto': 0.4}, 'data_criacao'),
+    'veterinario': ('motivo', {'motivo': 1.0, 'diagnostico': 0.4, 'prescricoes': 0.4, 'nome_veterinario': 0.2}, 'data_consulta'),
+    'vacinas': ('nome_vacina', {'nome_vacina': 1.0, 'observacoes': 0.4, 'veterinario': 0.2}, 'data_aplicacao')
+}
+
+STOPWORDS = {
+    'a', 'o', 'as', 'os', 'de', 'da', 'do', 'das', 'dos', 'e', 'em', 'no', 'na', 'nos', 'nas',
+    'um', 'uma', 'para', 'por', 'com', 'sem', 'que', 'se', 'ao', 'aos', 'ou', 'mais'
+}
+
+_PALAVRA = re.compile(r'\w+')
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos"""
+    decomposto = unicodedata.normalize('NFKD', texto.lower())
+    return ''.join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def radical(palavra):
+    """Redução simples de plurais e flexões comuns (otites → otit, otite → otit)"""
+    for sufixo in ('oes', 'aes', 'ais', 'eis', 'es', 's', 'a', 'e', 'o'):
+        if len(palavra) > len(sufixo) + 3 and palavra.endswith(sufixo):
+            return palavra[:-len(sufixo)]
+    return palavra
+
+
+def termos(texto):
+    return [radical(p) for p in _PALAVRA.findall(normalizar(texto)) if p not in STOPWORDS]
+
+
+class IndiceBusca:
+    """Índice invertido: termo → {(tabela, id): peso}"""
+
+    def __init__(self, tabelas):
+        """tabelas: {nome da tabela: lista de registros} (apenas as de CAMPOS são indexadas)"""
+        self.postings = {}
+        self.documentos = {}
+        for tabela, (campo_titulo, campos, campo_data) in CAMPOS.items():
+            for registro in tabelas.get(tabela, []):
+                chave = (tabela, registro['id'])
+                pesos = {}
+                for campo, peso in campos.items():
+                    for termo in termos(str(registro.get(campo) or '')):
+                        pesos[termo] = pesos.get(termo, 0.0) + peso
+                if not pesos:
+                    continue
+                comprimento = sum(pesos.values())
+                for termo, peso in pesos.items():
+                    self.postings.setdefault(termo, {})[chave] = peso / math.sqrt(comprimento)
+                self.documentos[chave] = registro
+
+    def buscar(self, consulta, limite=20, deslocamento=0):
+        """Resultados ordenados por relevância (tf-idf); todos os termos precisam aparecer"""
+        consulta_termos = list(dict.fromkeys(termos(consulta)))
+        if not consulta_termos:
+            return []
+        listas = [self.postings.get(t, {}) for t in consulta_termos]
+        if not all(listas):
+            return []
+        total = max(len(self.documentos), 1)
+        candidatos = set.intersection(*(set(lista) for lista in sorted(listas, key=len)))
+        pontuacao = {
+            chave: sum(lista[chave] * math.log(1 + total / len(lista)) for lista in listas)
+            for chave in candidatos
+        }
+        ordenados = sorted(
+            pontuacao.items(),
+            key=lambda item: (-item[1], -_ordem_data(self._data(item[0])), -item[0][1])
+        )
+        return [self._resultado(chave, relevancia, consulta_termos)
+                for chave, relevancia in ordenados[deslocamento:deslocamento + limite]]
+
+    def _data(self, chave):
+        tabela, _ = chave
+        return self.documentos[chave].get(CAMPOS[tabela][2])
+
+    def _resultado(self, chave, relevancia, consulta_termos):
+        tabela, id_registro = chave
+        registro = self.documentos[chave]
+        campo_titulo, campos, _ = CAMPOS[tabela]
+        corpo = ' — '.join(str(registro[c]) for c in campos if c != campo_titulo and registro.get(c))
+        data = self._data(chave)
+        return {
+            'tabela': tabela,
+            'id': id_registro,
+            'pet_id': registro.get('pet_id'),
+            'data_referencia': data.date() if hasattr(data, 'date') else data,
+            'titulo': registro.get(campo_titulo),
+            'trecho': trecho(corpo, consulta_termos),
+            'relevancia': round(relevancia, 4)
+        }
+
+
+def _ordem_data(data):
+    return data.toordinal() if data else 0
+
+
+def trecho(texto, consulta_termos, palavras=25):
+    """Janela do texto em volta do primeiro termo encontrado, com os termos em **negrito**"""
+    palavras_texto = texto.split()
+    if not palavras_texto:
+        return ''
+    encontrados = [i for i, p in enumerate(palavras_texto) if any(radical(normalizar(w)) in consulta_termos
+                                                                    for w in _PALAVRA.findall(p))]
+    inicio = max(encontrados[0] - palavras // 3, 0) if encontrados else 0
+    janela = palavras_texto[inicio:inicio + palavras]
+    marcados = set(i - inicio for i in encontrados)
+    partes = [f'**{p}**' if i in marcados else p for i, p in enumerate(janela)]
+    prefixo = '… ' if inicio > 0 else ''
+    sufixo = ' …' if inicio + palavras < len(palavras_texto) else ''
+    return prefixo + ' '.join(partes) + sufixo
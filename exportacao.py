@@ -0,0 +1,128 @@
+# ==================== EXPORTAÇÃO COMPLETA DA CONTA ====================
+# Grava cada tabela em um arquivo dentro de um .zip, página por página.
+# As páginas vêm de um gerador (paginação por chave no Supabase), então
+# a memória usada depende do tamanho da página e não do histórico da conta.
+
+import csv
+import io
+import json
+import os
+import tempfile
+import zipfile
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+FORMATOS = {
+    'CSV': 'csv',
+    'JSON Lines': 'jsonl',
+    'Parquet': 'parquet'
+}
+
+
+def _valor_texto(valor):
+    """Dicionários e listas (colunas JSONB) viram texto JSON"""
+    if isinstance(valor, (dict, list)):
+        return json.dumps(valor, ensure_ascii=False)
+    return valor
+
+
+def _gravar_csv(arquivo, paginas):
+    texto = io.TextIOWrapper(arquivo, encoding='utf-8', newline='')
+    escritor = None
+    total = 0
+    for pagina in paginas:
+        if escritor is None:
+            escritor = csv.DictWriter(texto, fieldnames=list(pagina[0]), extrasaction='ignore')
+            escritor.writeheader()
+        for registro in pagina:
+            escritor.writerow({k: _valor_texto(v) for k, v in registro.items()})
+        total += len(pagina)
+    texto.flush()
+    texto.detach()
+    return total
+
+
+def _gravar_jsonl(arquivo, paginas):
+    total = 0
+    for pagina in paginas:
+        linhas = ''.join(json.dumps(registro, ensure_ascii=False) + '\n' for registro in pagina)
+        arquivo.write(linhas.encode('utf-8'))
+        total += len(pagina)
+    return total
+
+
+def _gravar_parquet(arquivo, paginas):
+    escritor = None
+    schema = None
+    total = 0
+    try:
+        for pagina in paginas:
+            registros = [{k: _valor_texto(v) for k, v in registro.items()} for registro in pagina]
+            if schema is None:
+                # Colunas só com nulos na primeira página são gravadas como texto
+                inferido = pa.Table.from_pylist(registros).schema
+                schema = pa.schema([
+                    pa.field(campo.name, pa.string()) if pa.types.is_null(campo.type) else campo
+                    for campo in inferido
+                ])
+                textos = {campo.name for campo in schema if pa.types.is_string(campo.type)}
+                escritor = pq.ParquetWriter(arquivo, schema, compression='zstd')
+            for registro in registros:
+                for coluna in textos:
+                    if registro.get(coluna) is not None and not isinstance(registro[coluna], str):
+                        registro[coluna] = str(registro[coluna])
+            escritor.write_table(pa.Table.from_pylist(registros, schema=schema))
+            total += len(pagina)
+    finally:
+        if escritor is not None:
+            escritor.close()
+    return total
+
+
+_GRAVADORES = {
+    'csv': _gravar_csv,
+    'jsonl': _gravar_jsonl,
+    'parquet': _gravar_parquet
+}
+
+
+def _paginas_nao_vazias(paginas):
+    for pagina in paginas:
+        if pagina:
+            yield pagina
+
+
+def exportar_zip(tabelas, formato, destino=None):
+    """Gravar as tabelas em um .zip (um arquivo por tabela)
+    tabelas: {nome: gerador de páginas (listas de dicionários)}
+    formato: 'csv', 'jsonl' ou 'parquet'
+    Retorna (caminho do .zip, {tabela: quantidade de registros}); se falhar, o .zip é apagado
+    """
+    gravar = _GRAVADORES[formato]
+    if destino is None:
+        destino = tempfile.NamedTemporaryFile(prefix='petcontrol_', suffix='.zip', delete=False).name
+
+    contagens = {}
+    # Parquet já é comprimido internamente
+    compressao = zipfile.ZIP_STORED if formato == 'parquet' else zipfile.ZIP_DEFLATED
+    try:
+        with zipfile.ZipFile(destino, 'w', compression=compressao) as pacote:
+            for tabela, paginas in tabelas.items():
+                paginas = _paginas_nao_vazias(paginas)
+                primeira = next(paginas, None)
+                if primeira is None:
+                    contagens[tabela] = 0
+                    continue
+                with pacote.open(f'{tabela}.{formato}', 'w', force_zip64=True) as arquivo:
+                    contagens[tabela] = gravar(arquivo, _encadear(primeira, paginas))
+    except BaseException:
+        # Um .zip cortado no meio não pode ser oferecido para download
+        os.remove(destino)
+        raise
+    return destino, contagens
+
+
+def _encadear(primeira, restantes):
+    yield primeira
+    yield from restantes
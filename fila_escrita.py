@@ -0,0 +1,375 @@
+# ==================== FILA DE ESCRITA ====================
+# Gravações em segundo plano (write-behind) para ações rápidas e repetidas:
+# marcar/desmarcar "Ação realizada?" e marcar doses. Cada sessão tem uma fila
+# que:
+# - junta as atualizações do mesmo (tabela, id) — vale o último valor de cada
+#   campo — e as inserções com a mesma chave;
+# - grava em lote ATRASO_SEGUNDOS depois da primeira operação pendente (um PATCH
+#   por tabela e conjunto de campos, um POST por tabela), pelo loop de
+#   supabase_assincrono, e também antes de uma recarga e no logout;
+# - registra cada operação em um diário local (JSON Lines) até ser gravada: se o
+#   processo cair, a próxima sessão do mesmo usuário regrava o que ficou;
+# - tenta de novo (com espera crescente) o que falhar por rede, prazo ou 5xx; o
+#   que o banco recusar de vez (4xx, ex.: a dose de um medicamento já excluído)
+#   sai da fila e vai para DIRETORIO/descartadas/<user_id>.jsonl.
+
+import asyncio
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+import weakref
+from collections import deque
+
+import httpx
+
+import supabase_assincrono
+
+ATRASO_SEGUNDOS = 1.0
+# Espera máxima entre novas tentativas depois de falhas (dobra a cada falha)
+TENTATIVA_MAX_SEGUNDOS = 30.0
+DIRETORIO = '.fila_escrita'
+# Últimas descargas consideradas nas métricas de latência
+AMOSTRAS_LATENCIA = 200
+
+# Filas vivas do processo (descarregadas na saída; seus diários não são recuperados por outra sessão)
+_filas = weakref.WeakValueDictionary()
+_trava_filas = threading.Lock()
+
+
+def chave_da_operacao(operacao):
+    """Operações com a mesma chave são reunidas em uma só"""
+    if operacao['op'] == 'update':
+        return ('update', operacao['tabela'], operacao['id'])
+    return ('insert', operacao['tabela'], tuple(operacao['registro'][coluna] for coluna in operacao['chave']))
+
+
+def reunir_operacao(anterior, operacao):
+    """Operação que substitui `anterior` na fila (updates somam os campos; o mais novo vence)"""
+    if anterior is not None and operacao['op'] == 'update':
+        return dict(operacao, campos={**anterior['campos'], **operacao['campos']})
+    return operacao
+
+
+def erro_permanente(resultado):
+    """Recusa do banco que uma nova tentativa não resolve (4xx; token vencido, 408 e 429 passam)"""
+    if not isinstance(resultado, httpx.HTTPStatusError):
+        return False
+    status = resultado.response.status_code
+    return 400 <= status < 500 and status not in (401, 408, 429)
+
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(int(len(ordenados) * p), len(ordenados) - 1)]
+
+
+class FilaEscrita:
+    """Fila de escrita de uma sessão (operações pendentes, diário e métricas)"""
+
+    def __init__(self, id_sessao, user_id, api_url, headers, diretorio=DIRETORIO, atraso=ATRASO_SEGUNDOS):
+        self.id_sessao = id_sessao
+        self.user_id = user_id
+        self.api_url = api_url
+        self.headers = headers
+        self.diretorio = diretorio
+        self.atraso = float(atraso)
+        self.caminho = os.path.join(diretorio, f'{user_id}.{id_sessao}.jsonl')
+        self.trava = threading.Lock()
+        self.pendentes = {}
+        self.enfileirada_em = {}
+        # Lote em envio: fora de pendentes até a resposta, mas ainda não gravado
+        self.enviando = {}
+        self.agendada = False
+        self.espera = self.atraso
+        self._envio = None
+        # Métricas
+        self.enfileiradas = 0
+        self.coalescidas = 0
+        self.descargas = 0
+        self.requisicoes = 0
+        self.falhas = 0
+        self.descartadas = 0
+        self.ultimo_erro = None
+        self.latencias = deque(maxlen=AMOSTRAS_LATENCIA)
+        self.duracoes = deque(maxlen=AMOSTRAS_LATENCIA)
+        with _trava_filas:
+            _filas[id(self)] = self
+
+    # ---------- operações ----------
+
+    def atualizar(self, tabela, id_registro, campos):
+        """Enfileirar um PATCH de `campos` no registro `id_registro`"""
+        self._enfileirar({'op': 'update', 'tabela': tabela, 'id': id_registro, 'campos': campos})
+
+    def inserir(self, tabela, registro, chave):
+        """Enfileirar a inserção de `registro`; existentes com as mesmas colunas `chave` são ignorados"""
+        self._enfileirar({'op': 'insert', 'tabela': tabela, 'chave': list(chave), 'registro': registro})
+
+    def _enfileirar(self, operacao):
+        with self.trava:
+            chave = chave_da_operacao(operacao)
+            anterior = self.pendentes.get(chave)
+            if anterior is not None:
+                self.coalescidas += 1
+            self.pendentes[chave] = operacao = reunir_operacao(anterior, operacao)
+            self.enfileirada_em.setdefault(chave, time.monotonic())
+            self.enfileiradas += 1
+            self._anotar(operacao)
+            agendar = not self.agendada
+            self.agendada = True
+        if agendar:
+            supabase_assincrono._loop_de_fundo().call_soon_threadsafe(self._agendar, self.atraso)
+
+    def descartar(self, condicao):
+        """Tirar da fila (e do diário) as operações pendentes em que condicao(operacao) é verdadeira
+        Usado antes de excluir um registro cujas operações pendentes seriam recusadas; retorna quantas saíram
+        """
+        with self.trava:
+            chaves = [chave for chave, operacao in self.pendentes.items() if condicao(operacao)]
+            for chave in chaves:
+                del self.pendentes[chave]
+                self.enfileirada_em.pop(chave, None)
+            if chaves:
+                self._reescrever_diario()
+        return len(chaves)
+
+    # ---------- diário ----------
+
+    def _anotar(self, operacao):
+        os.makedirs(self.diretorio, exist_ok=True)
+        with open(self.caminho, 'a', encoding='utf-8') as arquivo:
+            arquivo.write(json.dumps(operacao, ensure_ascii=False) + '\n')
+
+    def _reescrever_diario(self):
+        # Só as operações ainda pendentes; sem pendências, o diário some
+        if not self.pendentes:
+            if os.path.exists(self.caminho):
+                os.remove(self.caminho)
+            return
+        temporario = self.caminho + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            for operacao in self.pendentes.values():
+                arquivo.write(json.dumps(operacao, ensure_ascii=False) + '\n')
+        os.replace(temporario, self.caminho)
+
+    def _arquivar_descartadas(self, operacoes, erro):
+        # Fora do padrão <user_id>.*.jsonl de recuperar_diarios(): não voltam para a fila
+        diretorio = os.path.join(self.diretorio, 'descartadas')
+        os.makedirs(diretorio, exist_ok=True)
+        detalhe = {'status': erro.response.status_code, 'erro': erro.response.text[:500],
+                   'descartada_em': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        with open(os.path.join(diretorio, f'{self.user_id}.jsonl'), 'a', encoding='utf-8') as arquivo:
+            for operacao in operacoes:
+                arquivo.write(json.dumps(dict(operacao, **detalhe), ensure_ascii=False) + '\n')
+
+    def recuperar_diarios(self):
+        """Enfileirar as operações deixadas por sessões deste usuário que não terminaram (queda do processo)
+        Retorna quantas operações foram recuperadas
+        """
+        with _trava_filas:
+            vivos = {fila.caminho for fila in _filas.values()}
+        recuperadas = 0
+        for caminho in sorted(glob.glob(os.path.join(self.diretorio, f'{self.user_id}.*.jsonl'))):
+            if caminho in vivos:
+                continue
+            with open(caminho, encoding='utf-8') as arquivo:
+                for linha in arquivo:
+                    try:
+                        operacao = json.loads(linha)
+                    except json.JSONDecodeError:
+                        # Última linha cortada pela queda
+                        continue
+                    self._enfileirar(operacao)
+                    recuperadas += 1
+            os.remove(caminho)
+        return recuperadas
+
+    # ---------- descarga ----------
+
+    def _agendar(self, segundos):
+        # Na thread do loop de fundo
+        asyncio.get_running_loop().call_later(segundos, lambda: asyncio.ensure_future(self._descarregar_no_prazo()))
+
+    async def _descarregar_no_prazo(self):
+        try:
+            await self._descarregar()
+        except TimeoutError:
+            # O lote voltou para a fila e uma nova tentativa já foi agendada
+            pass
+
+    def descarregar(self, prazo=supabase_assincrono.PRAZO_SEGUNDOS):
+        """Gravar agora tudo o que está pendente (espera terminar); retorna quantas operações continuam pendentes
+        Também espera uma descarga do timer em andamento, para uma leitura logo depois já ver as gravações
+        """
+        try:
+            return supabase_assincrono.executar(self._descarregar(), prazo)
+        except TimeoutError:
+            # O lote cancelado volta para a fila no loop de fundo; até lá, conta como pendente
+            return self.quantidade_pendente()
+
+    def quantidade_pendente(self):
+        """Operações ainda não gravadas (na fila ou em envio)"""
+        with self.trava:
+            return len(self.pendentes.keys() | self.enviando.keys())
+
+    async def _descarregar(self):
+        if self._envio is None:
+            self._envio = asyncio.Lock()
+        async with self._envio:
+            with self.trava:
+                lote, self.pendentes = self.pendentes, {}
+                enfileiradas_em, self.enfileirada_em = self.enfileirada_em, {}
+                self.enviando = lote
+                self.agendada = False
+            if not lote:
+                return 0
+
+            grupos = {}
+            for chave, operacao in lote.items():
+                if operacao['op'] == 'update':
+                    grupo = ('update', operacao['tabela'], json.dumps(operacao['campos'], sort_keys=True))
+                else:
+                    grupo = ('insert', operacao['tabela'], ','.join(operacao['chave']))
+                grupos.setdefault(grupo, []).append(chave)
+
+            inicio = time.monotonic()
+            try:
+                respostas, requisicoes = await self._enviar(lote, grupos)
+            except BaseException as erro:
+                # Prazo de reunir() ou cancelamento pelo prazo de descarregar(): nada foi
+                # confirmado, então o lote inteiro volta para a fila (e para o diário)
+                with self.trava:
+                    self.falhas += 1
+                    self.ultimo_erro = f'envio interrompido ({type(erro).__name__})'
+                    self._devolver(lote, enfileiradas_em, lote, time.monotonic())
+                    self.enviando = {}
+                    self._reescrever_diario()
+                    self.espera = min(self.espera * 2, TENTATIVA_MAX_SEGUNDOS)
+                    agendar = not self.agendada
+                    self.agendada = True
+                if agendar:
+                    self._agendar(self.espera)
+                raise
+            fim = time.monotonic()
+
+            with self.trava:
+                self.descargas += 1
+                self.requisicoes += requisicoes
+                self.duracoes.append(fim - inicio)
+                falharam = False
+                for chaves, resultado in respostas:
+                    if erro_permanente(resultado):
+                        # Recusada de vez: sai da fila em vez de travar as próximas descargas
+                        self.descartadas += len(chaves)
+                        self.ultimo_erro = f'{len(chaves)} operação(ões) recusada(s) ({resultado.response.status_code})'
+                        self._arquivar_descartadas([lote[chave] for chave in chaves], resultado)
+                    elif isinstance(resultado, Exception) or resultado is False or resultado is None:
+                        falharam = True
+                        self.falhas += 1
+                        self.ultimo_erro = str(resultado) if isinstance(resultado, Exception) else 'resposta de erro do Supabase'
+                        self._devolver(lote, enfileiradas_em, chaves, fim)
+                    else:
+                        self.latencias.extend(fim - enfileiradas_em[chave] for chave in chaves)
+                self.enviando = {}
+                self._reescrever_diario()
+                self.espera = min(self.espera * 2, TENTATIVA_MAX_SEGUNDOS) if falharam else self.atraso
+                agendar = bool(self.pendentes) and not self.agendada
+                if agendar:
+                    self.agendada = True
+            if agendar:
+                self._agendar(self.espera if falharam else self.atraso)
+            return len(self.pendentes)
+
+    async def _enviar(self, lote, grupos):
+        """Uma requisição por grupo; um grupo recusado com 4xx é reenviado operação por operação,
+        para só a operação recusada ser descartada. Retorna ([(chaves, resultado)], requisições)
+        """
+        cliente = supabase_assincrono.SupabaseAssincrono(self.api_url, self.headers)
+
+        def chamada(grupo, chaves):
+            tipo, tabela, detalhe = grupo
+            if tipo == 'update':
+                return cliente.update_em_lote(tabela, [lote[c]['id'] for c in chaves], json.loads(detalhe), levantar=True)
+            return cliente.post_lote(tabela, [lote[c]['registro'] for c in chaves], on_conflict=detalhe, levantar=True)
+
+        envios = list(grupos.items())
+        resultados = await supabase_assincrono.reunir([chamada(grupo, chaves) for grupo, chaves in envios])
+        respostas = []
+        isoladas = []
+        for (grupo, chaves), resultado in zip(envios, resultados):
+            if erro_permanente(resultado) and len(chaves) > 1:
+                isoladas.extend((grupo, [chave]) for chave in chaves)
+            else:
+                respostas.append((chaves, resultado))
+        if isoladas:
+            resultados = await supabase_assincrono.reunir([chamada(grupo, chaves) for grupo, chaves in isoladas])
+            respostas.extend((chaves, resultado) for (_, chaves), resultado in zip(isoladas, resultados))
+        return respostas, len(envios) + len(isoladas)
+
+    def _devolver(self, lote, enfileiradas_em, chaves, agora):
+        # De volta à fila, sem passar por cima do que foi enfileirado durante o envio (com a trava)
+        for chave in chaves:
+            self.pendentes[chave] = reunir_operacao(lote[chave], self.pendentes.get(chave, lote[chave]))
+            self.enfileirada_em[chave] = min(enfileiradas_em[chave], self.enfileirada_em.get(chave, agora))
+
+    # ---------- estado local e métricas ----------
+
+    def aplicar_pendentes(self, colecoes):
+        """Reaplicar os updates ainda pendentes às tabelas recém-carregadas (colecoes: {tabela: registros})"""
+        with self.trava:
+            atualizacoes = [op for op in self.pendentes.values() if op['op'] == 'update']
+        for operacao in atualizacoes:
+            for registro in colecoes.get(operacao['tabela'], []):
+                if registro.get('id') == operacao['id']:
+                    registro.update(operacao['campos'])
+
+    def encerrar(self, prazo=5.0):
+        """Gravar o que falta (logout); o que não for gravado fica no diário para o próximo login"""
+        restantes = self.descarregar(prazo)
+        with _trava_filas:
+            _filas.pop(id(self), None)
+        return restantes
+
+    def metricas(self):
+        """Profundidade da fila, contadores e latências (ms) das últimas descargas"""
+        with self.trava:
+            latencia_p50 = percentil(self.latencias, 0.5)
+            latencia_p95 = percentil(self.latencias, 0.95)
+            envio_p50 = percentil(self.duracoes, 0.5)
+            return {
+                'pendentes': len(self.pendentes.keys() | self.enviando.keys()),
+                'enfileiradas': self.enfileiradas,
+                'coalescidas': self.coalescidas,
+                'descargas': self.descargas,
+                'requisicoes': self.requisicoes,
+                'falhas': self.falhas,
+                'descartadas': self.descartadas,
+                'ultimo_erro': self.ultimo_erro,
+                'latencia_p50_ms': None if latencia_p50 is None else latencia_p50 * 1000,
+                'latencia_p95_ms': None if latencia_p95 is None else latencia_p95 * 1000,
+                'envio_p50_ms': None if envio_p50 is None else envio_p50 * 1000
+            }
+
+
+def relatorio():
+    """Operações pendentes em todas as filas do processo"""
+    with _trava_filas:
+        filas = list(_filas.values())
+    return {'filas': len(filas), 'pendentes': sum(fila.quantidade_pendente() for fila in filas)}
+
+
+@atexit.register
+def _descarregar_todas():
+    # Saída normal do servidor: grava o que der; o resto continua nos diários
+    with _trava_filas:
+        filas = list(_filas.values())
+    for fila in filas:
+        try:
+            fila.descarregar(prazo=5.0)
+        except Exception:  # noqa: BLE001 - a saída do processo não pode falhar aqui
+            pass
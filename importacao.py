@@ -0,0 +1,204 @@
+# ==================== IMPORTAÇÃO EM LOTE (CSV) ====================
+# Valida o arquivo coluna a coluna (datas, números, referências de pet)
+# e separa as linhas válidas, prontas para inserção em lote, dos erros
+# por linha. Nenhuma requisição é feita aqui.
+
+import csv
+import io
+
+import pandas as pd
+
+# Colunas aceitas por tabela. "pet" é o nome (ou id) de um pet já cadastrado
+# e vira a chave pet_id na gravação.
+ESQUEMAS = {
+    'pets': {
+        'obrigatorias': ['nome', 'especie', 'data_nascimento'],
+        'datas': ['data_nascimento'],
+        'numeros': ['peso'],
+        'textos': ['raca', 'cor', 'observacoes'],
+        'booleanos': []
+    },
+    'vacinas': {
+        'obrigatorias': ['pet', 'nome_vacina', 'data_aplicacao'],
+        'datas': ['data_aplicacao', 'proxima_dose'],
+        'numeros': [],
+        'textos': ['lote', 'veterinario', 'observacoes'],
+        'booleanos': ['concluido']
+    },
+    'peso': {
+        'obrigatorias': ['pet', 'data_pesagem', 'peso'],
+        'datas': ['data_pesagem'],
+        'numeros': ['peso'],
+        'textos': [],
+        'booleanos': []
+    },
+    'veterinario': {
+        'obrigatorias': ['pet', 'nome_veterinario', 'motivo', 'data_consulta'],
+        'datas': ['data_consulta'],
+        'numeros': [],
+        'textos': ['diagnostico', 'prescricoes'],
+        'booleanos': []
+    },
+    'preventivos': {
+        'obrigatorias': ['pet', 'nome_produto', 'tipo_preventivo', 'data_aplicacao'],
+        'datas': ['data_aplicacao', 'proxima_dose'],
+        'numeros': [],
+        'textos': [],
+        'booleanos': ['concluido']
+    }
+}
+
+VERDADEIRO = {'sim', 's', 'true', 'verdadeiro', '1', 'x'}
+FALSO = {'não', 'nao', 'n', 'false', 'falso', '0', ''}
+
+
+def colunas(tabela):
+    """Todas as colunas aceitas, obrigatórias primeiro"""
+    esquema = ESQUEMAS[tabela]
+    extras = esquema['datas'] + esquema['numeros'] + esquema['textos'] + esquema['booleanos']
+    return esquema['obrigatorias'] + [c for c in dict.fromkeys(extras) if c not in esquema['obrigatorias']]
+
+
+def modelo_csv(tabela):
+    """Cabeçalho do arquivo modelo da tabela"""
+    return ','.join(colunas(tabela)) + '\n'
+
+
+def ler_csv(conteudo):
+    """Ler o arquivo como texto (separador , ou ; detectado automaticamente)
+    O índice de cada linha é o número dela no arquivo menos 2, como em validar.
+    Linhas com mais campos que o cabeçalho (ex.: vírgula decimal sem aspas) não
+    entram no DataFrame: ficam em df.attrs['erros'] como erros da linha.
+    """
+    if isinstance(conteudo, bytes):
+        conteudo = conteudo.decode('utf-8-sig')
+    try:
+        dialeto = csv.Sniffer().sniff(conteudo.split('\n', 1)[0], delimiters=',;')
+    except csv.Error:
+        dialeto = csv.excel
+    leitor = csv.reader(io.StringIO(conteudo), dialeto)
+    cabecalho = [c.strip().lower() for c in next(leitor, [])]
+    if not cabecalho:
+        raise ValueError('arquivo vazio')
+
+    linhas, indices, erros = [], [], []
+    inicio = leitor.line_num + 1
+    for campos in leitor:
+        if campos:
+            if len(campos) > len(cabecalho):
+                erros.append({
+                    'linha': inicio, 'coluna': '',
+                    'erro': f'{len(campos)} campos para {len(cabecalho)} colunas '
+                            f'(use aspas em valores com vírgula ou ponto e vírgula)'
+                })
+            else:
+                linhas.append([c.strip() for c in campos] + [''] * (len(cabecalho) - len(campos)))
+                indices.append(inicio - 2)
+        inicio = leitor.line_num + 1
+
+    df = pd.DataFrame(linhas, columns=cabecalho, index=indices, dtype=str)
+    df.attrs['erros'] = erros
+    return df
+
+
+def _datas(coluna):
+    """Aceita AAAA-MM-DD e DD/MM/AAAA"""
+    iso = pd.to_datetime(coluna, format='%Y-%m-%d', errors='coerce')
+    brasil = pd.to_datetime(coluna, format='%d/%m/%Y', errors='coerce')
+    return iso.fillna(brasil)
+
+
+def _numeros(coluna):
+    """Aceita vírgula ou ponto como separador decimal"""
+    return pd.to_numeric(coluna.str.replace(',', '.', regex=False), errors='coerce')
+
+
+def validar(tabela, df, pets_por_nome, vagas_pets=None):
+    """Validar o DataFrame lido de ler_csv
+    pets_por_nome: {nome em minúsculas ou id em texto: pet_id}
+    vagas_pets: pets que ainda cabem no plano (apenas para a tabela pets)
+    Retorna (registros válidos, linha do arquivo de cada registro, erros [{'linha', 'coluna', 'erro'}],
+    colunas ausentes)
+    """
+    esquema = ESQUEMAS[tabela]
+    erros = list(df.attrs.get('erros', []))
+    ausentes = [c for c in esquema['obrigatorias'] if c not in df.columns]
+    if ausentes:
+        return [], [], [], ausentes
+
+    aceitas = colunas(tabela)
+    df = df[[c for c in aceitas if c in df.columns]].copy()
+    for coluna in aceitas:
+        if coluna not in df.columns:
+            df[coluna] = ''
+
+    invalida = pd.Series(False, index=df.index)
+
+    def marcar(mascara, coluna, mensagem):
+        nonlocal invalida
+        for indice in df.index[mascara]:
+            erros.append({'linha': int(indice) + 2, 'coluna': coluna, 'erro': mensagem})
+        invalida |= mascara
+
+    for coluna in esquema['obrigatorias']:
+        marcar(df[coluna] == '', coluna, 'campo obrigatório vazio')
+
+    for coluna in esquema['datas']:
+        datas = _datas(df[coluna])
+        marcar((df[coluna] != '') & datas.isna(), coluna, 'data inválida (use AAAA-MM-DD ou DD/MM/AAAA)')
+        df[coluna] = datas.dt.strftime('%Y-%m-%d').where(datas.notna(), None)
+
+    for coluna in esquema['numeros']:
+        numeros = _numeros(df[coluna])
+        marcar((df[coluna] != '') & (numeros.isna() | (numeros <= 0)), coluna, 'número inválido')
+        df[coluna] = numeros.round(2).astype(object).where(numeros.notna(), None)
+
+    for coluna in esquema['booleanos']:
+        valores = df[coluna].str.lower()
+        marcar(~valores.isin(VERDADEIRO | FALSO), coluna, 'use sim ou não')
+        df[coluna] = valores.isin(VERDADEIRO)
+
+    for coluna in esquema['textos']:
+        df[coluna] = df[coluna].where(df[coluna] != '', None)
+
+    if 'pet' in esquema['obrigatorias']:
+        pet_ids = df['pet'].str.lower().map(pets_por_nome)
+        marcar((df['pet'] != '') & pet_ids.isna(), 'pet', 'pet não cadastrado')
+        df = df.drop(columns='pet')
+        df['pet_id'] = pet_ids.astype(object)
+
+    if vagas_pets is not None:
+        # Linhas válidas além das vagas do plano são recusadas, na ordem do arquivo
+        excedentes = (~invalida).cumsum() > max(vagas_pets, 0)
+        marcar(excedentes & ~invalida, 'nome', 'limite de pets do plano atingido')
+
+    validos = df[~invalida]
+    if 'pet_id' in validos.columns:
+        validos = validos.assign(pet_id=validos['pet_id'].astype(int))
+    registros = validos.to_dict('records')
+    linhas = [int(indice) + 2 for indice in validos.index]
+    erros.sort(key=lambda e: e['linha'])
+    return registros, linhas, erros, []
+
+
+def faixas_de_linhas(linhas):
+    """Linhas do arquivo em faixas legíveis: {2, 3, 4, 7} -> '2–4, 7'"""
+    faixas = []
+    for linha in sorted(linhas):
+        if faixas and linha == faixas[-1][1] + 1:
+            faixas[-1][1] = linha
+        else:
+            faixas.append([linha, linha])
+    return ', '.join(str(inicio) if inicio == fim else f'{inicio}–{fim}' for inicio, fim in faixas)
+
+
+def mapa_de_pets(pets):
+    """Referências aceitas na coluna pet: nome (sem diferenciar maiúsculas) ou id"""
+    mapa = {}
+    # Em nomes repetidos vale o pet mais antigo, como no restante do app
+    for pet in sorted(pets, key=lambda p: p['id'], reverse=True):
+        mapa[str(pet['nome']).strip().lower()] = pet['id']
+    for pet in pets:
+        mapa[str(pet['id'])] = pet['id']
+    return mapa
+
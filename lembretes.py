@@ -0,0 +1,422 @@
+"""Agendador de lembretes de vacinas, preventivos e doses (todos os usuários)
+
+Hoje as pendências só aparecem quando o usuário abre o app e o semáforo
+de saúde é calculado. Este agendador roda fora do app (cron ou laço com
+--a-cada), varre as pendências de todos os usuários com paginação por
+chave (keyset) e envia os avisos por uma saída plugável:
+
+- vacinas e preventivos não concluídos com proxima_dose na janela do dia
+  (vencidos há até --dias-vencidos dias ou vencendo em até --antecedencia dias);
+- medicamentos em andamento com dose pendente programada até hoje
+  (função lembretes_doses_pendentes).
+
+As três varreduras rodam em paralelo (a próxima página de cada uma é
+buscada enquanto a atual é processada) e agrupam as pendências por
+usuário. Depois, em lotes de usuários, os lembretes são deduplicados
+contra lembretes_enviados (a gravação com ignore-duplicates devolve só
+os novos) e cada usuário recebe um único aviso, com concorrência
+limitada. Se a entrega falhar, os lembretes do usuário são liberados
+para a próxima execução.
+
+Uso:
+    export SUPABASE_URL=https://SEU-PROJETO.supabase.co
+    export SUPABASE_SERVICE_ROLE_KEY=...
+    python lembretes.py --arquivo lembretes.jsonl
+    python lembretes.py --smtp localhost:1025 --remetente avisos@petcontrol.app --a-cada 6
+
+Execute supabase_lembretes.sql antes de usar.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import smtplib
+import sys
+import time
+from datetime import date, datetime, timedelta
+from email.message import EmailMessage
+
+import httpx
+
+TAMANHO_PAGINA = 1000
+# Entregas simultâneas (e conexões abertas com o Supabase)
+ENTREGAS_SIMULTANEAS = 16
+# Usuários por lote de consulta de perfis e reserva em lembretes_enviados
+USUARIOS_POR_LOTE = 200
+LOTES_SIMULTANEOS = 4
+ANTECEDENCIA_DIAS = 7
+DIAS_VENCIDOS = 30
+
+ETAPAS = {
+    'vence_em_breve': 'vence em breve',
+    'vencido': 'vencido',
+    'hoje': 'dose de hoje',
+    'atrasada': 'dose atrasada'
+}
+
+
+# ==================== ACESSO AO SUPABASE ====================
+class FonteSupabase:
+    """Pendências, lembretes enviados e perfis via PostgREST (service role)"""
+
+    def __init__(self, url, service_key, conexoes=ENTREGAS_SIMULTANEAS, timeout=30.0):
+        self.api_url = f'{url}/rest/v1'
+        self.cliente = httpx.AsyncClient(
+            headers={
+                'apikey': service_key,
+                'Authorization': f'Bearer {service_key}',
+                'Content-Type': 'application/json'
+            },
+            limits=httpx.Limits(max_connections=conexoes, max_keepalive_connections=conexoes),
+            timeout=timeout
+        )
+        self.requisicoes = 0
+
+    async def _get(self, caminho, params):
+        self.requisicoes += 1
+        response = await self.cliente.get(f'{self.api_url}/{caminho}', params=params)
+        response.raise_for_status()
+        return response.json()
+
+    async def vencimentos(self, tabela, campos, inicio, fim, cursor, limite):
+        """Registros não concluídos com proxima_dose entre inicio e fim, em ordem de (proxima_dose, id)
+        cursor: (proxima_dose, id) do último registro da página anterior, ou None
+        """
+        params = [
+            ('select', f'id,user_id,pet_id,proxima_dose,{campos}'),
+            ('concluido', 'eq.false'),
+            ('proxima_dose', f'lte.{fim.isoformat()}'),
+            ('order', 'proxima_dose.asc,id.asc'),
+            ('limit', str(limite))
+        ]
+        if cursor:
+            data, ultimo_id = cursor
+            params += [('proxima_dose', f'gte.{data}'), ('or', f'(proxima_dose.gt.{data},id.gt.{ultimo_id})')]
+        else:
+            params.append(('proxima_dose', f'gte.{inicio.isoformat()}'))
+        return await self._get(tabela, params)
+
+    async def doses_pendentes(self, hoje, desde, apos, limite):
+        """Próxima dose pendente dos medicamentos em andamento (keyset por medicamento_id)"""
+        self.requisicoes += 1
+        response = await self.cliente.post(
+            f'{self.api_url}/rpc/lembretes_doses_pendentes',
+            json={'hoje': hoje.isoformat(), 'desde': desde.isoformat(), 'apos': apos, 'limite': limite}
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def perfis(self, user_ids):
+        """{user_id: perfil} com email e status"""
+        if not user_ids:
+            return {}
+        linhas = await self._get('profiles', {'select': 'id,email,status', 'id': f"in.({','.join(user_ids)})"})
+        return {perfil['id']: perfil for perfil in linhas}
+
+    async def nomes_dos_pets(self, pet_ids):
+        """{pet_id: nome}"""
+        if not pet_ids:
+            return {}
+        linhas = await self._get('pets', {'select': 'id,nome', 'id': f"in.({','.join(map(str, pet_ids))})"})
+        return {pet['id']: pet['nome'] for pet in linhas}
+
+    async def reservar(self, lembretes):
+        """Gravar os lembretes em lembretes_enviados; retorna as chaves que ainda não existiam"""
+        if not lembretes:
+            return set()
+        self.requisicoes += 1
+        response = await self.cliente.post(
+            f'{self.api_url}/lembretes_enviados',
+            params={'on_conflict': 'tipo,registro_id,referencia,etapa', 'select': 'tipo,registro_id,referencia,etapa'},
+            headers={'Prefer': 'return=representation,resolution=ignore-duplicates'},
+            json=[{campo: lembrete[campo] for campo in ('tipo', 'registro_id', 'referencia', 'etapa', 'user_id')}
+                  for lembrete in lembretes]
+        )
+        response.raise_for_status()
+        return {chave_lembrete(linha) for linha in response.json()}
+
+    async def liberar(self, lembretes):
+        """Remover lembretes não entregues (voltam a ser enviados na próxima execução)"""
+        if not lembretes:
+            return
+        condicoes = ','.join(
+            f"and(tipo.eq.{l['tipo']},registro_id.eq.{l['registro_id']},referencia.eq.{l['referencia']},etapa.eq.{l['etapa']})"
+            for l in lembretes
+        )
+        self.requisicoes += 1
+        response = await self.cliente.delete(f'{self.api_url}/lembretes_enviados', params={'or': f'({condicoes})'})
+        response.raise_for_status()
+
+    async def fechar(self):
+        await self.cliente.aclose()
+
+
+def chave_lembrete(lembrete):
+    return (lembrete['tipo'], lembrete['registro_id'], lembrete['referencia'], lembrete['etapa'])
+
+
+# ==================== SAÍDAS ====================
+def formatar_mensagem(notificacao):
+    """(assunto, corpo) do aviso de um usuário"""
+    lembretes = notificacao['lembretes']
+    vencidos = sum(1 for l in lembretes if l['etapa'] in ('vencido', 'atrasada'))
+    assunto = f"🐾 PetControl: {len(lembretes)} pendência(s)"
+    if vencidos:
+        assunto += f", {vencidos} vencida(s)"
+    linhas = ['Olá! Estas são as pendências dos seus pets:', '']
+    for l in sorted(lembretes, key=lambda l: l['referencia']):
+        data = date.fromisoformat(l['referencia']).strftime('%d/%m/%Y')
+        linhas.append(f"- {l['pet']}: {l['descricao']} ({ETAPAS[l['etapa']]}, {data})")
+    linhas += ['', 'Acesse o PetControl para registrar as aplicações.']
+    return assunto, '\n'.join(linhas)
+
+
+class SaidaArquivo:
+    """Grava cada aviso como uma linha JSON (testes locais e auditoria)"""
+
+    def __init__(self, caminho):
+        self.arquivo = open(caminho, 'a', encoding='utf-8')
+
+    async def enviar(self, notificacao):
+        assunto, corpo = formatar_mensagem(notificacao)
+        registro = dict(notificacao, assunto=assunto, corpo=corpo, gerado_em=datetime.now().isoformat())
+        self.arquivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+
+    async def fechar(self):
+        self.arquivo.close()
+
+
+class SaidaSMTP:
+    """Envia cada aviso por email (smtplib em uma thread, uma conexão por envio)"""
+
+    def __init__(self, host, porta, remetente, usuario=None, senha=None, tls=False):
+        self.host = host
+        self.porta = porta
+        self.remetente = remetente
+        self.usuario = usuario
+        self.senha = senha
+        self.tls = tls
+
+    def _enviar(self, mensagem):
+        with smtplib.SMTP(self.host, self.porta, timeout=30) as smtp:
+            if self.tls:
+                smtp.starttls()
+            if self.usuario:
+                smtp.login(self.usuario, self.senha)
+            smtp.send_message(mensagem)
+
+    async def enviar(self, notificacao):
+        assunto, corpo = formatar_mensagem(notificacao)
+        mensagem = EmailMessage()
+        mensagem['From'] = self.remetente
+        mensagem['To'] = notificacao['email']
+        mensagem['Subject'] = assunto
+        mensagem.set_content(corpo)
+        await asyncio.to_thread(self._enviar, mensagem)
+
+    async def fechar(self):
+        pass
+
+
+# ==================== AGENDADOR ====================
+def etapa_vencimento(proxima_dose, hoje):
+    return 'vencido' if proxima_dose < hoje else 'vence_em_breve'
+
+
+def etapa_dose(data_dose, hoje):
+    return 'atrasada' if data_dose < hoje else 'hoje'
+
+
+class AgendadorLembretes:
+    """Uma execução: varre as pendências do dia e entrega os avisos novos (um por usuário)"""
+
+    def __init__(self, fonte, saida, hoje=None, antecedencia=ANTECEDENCIA_DIAS, dias_vencidos=DIAS_VENCIDOS,
+                 tamanho_pagina=TAMANHO_PAGINA, simultaneas=ENTREGAS_SIMULTANEAS):
+        self.fonte = fonte
+        self.saida = saida
+        self.hoje = hoje or date.today()
+        self.inicio = self.hoje - timedelta(days=dias_vencidos)
+        self.fim = self.hoje + timedelta(days=antecedencia)
+        self.tamanho_pagina = tamanho_pagina
+        self.entregas = asyncio.Semaphore(simultaneas)
+        self.lotes = asyncio.Semaphore(LOTES_SIMULTANEOS)
+        self.pendencias = {}
+        self.estatisticas = {
+            'paginas': 0, 'registros': 0, 'novos': 0, 'duplicados': 0, 'ignorados': 0,
+            'avisos': 0, 'falhas': 0
+        }
+
+    async def executar(self):
+        """Varrer as três fontes em paralelo e avisar os usuários em lotes; retorna as estatísticas"""
+        await asyncio.gather(
+            self._varrer(self._pagina_vencimentos('vacinas', 'nome_vacina'),
+                         lambda linhas: self._lembretes_vencimento('vacina', linhas, 'nome_vacina')),
+            self._varrer(self._pagina_vencimentos('preventivos', 'tipo_preventivo,nome_produto'),
+                         lambda linhas: self._lembretes_vencimento('preventivo', linhas, 'tipo_preventivo')),
+            self._varrer(self._pagina_doses(), self._lembretes_doses)
+        )
+        usuarios = sorted(self.pendencias)
+        await asyncio.gather(*(
+            self._avisar_lote(usuarios[i:i + USUARIOS_POR_LOTE]) for i in range(0, len(usuarios), USUARIOS_POR_LOTE)
+        ))
+        return self.estatisticas
+
+    def _pagina_vencimentos(self, tabela, campos):
+        async def buscar(ultima):
+            cursor = (ultima['proxima_dose'], ultima['id']) if ultima else None
+            return await self.fonte.vencimentos(tabela, campos, self.inicio, self.fim, cursor, self.tamanho_pagina)
+        return buscar
+
+    def _pagina_doses(self):
+        async def buscar(ultima):
+            apos = ultima['medicamento_id'] if ultima else 0
+            return await self.fonte.doses_pendentes(self.hoje, self.inicio, apos, self.tamanho_pagina)
+        return buscar
+
+    async def _varrer(self, buscar, para_lembretes):
+        """Percorrer as páginas (a próxima é buscada enquanto a atual é agrupada por usuário)"""
+        proxima = asyncio.ensure_future(buscar(None))
+        while proxima is not None:
+            linhas = await proxima
+            if not linhas:
+                break
+            proxima = asyncio.ensure_future(buscar(linhas[-1])) if len(linhas) == self.tamanho_pagina else None
+            self.estatisticas['paginas'] += 1
+            self.estatisticas['registros'] += len(linhas)
+            for lembrete in para_lembretes(linhas):
+                self.pendencias.setdefault(lembrete.pop('user_id'), []).append(lembrete)
+
+    def _lembretes_vencimento(self, tipo, linhas, campo_descricao):
+        return [{
+            'tipo': tipo,
+            'registro_id': linha['id'],
+            'referencia': linha['proxima_dose'],
+            'etapa': etapa_vencimento(date.fromisoformat(linha['proxima_dose']), self.hoje),
+            'user_id': linha['user_id'],
+            'pet_id': linha.get('pet_id'),
+            'descricao': (f"{linha[campo_descricao]} ({linha['nome_produto']})"
+                          if tipo == 'preventivo' else f"Vacina {linha[campo_descricao]}")
+        } for linha in linhas]
+
+    def _lembretes_doses(self, linhas):
+        return [{
+            'tipo': 'dose',
+            'registro_id': linha['medicamento_id'],
+            'referencia': linha['proxima_dose_data'],
+            'etapa': etapa_dose(date.fromisoformat(linha['proxima_dose_data']), self.hoje),
+            'user_id': linha['user_id'],
+            'pet_id': linha.get('pet_id'),
+            'descricao': f"{linha['nome_remedio']} (dose {linha['proxima_dose_numero']})"
+        } for linha in linhas]
+
+    async def _avisar_lote(self, usuarios):
+        """Perfis, nomes dos pets e reserva dos lembretes de um lote de usuários; depois as entregas"""
+        async with self.lotes:
+            pet_ids = sorted({l['pet_id'] for u in usuarios for l in self.pendencias[u] if l['pet_id']})
+            perfis, nomes = await asyncio.gather(self.fonte.perfis(usuarios), self.fonte.nomes_dos_pets(pet_ids))
+
+            # Só usuários ativos e com email recebem avisos
+            ativos = [u for u in usuarios if perfis.get(u, {}).get('status') == 'ativo' and perfis[u].get('email')]
+            self.estatisticas['ignorados'] += sum(len(self.pendencias[u]) for u in usuarios) - \
+                sum(len(self.pendencias[u]) for u in ativos)
+
+            candidatos = [dict(l, user_id=u) for u in ativos for l in self.pendencias[u]]
+            novas = await self.fonte.reservar(candidatos)
+            self.estatisticas['novos'] += len(novas)
+            self.estatisticas['duplicados'] += len(candidatos) - len(novas)
+
+            por_usuario = {}
+            for lembrete in candidatos:
+                if chave_lembrete(lembrete) in novas:
+                    lembrete['pet'] = nomes.get(lembrete['pet_id'], 'Pet')
+                    por_usuario.setdefault(lembrete['user_id'], []).append(lembrete)
+            for u in usuarios:
+                del self.pendencias[u]
+
+        await asyncio.gather(*(self._entregar(perfis[u], lista) for u, lista in por_usuario.items()))
+
+    async def _entregar(self, perfil, lembretes):
+        notificacao = {
+            'user_id': perfil['id'],
+            'email': perfil['email'],
+            'lembretes': [{campo: l[campo] for campo in ('tipo', 'registro_id', 'pet', 'descricao', 'referencia', 'etapa')}
+                          for l in lembretes]
+        }
+        async with self.entregas:
+            try:
+                await self.saida.enviar(notificacao)
+                self.estatisticas['avisos'] += 1
+                return
+            except Exception as e:
+                print(f"Falha ao avisar {perfil['email']}: {e}", file=sys.stderr)
+        self.estatisticas['falhas'] += 1
+        await self.fonte.liberar(lembretes)
+
+
+async def executar_uma_vez(fonte, saida, **opcoes):
+    inicio = time.perf_counter()
+    estatisticas = await AgendadorLembretes(fonte, saida, **opcoes).executar()
+    segundos = time.perf_counter() - inicio
+    print(
+        f"Registros: {estatisticas['registros']} | Novos: {estatisticas['novos']} | "
+        f"Já enviados: {estatisticas['duplicados']} | Ignorados: {estatisticas['ignorados']} | "
+        f"Avisos: {estatisticas['avisos']} | Falhas: {estatisticas['falhas']} | "
+        f"{segundos:.1f}s ({estatisticas['registros'] / max(segundos, 1e-9):.0f} registros/s)"
+    )
+    return estatisticas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    saidas = parser.add_mutually_exclusive_group(required=True)
+    saidas.add_argument('--arquivo', help='Gravar os avisos em um arquivo JSON Lines')
+    saidas.add_argument('--smtp', help='Enviar por email: host:porta')
+    parser.add_argument('--remetente', default='avisos@petcontrol.app')
+    parser.add_argument('--tls', action='store_true', help='STARTTLS no servidor SMTP')
+    parser.add_argument('--hoje', type=date.fromisoformat, help='Data de referência (padrão: hoje)')
+    parser.add_argument('--antecedencia', type=int, default=ANTECEDENCIA_DIAS, help='Dias de aviso antes do vencimento')
+    parser.add_argument('--dias-vencidos', type=int, default=DIAS_VENCIDOS, help='Até quantos dias após o vencimento avisar')
+    parser.add_argument('--pagina', type=int, default=TAMANHO_PAGINA)
+    parser.add_argument('--simultaneas', type=int, default=ENTREGAS_SIMULTANEAS)
+    parser.add_argument('--a-cada', type=float, help='Repetir a cada N horas (padrão: executar uma vez)')
+    args = parser.parse_args()
+
+    url = os.environ.get('SUPABASE_URL')
+    chave = os.environ.get('SUPABASE_SERVICE_ROLE_KEY')
+    if not url or not chave:
+        sys.exit("Defina SUPABASE_URL e SUPABASE_SERVICE_ROLE_KEY")
+
+    async def rodar():
+        fonte = FonteSupabase(url, chave, conexoes=args.simultaneas)
+        if args.arquivo:
+            saida = SaidaArquivo(args.arquivo)
+        else:
+            host, _, porta = args.smtp.partition(':')
+            saida = SaidaSMTP(host, int(porta or 25), args.remetente, os.environ.get('SMTP_USUARIO'),
+                              os.environ.get('SMTP_SENHA'), tls=args.tls)
+        opcoes = {'antecedencia': args.antecedencia, 'dias_vencidos': args.dias_vencidos,
+                  'tamanho_pagina': args.pagina, 'simultaneas': args.simultaneas}
+        try:
+            while True:
+                try:
+                    await executar_uma_vez(fonte, saida, hoje=args.hoje, **opcoes)
+                except httpx.HTTPError as e:
+                    print(f"Erro na execução: {e}", file=sys.stderr)
+                    if not args.a_cada:
+                        return 1
+                if not args.a_cada:
+                    return 0
+                await asyncio.sleep(args.a_cada * 3600)
+        finally:
+            await saida.fechar()
+            await fonte.fechar()
+
+    try:
+        return asyncio.run(rodar())
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,214 @@
+# ==================== MEMÓRIA DOS DADOS POR SESSÃO ====================
+# Cada sessão do Streamlit guarda as tabelas decodificadas do usuário.
+# Em vez de ficarem no st.session_state enquanto o websocket existir, elas
+# ficam em um DadosSessao registrado no gerenciador do processo, que:
+# - mede o tamanho aproximado de cada sessão (amostragem);
+# - descarta os dados de sessões ociosas há mais de `ociosa_min` minutos;
+# - mantém o total abaixo de `total_mb`, descartando primeiro as sessões
+#   acima de `sessao_mb` e depois as usadas há mais tempo.
+# Uma sessão descartada recarrega os dados do Supabase no próximo uso.
+# Limites configuráveis em .streamlit/secrets.toml, seção [memoria].
+
+import sys
+import threading
+import time
+
+import numpy as np
+
+SESSAO_MB = 64
+TOTAL_MB = 768
+OCIOSA_MIN = 15
+
+# Sessões usadas nos últimos segundos nunca são descartadas (rerun em andamento)
+PROTECAO_SEGUNDOS = 60
+# Intervalo mínimo entre varreduras de sessões ociosas e entre medições de uma sessão
+VARREDURA_SEGUNDOS = 30
+REMEDIR_SEGUNDOS = 60
+
+# Caches reconstruídos sob demanda pelo app: são os primeiros a sair de uma
+# sessão acima do limite (função que cria o valor vazio de cada um)
+CACHES_RECONSTRUIVEIS = {'indice_busca': lambda: None, 'doses_medicamento': dict, 'arquivo': dict}
+
+# Itens medidos por coleção; o restante é estimado pela média da amostra
+AMOSTRA = 32
+
+MB = 1024 * 1024
+
+
+def tamanho_aproximado(objeto, profundidade=6, vistos=None):
+    """Bytes aproximados de um objeto e do que ele referencia (coleções grandes por amostragem)
+    Coleções já vistas na mesma medição não contam de novo (ex.: registros referenciados pelo índice de busca)
+    """
+    if vistos is None:
+        vistos = set()
+    if isinstance(objeto, np.ndarray):
+        return sys.getsizeof(objeto) + (0 if objeto.base is not None else objeto.nbytes)
+    tamanho = sys.getsizeof(objeto)
+    if profundidade == 0 or isinstance(objeto, (str, bytes, int, float, bool)) or objeto is None:
+        return tamanho
+    if id(objeto) in vistos:
+        return 0
+    vistos.add(id(objeto))
+    if isinstance(objeto, dict):
+        itens = objeto.items()
+        # Chaves de texto não contam: o decodificador JSON reaproveita a mesma string em todos os registros
+        medir = lambda item: ((0 if isinstance(item[0], str) else tamanho_aproximado(item[0], profundidade - 1, vistos))
+                              + tamanho_aproximado(item[1], profundidade - 1, vistos))
+    elif isinstance(objeto, (list, tuple, set, frozenset)):
+        itens = objeto
+        medir = lambda item: tamanho_aproximado(item, profundidade - 1, vistos)
+    elif hasattr(objeto, '__dict__'):
+        return tamanho + tamanho_aproximado(vars(objeto), profundidade - 1, vistos)
+    else:
+        return tamanho
+    if len(objeto) == 0:
+        return tamanho
+    amostra = []
+    for item in itens:
+        amostra.append(medir(item))
+        if len(amostra) == AMOSTRA:
+            break
+    return tamanho + int(sum(amostra) / len(amostra) * len(objeto))
+
+
+class DadosSessao:
+    """Tabelas de uma sessão, acessadas como atributos (dados.pets, dados.vacinas...)
+    Fica no st.session_state; as tabelas em si podem ser descartadas pelo gerenciador
+    """
+
+    def __init__(self, id_sessao):
+        for nome, valor in (('id_sessao', id_sessao), ('tabelas', {}), ('tamanho', 0), ('medido_em', 0.0),
+                            ('ultimo_uso', time.monotonic()), ('carregado_em', None), ('cargas', 0),
+                            ('descartes', 0), ('execucao', None)):
+            object.__setattr__(self, nome, valor)
+
+    def __getattr__(self, nome):
+        try:
+            return self.__dict__['tabelas'][nome]
+        except KeyError:
+            raise AttributeError(nome) from None
+
+    def __setattr__(self, nome, valor):
+        if nome in self.__dict__:
+            object.__setattr__(self, nome, valor)
+        else:
+            self.tabelas[nome] = valor
+
+    @property
+    def carregado(self):
+        return bool(self.tabelas)
+
+    @property
+    def em_execucao(self):
+        # Cada execução do script roda na sua própria thread, que termina com ela
+        # (fim normal, st.stop, st.rerun ou exceção)
+        return self.execucao is not None and self.execucao.is_alive()
+
+
+class GerenciadorSessoes:
+    """Registro das sessões do processo com limite de memória por sessão e total"""
+
+    def __init__(self, sessao_mb=SESSAO_MB, total_mb=TOTAL_MB, ociosa_min=OCIOSA_MIN):
+        self.trava = threading.Lock()
+        self.sessoes = {}
+        self.varrido_em = 0.0
+        self.descartes = 0
+        self.configurar(sessao_mb, total_mb, ociosa_min)
+
+    def configurar(self, sessao_mb=SESSAO_MB, total_mb=TOTAL_MB, ociosa_min=OCIOSA_MIN):
+        self.limite_sessao = float(sessao_mb) * MB
+        self.limite_total = float(total_mb) * MB
+        self.ociosidade = float(ociosa_min) * 60
+
+    def usar(self, dados):
+        """Marcar o uso da sessão; retorna False se os dados precisam ser (re)carregados"""
+        agora = time.monotonic()
+        with self.trava:
+            dados.ultimo_uso = agora
+            dados.execucao = threading.current_thread()
+            carregado = dados.carregado and dados.id_sessao in self.sessoes
+            if carregado and agora - dados.medido_em >= REMEDIR_SEGUNDOS:
+                self._medir(dados, agora)
+            self._aplicar_limites(agora, dados)
+        return carregado
+
+    def guardar(self, dados, tabelas):
+        """Substituir as tabelas da sessão (carga ou recarga) e aplicar os limites"""
+        agora = time.monotonic()
+        with self.trava:
+            dados.tabelas = tabelas
+            dados.carregado_em = time.time()
+            dados.cargas += 1
+            dados.ultimo_uso = agora
+            self.sessoes[dados.id_sessao] = dados
+            self._medir(dados, agora)
+            self._aplicar_limites(agora, dados)
+
+    def descartar(self, dados):
+        """Liberar os dados da sessão (logout)"""
+        with self.trava:
+            self._descartar(dados)
+
+    def _medir(self, dados, agora):
+        dados.tamanho = tamanho_aproximado(dados.tabelas)
+        dados.medido_em = agora
+        if dados.tamanho > self.limite_sessao:
+            # Acima do limite da sessão: sai primeiro o que o app reconstrói sob demanda
+            for nome, vazio in CACHES_RECONSTRUIVEIS.items():
+                if nome in dados.tabelas:
+                    dados.tabelas[nome] = vazio()
+            dados.tamanho = tamanho_aproximado(dados.tabelas)
+
+    def _descartar(self, dados):
+        if self.sessoes.pop(dados.id_sessao, None) is not None:
+            self.descartes += 1
+            dados.descartes += 1
+        dados.tabelas = {}
+        dados.tamanho = 0
+
+    def _aplicar_limites(self, agora, atual):
+        # Sessões com o script rodando (exportação, importação longas...) nunca são descartadas
+        # Sessões ociosas (abas fechadas ou esquecidas)
+        if agora - self.varrido_em >= VARREDURA_SEGUNDOS:
+            self.varrido_em = agora
+            for dados in list(self.sessoes.values()):
+                if dados is not atual and not dados.em_execucao and agora - dados.ultimo_uso > self.ociosidade:
+                    self._descartar(dados)
+
+        total = sum(dados.tamanho for dados in self.sessoes.values())
+        if total <= self.limite_total:
+            return
+        # Acima do limite total: primeiro as sessões acima do próprio limite, depois as menos usadas
+        candidatas = sorted(
+            (d for d in self.sessoes.values()
+             if d is not atual and not d.em_execucao and agora - d.ultimo_uso > PROTECAO_SEGUNDOS),
+            key=lambda d: (d.tamanho <= self.limite_sessao, d.ultimo_uso)
+        )
+        for dados in candidatas:
+            if total <= self.limite_total:
+                break
+            total -= dados.tamanho
+            self._descartar(dados)
+
+    def relatorio(self):
+        """Uso de memória do processo e de cada sessão carregada (maiores primeiro)"""
+        agora = time.monotonic()
+        with self.trava:
+            sessoes = [{
+                'sessao': dados.id_sessao[:8],
+                'mb': dados.tamanho / MB,
+                'ociosa_s': int(agora - dados.ultimo_uso),
+                'cargas': dados.cargas,
+                'descartes': dados.descartes,
+                'acima_do_limite': dados.tamanho > self.limite_sessao
+            } for dados in self.sessoes.values()]
+            return {
+                'sessoes': sorted(sessoes, key=lambda s: -s['mb']),
+                'total_mb': sum(s['mb'] for s in sessoes),
+                'limite_total_mb': self.limite_total / MB,
+                'limite_sessao_mb': self.limite_sessao / MB,
+                'descartes': self.descartes
+            }
+
+
+gerenciador = GerenciadorSessoes()
@@ -0,0 +1,301 @@
+# ==================== RASTREAMENTO DOS RERUNS ====================
+# Trechos (spans) aninhados de cada rerun do script: autenticação, carga dos
+# dados, decodificação, cálculos, corpo de cada aba e cada chamada ao
+# Supabase. Cada rerun é um rastro com um trecho raiz; ao terminar, o rastro:
+# - é exportado como uma linha OTLP/JSON (ExportTraceServiceRequest, o mesmo
+#   formato do file exporter do OpenTelemetry Collector) no arquivo configurado;
+# - vai inteiro, em árvore, para o log de reruns lentos se passar de
+#   limite_lento_ms.
+# Desligado (padrão), trecho() devolve um contexto vazio e os decoradores
+# chamam a função direto.
+
+import contextvars
+import functools
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime
+
+SERVICO = 'petcontrol'
+ESCOPO = 'petcontrol.rastreamento'
+ARQUIVO = os.path.join('rastros', 'rastros.otlp.jsonl')
+LENTOS = os.path.join('rastros', 'reruns_lentos.log')
+LIMITE_LENTO_MS = 1000
+# Arquivo de exportação trocado por <arquivo>.1 ao passar deste tamanho
+TAMANHO_MAX_MB = 20
+
+# Tipos de trecho do OTLP (SpanKind) e códigos de status
+INTERNO = 1
+CLIENTE = 3
+STATUS_OK = 1
+STATUS_ERRO = 2
+
+_configuracao = {
+    'ativo': False, 'arquivo': ARQUIVO, 'lentos': LENTOS,
+    'limite_lento_ms': LIMITE_LENTO_MS, 'amostragem': 1.0, 'tamanho_max_mb': TAMANHO_MAX_MB
+}
+_trava_arquivos = threading.Lock()
+# Trecho aberto no contexto atual (thread do script da sessão)
+_atual = contextvars.ContextVar('rastreamento_trecho', default=None)
+
+
+def configurar(ativo=False, arquivo=ARQUIVO, lentos=LENTOS, limite_lento_ms=LIMITE_LENTO_MS,
+               amostragem=1.0, tamanho_max_mb=TAMANHO_MAX_MB):
+    """Ligar/desligar o rastreamento; arquivo ou lentos vazios desligam a exportação ou o log"""
+    _configuracao.update(
+        ativo=bool(ativo), arquivo=arquivo, lentos=lentos, limite_lento_ms=float(limite_lento_ms),
+        amostragem=float(amostragem), tamanho_max_mb=float(tamanho_max_mb)
+    )
+
+
+class Trecho:
+    """Um span: nome, atributos, início/fim (ns desde a época) e status"""
+
+    def __init__(self, rastro, nome, pai, atributos, tipo=INTERNO):
+        self.rastro = rastro
+        self.nome = nome
+        self.id = os.urandom(8).hex()
+        self.pai = pai
+        self.atributos = atributos
+        self.tipo = tipo
+        self.inicio = None
+        self.fim = None
+        self.status = STATUS_OK
+        self.erro = None
+
+    def comecar(self):
+        self.inicio = time.time_ns()
+        return self
+
+    def terminar(self, excecao=None):
+        self.fim = time.time_ns()
+        if isinstance(excecao, Exception):
+            self.status = STATUS_ERRO
+            self.erro = f'{type(excecao).__name__}: {excecao}'
+        elif excecao is not None:
+            # st.rerun()/st.stop() interrompem o script, mas não são erros
+            self.atributos['interrompido'] = type(excecao).__name__
+        self.rastro.registrar(self)
+
+    @property
+    def duracao_ms(self):
+        return (self.fim - self.inicio) / 1e6
+
+    def __enter__(self):
+        self.comecar()
+        self._token = _atual.set(self)
+        return self
+
+    def __exit__(self, tipo, excecao, pilha):
+        _atual.reset(self._token)
+        self.terminar(excecao)
+        return False
+
+
+class Rastro:
+    """Trechos de um rerun (a raiz fica aberta até finalizar())"""
+
+    def __init__(self, nome, atributos):
+        self.id = os.urandom(16).hex()
+        self.trava = threading.Lock()
+        self.trechos = []
+        self.raiz = Trecho(self, nome, None, atributos).comecar()
+        self.ultimo_fim = self.raiz.inicio
+        self.finalizado = False
+
+    def registrar(self, trecho):
+        # Trechos de corrotinas terminam na thread do loop de fundo
+        with self.trava:
+            self.trechos.append(trecho)
+            self.ultimo_fim = max(self.ultimo_fim, trecho.fim)
+
+    @property
+    def duracao_ms(self):
+        return self.raiz.duracao_ms
+
+
+class _Nulo:
+    """Contexto vazio usado com o rastreamento desligado"""
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, tipo, excecao, pilha):
+        return False
+
+
+_NULO = _Nulo()
+
+
+def iniciar_rerun(nome='rerun', **atributos):
+    """Abrir o rastro de um rerun (None com o rastreamento desligado)"""
+    if not _configuracao['ativo']:
+        _atual.set(None)
+        return None
+    rastro = Rastro(nome, atributos)
+    _atual.set(rastro.raiz)
+    return rastro
+
+
+def anotar_rerun(**atributos):
+    """Acrescentar atributos ao trecho raiz do rerun atual (ex.: usuário, após o login)"""
+    trecho_atual = _atual.get()
+    if trecho_atual is not None:
+        trecho_atual.rastro.raiz.atributos.update(atributos)
+
+
+def trecho(nome, tipo=INTERNO, **atributos):
+    """Contexto que mede um trecho, filho do trecho aberto (with rastreamento.trecho('decodificar'): ...)"""
+    pai = _atual.get()
+    if pai is None:
+        return _NULO
+    return Trecho(pai.rastro, nome, pai, atributos, tipo)
+
+
+def rastrear(nome, *argumentos, tipo=INTERNO):
+    """Decorador: cada chamada vira um trecho
+    `argumentos` dá nome aos primeiros parâmetros posicionais gravados como atributos
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def rastreada(*args, **kwargs):
+            if _atual.get() is None:
+                return funcao(*args, **kwargs)
+            with trecho(nome, tipo, **dict(zip(argumentos, args))):
+                return funcao(*args, **kwargs)
+        return rastreada
+    return decorador
+
+
+def rastrear_corrotina(corrotina, nome, tipo=CLIENTE, **atributos):
+    """Corrotina medida como filha do trecho aberto agora, mesmo rodando no loop de fundo"""
+    pai = _atual.get()
+    if pai is None:
+        return corrotina
+
+    async def rastreada():
+        filho = Trecho(pai.rastro, nome, pai, atributos, tipo).comecar()
+        try:
+            resultado = await corrotina
+        except BaseException as excecao:
+            filho.terminar(excecao)
+            raise
+        filho.terminar()
+        return resultado
+
+    return rastreada()
+
+
+def finalizar_rerun(rastro, interrompido=False):
+    """Fechar a raiz, exportar o rastro e registrá-lo se for lento
+    interrompido=True (rerun que terminou em st.rerun()/st.stop()): a raiz termina
+    junto com o último trecho fechado
+    """
+    if rastro is None or rastro.finalizado:
+        return
+    rastro.finalizado = True
+    if _atual.get() is rastro.raiz:
+        _atual.set(None)
+    raiz = rastro.raiz
+    raiz.fim = rastro.ultimo_fim if interrompido else time.time_ns()
+    if interrompido:
+        raiz.atributos.setdefault('interrompido', 'rerun')
+    with rastro.trava:
+        rastro.trechos.append(raiz)
+
+    configuracao = dict(_configuracao)
+    if configuracao['arquivo'] and random.random() < configuracao['amostragem']:
+        _anexar(configuracao['arquivo'], json.dumps(para_otlp(rastro), ensure_ascii=False),
+                configuracao['tamanho_max_mb'])
+    if configuracao['lentos'] and raiz.duracao_ms >= configuracao['limite_lento_ms']:
+        cabecalho = (f"{datetime.now().isoformat(timespec='seconds')} rerun lento: {raiz.duracao_ms:.0f} ms "
+                     f"(limite {configuracao['limite_lento_ms']:.0f} ms) trace_id={rastro.id}")
+        _anexar(configuracao['lentos'], cabecalho + '\n' + arvore(rastro) + '\n', configuracao['tamanho_max_mb'])
+
+
+def _anexar(caminho, texto, tamanho_max_mb):
+    with _trava_arquivos:
+        diretorio = os.path.dirname(caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        if os.path.exists(caminho) and os.path.getsize(caminho) > tamanho_max_mb * 1024 * 1024:
+            os.replace(caminho, caminho + '.1')
+        with open(caminho, 'a', encoding='utf-8') as arquivo:
+            arquivo.write(texto + '\n')
+
+
+# ---------- formatos ----------
+
+def _valor_otlp(valor):
+    if isinstance(valor, bool):
+        return {'boolValue': valor}
+    if isinstance(valor, int):
+        return {'intValue': str(valor)}
+    if isinstance(valor, float):
+        return {'doubleValue': valor}
+    return {'stringValue': str(valor)}
+
+
+def _atributos_otlp(atributos):
+    return [{'key': chave, 'value': _valor_otlp(valor)} for chave, valor in atributos.items() if valor is not None]
+
+
+def para_otlp(rastro):
+    """Rastro no formato OTLP/JSON (ExportTraceServiceRequest), ids em hexadecimal"""
+    with rastro.trava:
+        trechos = sorted(rastro.trechos, key=lambda t: t.inicio)
+    spans = []
+    for t in trechos:
+        span = {
+            'traceId': rastro.id,
+            'spanId': t.id,
+            'name': t.nome,
+            'kind': t.tipo,
+            'startTimeUnixNano': str(t.inicio),
+            'endTimeUnixNano': str(t.fim),
+            'attributes': _atributos_otlp(t.atributos),
+            'status': {'code': t.status, **({'message': t.erro} if t.erro else {})}
+        }
+        if t.pai is not None:
+            span['parentSpanId'] = t.pai.id
+        spans.append(span)
+    return {'resourceSpans': [{
+        'resource': {'attributes': _atributos_otlp({'service.name': SERVICO})},
+        'scopeSpans': [{'scope': {'name': ESCOPO}, 'spans': spans}]
+    }]}
+
+
+def arvore(rastro):
+    """Trechos do rastro em árvore, um por linha: nome, duração e atributos"""
+    with rastro.trava:
+        trechos = list(rastro.trechos)
+    filhos = {}
+    for t in trechos:
+        filhos.setdefault(t.pai.id if t.pai is not None else None, []).append(t)
+    linhas = []
+
+    def descer(trecho_pai, nivel):
+        for t in sorted(filhos.get(trecho_pai, []), key=lambda t: t.inicio):
+            atributos = ' '.join(f'{chave}={valor}' for chave, valor in t.atributos.items())
+            linhas.append(
+                f"{'  ' * nivel}{t.nome} {t.duracao_ms:.1f} ms"
+                + (f' [{atributos}]' if atributos else '')
+                + (f' ERRO {t.erro}' if t.erro else '')
+            )
+            descer(t.id, nivel + 1)
+
+    descer(None, 0)
+    return '\n'.join(linhas)
+
+
+def resumo(rastro, quantidade=8):
+    """Trechos que mais somaram tempo no rastro: [(nome, chamadas, total_ms)], maiores primeiro"""
+    with rastro.trava:
+        trechos = [t for t in rastro.trechos if t.pai is not None]
+    totais = {}
+    for t in trechos:
+        chamadas, total = totais.get(t.nome, (0, 0.0))
+        totais[t.nome] = (chamadas + 1, total + t.duracao_ms)
+    return sorted(((nome, c, ms) for nome, (c, ms) in totais.items()), key=lambda item: -item[2])[:quantidade]
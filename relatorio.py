@@ -0,0 +1,186 @@
+# ==================== RELATÓRIO DE SAÚDE POR PET ====================
+# Resumo imprimível para levar à consulta: vacinas, preventivos,
+# medicamentos com adesão, evolução do peso e consultas recentes.
+# O HTML gerado fica em cache no processo, indexado por um hash do
+# conteúdo dos registros do pet; só é renderizado de novo quando algum
+# registro (ou a data de hoje, que muda os status) muda.
+
+import hashlib
+import html
+import json
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+import agenda_doses
+
+# Quantidade máxima de relatórios em cache (LRU)
+CACHE_MAXIMO = 64
+
+_cache = OrderedDict()
+_trava_cache = threading.Lock()
+
+CSS = """
+body { font-family: -apple-system, 'Segoe UI', Roboto, sans-serif; color: #263238; margin: 32px; }
+h1 { color: #FF6B6B; margin-bottom: 4px; }
+h2 { color: #37474F; border-bottom: 2px solid #FFE0E0; padding-bottom: 4px; margin-top: 28px; }
+.sub { color: #78909C; margin-top: 0; }
+table { width: 100%; border-collapse: collapse; font-size: 14px; }
+th, td { text-align: left; padding: 6px 8px; border-bottom: 1px solid #ECEFF1; }
+th { background: #FAFAFA; }
+.vencido { color: #C62828; font-weight: 600; }
+.breve { color: #EF6C00; font-weight: 600; }
+.ok { color: #2E7D32; }
+.vazio { color: #90A4AE; font-style: italic; }
+@media print {
+    body { margin: 12mm; }
+    h2 { page-break-after: avoid; }
+    tr { page-break-inside: avoid; }
+    .nao-imprimir { display: none; }
+}
+"""
+
+
+def assinatura(*partes):
+    """Hash do conteúdo dos registros usados no relatório"""
+    conteudo = json.dumps(partes, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+
+def _data(valor):
+    return valor.strftime('%d/%m/%Y') if valor else '—'
+
+
+def _texto(valor):
+    return html.escape(str(valor)) if valor not in (None, '') else '—'
+
+
+def _status_proxima_dose(registro, hoje):
+    proxima = registro.get('proxima_dose')
+    if registro.get('concluido'):
+        return '<span class="ok">Concluído</span>'
+    if not proxima:
+        return '—'
+    if proxima < hoje:
+        return '<span class="vencido">Vencido</span>'
+    if proxima <= hoje + timedelta(days=7):
+        return '<span class="breve">Vence em breve</span>'
+    return '<span class="ok">Em dia</span>'
+
+
+def _tabela(cabecalho, linhas, vazio):
+    if not linhas:
+        return f'<p class="vazio">{vazio}</p>'
+    topo = ''.join(f'<th>{c}</th>' for c in cabecalho)
+    corpo = ''.join('<tr>' + ''.join(f'<td>{c}</td>' for c in linha) + '</tr>' for linha in linhas)
+    return f'<table><thead><tr>{topo}</tr></thead><tbody>{corpo}</tbody></table>'
+
+
+def _secao_vacinas(vacinas, hoje):
+    linhas = [
+        [_texto(v['nome_vacina']), _data(v['data_aplicacao']), _data(v.get('proxima_dose')),
+         _status_proxima_dose(v, hoje), _texto(v.get('veterinario'))]
+        for v in sorted(vacinas, key=lambda v: v['data_aplicacao'], reverse=True)
+    ]
+    return _tabela(['Vacina', 'Aplicação', 'Próxima dose', 'Status', 'Veterinário'], linhas,
+                   'Nenhuma vacina registrada.')
+
+
+def _secao_preventivos(preventivos, hoje):
+    linhas = [
+        [_texto(p['tipo_preventivo']), _texto(p['nome_produto']), _data(p['data_aplicacao']),
+         _data(p.get('proxima_dose')), _status_proxima_dose(p, hoje)]
+        for p in sorted(preventivos, key=lambda p: p['data_aplicacao'], reverse=True)
+    ]
+    return _tabela(['Tipo', 'Produto', 'Aplicação', 'Próxima dose', 'Status'], linhas,
+                   'Nenhum preventivo registrado.')
+
+
+def _secao_medicamentos(medicamentos, progresso_por_medicamento, hoje):
+    linhas = []
+    for med in sorted(medicamentos, key=lambda m: m['data_inicio'], reverse=True):
+        feitas, total, _ = agenda_doses.progresso_agregado(med, progresso_por_medicamento.get(med['id']))
+        previstas = agenda_doses.doses_previstas_ate(med, hoje)
+        if previstas:
+            adesao = min(feitas, previstas) / previstas * 100
+            classe = 'ok' if adesao >= 90 else 'breve' if adesao >= 70 else 'vencido'
+            texto_adesao = f'<span class="{classe}">{adesao:.0f}%</span> ({min(feitas, previstas)}/{previstas})'
+        else:
+            texto_adesao = 'Não iniciado'
+        linhas.append([
+            _texto(med['nome_remedio']), _texto(med['dosagem']),
+            f"{_data(med['data_inicio'])} a {_data(med['data_fim'])}",
+            f'{feitas}/{total}', texto_adesao
+        ])
+    return _tabela(['Medicamento', 'Dosagem', 'Período', 'Doses', 'Adesão até hoje'], linhas,
+                   'Nenhum medicamento registrado.')
+
+
+def _secao_peso(pesagens, hoje, dias_tendencia=180):
+    if not pesagens:
+        return '<p class="vazio">Nenhuma pesagem registrada.</p>'
+    ordenadas = sorted(pesagens, key=lambda p: p['data_pesagem'])
+    ultima = ordenadas[-1]
+    recentes = [p for p in ordenadas if p['data_pesagem'] >= hoje - timedelta(days=dias_tendencia)]
+    resumo = f"<p>Peso atual: <strong>{float(ultima['peso']):.2f} kg</strong> em {_data(ultima['data_pesagem'])}"
+    if len(recentes) >= 2:
+        inicial = float(recentes[0]['peso'])
+        variacao = float(recentes[-1]['peso']) - inicial
+        percentual = variacao / inicial * 100 if inicial else 0
+        resumo += (f" | Variação em {dias_tendencia} dias: {variacao:+.2f} kg ({percentual:+.1f}%)")
+    resumo += '</p>'
+    linhas = [[_data(p['data_pesagem']), f"{float(p['peso']):.2f} kg"] for p in reversed(ordenadas[-10:])]
+    return resumo + _tabela(['Data', 'Peso'], linhas, '')
+
+
+def _secao_consultas(consultas, limite=5):
+    linhas = [
+        [_data(c['data_consulta']), _texto(c['nome_veterinario']), _texto(c['motivo']),
+         _texto(c.get('diagnostico')), _texto(c.get('prescricoes'))]
+        for c in sorted(consultas, key=lambda c: c['data_consulta'], reverse=True)[:limite]
+    ]
+    return _tabela(['Data', 'Veterinário', 'Motivo', 'Diagnóstico', 'Prescrições'], linhas,
+                   'Nenhuma consulta registrada.')
+
+
+def gerar_html(pet, vacinas, preventivos, medicamentos, progresso_por_medicamento, pesagens, consultas, hoje):
+    """Renderizar o relatório de saúde do pet em HTML (pronto para imprimir ou salvar em PDF)"""
+    idade = ''
+    if pet.get('data_nascimento'):
+        idade = f" | {(hoje - pet['data_nascimento']).days // 365} anos"
+    partes = [
+        '<!DOCTYPE html><html lang="pt-BR"><head><meta charset="utf-8">',
+        f"<title>Relatório de saúde - {_texto(pet['nome'])}</title><style>{CSS}</style></head><body>",
+        f"<h1>🐾 {_texto(pet['nome'])}</h1>",
+        f"<p class=\"sub\">{_texto(pet.get('especie'))} | {_texto(pet.get('raca'))} | "
+        f"Nascimento: {_data(pet.get('data_nascimento'))}{idade}</p>",
+        f'<p class="sub">Relatório gerado em {_data(hoje)}</p>',
+        '<p class="nao-imprimir">Use Imprimir &gt; Salvar como PDF no navegador para gerar o PDF.</p>',
+        '<h2>💉 Vacinas</h2>', _secao_vacinas(vacinas, hoje),
+        '<h2>🛡️ Preventivos</h2>', _secao_preventivos(preventivos, hoje),
+        '<h2>💊 Medicamentos</h2>', _secao_medicamentos(medicamentos, progresso_por_medicamento, hoje),
+        '<h2>⚖️ Peso</h2>', _secao_peso(pesagens, hoje),
+        '<h2>🏥 Consultas recentes</h2>', _secao_consultas(consultas),
+    ]
+    if pet.get('observacoes'):
+        partes += ['<h2>📝 Observações</h2>', f"<p>{_texto(pet['observacoes'])}</p>"]
+    partes.append('</body></html>')
+    return ''.join(partes)
+
+
+def relatorio_html(pet, vacinas, preventivos, medicamentos, progresso_por_medicamento, pesagens, consultas, hoje):
+    """Relatório em bytes (UTF-8), do cache quando os registros não mudaram"""
+    progresso_usado = {m['id']: progresso_por_medicamento.get(m['id']) for m in medicamentos}
+    chave = assinatura(pet, vacinas, preventivos, medicamentos, progresso_usado, pesagens, consultas, hoje)
+    with _trava_cache:
+        if chave in _cache:
+            _cache.move_to_end(chave)
+            return _cache[chave]
+
+    conteudo = gerar_html(pet, vacinas, preventivos, medicamentos, progresso_usado,
+                          pesagens, consultas, hoje).encode('utf-8')
+    with _trava_cache:
+        _cache[chave] = conteudo
+        while len(_cache) > CACHE_MAXIMO:
+            _cache.popitem(last=False)
+    return conteudo
@@ -0,0 +1,111 @@
+"""Benchmark da detecção de anomalias de peso (serie_peso.anomalias_de_peso)
+
+Gera o histórico sintético de um usuário (vários pets com anos de
+pesagens irregulares, alguns com perda ou ganho rápido recente) e compara
+a passada vetorizada com uma implementação equivalente em Python puro,
+pet a pet. Os arrays colunares são montados uma vez a cada carga de
+dados (recarregar_dados); a detecção roda a cada rerun do app. Confere
+que as duas implementações chegam aos mesmos alertas.
+
+Uso:
+    python scripts/bench_anomalias_peso.py --pets 15 --pesagens 2000
+"""
+
+import argparse
+import bisect
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import serie_peso  # noqa: E402
+
+
+def gerar_historico(pets, pesagens_por_pet, hoje):
+    especies = list(serie_peso.LIMITES_ESPECIE) + ['Outro']
+    lista_pets = [{'id': i + 1, 'especie': random.choice(especies)} for i in range(pets)]
+    pesagens = []
+    for pet in lista_pets:
+        peso = random.uniform(3, 40)
+        dia = hoje - timedelta(days=pesagens_por_pet * 3)
+        tendencia = random.choice([0, 0, -0.08, 0.06])
+        for n in range(pesagens_por_pet):
+            dia += timedelta(days=random.randint(1, 5))
+            # Tendência só nas últimas semanas (anomalia recente)
+            ajuste = tendencia if n > pesagens_por_pet - 6 else 0
+            peso = max(peso * (1 + ajuste + random.gauss(0, 0.005)), 0.5)
+            pesagens.append({'id': len(pesagens) + 1, 'pet_id': pet['id'], 'data_pesagem': min(dia, hoje),
+                             'peso': round(peso, 2)})
+    random.shuffle(pesagens)
+    return lista_pets, pesagens
+
+
+def anomalias_python(pesagens, pets, hoje):
+    """Mesma regra de serie_peso.anomalias_de_peso, em laços Python"""
+    especies = {pet['id']: pet.get('especie') for pet in pets}
+    por_pet = {}
+    for p in pesagens:
+        por_pet.setdefault(p['pet_id'], []).append(p)
+    alertas = {}
+    for pet_id, lista in por_pet.items():
+        lista.sort(key=lambda p: (p['data_pesagem'], p['id']))
+        dias = [p['data_pesagem'].toordinal() for p in lista]
+        ultima = lista[-1]
+        if (hoje - ultima['data_pesagem']).days > serie_peso.VALIDADE_ALERTA:
+            continue
+        j = bisect.bisect_right(dias, dias[-1] - serie_peso.INTERVALO_MINIMO) - 1
+        if j < 0:
+            continue
+        intervalo = dias[-1] - dias[j]
+        if intervalo > serie_peso.INTERVALO_MAXIMO or lista[j]['peso'] <= 0:
+            continue
+        taxa = (ultima['peso'] - lista[j]['peso']) / lista[j]['peso'] / intervalo * 7 * 100
+        amarelo, vermelho = serie_peso.LIMITES_ESPECIE.get(especies.get(pet_id), serie_peso.LIMITES_PADRAO)
+        if abs(taxa) >= vermelho:
+            alertas[pet_id] = 'vermelho'
+        elif abs(taxa) >= amarelo:
+            alertas[pet_id] = 'amarelo'
+    return alertas
+
+
+def cronometrar(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos), resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pets', type=int, default=15)
+    parser.add_argument('--pesagens', type=int, default=2000, help='Pesagens por pet')
+    parser.add_argument('--repeticoes', type=int, default=7)
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.semente)
+    hoje = date.today()
+    pets, pesagens = gerar_historico(args.pets, args.pesagens, hoje)
+
+    ms_arrays, arrays = cronometrar(lambda: serie_peso.arrays_de_pesagens(pesagens), args.repeticoes)
+    ms_vetorizado, alertas = cronometrar(lambda: serie_peso.anomalias_de_peso(arrays, pets, hoje), args.repeticoes)
+    ms_python, alertas_python = cronometrar(lambda: anomalias_python(pesagens, pets, hoje), args.repeticoes)
+
+    iguais = {pet_id: a['nivel'] for pet_id, a in alertas.items()} == alertas_python
+    print(f"Pesagens: {len(pesagens)} ({args.pets} pets) | Alertas: {len(alertas)} | Resultados iguais: {iguais}")
+    print()
+    print(f"{'etapa':<38}{'mediana (ms)':>14}")
+    print(f"{'montar os arrays (uma vez por carga)':<38}{ms_arrays:>14.2f}")
+    print(f"{'detecção vetorizada (a cada rerun)':<38}{ms_vetorizado:>14.2f}")
+    print(f"{'Python puro (a cada rerun)':<38}{ms_python:>14.2f}")
+    return 0 if iguais else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""Benchmark da camada assíncrona (supabase_assincrono.py)
+
+Sobe um PostgREST simulado (tornado) que responde a cada requisição depois
+de uma latência fixa e compara:
+- a carga da sessão (recarregar_dados: 10 tabelas) com httpx síncrono, uma
+  requisição após a outra, e com supabase_assincrono.reunir pela ponte
+  executar(), como o app faz;
+- a exclusão em cascata de um pet (7 tabelas filhas);
+- o limite de simultâneas (pico de requisições em andamento no servidor);
+- o prazo total (requisições lentas canceladas com TimeoutError).
+
+Uso:
+    python scripts/bench_assincrono.py --latencia-ms 40 --registros 200
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+import httpx
+from tornado import httpserver, netutil, web
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import supabase_assincrono  # noqa: E402
+
+TABELAS = ['pets', 'vacinas', 'alimentacao', 'estoques_alimento', 'veterinario', 'medicamentos',
+           'preventivos', 'peso', 'notas', 'medicamentos_progresso']
+TABELAS_DO_PET = ['vacinas', 'alimentacao', 'veterinario', 'medicamentos', 'preventivos', 'peso', 'notas']
+
+
+class Servidor:
+    """Contadores do PostgREST simulado"""
+
+    def __init__(self, latencia, registros):
+        self.latencia = latencia
+        self.corpo = json.dumps([{'id': i, 'nome': f'registro {i}', 'user_id': 'u'} for i in range(registros)])
+        self.em_andamento = 0
+        self.pico = 0
+        self.requisicoes = 0
+
+    def zerar(self):
+        self.pico = 0
+        self.requisicoes = 0
+
+
+class Tabela(web.RequestHandler):
+    def initialize(self, servidor):
+        self.servidor = servidor
+
+    async def responder(self, status, corpo=None):
+        servidor = self.servidor
+        servidor.requisicoes += 1
+        servidor.em_andamento += 1
+        servidor.pico = max(servidor.pico, servidor.em_andamento)
+        try:
+            # ?lenta=1 simula uma consulta que passa do prazo
+            atraso = servidor.latencia * (100 if self.get_argument('lenta', None) else 1)
+            await asyncio.sleep(atraso)
+        finally:
+            servidor.em_andamento -= 1
+        self.set_status(status)
+        if corpo is not None:
+            self.set_header('Content-Type', 'application/json')
+            self.finish(corpo)
+
+    async def get(self, tabela):
+        await self.responder(200, self.servidor.corpo)
+
+    async def delete(self, tabela):
+        await self.responder(204)
+
+
+def iniciar_servidor(servidor):
+    """Servidor em uma thread com loop próprio; retorna a URL base"""
+    pronto = threading.Event()
+    porta = []
+
+    def executar():
+        async def principal():
+            aplicacao = web.Application([(r'/rest/v1/(\w+)', Tabela, {'servidor': servidor})])
+            http = httpserver.HTTPServer(aplicacao)
+            sockets = netutil.bind_sockets(0, '127.0.0.1')
+            http.add_sockets(sockets)
+            porta.append(sockets[0].getsockname()[1])
+            pronto.set()
+            await asyncio.Event().wait()
+        asyncio.run(principal())
+
+    threading.Thread(target=executar, daemon=True).start()
+    pronto.wait()
+    return f'http://127.0.0.1:{porta[0]}/rest/v1'
+
+
+def medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    tempos.sort()
+    return tempos[len(tempos) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latencia-ms', type=float, default=40, help='Latência de cada requisição')
+    parser.add_argument('--registros', type=int, default=200, help='Registros por tabela')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    servidor = Servidor(args.latencia_ms / 1000, args.registros)
+    api_url = iniciar_servidor(servidor)
+    headers = {'apikey': 'chave', 'Authorization': 'Bearer token'}
+    cliente = supabase_assincrono.SupabaseAssincrono(api_url, headers)
+
+    def carga_em_serie():
+        return [httpx.get(f'{api_url}/{tabela}', headers=headers, timeout=10.0).json() for tabela in TABELAS]
+
+    def carga_simultanea():
+        return supabase_assincrono.executar(supabase_assincrono.reunir([cliente.get(tabela) for tabela in TABELAS]))
+
+    def cascata_em_serie():
+        for tabela in TABELAS_DO_PET:
+            httpx.delete(f'{api_url}/{tabela}?pet_id=eq.1', headers=headers, timeout=10.0)
+
+    def cascata_simultanea():
+        supabase_assincrono.executar(supabase_assincrono.reunir(
+            [cliente.delete(tabela, 'pet_id=eq.1') for tabela in TABELAS_DO_PET]
+        ))
+
+    assert carga_em_serie() == carga_simultanea()
+    print(f"Latência por requisição: {args.latencia_ms:.0f} ms | {args.registros} registros por tabela")
+    print()
+    print(f"{'operação':<34}{'em série (ms)':>15}{'simultânea (ms)':>17}{'ganho':>8}")
+    for nome, serie, simultanea in [
+        (f'carga da sessão ({len(TABELAS)} tabelas)', carga_em_serie, carga_simultanea),
+        (f'excluir pet ({len(TABELAS_DO_PET)} tabelas)', cascata_em_serie, cascata_simultanea),
+    ]:
+        t_serie, t_simultanea = medir(serie, args.repeticoes), medir(simultanea, args.repeticoes)
+        print(f"{nome:<34}{t_serie:>15.0f}{t_simultanea:>17.0f}{t_serie / t_simultanea:>7.1f}x")
+
+    servidor.zerar()
+    supabase_assincrono.executar(supabase_assincrono.reunir([cliente.get('pets') for _ in range(40)], simultaneas=4))
+    print()
+    print(f"40 requisições com simultaneas=4: pico de {servidor.pico} em andamento no servidor")
+
+    inicio = time.perf_counter()
+    try:
+        supabase_assincrono.executar(supabase_assincrono.reunir(
+            [cliente.get('pets'), cliente.get('vacinas', 'lenta=1')], prazo=args.latencia_ms * 5 / 1000
+        ))
+        print("Prazo: a requisição lenta não foi cancelada")
+        return 1
+    except TimeoutError:
+        print(f"Prazo de {args.latencia_ms * 5:.0f} ms: cancelado com TimeoutError após "
+              f"{(time.perf_counter() - inicio) * 1000:.0f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""Benchmark da fila de escrita (fila_escrita.py)
+
+Sobe um PostgREST simulado (tornado) que guarda o estado das tabelas e
+responde a cada requisição depois de uma latência fixa. Um usuário
+alterna "Ação realizada?" em várias vacinas, às vezes várias vezes no
+mesmo registro, e marca doses em sequência. Compara:
+- gravação imediata, como antes: um PATCH/POST por clique seguido de uma
+  recarga completa (10 tabelas);
+- fila de escrita: as mesmas ações, gravadas em lote.
+Confere que o estado final no servidor é o mesmo e simula uma queda do
+processo: as operações do diário são regravadas pela sessão seguinte.
+
+Uso:
+    python scripts/bench_fila_escrita.py --cliques 200 --latencia-ms 40
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import httpx
+from tornado import httpserver, netutil, web
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fila_escrita  # noqa: E402
+
+TABELAS_DA_RECARGA = 10
+
+
+class Banco:
+    """Estado do PostgREST simulado: vacinas (id -> concluido) e doses (medicamento_id, numero_dose)"""
+
+    def __init__(self, vacinas, latencia):
+        self.vacinas = {i: False for i in range(1, vacinas + 1)}
+        self.doses = set()
+        self.latencia = latencia
+        self.requisicoes = 0
+
+
+class Rota(web.RequestHandler):
+    def initialize(self, banco):
+        self.banco = banco
+
+    async def prepare(self):
+        self.banco.requisicoes += 1
+        await asyncio.sleep(self.banco.latencia)
+
+    def get(self, tabela):
+        self.set_header('Content-Type', 'application/json')
+        self.finish('[]')
+
+    def patch(self, tabela):
+        filtro = self.get_argument('id')
+        ids = filtro[4:-1].split(',') if filtro.startswith('in.') else [filtro[3:]]
+        campos = json.loads(self.request.body)
+        for i in ids:
+            self.banco.vacinas[int(i)] = campos['concluido']
+        self.set_status(204)
+
+    def post(self, tabela):
+        registros = json.loads(self.request.body)
+        for registro in registros if isinstance(registros, list) else [registros]:
+            self.banco.doses.add((registro['medicamento_id'], registro['numero_dose']))
+        self.set_status(201)
+        self.set_header('Content-Type', 'application/json')
+        self.finish(json.dumps(registros))
+
+
+def iniciar_servidor(banco):
+    pronto = threading.Event()
+    porta = []
+
+    def executar():
+        async def principal():
+            http = httpserver.HTTPServer(web.Application([(r'/rest/v1/(\w+)', Rota, {'banco': banco})]))
+            sockets = netutil.bind_sockets(0, '127.0.0.1')
+            http.add_sockets(sockets)
+            porta.append(sockets[0].getsockname()[1])
+            pronto.set()
+            await asyncio.Event().wait()
+        asyncio.run(principal())
+
+    threading.Thread(target=executar, daemon=True).start()
+    pronto.wait()
+    return f'http://127.0.0.1:{porta[0]}/rest/v1'
+
+
+def gerar_cliques(quantidade, vacinas):
+    """Sequência de ações: ('vacina', id, concluido) ou ('dose', medicamento_id, numero_dose)"""
+    estado = {i: False for i in range(1, vacinas + 1)}
+    proxima_dose = {1: 1, 2: 1}
+    cliques = []
+    for _ in range(quantidade):
+        if random.random() < 0.6:
+            # Poucas vacinas recebem a maioria dos cliques (marca, desmarca, marca de novo)
+            vacina = min(int(random.expovariate(0.5)) + 1, vacinas)
+            estado[vacina] = not estado[vacina]
+            cliques.append(('vacina', vacina, estado[vacina]))
+        else:
+            medicamento = random.choice([1, 2])
+            cliques.append(('dose', medicamento, proxima_dose[medicamento]))
+            proxima_dose[medicamento] += 1
+    return cliques
+
+
+def imediato(api_url, cliques):
+    """Como antes: cada clique grava na hora e recarrega todas as tabelas"""
+    headers = {'apikey': 'chave', 'Authorization': 'Bearer token', 'Content-Type': 'application/json'}
+    with httpx.Client(headers=headers, timeout=10.0) as cliente:
+        for tipo, chave, valor in cliques:
+            if tipo == 'vacina':
+                cliente.patch(f'{api_url}/vacinas?id=eq.{chave}', json={'concluido': valor})
+            else:
+                cliente.post(f'{api_url}/medicamentos_log?on_conflict=medicamento_id,numero_dose',
+                             json=[{'medicamento_id': chave, 'numero_dose': valor}])
+            for _ in range(TABELAS_DA_RECARGA):
+                cliente.get(f'{api_url}/vacinas')
+
+
+def pela_fila(fila, cliques, intervalo):
+    for tipo, chave, valor in cliques:
+        if tipo == 'vacina':
+            fila.atualizar('vacinas', chave, {'concluido': valor})
+        else:
+            fila.inserir('medicamentos_log', {'medicamento_id': chave, 'numero_dose': valor},
+                         ('medicamento_id', 'numero_dose'))
+        time.sleep(intervalo)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cliques', type=int, default=200)
+    parser.add_argument('--vacinas', type=int, default=12)
+    parser.add_argument('--latencia-ms', type=float, default=40, help='Latência de cada requisição')
+    parser.add_argument('--intervalo-ms', type=float, default=25, help='Tempo entre dois cliques')
+    parser.add_argument('--atraso', type=float, default=fila_escrita.ATRASO_SEGUNDOS)
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.semente)
+    cliques = gerar_cliques(args.cliques, args.vacinas)
+    latencia = args.latencia_ms / 1000
+    diretorio = tempfile.mkdtemp(prefix='fila_escrita_')
+    headers = {'apikey': 'chave', 'Authorization': 'Bearer token'}
+
+    try:
+        print(f"{len(cliques)} cliques, {args.intervalo_ms:.0f} ms entre cliques | "
+              f"latência {args.latencia_ms:.0f} ms por requisição | atraso da fila {args.atraso:.1f} s")
+        print()
+
+        banco_imediato = Banco(args.vacinas, latencia)
+        inicio = time.perf_counter()
+        imediato(iniciar_servidor(banco_imediato), cliques)
+        segundos_imediato = time.perf_counter() - inicio
+
+        banco_fila = Banco(args.vacinas, latencia)
+        fila = fila_escrita.FilaEscrita('bench', 'usuario', iniciar_servidor(banco_fila), headers,
+                                        diretorio=diretorio, atraso=args.atraso)
+        inicio = time.perf_counter()
+        pela_fila(fila, cliques, args.intervalo_ms / 1000)
+        segundos_cliques = time.perf_counter() - inicio
+        fila.descarregar()
+        metricas = fila.metricas()
+
+        print(f"{'gravação':<20}{'requisições':>13}{'espera do usuário (s)':>24}")
+        print(f"{'imediata + recarga':<20}{banco_imediato.requisicoes:>13}{segundos_imediato:>24.2f}")
+        print(f"{'fila de escrita':<20}{banco_fila.requisicoes:>13}{0:>24.2f}"
+              f"   (cliques duraram {segundos_cliques:.2f} s)")
+        print()
+        print(f"Fila: {metricas['enfileiradas']} operações, {metricas['coalescidas']} reunidas, "
+              f"{metricas['descargas']} descargas, {metricas['requisicoes']} requisições, "
+              f"pendentes {metricas['pendentes']}")
+        print(f"Latência clique → gravado: p50 {metricas['latencia_p50_ms']:.0f} ms | "
+              f"p95 {metricas['latencia_p95_ms']:.0f} ms | envio p50 {metricas['envio_p50_ms']:.0f} ms")
+        mesmo_estado = (banco_imediato.vacinas == banco_fila.vacinas and banco_imediato.doses == banco_fila.doses)
+        print(f"Mesmo estado final no servidor: {mesmo_estado}")
+
+        # Queda: operações enfileiradas e nunca gravadas (atraso longo), processo "morre"
+        banco_queda = Banco(args.vacinas, latencia)
+        api_queda = iniciar_servidor(banco_queda)
+        interrompida = fila_escrita.FilaEscrita('caiu', 'usuario', api_queda, headers, diretorio=diretorio, atraso=3600)
+        pela_fila(interrompida, cliques, 0)
+        fila_escrita._filas.pop(id(interrompida))
+        seguinte = fila_escrita.FilaEscrita('nova', 'usuario', api_queda, headers, diretorio=diretorio)
+        recuperadas = seguinte.recuperar_diarios()
+        seguinte.descarregar()
+        recuperou = banco_queda.vacinas == banco_imediato.vacinas and banco_queda.doses == banco_imediato.doses
+        print(f"Queda: {recuperadas} operações recuperadas do diário, estado igual: {recuperou}")
+        return 0 if mesmo_estado and recuperou else 1
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
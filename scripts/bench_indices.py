@@ -0,0 +1,284 @@
+"""Benchmark de planos de consulta (EXPLAIN ANALYZE) antes e depois de supabase_indices.sql
+
+Cria um banco local com as migrações do PetControl, popula dados sintéticos
+e executa as consultas que o app faz via PostgREST (com RLS ativo, como o
+papel `authenticated` do Supabase). Mostra o plano e o tempo de cada consulta
+com o conjunto de índices original ("antes") e com os índices alinhados aos
+padrões de acesso ("depois").
+
+Uso:
+    createdb petcontrol_bench
+    python scripts/bench_indices.py --dsn postgresql://postgres@localhost/petcontrol_bench
+
+O banco informado é recriado do zero (schemas public e auth são apagados).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+# Objetos mínimos do Supabase que as migrações referenciam
+STUB_SUPABASE = """
+DROP SCHEMA IF EXISTS public CASCADE;
+DROP SCHEMA IF EXISTS auth CASCADE;
+CREATE SCHEMA public;
+CREATE SCHEMA auth;
+CREATE TABLE auth.users (id UUID PRIMARY KEY, email TEXT);
+CREATE FUNCTION auth.uid() RETURNS UUID AS $$
+    SELECT NULLIF(current_setting('request.jwt.claim.sub', true), '')::UUID
+$$ LANGUAGE sql STABLE;
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'authenticated') THEN
+        CREATE ROLE authenticated NOLOGIN;
+    END IF;
+END $$;
+GRANT USAGE ON SCHEMA public, auth TO authenticated;
+"""
+
+# Migrações na ordem do README
+MIGRACOES = [
+    'supabase_schema.sql',
+    'supabase_updates.sql',
+    'supabase_auth_setup.sql',
+    'supabase_doses_esparsas.sql',
+    'supabase_progresso_medicamentos.sql',
+    'supabase_pet_id.sql',
+]
+
+# Volta ao conjunto de índices original (apenas colunas isoladas)
+INDICES_ORIGINAIS = """
+DROP INDEX IF EXISTS idx_vacinas_user_pet_data, idx_alimentacao_user_pet_data,
+    idx_veterinario_user_pet_data, idx_medicamentos_user_pet_data,
+    idx_preventivos_user_pet_data, idx_peso_user_pet_data, idx_notas_user_pet_data;
+CREATE INDEX IF NOT EXISTS idx_vacinas_user_id ON vacinas(user_id);
+CREATE INDEX IF NOT EXISTS idx_alimentacao_user_id ON alimentacao(user_id);
+CREATE INDEX IF NOT EXISTS idx_veterinario_user_id ON veterinario(user_id);
+CREATE INDEX IF NOT EXISTS idx_medicamentos_user_id ON medicamentos(user_id);
+CREATE INDEX IF NOT EXISTS idx_preventivos_user_id ON preventivos(user_id);
+CREATE INDEX IF NOT EXISTS idx_peso_user_id ON peso(user_id);
+CREATE INDEX IF NOT EXISTS idx_notas_user_id ON notas(user_id);
+CREATE INDEX IF NOT EXISTS idx_medicamentos_log_medicamento_id ON medicamentos_log(medicamento_id);
+ANALYZE;
+"""
+
+INDICES_NOVOS = """
+CREATE INDEX IF NOT EXISTS idx_vacinas_user_pet_data ON vacinas(user_id, pet_id, data_aplicacao);
+CREATE INDEX IF NOT EXISTS idx_alimentacao_user_pet_data ON alimentacao(user_id, pet_id, data_registro);
+CREATE INDEX IF NOT EXISTS idx_veterinario_user_pet_data ON veterinario(user_id, pet_id, data_consulta);
+CREATE INDEX IF NOT EXISTS idx_medicamentos_user_pet_data ON medicamentos(user_id, pet_id, data_inicio);
+CREATE INDEX IF NOT EXISTS idx_preventivos_user_pet_data ON preventivos(user_id, pet_id, data_aplicacao);
+CREATE INDEX IF NOT EXISTS idx_peso_user_pet_data ON peso(user_id, pet_id, data_pesagem);
+CREATE INDEX IF NOT EXISTS idx_notas_user_pet_data ON notas(user_id, pet_id, data_criacao);
+"""
+
+# Dados sintéticos: usuários com 1 a 15 pets e anos de histórico
+SEMENTE = """
+SELECT setseed(0.42);
+SET session_replication_role = replica;  -- sem triggers durante a carga
+
+INSERT INTO auth.users (id, email)
+SELECT gen_random_uuid(), 'usuario' || n || '@exemplo.com'
+FROM generate_series(1, {usuarios}) n;
+
+INSERT INTO profiles (id, email, plano, status)
+SELECT id, email, (ARRAY['Essencial', 'Plus', 'Elite'])[1 + floor(random() * 3)::INT], 'ativo'
+FROM auth.users;
+
+INSERT INTO pets (user_id, nome, especie, raca, data_nascimento, peso, cor)
+SELECT u.id, 'Pet ' || n, (ARRAY['Cão', 'Gato'])[1 + (n % 2)], 'SRD',
+       CURRENT_DATE - (365 + floor(random() * 3000)::INT), 5 + random() * 30, 'Caramelo'
+FROM auth.users u
+CROSS JOIN LATERAL generate_series(1, 1 + floor(random() * {pets_max})::INT) n;
+
+INSERT INTO vacinas (user_id, pet_id, nome_vacina, data_aplicacao, proxima_dose, concluido, observacoes)
+SELECT p.user_id, p.id, 'V10', d, d + 365, d + 365 < CURRENT_DATE, 'Sem reações'
+FROM pets p
+CROSS JOIN LATERAL generate_series(1, {vacinas_por_pet}) n
+CROSS JOIN LATERAL (SELECT CURRENT_DATE - n * 90 + floor(random() * 30)::INT AS d) x;
+
+INSERT INTO preventivos (user_id, pet_id, nome_produto, tipo_preventivo, data_aplicacao, proxima_dose, concluido)
+SELECT p.user_id, p.id, 'Bravecto', 'Antipulgas', d, d + 90, d + 90 < CURRENT_DATE - 30
+FROM pets p
+CROSS JOIN LATERAL generate_series(1, {preventivos_por_pet}) n
+CROSS JOIN LATERAL (SELECT CURRENT_DATE - n * 90 + floor(random() * 30)::INT AS d) x;
+
+INSERT INTO peso (user_id, pet_id, data_pesagem, peso)
+SELECT p.user_id, p.id, CURRENT_DATE - n * 7, 10 + random() * 5
+FROM pets p CROSS JOIN LATERAL generate_series(1, {pesagens_por_pet}) n;
+
+INSERT INTO veterinario (user_id, pet_id, nome_veterinario, motivo, data_consulta, diagnostico)
+SELECT p.user_id, p.id, 'Clínica Central', 'Rotina', CURRENT_DATE - n * 60, 'Saudável'
+FROM pets p CROSS JOIN LATERAL generate_series(1, {consultas_por_pet}) n;
+
+INSERT INTO notas (user_id, pet_id, titulo, texto, data_criacao)
+SELECT p.user_id, p.id, 'Nota ' || n, 'Observação de rotina', NOW() - n * INTERVAL '20 days'
+FROM pets p CROSS JOIN LATERAL generate_series(1, {notas_por_pet}) n;
+
+INSERT INTO alimentacao (user_id, pet_id, tipo_alimento, marca_nome, quantidade, frequencia, horarios, data_registro)
+SELECT p.user_id, p.id, 'Ração', 'Premier', 150, 2, '08:00, 18:00', NOW() - n * INTERVAL '180 days'
+FROM pets p CROSS JOIN LATERAL generate_series(1, 2) n;
+
+INSERT INTO medicamentos (user_id, pet_id, nome_remedio, dosagem, frequencia, duracao, doses_por_dia, data_inicio, data_fim)
+SELECT p.user_id, p.id, 'Amoxicilina', '5mg', '12/12h', 10, 2, d, d + 10
+FROM pets p
+CROSS JOIN LATERAL generate_series(1, {medicamentos_por_pet}) n
+CROSS JOIN LATERAL (SELECT CURRENT_DATE - n * 45 AS d) x;
+
+INSERT INTO medicamentos_log (user_id, medicamento_id, numero_dose, data_dose, realizado)
+SELECT m.user_id, m.id, n, m.data_inicio + (n - 1) / 2, TRUE
+FROM medicamentos m
+CROSS JOIN LATERAL generate_series(1, LEAST(20, GREATEST(0, (CURRENT_DATE - m.data_inicio) * 2))) n;
+
+SET session_replication_role = DEFAULT;
+GRANT SELECT, INSERT, UPDATE, DELETE ON ALL TABLES IN SCHEMA public TO authenticated;
+VACUUM ANALYZE;
+"""
+
+# Consultas do app (equivalentes às requisições PostgREST)
+CONSULTAS = {
+    'vacinas do usuário (recarregar_dados)': "SELECT * FROM vacinas",
+    'pesagens de um pet por data': "SELECT * FROM peso WHERE pet_id = {pet_id} ORDER BY data_pesagem DESC",
+    'consultas de um pet por data': "SELECT * FROM veterinario WHERE pet_id = {pet_id} ORDER BY data_consulta DESC",
+    'vacinas pendentes/vencidas': (
+        "SELECT * FROM vacinas WHERE concluido = FALSE AND proxima_dose IS NOT NULL "
+        "AND proxima_dose <= CURRENT_DATE + 7 ORDER BY proxima_dose"
+    ),
+    'preventivos pendentes/vencidos': (
+        "SELECT * FROM preventivos WHERE concluido = FALSE AND proxima_dose IS NOT NULL "
+        "AND proxima_dose <= CURRENT_DATE + 7 ORDER BY proxima_dose"
+    ),
+    'progresso de medicamentos (view)': "SELECT * FROM medicamentos_progresso",
+    'doses de um medicamento': (
+        "SELECT id, numero_dose, realizado FROM medicamentos_log "
+        "WHERE medicamento_id = {medicamento_id} ORDER BY numero_dose"
+    ),
+}
+
+
+def psql(dsn, sql, binario='psql'):
+    """Executar SQL no psql e devolver a saída (modo sem alinhamento)"""
+    resultado = subprocess.run(
+        [binario, dsn, '-X', '-q', '-At', '-v', 'ON_ERROR_STOP=1'],
+        input=sql, capture_output=True, text=True
+    )
+    if resultado.returncode != 0:
+        raise RuntimeError(resultado.stderr.strip())
+    return resultado.stdout
+
+
+def aplicar_migracoes(dsn, binario):
+    """Recriar o banco com as migrações do repositório"""
+    psql(dsn, STUB_SUPABASE, binario)
+    for arquivo in MIGRACOES:
+        psql(dsn, (RAIZ / arquivo).read_text(encoding='utf-8'), binario)
+
+
+def escolher_alvos(dsn, binario):
+    """Usuário com mais pets e um pet/medicamento dele para as consultas"""
+    linha = psql(dsn, """
+        SELECT p.user_id, p.id, (SELECT MIN(m.id) FROM medicamentos m WHERE m.pet_id = p.id)
+        FROM pets p
+        WHERE p.user_id = (SELECT user_id FROM pets GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 1)
+        ORDER BY p.id LIMIT 1;
+    """, binario).strip()
+    user_id, pet_id, medicamento_id = linha.split('|')
+    return user_id, int(pet_id), int(medicamento_id)
+
+
+def explicar(dsn, binario, user_id, consulta, repeticoes):
+    """Executar EXPLAIN ANALYZE como o usuário autenticado; retorna (plano, tempos de execução)"""
+    sql = f"""
+        BEGIN;
+        SET LOCAL ROLE authenticated;
+        SET LOCAL request.jwt.claim.sub = '{user_id}';
+        EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {consulta};
+        ROLLBACK;
+    """
+    tempos = []
+    plano = None
+    for _ in range(repeticoes):
+        saida = json.loads(psql(dsn, sql, binario))[0]
+        tempos.append(saida['Execution Time'])
+        plano = saida['Plan']
+    return plano, tempos
+
+
+def buffers(plano):
+    """Páginas lidas pelo nó (inclui os nós filhos)"""
+    return plano.get('Shared Hit Blocks', 0) + plano.get('Shared Read Blocks', 0)
+
+
+def resumir_plano(plano, nivel=0):
+    """Árvore do plano em texto (tipo do nó, índice e linhas)"""
+    descricao = plano['Node Type']
+    if plano.get('Index Name'):
+        descricao += f" using {plano['Index Name']}"
+    if plano.get('Relation Name'):
+        descricao += f" on {plano['Relation Name']}"
+    descricao += f" (linhas={plano.get('Actual Rows')}, buffers={buffers(plano)})"
+    linhas = ['  ' * nivel + '-> ' + descricao]
+    for filho in plano.get('Plans', []):
+        linhas.extend(resumir_plano(filho, nivel + 1))
+    return linhas
+
+
+def medir(dsn, binario, alvos, repeticoes, saida_planos, fase):
+    """Medir todas as consultas na fase atual do banco; retorna {consulta: (mediana ms, buffers)}"""
+    user_id, pet_id, medicamento_id = alvos
+    resultados = {}
+    saida_planos.write(f"\n==================== {fase.upper()} ====================\n")
+    for nome, consulta in CONSULTAS.items():
+        sql = consulta.format(pet_id=pet_id, medicamento_id=medicamento_id)
+        plano, tempos = explicar(dsn, binario, user_id, sql, repeticoes)
+        resultados[nome] = (statistics.median(tempos), buffers(plano))
+        saida_planos.write(f"\n--- {nome} ({resultados[nome][0]:.3f} ms)\n{sql}\n")
+        saida_planos.write('\n'.join(resumir_plano(plano)) + '\n')
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dsn', default=os.environ.get('DATABASE_URL', 'postgresql://postgres@localhost/petcontrol_bench'))
+    parser.add_argument('--psql', default='psql', help='Caminho do binário psql')
+    parser.add_argument('--usuarios', type=int, default=2000)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--planos', default='bench_indices_planos.txt', help='Arquivo com os planos completos')
+    args = parser.parse_args()
+
+    volumes = {
+        'usuarios': args.usuarios, 'pets_max': 15, 'vacinas_por_pet': 12, 'preventivos_por_pet': 16,
+        'pesagens_por_pet': 150, 'consultas_por_pet': 20, 'notas_por_pet': 20, 'medicamentos_por_pet': 8,
+    }
+
+    print(f"Recriando banco e aplicando migrações em {args.dsn} ...")
+    aplicar_migracoes(args.dsn, args.psql)
+    print(f"Populando {args.usuarios} usuários ...")
+    psql(args.dsn, SEMENTE.format(**volumes), args.psql)
+    alvos = escolher_alvos(args.dsn, args.psql)
+
+    with open(args.planos, 'w', encoding='utf-8') as saida_planos:
+        psql(args.dsn, INDICES_ORIGINAIS, args.psql)
+        antes = medir(args.dsn, args.psql, alvos, args.repeticoes, saida_planos, 'antes')
+
+        psql(args.dsn, INDICES_NOVOS, args.psql)
+        psql(args.dsn, (RAIZ / 'supabase_indices.sql').read_text(encoding='utf-8'), args.psql)
+        depois = medir(args.dsn, args.psql, alvos, args.repeticoes, saida_planos, 'depois')
+
+    largura = max(len(nome) for nome in CONSULTAS)
+    print(f"\n{'consulta'.ljust(largura)}  {'antes (ms)':>11}  {'depois (ms)':>11}  {'buffers antes':>13}  {'buffers depois':>14}")
+    for nome in CONSULTAS:
+        (ms_antes, buf_antes), (ms_depois, buf_depois) = antes[nome], depois[nome]
+        print(f"{nome.ljust(largura)}  {ms_antes:>11.3f}  {ms_depois:>11.3f}  {buf_antes:>13}  {buf_depois:>14}")
+    print(f"\nPlanos completos em {args.planos}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""Benchmark de vazão do agendador de lembretes (lembretes.py)
+
+Roda o AgendadorLembretes contra uma fonte em memória com a mesma
+interface da FonteSupabase, que simula a latência de cada requisição, e
+uma saída que simula a latência de cada envio. Compara entregas em série
+com entregas concorrentes e executa de novo no mesmo dia para conferir
+que nenhum lembrete é reenviado.
+
+Uso:
+    python scripts/bench_lembretes.py --registros 300000 --usuarios 20000 --latencia-ms 20
+"""
+
+import argparse
+import asyncio
+import bisect
+import random
+import sys
+import time
+import uuid
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import lembretes  # noqa: E402
+
+
+class FonteMemoria:
+    """Mesma interface da FonteSupabase, em memória, com latência simulada"""
+
+    def __init__(self, tabelas, medicamentos, perfis, pets, latencia):
+        # Vencimentos ordenados por (proxima_dose, id), como o índice idx_*_lembretes
+        self.tabelas = {nome: sorted(linhas, key=lambda l: (l['proxima_dose'], l['id'])) for nome, linhas in tabelas.items()}
+        self.chaves = {nome: [(l['proxima_dose'], l['id']) for l in linhas] for nome, linhas in self.tabelas.items()}
+        self.medicamentos = sorted(medicamentos, key=lambda m: m['medicamento_id'])
+        self.ids_medicamentos = [m['medicamento_id'] for m in self.medicamentos]
+        self.perfis_por_id = perfis
+        self.pets = pets
+        self.latencia = latencia
+        self.enviados = set()
+        self.requisicoes = 0
+
+    async def _requisicao(self):
+        self.requisicoes += 1
+        await asyncio.sleep(self.latencia)
+
+    async def vencimentos(self, tabela, campos, inicio, fim, cursor, limite):
+        await self._requisicao()
+        chaves = self.chaves[tabela]
+        if cursor:
+            posicao = bisect.bisect_right(chaves, (cursor[0], cursor[1]))
+        else:
+            posicao = bisect.bisect_left(chaves, (inicio.isoformat(), 0))
+        fim = fim.isoformat()
+        pagina = []
+        for linha in self.tabelas[tabela][posicao:]:
+            if linha['proxima_dose'] > fim or len(pagina) == limite:
+                break
+            if not linha['concluido']:
+                pagina.append(linha)
+        return pagina
+
+    async def doses_pendentes(self, hoje, desde, apos, limite):
+        await self._requisicao()
+        hoje, desde = hoje.isoformat(), desde.isoformat()
+        pagina = []
+        for linha in self.medicamentos[bisect.bisect_right(self.ids_medicamentos, apos):]:
+            if len(pagina) == limite:
+                break
+            if desde <= linha['proxima_dose_data'] <= hoje:
+                pagina.append(linha)
+        return pagina
+
+    async def perfis(self, user_ids):
+        await self._requisicao()
+        return {u: self.perfis_por_id[u] for u in user_ids if u in self.perfis_por_id}
+
+    async def nomes_dos_pets(self, pet_ids):
+        await self._requisicao()
+        return {p: self.pets[p] for p in pet_ids if p in self.pets}
+
+    async def reservar(self, lista):
+        await self._requisicao()
+        novas = {lembretes.chave_lembrete(l) for l in lista} - self.enviados
+        self.enviados |= novas
+        return novas
+
+    async def liberar(self, lista):
+        await self._requisicao()
+        self.enviados -= {lembretes.chave_lembrete(l) for l in lista}
+
+
+class SaidaMemoria:
+    """Conta os avisos; cada envio espera a latência simulada"""
+
+    def __init__(self, latencia):
+        self.latencia = latencia
+        self.avisos = 0
+        self.lembretes = 0
+
+    async def enviar(self, notificacao):
+        await asyncio.sleep(self.latencia)
+        self.avisos += 1
+        self.lembretes += len(notificacao['lembretes'])
+
+
+def gerar_dados(registros, usuarios, hoje):
+    """Vacinas, preventivos e medicamentos com vencimentos entre 45 dias atrás e 15 dias à frente"""
+    ids_usuarios = [str(uuid.uuid4()) for _ in range(usuarios)]
+    perfis = {u: {'id': u, 'email': f'tutor{i}@exemplo.com', 'status': 'ativo' if random.random() < 0.9 else 'cancelado'}
+              for i, u in enumerate(ids_usuarios)}
+    pets = {i + 1: f'Pet {i + 1}' for i in range(usuarios * 2)}
+
+    def registro(i):
+        pet_id = random.randint(1, len(pets))
+        return {
+            'id': i + 1,
+            'user_id': ids_usuarios[(pet_id - 1) // 2],
+            'pet_id': pet_id,
+            'proxima_dose': (hoje + timedelta(days=random.randint(-45, 15))).isoformat(),
+            'concluido': random.random() < 0.2
+        }
+
+    quantidade = registros // 5
+    vacinas = [dict(registro(i), nome_vacina=random.choice(['V10', 'Antirrábica', 'Gripe'])) for i in range(quantidade * 2)]
+    preventivos = [dict(registro(i), tipo_preventivo=random.choice(['Antipulgas', 'Vermífugo']), nome_produto='Produto')
+                   for i in range(quantidade * 2)]
+    medicamentos = []
+    for i in range(quantidade):
+        base = registro(i)
+        medicamentos.append({
+            'medicamento_id': base['id'], 'user_id': base['user_id'], 'pet_id': base['pet_id'],
+            'nome_remedio': 'Remédio', 'proxima_dose_numero': random.randint(1, 20),
+            'proxima_dose_data': (hoje + timedelta(days=random.randint(-45, 15))).isoformat()
+        })
+    return {'vacinas': vacinas, 'preventivos': preventivos}, medicamentos, perfis, pets
+
+
+async def rodada(fonte, latencia_envio, hoje, simultaneas, pagina):
+    saida = SaidaMemoria(latencia_envio)
+    requisicoes_antes = fonte.requisicoes
+    inicio = time.perf_counter()
+    estatisticas = await lembretes.AgendadorLembretes(
+        fonte, saida, hoje=hoje, tamanho_pagina=pagina, simultaneas=simultaneas
+    ).executar()
+    segundos = time.perf_counter() - inicio
+    return estatisticas, saida, fonte.requisicoes - requisicoes_antes, segundos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--registros', type=int, default=300000)
+    parser.add_argument('--usuarios', type=int, default=20000)
+    parser.add_argument('--latencia-ms', type=float, default=20, help='Latência de cada requisição ao Supabase')
+    parser.add_argument('--envio-ms', type=float, default=5, help='Latência de cada envio de aviso')
+    parser.add_argument('--pagina', type=int, default=lembretes.TAMANHO_PAGINA)
+    parser.add_argument('--simultaneas', type=int, default=lembretes.ENTREGAS_SIMULTANEAS)
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.semente)
+    hoje = date.today()
+    tabelas, medicamentos, perfis, pets = gerar_dados(args.registros, args.usuarios, hoje)
+    total = sum(len(linhas) for linhas in tabelas.values()) + len(medicamentos)
+    print(f"Registros: {total} | Usuários: {args.usuarios} | Latência: {args.latencia_ms:.0f} ms "
+          f"por requisição, {args.envio_ms:.0f} ms por envio")
+    print()
+    print(f"{'execução':<26}{'lidos':>9}{'avisos':>9}{'novos':>9}{'requisições':>13}{'tempo (s)':>11}{'registros/s':>13}")
+
+    def linha(nome, resultado):
+        estatisticas, saida, requisicoes, segundos = resultado
+        print(f"{nome:<26}{estatisticas['registros']:>9}{saida.avisos:>9}{estatisticas['novos']:>9}"
+              f"{requisicoes:>13}{segundos:>11.2f}{estatisticas['registros'] / segundos:>13.0f}")
+
+    latencia, envio = args.latencia_ms / 1000, args.envio_ms / 1000
+    serie = asyncio.run(rodada(FonteMemoria(tabelas, medicamentos, perfis, pets, latencia), envio, hoje, 1, args.pagina))
+    linha('entregas em série', serie)
+
+    fonte = FonteMemoria(tabelas, medicamentos, perfis, pets, latencia)
+    concorrente = asyncio.run(rodada(fonte, envio, hoje, args.simultaneas, args.pagina))
+    linha(f'{args.simultaneas} entregas simultâneas', concorrente)
+    repetida = asyncio.run(rodada(fonte, envio, hoje, args.simultaneas, args.pagina))
+    linha('mesmo dia, de novo', repetida)
+
+    ok = serie[0]['novos'] == concorrente[0]['novos'] and repetida[0]['novos'] == 0
+    print()
+    print(f"Mesmos lembretes nas duas execuções e nenhum reenvio: {ok}")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
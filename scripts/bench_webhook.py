@@ -0,0 +1,192 @@
+"""Benchmark de vazão do webhook_worker.py contra uma caixa de entrada local
+
+Sobe o servidor HTTP do worker apoiado em uma caixa de entrada em memória
+que simula a latência de cada requisição ao Supabase, dispara os webhooks
+em paralelo (com uma fração de reenvios duplicados, como as plataformas
+fazem) e processa a fila em lotes. Para comparação, executa o mesmo
+conjunto de eventos no fluxo da edge function (getUserByEmail + upsert
+por evento, dentro da própria requisição).
+
+Uso:
+    python scripts/bench_webhook.py --eventos 2000 --latencia-ms 20
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import webhook_worker  # noqa: E402
+
+
+class InboxMemoria:
+    """Mesma interface da InboxSupabase, em memória, com latência simulada"""
+
+    def __init__(self, latencia, usuarios_existentes=()):
+        self.latencia = latencia
+        self.trava = threading.Lock()
+        self.eventos = {}
+        self.usuarios = {email: str(uuid.uuid4()) for email in usuarios_existentes}
+        self.perfis = {}
+        self.requisicoes = 0
+
+    def _requisicao(self):
+        with self.trava:
+            self.requisicoes += 1
+        time.sleep(self.latencia)
+
+    def inserir(self, chave, fonte, payload):
+        self._requisicao()
+        with self.trava:
+            if chave in self.eventos:
+                return False
+            self.eventos[chave] = {
+                'chave': chave, 'fonte': fonte, 'payload': payload,
+                'recebido_em': time.monotonic(), 'processado_em': None, 'tentativas': 0
+            }
+            return True
+
+    def pendentes(self, limite):
+        self._requisicao()
+        with self.trava:
+            fila = [e for e in self.eventos.values() if e['processado_em'] is None
+                    and e['tentativas'] < webhook_worker.MAX_TENTATIVAS]
+        fila.sort(key=lambda e: e['recebido_em'])
+        return [dict(e) for e in fila[:limite]]
+
+    def perfis_por_email(self, emails):
+        self._requisicao()
+        with self.trava:
+            return {email: self.usuarios[email] for email in emails if email in self.usuarios}
+
+    def criar_usuario(self, email, fonte, plano):
+        self._requisicao()
+        with self.trava:
+            return self.usuarios.setdefault(email, str(uuid.uuid4()))
+
+    def atualizar_perfis(self, perfis):
+        self._requisicao()
+        with self.trava:
+            for perfil in perfis:
+                self.perfis[perfil['id']] = perfil
+
+    def concluir(self, chaves):
+        self._requisicao()
+        with self.trava:
+            for chave in chaves:
+                self.eventos[chave]['processado_em'] = time.monotonic()
+
+    def registrar_falha(self, chave, tentativas, erro):
+        self._requisicao()
+        with self.trava:
+            self.eventos[chave]['tentativas'] = tentativas + 1
+
+
+def gerar_eventos(n, clientes, fracao_duplicados):
+    """Payloads Kiwify/Hotmart sintéticos; alguns são reenvios idênticos"""
+    eventos = []
+    for i in range(n):
+        email = f'cliente{random.randrange(clientes)}@exemplo.com'
+        if i % 2 == 0:
+            payload = {
+                'order_id': f'ord_{i}',
+                'order_status': random.choice(['paid', 'paid', 'refunded']),
+                'Product': {'id': random.choice(list(webhook_worker.PLANOS_KIWIFY))},
+                'Customer': {'email': email}
+            }
+        else:
+            payload = {
+                'id': f'evt_{i}',
+                'event': random.choice(['PURCHASE_APPROVED', 'PURCHASE_APPROVED', 'PURCHASE_CANCELED']),
+                'data': {'product': {'id': random.choice(list(webhook_worker.PLANOS_HOTMART))},
+                         'buyer': {'email': email}}
+            }
+        eventos.append(payload)
+    duplicados = random.sample(eventos, int(n * fracao_duplicados))
+    eventos.extend(duplicados)
+    random.shuffle(eventos)
+    return eventos
+
+
+def fluxo_edge_function(inbox, payload):
+    """Fluxo atual: busca no Auth, cria se preciso e upsert, por evento"""
+    evento = webhook_worker.interpretar_evento(payload)
+    user_id = inbox.perfis_por_email([evento['email']]).get(evento['email'])
+    if not user_id:
+        user_id = inbox.criar_usuario(evento['email'], evento['fonte'], evento['plano'])
+    inbox.atualizar_perfis([{'id': user_id, 'email': evento['email'], **evento}])
+
+
+def medir_edge_function(eventos, args, existentes):
+    inbox = InboxMemoria(args.latencia_ms / 1000, existentes)
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(args.conexoes) as executor:
+        list(executor.map(lambda p: fluxo_edge_function(inbox, p), eventos))
+    return time.perf_counter() - inicio, inbox.requisicoes
+
+
+def medir_worker(eventos, args, existentes):
+    inbox = InboxMemoria(args.latencia_ms / 1000, existentes)
+    servidor = webhook_worker.criar_servidor(inbox, 0)
+    porta = servidor.server_address[1]
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+    corpos = [json.dumps(p) for p in eventos]
+    inicio = time.perf_counter()
+    limites = httpx.Limits(max_connections=args.conexoes, max_keepalive_connections=args.conexoes)
+    with httpx.Client(base_url=f'http://127.0.0.1:{porta}', limits=limites) as cliente:
+        with ThreadPoolExecutor(args.conexoes) as executor:
+            respostas = list(executor.map(lambda c: cliente.post('/', content=c), corpos))
+    recebimento = time.perf_counter() - inicio
+    servidor.shutdown()
+    servidor.server_close()
+
+    processador = webhook_worker.ProcessadorWebhooks(inbox, args.lote)
+    inicio = time.perf_counter()
+    processador.processar_tudo()
+    processamento = time.perf_counter() - inicio
+
+    duplicados = sum(1 for r in respostas if r.json().get('duplicado'))
+    return recebimento, processamento, inbox.requisicoes, duplicados, len(inbox.perfis)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--eventos', type=int, default=2000)
+    parser.add_argument('--clientes', type=int, default=800, help='Emails distintos nos eventos')
+    parser.add_argument('--duplicados', type=float, default=0.2, help='Fração de reenvios')
+    parser.add_argument('--latencia-ms', type=float, default=20.0, help='Latência simulada por requisição ao Supabase')
+    parser.add_argument('--conexoes', type=int, default=16, help='Requisições simultâneas das plataformas')
+    parser.add_argument('--lote', type=int, default=webhook_worker.TAMANHO_LOTE)
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.semente)
+    eventos = gerar_eventos(args.eventos, args.clientes, args.duplicados)
+    existentes = [f'cliente{i}@exemplo.com' for i in range(0, args.clientes, 2)]
+
+    tempo_edge, req_edge = medir_edge_function(eventos, args, existentes)
+    recebimento, processamento, req_worker, duplicados, perfis = medir_worker(eventos, args, existentes)
+
+    print(f"Eventos enviados: {len(eventos)} ({duplicados} reenvios ignorados) | Perfis atualizados: {perfis}")
+    print(f"Latência simulada: {args.latencia_ms:.0f} ms | Conexões: {args.conexoes} | Lote: {args.lote}")
+    print()
+    print(f"{'fluxo':<28}{'tempo (s)':>12}{'eventos/s':>12}{'requisições':>14}")
+    print(f"{'edge function (por evento)':<28}{tempo_edge:>12.2f}{len(eventos) / tempo_edge:>12.0f}{req_edge:>14}")
+    print(f"{'worker: recebimento HTTP':<28}{recebimento:>12.2f}{len(eventos) / recebimento:>12.0f}{'':>14}")
+    print(f"{'worker: processamento':<28}{processamento:>12.2f}{len(eventos) / processamento:>12.0f}{'':>14}")
+    print(f"{'worker: total':<28}{recebimento + processamento:>12.2f}"
+          f"{len(eventos) / (recebimento + processamento):>12.0f}{req_worker:>14}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+"""Publicador local no lugar do Supabase Realtime (tempo_real.py)
+
+Servidor websocket com o subconjunto do protocolo Phoenix usado pelo app:
+phx_join com postgres_changes (filtro user_id=eq.X), heartbeat,
+access_token e o envio dos eventos postgres_changes. Como no Supabase com
+RLS, DELETE chega a todos os assinantes da tabela só com o id.
+
+Sem argumentos, roda uma verificação: uma AssinaturaTempoReal aplica às
+coleções locais uma sequência aleatória de INSERT/UPDATE/DELETE (inclusive
+de outro usuário), uma mudança de status do perfil e uma queda de conexão,
+e confere que as coleções terminam iguais ao "banco" sem nenhuma
+requisição de recarga.
+
+Com --servidor, só publica: cada linha JSON da entrada padrão
+({"table": ..., "type": ..., "record": {...}, "old_record": {...}}) é
+enviada aos assinantes. Para usar com o app, em .streamlit/secrets.toml:
+    [tempo_real]
+    ativo = true
+    url = "ws://localhost:4000/realtime/v1/websocket"
+
+Uso:
+    python scripts/publicador_tempo_real.py --eventos 2000
+    python scripts/publicador_tempo_real.py --servidor --porta 4000
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from tornado import web, websocket
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import tempo_real  # noqa: E402
+
+
+class Publicador:
+    """Assinantes conectados e envio dos eventos postgres_changes"""
+
+    def __init__(self):
+        self.conexoes = set()
+        self.enviadas = 0
+
+    def publicar(self, tabela, tipo, registro=None, antigo=None):
+        for conexao in list(self.conexoes):
+            for topico, assinaturas in conexao.assinaturas.items():
+                assinatura = conexao.assinatura_do_evento(assinaturas, tabela, tipo, registro or antigo or {})
+                if assinatura is not None:
+                    conexao.write_message(json.dumps({
+                        'topic': topico,
+                        'event': 'postgres_changes',
+                        'payload': {'ids': [assinatura['id']], 'data': {
+                            'schema': 'public', 'table': tabela, 'type': tipo,
+                            'commit_timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                            'record': registro or {}, 'old_record': antigo or {}, 'errors': None
+                        }}
+                    }))
+                    self.enviadas += 1
+
+    def derrubar(self):
+        for conexao in list(self.conexoes):
+            conexao.close()
+
+
+class ConexaoPhoenix(websocket.WebSocketHandler):
+    """Uma conexão de cliente (canais por tópico com as assinaturas do phx_join)"""
+
+    def initialize(self, publicador):
+        self.publicador = publicador
+        self.assinaturas = {}
+
+    def check_origin(self, origin):
+        return True
+
+    def open(self):
+        self.publicador.conexoes.add(self)
+
+    def on_close(self):
+        self.publicador.conexoes.discard(self)
+
+    def responder(self, mensagem, resposta=None):
+        self.write_message(json.dumps({
+            'topic': mensagem.get('topic'), 'event': 'phx_reply', 'ref': mensagem.get('ref'),
+            'payload': {'status': 'ok', 'response': resposta or {}}
+        }))
+
+    def on_message(self, texto):
+        mensagem = json.loads(texto)
+        evento = mensagem.get('event')
+        if evento == 'phx_join':
+            alteracoes = mensagem['payload']['config'].get('postgres_changes', [])
+            for i, alteracao in enumerate(alteracoes):
+                alteracao['id'] = i + 1
+            self.assinaturas[mensagem['topic']] = alteracoes
+            self.responder(mensagem, {'postgres_changes': alteracoes})
+        elif evento in ('heartbeat', 'access_token'):
+            self.responder(mensagem)
+        elif evento == 'phx_leave':
+            self.assinaturas.pop(mensagem['topic'], None)
+            self.responder(mensagem)
+
+    @staticmethod
+    def assinatura_do_evento(assinaturas, tabela, tipo, registro):
+        """Primeira assinatura do canal que recebe o evento (ou None)"""
+        for assinatura in assinaturas:
+            if assinatura['table'] != tabela or assinatura['event'] not in ('*', tipo):
+                continue
+            if tipo == 'DELETE' or not assinatura.get('filter'):
+                return assinatura
+            coluna, valor = assinatura['filter'].split('=eq.', 1)
+            if str(registro.get(coluna)) == valor:
+                return assinatura
+        return None
+
+
+def iniciar_servidor(publicador, porta):
+    aplicacao = web.Application([(r'/realtime/v1/websocket', ConexaoPhoenix, {'publicador': publicador})])
+    return aplicacao.listen(porta, address='127.0.0.1')
+
+
+async def servidor(porta):
+    publicador = Publicador()
+    iniciar_servidor(publicador, porta)
+    print(f"Publicando em ws://localhost:{porta}/realtime/v1/websocket (uma linha JSON por evento)")
+    loop = asyncio.get_running_loop()
+    while True:
+        linha = await loop.run_in_executor(None, sys.stdin.readline)
+        if not linha:
+            return
+        if linha.strip():
+            evento = json.loads(linha)
+            publicador.publicar(evento['table'], evento['type'], evento.get('record'), evento.get('old_record'))
+            print(f"{evento['type']} {evento['table']}: {publicador.enviadas} mensagem(ns) enviada(s)")
+
+
+class AppSimulado:
+    """Faz o papel dos reruns do app: a cada aviso drena e aplica os eventos"""
+
+    def __init__(self, colecoes):
+        self.colecoes = colecoes
+        self.avisos = threading.Event()
+        self.reruns = 0
+        self.aplicados = 0
+        self.latencias = []
+        self.parar = False
+
+    def ao_receber(self):
+        self.avisos.set()
+        return True
+
+    def executar(self, assinatura):
+        while not self.parar:
+            if not self.avisos.wait(0.05):
+                continue
+            self.avisos.clear()
+            eventos = assinatura.drenar()
+            if not eventos:
+                continue
+            self.reruns += 1
+            agora = time.perf_counter()
+            for evento in eventos:
+                publicado_em = (evento['registro'] or {}).get('publicado_em')
+                if publicado_em:
+                    self.latencias.append(agora - publicado_em)
+            tempo_real.aplicar_eventos(self.colecoes, eventos)
+            self.aplicados += len(eventos)
+
+
+async def esperar(condicao, segundos=10):
+    limite = time.monotonic() + segundos
+    while not condicao():
+        if time.monotonic() > limite:
+            raise TimeoutError('condição não atingida')
+        await asyncio.sleep(0.01)
+
+
+async def verificar(quantidade, porta, semente):
+    random.seed(semente)
+    publicador = Publicador()
+    iniciar_servidor(publicador, porta)
+
+    usuario, outro = str(uuid.uuid4()), str(uuid.uuid4())
+    banco = {'pets': {}, 'vacinas': {}}
+    proximo_id = {'pets': 0, 'vacinas': 0}
+
+    def novo(tabela, dono):
+        proximo_id[tabela] += 1
+        return {'id': proximo_id[tabela], 'user_id': dono, 'nome': f'{tabela} {proximo_id[tabela]}'}
+
+    # Estado inicial carregado pela sessão (como recarregar_dados)
+    for tabela in banco:
+        for _ in range(50):
+            registro = novo(tabela, usuario)
+            banco[tabela][registro['id']] = registro
+    colecoes = {tabela: [dict(r) for r in registros.values()] for tabela, registros in banco.items()}
+
+    app = AppSimulado(colecoes)
+    assinatura = tempo_real.AssinaturaTempoReal(
+        f'ws://127.0.0.1:{porta}/realtime/v1/websocket', usuario, 'token', app.ao_receber
+    ).iniciar()
+    thread_app = threading.Thread(target=app.executar, args=(assinatura,), daemon=True)
+    thread_app.start()
+    await esperar(lambda: assinatura.estado == 'conectada')
+
+    inicio = time.perf_counter()
+    for i in range(quantidade):
+        tabela = random.choice(list(banco))
+        dono = usuario if random.random() < 0.8 else outro
+        tipo = random.choices(['INSERT', 'UPDATE', 'DELETE'], [5, 3, 2])[0]
+        proprios = [r for r in banco[tabela].values() if r['user_id'] == dono]
+        if tipo != 'INSERT' and not proprios:
+            tipo = 'INSERT'
+        if tipo == 'INSERT':
+            registro = novo(tabela, dono)
+        elif tipo == 'UPDATE':
+            registro = dict(random.choice(proprios), nome=f'{tabela} editado {i}')
+        else:
+            registro = random.choice(proprios)
+            del banco[tabela][registro['id']]
+            publicador.publicar(tabela, 'DELETE', antigo={'id': registro['id']})
+            continue
+        banco[tabela][registro['id']] = registro
+        publicador.publicar(tabela, tipo, registro=dict(registro, publicado_em=time.perf_counter()))
+        if i % 50 == 0:
+            # Rajadas separadas por pequenas pausas, como edições em outro dispositivo
+            await asyncio.sleep(0.005)
+
+    def convergiu():
+        for tabela, registros in banco.items():
+            esperado = {i: r for i, r in registros.items() if r['user_id'] == usuario}
+            local = {r['id']: r for r in colecoes[tabela]}
+            if set(esperado) != set(local):
+                return False
+            if any(local[i]['nome'] != r['nome'] for i, r in esperado.items()):
+                return False
+        return True
+
+    await esperar(convergiu)
+    segundos = time.perf_counter() - inicio
+
+    # Status do perfil alterado pelo webhook
+    publicador.publicar('profiles', 'UPDATE', registro={'id': usuario, 'plano': 'Plus', 'status': 'cancelado'})
+    await esperar(lambda: (assinatura.perfil or {}).get('status') == 'cancelado')
+
+    # Queda de conexão: reconecta e pede uma recarga completa
+    publicador.derrubar()
+    await esperar(lambda: assinatura.precisa_recarregar and assinatura.estado == 'conectada', 15)
+
+    assinatura.parar()
+    app.parar = True
+    thread_app.join()
+
+    latencias = sorted(app.latencias)
+    p50 = latencias[len(latencias) // 2] * 1000
+    p99 = latencias[int(len(latencias) * 0.99)] * 1000
+    print(f"Eventos publicados: {quantidade} | entregues à sessão: {assinatura.recebidos - 1} | "
+          f"aplicados: {app.aplicados}")
+    print(f"Reruns: {app.reruns} ({app.aplicados / max(app.reruns, 1):.1f} eventos por rerun) | "
+          f"requisições ao Supabase: 0")
+    print(f"Latência publicação → aplicação: p50 {p50:.1f} ms | p99 {p99:.1f} ms | total {segundos:.2f} s")
+    print(f"Coleções iguais ao banco: {convergiu()} | perfil: {assinatura.perfil['status']} | "
+          f"recarga pedida após reconexão: {assinatura.precisa_recarregar}")
+    return 0 if convergiu() else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--servidor', action='store_true', help='Só publicar eventos lidos da entrada padrão')
+    parser.add_argument('--porta', type=int, default=4000)
+    parser.add_argument('--eventos', type=int, default=2000)
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+    if args.servidor:
+        asyncio.run(servidor(args.porta))
+        return 0
+    return asyncio.run(verificar(args.eventos, args.porta, args.semente))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
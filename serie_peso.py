@@ -0,0 +1,206 @@
+# ==================== SÉRIES DE PESO (NUMPY) ====================
+# As pesagens viram arrays (datas em datetime64[D], pesos em float64) e
+# todos os cálculos são vetorizados: variação entre pesagens, média móvel
+# por janela de dias, taxa de variação semanal e redução de pontos (LTTB)
+# antes de desenhar o gráfico.
+
+import numpy as np
+
+# Pontos máximos desenhados por gráfico
+PONTOS_GRAFICO = 300
+
+# date(1970, 1, 1).toordinal(): converte ordinais do Python em dias desde a época
+_ORDINAL_EPOCH = 719163
+
+
+def arrays_de_pesagens(pesagens):
+    """(pet_ids, datas, pesos, ids) ordenados por pet e data"""
+    if not pesagens:
+        vazio = np.array([], dtype=np.int64)
+        return vazio, np.array([], dtype='datetime64[D]'), np.array([], dtype=np.float64), vazio
+    n = len(pesagens)
+    pet_ids = np.fromiter((p.get('pet_id') or 0 for p in pesagens), dtype=np.int64, count=n)
+    # Converter por ordinal é bem mais rápido que np.array de objetos date
+    dias = np.fromiter((p['data_pesagem'].toordinal() for p in pesagens), dtype=np.int64, count=n)
+    datas = (dias - _ORDINAL_EPOCH).astype('datetime64[D]')
+    pesos = np.fromiter((float(p['peso']) for p in pesagens), dtype=np.float64, count=n)
+    ids = np.fromiter((p['id'] for p in pesagens), dtype=np.int64, count=n)
+    # np.lexsort ordena pela última chave primeiro: pet, depois data
+    ordem = np.lexsort((ids, datas, pet_ids))
+    return pet_ids[ordem], datas[ordem], pesos[ordem], ids[ordem]
+
+
+def variacao(pesos, pet_ids=None):
+    """Diferença para a pesagem anterior (NaN na primeira pesagem de cada pet)"""
+    resultado = np.full(pesos.shape, np.nan)
+    if len(pesos) > 1:
+        resultado[1:] = np.diff(pesos)
+        if pet_ids is not None:
+            resultado[1:][pet_ids[1:] != pet_ids[:-1]] = np.nan
+    return resultado
+
+
+def taxa_semanal(datas, pesos, pet_ids=None):
+    """Variação em kg por semana entre pesagens consecutivas (NaN quando não há intervalo)"""
+    resultado = np.full(pesos.shape, np.nan)
+    if len(pesos) > 1:
+        dias = np.diff(datas).astype(np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            resultado[1:] = np.where(dias > 0, np.diff(pesos) / dias * 7, np.nan)
+        if pet_ids is not None:
+            resultado[1:][pet_ids[1:] != pet_ids[:-1]] = np.nan
+    return resultado
+
+
+def media_movel(datas, pesos, janela_dias=30):
+    """Média das pesagens dos últimos janela_dias dias (inclusive) em cada ponto
+    Série de um único pet, em ordem de data; funciona com pesagens irregulares
+    """
+    if len(pesos) == 0:
+        return pesos.copy()
+    acumulado = np.concatenate(([0.0], np.cumsum(pesos)))
+    inicio = np.searchsorted(datas, datas - np.timedelta64(janela_dias - 1, 'D'), side='left')
+    fim = np.arange(1, len(pesos) + 1)
+    return (acumulado[fim] - acumulado[inicio]) / (fim - inicio)
+
+
+def lttb(x, y, pontos):
+    """Largest-Triangle-Three-Buckets: índices dos pontos que preservam o formato da série
+    x e y numéricos (datas como dias), em ordem crescente de x
+    """
+    n = len(x)
+    if pontos >= n or pontos < 3:
+        return np.arange(n)
+
+    indices = np.empty(pontos, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    # Limites dos baldes internos (primeiro e último pontos ficam fixos)
+    limites = np.linspace(1, n - 1, pontos - 1).astype(np.int64)
+    anterior = 0
+    for balde in range(pontos - 2):
+        inicio, fim = limites[balde], limites[balde + 1]
+        proximo_inicio, proximo_fim = limites[balde + 1], limites[balde + 2] if balde + 2 < len(limites) else n
+        if proximo_fim <= proximo_inicio:
+            proximo_fim = proximo_inicio + 1
+        media_x = x[proximo_inicio:proximo_fim].mean()
+        media_y = y[proximo_inicio:proximo_fim].mean()
+        # Área do triângulo (ponto anterior escolhido, candidato, média do próximo balde)
+        areas = np.abs(
+            (x[anterior] - media_x) * (y[inicio:fim] - y[anterior])
+            - (x[anterior] - x[inicio:fim]) * (media_y - y[anterior])
+        )
+        anterior = inicio + int(np.argmax(areas))
+        indices[balde + 1] = anterior
+    return indices
+
+
+def serie_do_pet(pesagens, janela_dias=30, pontos=PONTOS_GRAFICO):
+    """Série pronta para o gráfico de um pet: dicionário de arrays já reduzidos
+    Chaves: datas, peso, media_movel, taxa_semanal (kg/semana)
+    """
+    _, datas, pesos, _ = arrays_de_pesagens(pesagens)
+    media = media_movel(datas, pesos, janela_dias)
+    taxa = taxa_semanal(datas, pesos)
+    indices = lttb(datas.astype(np.float64), pesos, pontos)
+    return {
+        'datas': datas[indices],
+        'peso': pesos[indices],
+        'media_movel': media[indices],
+        'taxa_semanal': taxa[indices]
+    }
+
+
+def variacoes_por_registro(pesagens):
+    """{id da pesagem: diferença para a pesagem anterior do mesmo pet} (todas de uma vez)"""
+    pet_ids, _, pesos, ids = arrays_de_pesagens(pesagens)
+    diferencas = variacao(pesos, pet_ids)
+    return {int(i): (None if np.isnan(d) else float(d)) for i, d in zip(ids, diferencas)}
+
+
+def resumo_do_pet(pesagens, dias=30):
+    """(peso atual, variação nos últimos `dias` dias, taxa semanal da última pesagem) ou None"""
+    _, datas, pesos, _ = arrays_de_pesagens(pesagens)
+    if len(pesos) == 0:
+        return None
+    inicio = np.searchsorted(datas, datas[-1] - np.timedelta64(dias, 'D'), side='left')
+    variacao_periodo = float(pesos[-1] - pesos[inicio]) if inicio < len(pesos) - 1 else None
+    taxa = taxa_semanal(datas, pesos)[-1]
+    return float(pesos[-1]), variacao_periodo, (None if np.isnan(taxa) else float(taxa))
+
+
+# ==================== ANOMALIAS DE PESO ====================
+# Variação percentual por semana (em módulo) a partir da qual a pesagem
+# vira alerta: (amarelo, vermelho). Gatos e aves toleram menos perda
+# rápida que cães; espécies não listadas usam o padrão.
+LIMITES_ESPECIE = {
+    'Cão': (3.0, 5.0),
+    'Gato': (2.0, 4.0),
+    'Pássaro': (2.0, 4.0)
+}
+LIMITES_PADRAO = (3.0, 5.0)
+
+# A pesagem de referência é a última feita ao menos INTERVALO_MINIMO dias
+# antes (evita ruído de pesagens no mesmo dia) e no máximo INTERVALO_MAXIMO
+# dias antes (referências antigas diluem a variação)
+INTERVALO_MINIMO = 7
+INTERVALO_MAXIMO = 60
+
+# Uma anomalia só afeta o status enquanto a pesagem for recente
+VALIDADE_ALERTA = 30
+
+
+def variacao_semanal_percentual(pet_ids, datas, pesos):
+    """Variação % por semana de cada pesagem em relação à referência do mesmo pet
+    Arrays ordenados por pet e data (arrays_de_pesagens); NaN quando não há referência
+    """
+    resultado = np.full(pesos.shape, np.nan)
+    if len(pesos) < 2:
+        return resultado
+    dias = datas.astype(np.int64)
+    # Chave única (pet, dia) em ordem crescente para uma busca binária em todos os pets de uma vez
+    deslocamento = dias.max() - dias.min() + INTERVALO_MAXIMO + 1
+    chave = (pet_ids - pet_ids.min()) * deslocamento + (dias - dias.min())
+    referencia = np.searchsorted(chave, chave - INTERVALO_MINIMO, side='right') - 1
+    valida = referencia >= 0
+    referencia = np.where(valida, referencia, 0)
+    intervalo = dias - dias[referencia]
+    valida &= (pet_ids[referencia] == pet_ids) & (intervalo >= INTERVALO_MINIMO) & (intervalo <= INTERVALO_MAXIMO)
+    valida &= pesos[referencia] > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        taxa = (pesos - pesos[referencia]) / pesos[referencia] / intervalo * 7 * 100
+    resultado[valida] = taxa[valida]
+    return resultado
+
+
+def anomalias_de_peso(arrays, pets, hoje):
+    """Alertas de peso por pet em uma única passada vetorizada sobre todas as pesagens
+    arrays: resultado de arrays_de_pesagens (montado uma vez por carga de dados)
+    Considera a pesagem mais recente de cada pet (se feita nos últimos VALIDADE_ALERTA dias)
+    Retorna {pet_id: {'nivel': 'amarelo'|'vermelho', 'variacao_semanal': %, 'data': data}}
+    """
+    pet_ids, datas, pesos, _ = arrays
+    if len(pesos) == 0:
+        return {}
+    taxa = variacao_semanal_percentual(pet_ids, datas, pesos)
+
+    # Última pesagem de cada pet (arrays ordenados por pet e data)
+    ultima = np.flatnonzero(np.append(pet_ids[1:] != pet_ids[:-1], True))
+    recente = datas[ultima] >= np.datetime64(hoje, 'D') - np.timedelta64(VALIDADE_ALERTA, 'D')
+    ultima = ultima[recente & ~np.isnan(taxa[ultima])]
+    if len(ultima) == 0:
+        return {}
+
+    especies = {pet['id']: pet.get('especie') for pet in pets}
+    limites = np.array([LIMITES_ESPECIE.get(especies.get(int(p)), LIMITES_PADRAO) for p in pet_ids[ultima]])
+    intensidade = np.abs(taxa[ultima])
+    niveis = np.where(intensidade >= limites[:, 1], 'vermelho', np.where(intensidade >= limites[:, 0], 'amarelo', ''))
+
+    alertas = {}
+    for indice, nivel in zip(ultima, niveis):
+        if nivel:
+            alertas[int(pet_ids[indice])] = {
+                'nivel': str(nivel),
+                'variacao_semanal': float(taxa[indice]),
+                'data': datas[indice].astype(object)
+            }
+    return alertas
@@ -0,0 +1,215 @@
+-- ==================== PAINEL ADMINISTRATIVO ====================
+-- Execute estes comandos no SQL Editor do Supabase (após supabase_lembretes.sql)
+--
+-- Agregados sobre todos os usuários para a seção "Administração" do app.
+-- As funções rodam como SECURITY DEFINER (ignoram o RLS) e só respondem a
+-- usuários cadastrados em administradores; devolvem apenas contagens,
+-- nunca registros individuais.
+--
+-- Para liberar o acesso a um usuário:
+-- INSERT INTO administradores (user_id) SELECT id FROM profiles WHERE email = 'voce@exemplo.com';
+
+-- ========================================
+-- 1. ADMINISTRADORES
+-- ========================================
+
+CREATE TABLE IF NOT EXISTS administradores (
+    user_id UUID PRIMARY KEY REFERENCES auth.users(id) ON DELETE CASCADE,
+    criado_em TIMESTAMP DEFAULT NOW()
+);
+
+-- RLS sem políticas: a tabela só é lida pelas funções abaixo
+ALTER TABLE administradores ENABLE ROW LEVEL SECURITY;
+REVOKE ALL ON TABLE administradores FROM anon, authenticated;
+
+CREATE OR REPLACE FUNCTION is_admin()
+RETURNS BOOLEAN
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public, pg_temp
+AS $$
+    SELECT EXISTS (SELECT 1 FROM administradores WHERE user_id = auth.uid());
+$$;
+
+-- Índice para contar pets por usuário sem ler a tabela
+CREATE INDEX IF NOT EXISTS idx_pets_user_id ON pets(user_id);
+
+-- ========================================
+-- 2. AGREGADOS
+-- ========================================
+
+-- Perfis e pets por plano, comparados aos limites do app (PLANOS em app.py)
+-- limites: {"Essencial": 1, "Plus": 4, "Elite": 15}
+CREATE OR REPLACE FUNCTION admin_planos(limites JSONB)
+RETURNS TABLE (
+    plano TEXT,
+    perfis BIGINT,
+    ativos BIGINT,
+    pets BIGINT,
+    media_pets NUMERIC,
+    no_limite BIGINT,
+    acima_do_limite BIGINT
+)
+LANGUAGE plpgsql
+STABLE
+SECURITY DEFINER
+SET search_path = public, pg_temp
+AS $$
+BEGIN
+    IF NOT is_admin() THEN
+        RAISE EXCEPTION 'Acesso restrito a administradores' USING ERRCODE = '42501';
+    END IF;
+
+    RETURN QUERY
+    WITH pets_por_usuario AS (
+        SELECT p.user_id, COUNT(*) AS total
+        FROM pets p
+        GROUP BY p.user_id
+    )
+    SELECT
+        pr.plano,
+        COUNT(*),
+        COUNT(*) FILTER (WHERE pr.status = 'ativo'),
+        COALESCE(SUM(pu.total), 0)::BIGINT,
+        ROUND(COALESCE(AVG(pu.total) FILTER (WHERE pr.status = 'ativo'), 0), 2),
+        COUNT(*) FILTER (WHERE pr.status = 'ativo' AND COALESCE(pu.total, 0) = (limites->>pr.plano)::INTEGER),
+        COUNT(*) FILTER (WHERE COALESCE(pu.total, 0) > (limites->>pr.plano)::INTEGER)
+    FROM profiles pr
+    LEFT JOIN pets_por_usuario pu ON pu.user_id = pr.id
+    GROUP BY pr.plano
+    ORDER BY (limites->>pr.plano)::INTEGER;
+END;
+$$;
+
+-- Vacinas pendentes, vencidas e vencendo em 7 dias (usuários ativos), por plano
+CREATE OR REPLACE FUNCTION admin_vacinas(hoje DATE DEFAULT CURRENT_DATE)
+RETURNS TABLE (
+    plano TEXT,
+    usuarios BIGINT,
+    pendentes BIGINT,
+    vencidas BIGINT,
+    vencendo_7_dias BIGINT,
+    usuarios_com_vencidas BIGINT
+)
+LANGUAGE plpgsql
+STABLE
+SECURITY DEFINER
+SET search_path = public, pg_temp
+AS $$
+BEGIN
+    IF NOT is_admin() THEN
+        RAISE EXCEPTION 'Acesso restrito a administradores' USING ERRCODE = '42501';
+    END IF;
+
+    RETURN QUERY
+    -- Uma linha por usuário com vacina pendente (índice parcial idx_vacinas_pendentes)
+    WITH por_usuario AS (
+        SELECT
+            v.user_id,
+            COUNT(*) AS pendentes,
+            COUNT(*) FILTER (WHERE v.proxima_dose < hoje) AS vencidas,
+            COUNT(*) FILTER (WHERE v.proxima_dose BETWEEN hoje AND hoje + 7) AS vencendo
+        FROM vacinas v
+        WHERE v.concluido = FALSE AND v.proxima_dose IS NOT NULL
+        GROUP BY v.user_id
+    )
+    SELECT
+        pr.plano,
+        COUNT(*),
+        COALESCE(SUM(pu.pendentes), 0)::BIGINT,
+        COALESCE(SUM(pu.vencidas), 0)::BIGINT,
+        COALESCE(SUM(pu.vencendo), 0)::BIGINT,
+        COUNT(*) FILTER (WHERE pu.vencidas > 0)
+    FROM profiles pr
+    LEFT JOIN por_usuario pu ON pu.user_id = pr.id
+    WHERE pr.status = 'ativo'
+    GROUP BY pr.plano
+    ORDER BY pr.plano;
+END;
+$$;
+
+-- Perfis por origem (webhook_source) e status
+CREATE OR REPLACE FUNCTION admin_fontes()
+RETURNS TABLE (fonte TEXT, status TEXT, perfis BIGINT)
+LANGUAGE plpgsql
+STABLE
+SECURITY DEFINER
+SET search_path = public, pg_temp
+AS $$
+BEGIN
+    IF NOT is_admin() THEN
+        RAISE EXCEPTION 'Acesso restrito a administradores' USING ERRCODE = '42501';
+    END IF;
+
+    RETURN QUERY
+    SELECT COALESCE(pr.webhook_source, 'manual'), pr.status, COUNT(*)
+    FROM profiles pr
+    GROUP BY 1, 2
+    ORDER BY 3 DESC;
+END;
+$$;
+
+-- Novos perfis e novos pets por semana (últimas `semanas` semanas)
+CREATE OR REPLACE FUNCTION admin_cadastros(semanas INTEGER DEFAULT 12)
+RETURNS TABLE (semana DATE, plano TEXT, perfis BIGINT, pets BIGINT)
+LANGUAGE plpgsql
+STABLE
+SECURITY DEFINER
+SET search_path = public, pg_temp
+AS $$
+DECLARE
+    inicio TIMESTAMP := date_trunc('week', NOW()) - make_interval(weeks => semanas - 1);
+BEGIN
+    IF NOT is_admin() THEN
+        RAISE EXCEPTION 'Acesso restrito a administradores' USING ERRCODE = '42501';
+    END IF;
+
+    RETURN QUERY
+    WITH novos_perfis AS (
+        SELECT date_trunc('week', pr.created_at)::DATE AS semana, pr.plano, COUNT(*) AS total
+        FROM profiles pr
+        WHERE pr.created_at >= inicio
+        GROUP BY 1, 2
+    ),
+    novos_pets AS (
+        SELECT date_trunc('week', p.created_at)::DATE AS semana, pr.plano, COUNT(*) AS total
+        FROM pets p
+        JOIN profiles pr ON pr.id = p.user_id
+        WHERE p.created_at >= inicio
+        GROUP BY 1, 2
+    )
+    SELECT
+        COALESCE(np.semana, pt.semana),
+        COALESCE(np.plano, pt.plano),
+        COALESCE(np.total, 0)::BIGINT,
+        COALESCE(pt.total, 0)::BIGINT
+    FROM novos_perfis np
+    FULL JOIN novos_pets pt ON pt.semana = np.semana AND pt.plano = np.plano
+    ORDER BY 1, 2;
+END;
+$$;
+
+-- ========================================
+-- 3. ÍNDICES DOS PERÍODOS
+-- ========================================
+
+CREATE INDEX IF NOT EXISTS idx_profiles_created_at ON profiles(created_at);
+CREATE INDEX IF NOT EXISTS idx_pets_created_at ON pets(created_at);
+
+-- ========================================
+-- 4. PERMISSÕES
+-- ========================================
+-- Qualquer usuário autenticado pode chamar; as funções recusam quem não é administrador
+
+REVOKE EXECUTE ON FUNCTION is_admin() FROM PUBLIC, anon;
+REVOKE EXECUTE ON FUNCTION admin_planos(JSONB) FROM PUBLIC, anon;
+REVOKE EXECUTE ON FUNCTION admin_vacinas(DATE) FROM PUBLIC, anon;
+REVOKE EXECUTE ON FUNCTION admin_fontes() FROM PUBLIC, anon;
+REVOKE EXECUTE ON FUNCTION admin_cadastros(INTEGER) FROM PUBLIC, anon;
+
+GRANT EXECUTE ON FUNCTION is_admin() TO authenticated;
+GRANT EXECUTE ON FUNCTION admin_planos(JSONB) TO authenticated;
+GRANT EXECUTE ON FUNCTION admin_vacinas(DATE) TO authenticated;
+GRANT EXECUTE ON FUNCTION admin_fontes() TO authenticated;
+GRANT EXECUTE ON FUNCTION admin_cadastros(INTEGER) TO authenticated;
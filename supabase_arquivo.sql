@@ -0,0 +1,270 @@
+-- ==================== ARQUIVO DO HISTÓRICO (DADOS FRIOS) ====================
+-- Execute estes comandos no SQL Editor do Supabase (após supabase_tempo_real.sql)
+--
+-- Tratamentos terminados, vacinas e preventivos concluídos e as doses desses
+-- tratamentos eram lidos em toda recarga do app, embora quase nunca sejam
+-- abertos. arquivar_historico() move esses registros frios para tabelas
+-- *_arquivo com as mesmas colunas: a carga padrão do app só lê as tabelas
+-- quentes, e o arquivo é buscado quando o usuário abre "Histórico completo".
+-- Registros frios:
+-- - medicamentos com data_fim há mais de dias_medicamentos dias (com as
+--   linhas de medicamentos_log);
+-- - vacinas concluídas aplicadas há mais de dias_vacinas dias, sem próxima
+--   dose ou já substituídas por uma aplicação mais nova da mesma vacina no
+--   mesmo pet (a dose mais recente continua quente e segue no semáforo);
+-- - preventivos com a mesma regra (mesmo tipo_preventivo no mesmo pet).
+--
+-- As tabelas *_arquivo copiam as colunas das tabelas quentes no momento em
+-- que são criadas: uma coluna nova em vacinas, preventivos, medicamentos ou
+-- medicamentos_log precisa ser acrescentada também ao arquivo.
+
+-- ========================================
+-- 1. TABELAS DE ARQUIVO
+-- ========================================
+-- Mesmas colunas (e na mesma ordem) das tabelas quentes, mais arquivado_em.
+-- Sem INCLUDING GENERATED, a coluna busca de vacinas vira uma coluna comum
+-- com o valor copiado.
+
+CREATE TABLE IF NOT EXISTS vacinas_arquivo (LIKE vacinas);
+ALTER TABLE vacinas_arquivo ADD COLUMN IF NOT EXISTS arquivado_em TIMESTAMP DEFAULT NOW();
+
+CREATE TABLE IF NOT EXISTS preventivos_arquivo (LIKE preventivos);
+ALTER TABLE preventivos_arquivo ADD COLUMN IF NOT EXISTS arquivado_em TIMESTAMP DEFAULT NOW();
+
+-- doses_realizadas: contadas no arquivamento, para a lista não precisar do log
+CREATE TABLE IF NOT EXISTS medicamentos_arquivo (LIKE medicamentos);
+ALTER TABLE medicamentos_arquivo ADD COLUMN IF NOT EXISTS doses_realizadas INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE medicamentos_arquivo ADD COLUMN IF NOT EXISTS arquivado_em TIMESTAMP DEFAULT NOW();
+
+CREATE TABLE IF NOT EXISTS medicamentos_log_arquivo (LIKE medicamentos_log);
+ALTER TABLE medicamentos_log_arquivo ADD COLUMN IF NOT EXISTS arquivado_em TIMESTAMP DEFAULT NOW();
+
+DO $$
+DECLARE
+    tabela TEXT;
+BEGIN
+    FOREACH tabela IN ARRAY ARRAY[
+        'vacinas_arquivo', 'preventivos_arquivo', 'medicamentos_arquivo', 'medicamentos_log_arquivo'
+    ]
+    LOOP
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_constraint WHERE conrelid = tabela::REGCLASS AND contype = 'p'
+        ) THEN
+            EXECUTE format('ALTER TABLE %I ADD PRIMARY KEY (id)', tabela);
+        END IF;
+        -- Excluir o usuário apaga também o arquivo dele
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_constraint WHERE conname = tabela || '_user_id_fkey'
+        ) THEN
+            EXECUTE format(
+                'ALTER TABLE %I ADD CONSTRAINT %I FOREIGN KEY (user_id) REFERENCES auth.users(id) ON DELETE CASCADE',
+                tabela, tabela || '_user_id_fkey'
+            );
+        END IF;
+    END LOOP;
+END;
+$$;
+
+-- Excluir o pet apaga também o histórico arquivado dele
+DO $$
+DECLARE
+    tabela TEXT;
+BEGIN
+    FOREACH tabela IN ARRAY ARRAY['vacinas_arquivo', 'preventivos_arquivo', 'medicamentos_arquivo']
+    LOOP
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_constraint WHERE conname = tabela || '_pet_id_fkey'
+        ) THEN
+            EXECUTE format(
+                'ALTER TABLE %I ADD CONSTRAINT %I FOREIGN KEY (pet_id) REFERENCES pets(id) ON DELETE CASCADE',
+                tabela, tabela || '_pet_id_fkey'
+            );
+        END IF;
+    END LOOP;
+END;
+$$;
+
+-- Doses arquivadas saem junto com o medicamento arquivado
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'medicamentos_log_arquivo_medicamento_id_fkey'
+    ) THEN
+        ALTER TABLE medicamentos_log_arquivo ADD CONSTRAINT medicamentos_log_arquivo_medicamento_id_fkey
+            FOREIGN KEY (medicamento_id) REFERENCES medicamentos_arquivo(id) ON DELETE CASCADE;
+    END IF;
+END;
+$$;
+
+-- Consultas do "Histórico completo" (por usuário, mais recentes primeiro)
+CREATE INDEX IF NOT EXISTS idx_vacinas_arquivo_user_pet_data ON vacinas_arquivo(user_id, pet_id, data_aplicacao);
+CREATE INDEX IF NOT EXISTS idx_preventivos_arquivo_user_pet_data ON preventivos_arquivo(user_id, pet_id, data_aplicacao);
+CREATE INDEX IF NOT EXISTS idx_medicamentos_arquivo_user_pet_data ON medicamentos_arquivo(user_id, pet_id, data_inicio);
+CREATE INDEX IF NOT EXISTS idx_medicamentos_log_arquivo_medicamento_id ON medicamentos_log_arquivo(medicamento_id);
+CREATE INDEX IF NOT EXISTS idx_medicamentos_log_arquivo_user_id ON medicamentos_log_arquivo(user_id);
+
+-- ========================================
+-- 2. POLÍTICAS RLS
+-- ========================================
+-- O usuário lê e exclui o próprio arquivo; só arquivar_historico() insere.
+
+ALTER TABLE vacinas_arquivo ENABLE ROW LEVEL SECURITY;
+ALTER TABLE preventivos_arquivo ENABLE ROW LEVEL SECURITY;
+ALTER TABLE medicamentos_arquivo ENABLE ROW LEVEL SECURITY;
+ALTER TABLE medicamentos_log_arquivo ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Usuários veem apenas suas vacinas arquivadas" ON vacinas_arquivo;
+CREATE POLICY "Usuários veem apenas suas vacinas arquivadas"
+ON vacinas_arquivo FOR SELECT
+USING (auth.uid() = user_id);
+
+DROP POLICY IF EXISTS "Usuários deletam apenas suas vacinas arquivadas" ON vacinas_arquivo;
+CREATE POLICY "Usuários deletam apenas suas vacinas arquivadas"
+ON vacinas_arquivo FOR DELETE
+USING (auth.uid() = user_id);
+
+DROP POLICY IF EXISTS "Usuários veem apenas seus preventivos arquivados" ON preventivos_arquivo;
+CREATE POLICY "Usuários veem apenas seus preventivos arquivados"
+ON preventivos_arquivo FOR SELECT
+USING (auth.uid() = user_id);
+
+DROP POLICY IF EXISTS "Usuários deletam apenas seus preventivos arquivados" ON preventivos_arquivo;
+CREATE POLICY "Usuários deletam apenas seus preventivos arquivados"
+ON preventivos_arquivo FOR DELETE
+USING (auth.uid() = user_id);
+
+DROP POLICY IF EXISTS "Usuários veem apenas seus medicamentos arquivados" ON medicamentos_arquivo;
+CREATE POLICY "Usuários veem apenas seus medicamentos arquivados"
+ON medicamentos_arquivo FOR SELECT
+USING (auth.uid() = user_id);
+
+DROP POLICY IF EXISTS "Usuários deletam apenas seus medicamentos arquivados" ON medicamentos_arquivo;
+CREATE POLICY "Usuários deletam apenas seus medicamentos arquivados"
+ON medicamentos_arquivo FOR DELETE
+USING (auth.uid() = user_id);
+
+DROP POLICY IF EXISTS "Usuários veem apenas seu log arquivado" ON medicamentos_log_arquivo;
+CREATE POLICY "Usuários veem apenas seu log arquivado"
+ON medicamentos_log_arquivo FOR SELECT
+USING (auth.uid() = user_id);
+
+DROP POLICY IF EXISTS "Usuários deletam apenas seu log arquivado" ON medicamentos_log_arquivo;
+CREATE POLICY "Usuários deletam apenas seu log arquivado"
+ON medicamentos_log_arquivo FOR DELETE
+USING (auth.uid() = user_id);
+
+-- ========================================
+-- 3. ARQUIVAMENTO
+-- ========================================
+-- Chamada por um usuário (rpc), arquiva só os registros dele; pelo
+-- service_role ou pelo pg_cron (sem auth.uid()), os de todos os usuários.
+-- Cada tabela é movida em uma instrução (DELETE ... RETURNING + INSERT), e
+-- a função inteira roda em uma transação: nada fica nas duas tabelas nem
+-- some das duas. Retorna a quantidade de linhas movidas por tabela.
+
+CREATE OR REPLACE FUNCTION arquivar_historico(
+    dias_medicamentos INTEGER DEFAULT 30,
+    dias_vacinas INTEGER DEFAULT 365,
+    dias_preventivos INTEGER DEFAULT 180,
+    hoje DATE DEFAULT CURRENT_DATE
+)
+RETURNS TABLE (tabela TEXT, arquivados BIGINT)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public, pg_temp
+AS $$
+DECLARE
+    usuario UUID := auth.uid();
+    ids_medicamentos BIGINT[];
+    movidos BIGINT;
+BEGIN
+    -- Medicamentos: primeiro copiados (com as doses contadas), depois o log, por fim removidos
+    SELECT COALESCE(array_agg(m.id), '{}') INTO ids_medicamentos
+    FROM medicamentos m
+    WHERE m.data_fim < hoje - dias_medicamentos
+      AND (usuario IS NULL OR m.user_id = usuario);
+
+    INSERT INTO medicamentos_arquivo
+    SELECT m.*, (
+        SELECT COUNT(*)
+        FROM medicamentos_log l
+        WHERE l.medicamento_id = m.id
+          AND l.realizado
+          AND l.numero_dose BETWEEN 1 AND m.duracao * GREATEST(COALESCE(m.doses_por_dia, 1), 1)
+    ), NOW()
+    FROM medicamentos m
+    WHERE m.id = ANY(ids_medicamentos);
+    GET DIAGNOSTICS movidos = ROW_COUNT;
+    tabela := 'medicamentos'; arquivados := movidos; RETURN NEXT;
+
+    WITH removidos AS (
+        DELETE FROM medicamentos_log l WHERE l.medicamento_id = ANY(ids_medicamentos) RETURNING l.*
+    )
+    INSERT INTO medicamentos_log_arquivo SELECT removidos.*, NOW() FROM removidos;
+    GET DIAGNOSTICS movidos = ROW_COUNT;
+    tabela := 'medicamentos_log'; arquivados := movidos; RETURN NEXT;
+
+    DELETE FROM medicamentos m WHERE m.id = ANY(ids_medicamentos);
+
+    -- Vacinas e preventivos concluídos sem próxima dose ou já substituídos
+    WITH removidos AS (
+        DELETE FROM vacinas v
+        WHERE v.concluido
+          AND v.data_aplicacao < hoje - dias_vacinas
+          AND (usuario IS NULL OR v.user_id = usuario)
+          AND (
+              v.proxima_dose IS NULL
+              OR EXISTS (
+                  SELECT 1 FROM vacinas n
+                  WHERE n.pet_id = v.pet_id
+                    AND n.nome_vacina = v.nome_vacina
+                    AND n.data_aplicacao > v.data_aplicacao
+              )
+          )
+        RETURNING v.*
+    )
+    INSERT INTO vacinas_arquivo SELECT removidos.*, NOW() FROM removidos;
+    GET DIAGNOSTICS movidos = ROW_COUNT;
+    tabela := 'vacinas'; arquivados := movidos; RETURN NEXT;
+
+    WITH removidos AS (
+        DELETE FROM preventivos p
+        WHERE p.concluido
+          AND p.data_aplicacao < hoje - dias_preventivos
+          AND (usuario IS NULL OR p.user_id = usuario)
+          AND (
+              p.proxima_dose IS NULL
+              OR EXISTS (
+                  SELECT 1 FROM preventivos n
+                  WHERE n.pet_id = p.pet_id
+                    AND n.tipo_preventivo = p.tipo_preventivo
+                    AND n.data_aplicacao > p.data_aplicacao
+              )
+          )
+        RETURNING p.*
+    )
+    INSERT INTO preventivos_arquivo SELECT removidos.*, NOW() FROM removidos;
+    GET DIAGNOSTICS movidos = ROW_COUNT;
+    tabela := 'preventivos'; arquivados := movidos; RETURN NEXT;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION arquivar_historico(INTEGER, INTEGER, INTEGER, DATE) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION arquivar_historico(INTEGER, INTEGER, INTEGER, DATE) TO authenticated, service_role;
+
+-- ========================================
+-- 4. AGENDAMENTO (OPCIONAL)
+-- ========================================
+-- Com a extensão pg_cron (Database > Extensions), todo dia às 03:30 (UTC):
+-- SELECT cron.schedule('arquivar-historico', '30 3 * * *', $$SELECT * FROM arquivar_historico()$$);
+--
+-- Idades diferentes das padrão:
+-- SELECT * FROM arquivar_historico(dias_medicamentos => 90, dias_vacinas => 730, dias_preventivos => 365);
+
+-- ========================================
+-- 5. CONFERÊNCIA
+-- ========================================
+-- SELECT 'vacinas' AS tabela, (SELECT COUNT(*) FROM vacinas) AS quentes, (SELECT COUNT(*) FROM vacinas_arquivo) AS arquivados
+-- UNION ALL SELECT 'preventivos', (SELECT COUNT(*) FROM preventivos), (SELECT COUNT(*) FROM preventivos_arquivo)
+-- UNION ALL SELECT 'medicamentos', (SELECT COUNT(*) FROM medicamentos), (SELECT COUNT(*) FROM medicamentos_arquivo)
+-- UNION ALL SELECT 'medicamentos_log', (SELECT COUNT(*) FROM medicamentos_log), (SELECT COUNT(*) FROM medicamentos_log_arquivo);
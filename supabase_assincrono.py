@@ -0,0 +1,131 @@
+# ==================== ACESSO ASSÍNCRONO AO SUPABASE ====================
+# Versão assíncrona de supabase_get/post/update/delete sobre httpx.AsyncClient.
+# Um único loop de eventos em uma thread de fundo atende todas as sessões do
+# processo e mantém o pool de conexões aberto entre os reruns; o script do
+# Streamlit (síncrono) usa `executar` como ponte e `reunir` para sobrepor
+# requisições independentes com concorrência limitada e prazo total.
+
+import asyncio
+import threading
+
+import httpx
+
+# Requisições simultâneas por chamada de reunir() e conexões abertas no processo
+SIMULTANEAS = 8
+CONEXOES = 32
+# Prazo de cada requisição e de um reunir()/executar() inteiro
+REQUISICAO_SEGUNDOS = 10.0
+PRAZO_SEGUNDOS = 30.0
+
+_trava = threading.Lock()
+_loop = None
+_cliente = None
+
+
+def _loop_de_fundo():
+    """Loop de eventos do processo (criado no primeiro uso, em uma thread daemon)"""
+    global _loop
+    with _trava:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='supabase-assincrono', daemon=True).start()
+            _loop = loop
+    return _loop
+
+
+def _cliente_http():
+    # Criado dentro do loop de fundo: o AsyncClient só pode ser usado no loop em que nasceu
+    global _cliente
+    if _cliente is None:
+        _cliente = httpx.AsyncClient(
+            timeout=REQUISICAO_SEGUNDOS,
+            limits=httpx.Limits(max_connections=CONEXOES, max_keepalive_connections=CONEXOES)
+        )
+    return _cliente
+
+
+def executar(corrotina, prazo=PRAZO_SEGUNDOS):
+    """Rodar uma corrotina no loop de fundo e esperar o resultado (ponte para código síncrono)
+    Passado o prazo, a corrotina é cancelada e TimeoutError é levantado
+    """
+    futuro = asyncio.run_coroutine_threadsafe(corrotina, _loop_de_fundo())
+    try:
+        return futuro.result(prazo)
+    except TimeoutError:
+        futuro.cancel()
+        raise
+
+
+async def reunir(corrotinas, simultaneas=SIMULTANEAS, prazo=PRAZO_SEGUNDOS):
+    """Aguardar várias corrotinas com no máximo `simultaneas` em andamento
+    Resultados na ordem das corrotinas; a exceção de uma não cancela as outras
+    e volta no lugar do resultado. Passado o prazo, todas são canceladas (TimeoutError)
+    """
+    semaforo = asyncio.Semaphore(simultaneas)
+
+    async def limitada(corrotina):
+        async with semaforo:
+            return await corrotina
+
+    return await asyncio.wait_for(
+        asyncio.gather(*(limitada(c) for c in corrotinas), return_exceptions=True), prazo
+    )
+
+
+class SupabaseAssincrono:
+    """Requisições ao PostgREST com os headers de um usuário (mesmas regras das funções síncronas do app)"""
+
+    def __init__(self, api_url, headers):
+        self.api_url = api_url
+        self.headers = headers
+
+    def _url(self, table, filters):
+        return f'{self.api_url}/{table}' + (f'?{filters}' if filters else '')
+
+    async def get(self, table, filters=None):
+        """Registros da tabela ([] se a resposta não for 200)"""
+        response = await _cliente_http().get(self._url(table, filters), headers=self.headers)
+        return response.json() if response.status_code == 200 else []
+
+    async def post(self, table, data):
+        """Inserir um registro ou uma lista; retorna as linhas gravadas ou None"""
+        response = await _cliente_http().post(self._url(table, None), headers=self.headers, json=data)
+        return response.json() if response.status_code in [200, 201] else None
+
+    async def update(self, table, id_value, data):
+        response = await _cliente_http().patch(self._url(table, f'id=eq.{id_value}'), headers=self.headers, json=data)
+        return response.status_code in [200, 204]
+
+    async def update_em_lote(self, table, ids, data, levantar=False):
+        """Aplicar os mesmos campos a vários registros em uma requisição (id=in.(...))
+        Com levantar=True, uma resposta de erro levanta httpx.HTTPStatusError em vez de retornar False
+        """
+        filtro = f"id=in.({','.join(str(i) for i in ids)})"
+        response = await _cliente_http().patch(self._url(table, filtro), headers=self.headers, json=data)
+        if levantar:
+            response.raise_for_status()
+        return response.status_code in [200, 204]
+
+    async def post_lote(self, table, registros, on_conflict=None, mesclar=False, levantar=False):
+        """Inserir vários registros; com on_conflict, existentes são ignorados ou, com mesclar=True, atualizados
+        Com levantar=True, uma resposta de erro levanta httpx.HTTPStatusError em vez de retornar None
+        """
+        headers = dict(self.headers)
+        filtro = None
+        if on_conflict:
+            filtro = f'on_conflict={on_conflict}'
+            resolucao = 'merge-duplicates' if mesclar else 'ignore-duplicates'
+            headers['Prefer'] = f'return=representation,resolution={resolucao}'
+        response = await _cliente_http().post(self._url(table, filtro), headers=headers, json=registros)
+        if levantar:
+            response.raise_for_status()
+        return response.json() if response.status_code in [200, 201] else None
+
+    async def delete(self, table, filters):
+        """Excluir os registros que atendem aos filtros (ex.: id=eq.7 ou pet_id=eq.3)"""
+        response = await _cliente_http().delete(self._url(table, filters), headers=self.headers)
+        return response.status_code in [200, 204]
+
+    async def rpc(self, funcao, parametros):
+        response = await _cliente_http().post(self._url(f'rpc/{funcao}', None), headers=self.headers, json=parametros)
+        return response.json() if response.status_code == 200 else None
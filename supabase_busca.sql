@@ -0,0 +1,95 @@
+-- ==================== BUSCA TEXTUAL (PORTUGUÊS) ====================
+-- Execute estes comandos no SQL Editor do Supabase (após supabase_webhook_inbox.sql)
+--
+-- Colunas tsvector geradas (configuração 'portuguese', com radicais) em
+-- notas, veterinario e vacinas, índices GIN e a função buscar_registros,
+-- chamada pelo app via /rest/v1/rpc/buscar_registros. A função devolve
+-- apenas um trecho destacado de cada resultado, ordenado por relevância,
+-- sem transferir o texto completo dos registros.
+
+-- ========================================
+-- 1. COLUNAS DE BUSCA
+-- ========================================
+-- Peso A: título/motivo/nome; peso B: corpo do texto.
+
+ALTER TABLE notas ADD COLUMN IF NOT EXISTS busca TSVECTOR
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('portuguese', coalesce(titulo, '')), 'A') ||
+        setweight(to_tsvector('portuguese', coalesce(texto, '')), 'B')
+    ) STORED;
+
+ALTER TABLE veterinario ADD COLUMN IF NOT EXISTS busca TSVECTOR
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('portuguese', coalesce(motivo, '')), 'A') ||
+        setweight(to_tsvector('portuguese', coalesce(diagnostico, '')), 'B') ||
+        setweight(to_tsvector('portuguese', coalesce(prescricoes, '')), 'B') ||
+        setweight(to_tsvector('portuguese', coalesce(nome_veterinario, '')), 'C')
+    ) STORED;
+
+ALTER TABLE vacinas ADD COLUMN IF NOT EXISTS busca TSVECTOR
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('portuguese', coalesce(nome_vacina, '')), 'A') ||
+        setweight(to_tsvector('portuguese', coalesce(observacoes, '')), 'B') ||
+        setweight(to_tsvector('portuguese', coalesce(veterinario, '')), 'C')
+    ) STORED;
+
+-- ========================================
+-- 2. ÍNDICES GIN
+-- ========================================
+
+CREATE INDEX IF NOT EXISTS idx_notas_busca ON notas USING GIN (busca);
+CREATE INDEX IF NOT EXISTS idx_veterinario_busca ON veterinario USING GIN (busca);
+CREATE INDEX IF NOT EXISTS idx_vacinas_busca ON vacinas USING GIN (busca);
+
+-- ========================================
+-- 3. FUNÇÃO DE BUSCA
+-- ========================================
+-- SECURITY INVOKER: o RLS de cada tabela continua valendo (só os registros
+-- do usuário logado). O trecho (ts_headline) é calculado apenas para a
+-- página pedida.
+
+CREATE OR REPLACE FUNCTION buscar_registros(consulta TEXT, limite INTEGER DEFAULT 20, deslocamento INTEGER DEFAULT 0)
+RETURNS TABLE (
+    tabela TEXT,
+    id BIGINT,
+    pet_id BIGINT,
+    data_referencia DATE,
+    titulo TEXT,
+    trecho TEXT,
+    relevancia REAL
+)
+LANGUAGE sql STABLE SECURITY INVOKER
+AS $$
+    WITH q AS (
+        SELECT websearch_to_tsquery('portuguese', consulta) AS tsq
+    ),
+    resultados AS (
+        SELECT 'notas'::TEXT AS tabela, n.id, n.pet_id, n.data_criacao::DATE AS data,
+               n.titulo AS titulo, n.texto AS corpo, ts_rank_cd(n.busca, q.tsq) AS relevancia
+        FROM notas n, q
+        WHERE n.busca @@ q.tsq
+        UNION ALL
+        SELECT 'veterinario', v.id, v.pet_id, v.data_consulta,
+               v.motivo, concat_ws(' — ', v.diagnostico, v.prescricoes), ts_rank_cd(v.busca, q.tsq)
+        FROM veterinario v, q
+        WHERE v.busca @@ q.tsq
+        UNION ALL
+        SELECT 'vacinas', va.id, va.pet_id, va.data_aplicacao,
+               va.nome_vacina, va.observacoes, ts_rank_cd(va.busca, q.tsq)
+        FROM vacinas va, q
+        WHERE va.busca @@ q.tsq
+    ),
+    pagina AS (
+        SELECT * FROM resultados
+        ORDER BY relevancia DESC, data DESC NULLS LAST, id DESC
+        LIMIT least(greatest(limite, 1), 100) OFFSET greatest(deslocamento, 0)
+    )
+    SELECT p.tabela, p.id, p.pet_id, p.data AS data_referencia, p.titulo,
+           ts_headline('portuguese', coalesce(p.corpo, ''), q.tsq,
+                       'StartSel=**, StopSel=**, MaxWords=25, MinWords=8, MaxFragments=2, FragmentDelimiter=" … "'),
+           p.relevancia
+    FROM pagina p, q
+    ORDER BY p.relevancia DESC, p.data DESC NULLS LAST, p.id DESC;
+$$;
+
+GRANT EXECUTE ON FUNCTION buscar_registros(TEXT, INTEGER, INTEGER) TO authenticated;
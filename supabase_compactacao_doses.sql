@@ -0,0 +1,392 @@
+-- ==================== COMPACTAÇÃO DAS DOSES DE TRATAMENTOS TERMINADOS ====================
+-- Execute estes comandos no SQL Editor do Supabase (após supabase_arquivo.sql)
+--
+-- Um tratamento terminado não recebe mais doses, mas o log continua com uma
+-- linha por dose realizada (dezenas ou centenas por tratamento, cada uma com
+-- índice e cabeçalho de linha). compactar_doses() troca essas linhas por um
+-- resumo por medicamento em medicamentos_resumo: doses tomadas, doses
+-- perdidas e um mapa de bits das doses realizadas (bit n-1 = dose n, a partir
+-- do bit menos significativo de cada byte, a numeração de get_bit/set_bit).
+-- Um tratamento de 30 dias com 3 doses diárias cabe em 12 bytes.
+--
+-- A view medicamentos_progresso passa a somar o log e o mapa, então a lista
+-- de "Finalizados" e os lembretes continuam com as mesmas contagens; o app só
+-- decodifica o mapa quando o usuário abre as doses de um tratamento
+-- finalizado. arquivar_historico() passa a levar o mapa para
+-- medicamentos_arquivo.doses_mapa em vez de copiar as linhas do log.
+
+-- ========================================
+-- 1. MAPA DE BITS
+-- ========================================
+
+-- Mapa com as doses `numeros` (fora de 1..total são ignoradas), (total + 7) / 8 bytes
+CREATE OR REPLACE FUNCTION mapa_de_doses(numeros INTEGER[], total INTEGER)
+RETURNS BYTEA
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT COALESCE(
+        decode(string_agg(lpad(to_hex(b.valor), 2, '0'), '' ORDER BY b.posicao), 'hex'),
+        ''::BYTEA
+    )
+    FROM (
+        SELECT
+            i AS posicao,
+            COALESCE((
+                SELECT SUM(DISTINCT 1 << ((n - 1) % 8))
+                FROM unnest(numeros) n
+                WHERE n BETWEEN 1 AND total
+                  AND (n - 1) / 8 = i
+            ), 0)::INTEGER AS valor
+        FROM generate_series(0, (GREATEST(total, 0) + 7) / 8 - 1) i
+    ) b;
+$$;
+
+-- Números das doses marcadas no mapa, em ordem
+CREATE OR REPLACE FUNCTION doses_do_mapa(mapa BYTEA, total INTEGER)
+RETURNS SETOF INTEGER
+LANGUAGE sql
+IMMUTABLE
+STRICT
+AS $$
+    SELECT n
+    FROM generate_series(1, LEAST(total, length(mapa) * 8)) n
+    WHERE get_bit(mapa, n - 1) = 1;
+$$;
+
+-- Dose marcada no mapa (FALSE fora do tamanho do mapa)
+CREATE OR REPLACE FUNCTION dose_no_mapa(mapa BYTEA, numero_dose INTEGER)
+RETURNS BOOLEAN
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT CASE
+        WHEN mapa IS NULL OR numero_dose < 1 OR numero_dose > length(mapa) * 8 THEN FALSE
+        ELSE get_bit(mapa, numero_dose - 1) = 1
+    END;
+$$;
+
+-- ========================================
+-- 2. RESUMOS E ARQUIVO
+-- ========================================
+-- id: chave para a exportação paginada (supabase_get_paginado ordena por id)
+
+CREATE TABLE IF NOT EXISTS medicamentos_resumo (
+    id BIGSERIAL PRIMARY KEY,
+    medicamento_id BIGINT NOT NULL UNIQUE REFERENCES medicamentos(id) ON DELETE CASCADE,
+    user_id UUID REFERENCES auth.users(id) ON DELETE CASCADE,
+    total_doses INTEGER NOT NULL,
+    doses_tomadas INTEGER NOT NULL,
+    doses_perdidas INTEGER NOT NULL,
+    mapa BYTEA NOT NULL,
+    compactado_em TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_medicamentos_resumo_user_id ON medicamentos_resumo(user_id);
+
+-- Doses dos tratamentos arquivados (substitui as linhas de medicamentos_log_arquivo)
+ALTER TABLE medicamentos_arquivo ADD COLUMN IF NOT EXISTS doses_mapa BYTEA;
+
+-- O usuário lê e exclui os próprios resumos; só compactar_doses() grava.
+ALTER TABLE medicamentos_resumo ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Usuários veem apenas seus resumos de doses" ON medicamentos_resumo;
+CREATE POLICY "Usuários veem apenas seus resumos de doses"
+ON medicamentos_resumo FOR SELECT
+USING (auth.uid() = user_id);
+
+DROP POLICY IF EXISTS "Usuários deletam apenas seus resumos de doses" ON medicamentos_resumo;
+CREATE POLICY "Usuários deletam apenas seus resumos de doses"
+ON medicamentos_resumo FOR DELETE
+USING (auth.uid() = user_id);
+
+-- ========================================
+-- 3. PROGRESSO COM OS RESUMOS
+-- ========================================
+-- Mesmas colunas de supabase_progresso_medicamentos.sql. Doses realizadas =
+-- log ∪ mapa (uma dose gravada depois da compactação não conta duas vezes).
+
+CREATE OR REPLACE VIEW medicamentos_progresso
+WITH (security_invoker = true) AS
+SELECT
+    m.id AS medicamento_id,
+    m.user_id,
+    t.total_doses,
+    r.doses_realizadas,
+    t.total_doses - r.doses_realizadas AS doses_pendentes,
+    p.numero_dose AS proxima_dose_numero,
+    m.data_inicio + ((p.numero_dose - 1) / t.doses_por_dia) AS proxima_dose_data
+FROM medicamentos m
+CROSS JOIN LATERAL (
+    SELECT
+        GREATEST(COALESCE(m.doses_por_dia, 1), 1) AS doses_por_dia,
+        m.duracao * GREATEST(COALESCE(m.doses_por_dia, 1), 1) AS total_doses
+) t
+LEFT JOIN medicamentos_resumo s ON s.medicamento_id = m.id
+CROSS JOIN LATERAL (
+    SELECT COUNT(*)::INTEGER AS doses_realizadas
+    FROM (
+        SELECT l.numero_dose
+        FROM medicamentos_log l
+        WHERE l.medicamento_id = m.id
+          AND l.realizado
+          AND l.numero_dose BETWEEN 1 AND t.total_doses
+        UNION
+        SELECT d.numero_dose
+        FROM doses_do_mapa(s.mapa, t.total_doses) AS d(numero_dose)
+    ) feitas
+) r
+-- Próxima dose pendente: a dose 1 ou a primeira lacuna após uma dose realizada
+LEFT JOIN LATERAL (
+    SELECT c.numero_dose
+    FROM (
+        SELECT 1 AS numero_dose
+        UNION ALL
+        SELECT l.numero_dose + 1
+        FROM medicamentos_log l
+        WHERE l.medicamento_id = m.id AND l.realizado
+        UNION ALL
+        SELECT d.numero_dose + 1
+        FROM doses_do_mapa(s.mapa, t.total_doses) AS d(numero_dose)
+    ) c
+    WHERE c.numero_dose <= t.total_doses
+      AND NOT dose_no_mapa(s.mapa, c.numero_dose)
+      AND NOT EXISTS (
+          SELECT 1 FROM medicamentos_log x
+          WHERE x.medicamento_id = m.id
+            AND x.numero_dose = c.numero_dose
+            AND x.realizado
+      )
+    ORDER BY c.numero_dose
+    LIMIT 1
+) p ON TRUE;
+
+GRANT SELECT ON medicamentos_progresso TO authenticated;
+
+-- ========================================
+-- 4. COMPACTAÇÃO
+-- ========================================
+
+-- Resumo (log ∪ mapa já existente) dos medicamentos `ids` e remoção do log deles.
+-- Uso interno de compactar_doses() e arquivar_historico(); retorna as linhas removidas do log.
+CREATE OR REPLACE FUNCTION compactar_medicamentos(ids BIGINT[])
+RETURNS BIGINT
+LANGUAGE plpgsql
+SET search_path = public, pg_temp
+AS $$
+DECLARE
+    removidas BIGINT;
+BEGIN
+    INSERT INTO medicamentos_resumo AS s (medicamento_id, user_id, total_doses, doses_tomadas, doses_perdidas, mapa)
+    SELECT m.id, m.user_id, t.total_doses, f.tomadas, t.total_doses - f.tomadas, mapa_de_doses(f.numeros, t.total_doses)
+    FROM medicamentos m
+    CROSS JOIN LATERAL (
+        SELECT m.duracao * GREATEST(COALESCE(m.doses_por_dia, 1), 1) AS total_doses
+    ) t
+    CROSS JOIN LATERAL (
+        SELECT COUNT(*)::INTEGER AS tomadas, COALESCE(array_agg(feitas.numero_dose), '{}') AS numeros
+        FROM (
+            SELECT l.numero_dose
+            FROM medicamentos_log l
+            WHERE l.medicamento_id = m.id AND l.realizado
+            UNION
+            SELECT d.numero_dose
+            FROM medicamentos_resumo r, doses_do_mapa(r.mapa, r.total_doses) AS d(numero_dose)
+            WHERE r.medicamento_id = m.id
+        ) feitas
+        WHERE feitas.numero_dose BETWEEN 1 AND t.total_doses
+    ) f
+    WHERE m.id = ANY(ids)
+    ON CONFLICT (medicamento_id) DO UPDATE SET
+        total_doses = EXCLUDED.total_doses,
+        doses_tomadas = EXCLUDED.doses_tomadas,
+        doses_perdidas = EXCLUDED.doses_perdidas,
+        mapa = EXCLUDED.mapa,
+        compactado_em = NOW();
+
+    DELETE FROM medicamentos_log l WHERE l.medicamento_id = ANY(ids);
+    GET DIAGNOSTICS removidas = ROW_COUNT;
+    RETURN removidas;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION compactar_medicamentos(BIGINT[]) FROM PUBLIC, anon, authenticated;
+
+-- Chamada por um usuário (rpc), compacta só os tratamentos dele; pelo
+-- service_role ou pelo pg_cron (sem auth.uid()), os de todos os usuários.
+-- Compacta os tratamentos terminados há mais de `dias` dias (ainda com linhas
+-- no log ou sem resumo) e dobra no doses_mapa do arquivo as linhas que
+-- arquivamentos anteriores deixaram em medicamentos_log_arquivo.
+CREATE OR REPLACE FUNCTION compactar_doses(
+    dias INTEGER DEFAULT 7,
+    hoje DATE DEFAULT CURRENT_DATE
+)
+RETURNS TABLE (tabela TEXT, compactados BIGINT)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public, pg_temp
+AS $$
+DECLARE
+    usuario UUID := auth.uid();
+    ids_medicamentos BIGINT[];
+    movidos BIGINT;
+BEGIN
+    SELECT COALESCE(array_agg(m.id), '{}') INTO ids_medicamentos
+    FROM medicamentos m
+    WHERE m.data_fim < hoje - dias
+      AND (usuario IS NULL OR m.user_id = usuario)
+      AND (
+          EXISTS (SELECT 1 FROM medicamentos_log l WHERE l.medicamento_id = m.id)
+          OR NOT EXISTS (SELECT 1 FROM medicamentos_resumo s WHERE s.medicamento_id = m.id)
+      );
+
+    movidos := compactar_medicamentos(ids_medicamentos);
+    tabela := 'medicamentos'; compactados := cardinality(ids_medicamentos); RETURN NEXT;
+    tabela := 'medicamentos_log'; compactados := movidos; RETURN NEXT;
+
+    -- Arquivo: mapa = doses_mapa ∪ linhas de medicamentos_log_arquivo
+    UPDATE medicamentos_arquivo a
+    SET doses_mapa = mapa_de_doses(f.numeros, t.total_doses),
+        doses_realizadas = f.tomadas
+    FROM medicamentos_arquivo m
+    CROSS JOIN LATERAL (
+        SELECT m.duracao * GREATEST(COALESCE(m.doses_por_dia, 1), 1) AS total_doses
+    ) t
+    CROSS JOIN LATERAL (
+        SELECT COUNT(*)::INTEGER AS tomadas, COALESCE(array_agg(feitas.numero_dose), '{}') AS numeros
+        FROM (
+            SELECT l.numero_dose
+            FROM medicamentos_log_arquivo l
+            WHERE l.medicamento_id = m.id AND l.realizado
+            UNION
+            SELECT d.numero_dose
+            FROM doses_do_mapa(m.doses_mapa, t.total_doses) AS d(numero_dose)
+        ) feitas
+        WHERE feitas.numero_dose BETWEEN 1 AND t.total_doses
+    ) f
+    WHERE a.id = m.id
+      AND (usuario IS NULL OR m.user_id = usuario)
+      AND (
+          m.doses_mapa IS NULL
+          OR EXISTS (SELECT 1 FROM medicamentos_log_arquivo l WHERE l.medicamento_id = m.id)
+      );
+
+    DELETE FROM medicamentos_log_arquivo l
+    WHERE usuario IS NULL OR l.user_id = usuario;
+    GET DIAGNOSTICS movidos = ROW_COUNT;
+    tabela := 'medicamentos_log_arquivo'; compactados := movidos; RETURN NEXT;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION compactar_doses(INTEGER, DATE) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION compactar_doses(INTEGER, DATE) TO authenticated, service_role;
+
+-- ========================================
+-- 5. ARQUIVAMENTO COM O MAPA
+-- ========================================
+-- Mesma função de supabase_arquivo.sql; os medicamentos são compactados antes
+-- de ir para o arquivo e levam o mapa em doses_mapa. O log não é mais copiado
+-- para medicamentos_log_arquivo (a linha 'medicamentos_log' do retorno conta
+-- as linhas compactadas).
+
+CREATE OR REPLACE FUNCTION arquivar_historico(
+    dias_medicamentos INTEGER DEFAULT 30,
+    dias_vacinas INTEGER DEFAULT 365,
+    dias_preventivos INTEGER DEFAULT 180,
+    hoje DATE DEFAULT CURRENT_DATE
+)
+RETURNS TABLE (tabela TEXT, arquivados BIGINT)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public, pg_temp
+AS $$
+DECLARE
+    usuario UUID := auth.uid();
+    ids_medicamentos BIGINT[];
+    compactadas BIGINT;
+    movidos BIGINT;
+BEGIN
+    -- Medicamentos: compactados, copiados com o resumo e removidos
+    SELECT COALESCE(array_agg(m.id), '{}') INTO ids_medicamentos
+    FROM medicamentos m
+    WHERE m.data_fim < hoje - dias_medicamentos
+      AND (usuario IS NULL OR m.user_id = usuario);
+
+    compactadas := compactar_medicamentos(ids_medicamentos);
+
+    INSERT INTO medicamentos_arquivo
+    SELECT m.*, s.doses_tomadas, NOW(), s.mapa
+    FROM medicamentos m
+    JOIN medicamentos_resumo s ON s.medicamento_id = m.id
+    WHERE m.id = ANY(ids_medicamentos);
+    GET DIAGNOSTICS movidos = ROW_COUNT;
+    tabela := 'medicamentos'; arquivados := movidos; RETURN NEXT;
+    tabela := 'medicamentos_log'; arquivados := compactadas; RETURN NEXT;
+
+    -- O resumo sai junto (ON DELETE CASCADE)
+    DELETE FROM medicamentos m WHERE m.id = ANY(ids_medicamentos);
+
+    -- Vacinas e preventivos concluídos sem próxima dose ou já substituídos
+    WITH removidos AS (
+        DELETE FROM vacinas v
+        WHERE v.concluido
+          AND v.data_aplicacao < hoje - dias_vacinas
+          AND (usuario IS NULL OR v.user_id = usuario)
+          AND (
+              v.proxima_dose IS NULL
+              OR EXISTS (
+                  SELECT 1 FROM vacinas n
+                  WHERE n.pet_id = v.pet_id
+                    AND n.nome_vacina = v.nome_vacina
+                    AND n.data_aplicacao > v.data_aplicacao
+              )
+          )
+        RETURNING v.*
+    )
+    INSERT INTO vacinas_arquivo SELECT removidos.*, NOW() FROM removidos;
+    GET DIAGNOSTICS movidos = ROW_COUNT;
+    tabela := 'vacinas'; arquivados := movidos; RETURN NEXT;
+
+    WITH removidos AS (
+        DELETE FROM preventivos p
+        WHERE p.concluido
+          AND p.data_aplicacao < hoje - dias_preventivos
+          AND (usuario IS NULL OR p.user_id = usuario)
+          AND (
+              p.proxima_dose IS NULL
+              OR EXISTS (
+                  SELECT 1 FROM preventivos n
+                  WHERE n.pet_id = p.pet_id
+                    AND n.tipo_preventivo = p.tipo_preventivo
+                    AND n.data_aplicacao > p.data_aplicacao
+              )
+          )
+        RETURNING p.*
+    )
+    INSERT INTO preventivos_arquivo SELECT removidos.*, NOW() FROM removidos;
+    GET DIAGNOSTICS movidos = ROW_COUNT;
+    tabela := 'preventivos'; arquivados := movidos; RETURN NEXT;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION arquivar_historico(INTEGER, INTEGER, INTEGER, DATE) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION arquivar_historico(INTEGER, INTEGER, INTEGER, DATE) TO authenticated, service_role;
+
+-- Linhas antigas de medicamentos_log_arquivo vão para doses_mapa agora
+SELECT * FROM compactar_doses();
+
+-- ========================================
+-- 6. AGENDAMENTO (OPCIONAL)
+-- ========================================
+-- Com a extensão pg_cron, todo dia às 03:15 (UTC), antes do arquivamento:
+-- SELECT cron.schedule('compactar-doses', '15 3 * * *', $$SELECT * FROM compactar_doses()$$);
+
+-- ========================================
+-- 7. CONFERÊNCIA
+-- ========================================
+-- SELECT pg_size_pretty(pg_total_relation_size('medicamentos_log')) AS log,
+--        pg_size_pretty(pg_total_relation_size('medicamentos_resumo')) AS resumos,
+--        (SELECT COUNT(*) FROM medicamentos_resumo) AS tratamentos_compactados;
+--
+-- Decodificar o mapa de um tratamento:
+-- SELECT d AS dose FROM medicamentos_resumo s, doses_do_mapa(s.mapa, s.total_doses) d WHERE s.medicamento_id = 1;
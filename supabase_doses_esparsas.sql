@@ -0,0 +1,19 @@
+-- ==================== DOSES ESPARSAS (MEDICAMENTOS_LOG) ====================
+-- Execute estes comandos no SQL Editor do Supabase (após supabase_updates.sql)
+--
+-- A agenda de doses passa a ser calculada pelo app a partir de
+-- data_inicio, duracao e doses_por_dia. A tabela medicamentos_log guarda
+-- somente as doses realizadas.
+
+-- 1. Remover as doses futuras materializadas (realizado = FALSE)
+DELETE FROM medicamentos_log WHERE realizado IS NOT TRUE;
+
+-- 2. Novos registros representam doses realizadas
+ALTER TABLE medicamentos_log ALTER COLUMN realizado SET DEFAULT TRUE;
+
+-- 3. O índice por "realizado" deixa de ter utilidade (todas as linhas são TRUE)
+DROP INDEX IF EXISTS idx_medicamentos_log_realizado;
+
+-- 4. Compactar a tabela após a remoção
+-- (Opcional - execute fora de uma transação)
+-- VACUUM (ANALYZE) medicamentos_log;
@@ -0,0 +1,19 @@
+-- ==================== EMAIL NORMALIZADO DOS PERFIS ====================
+-- Execute estes comandos no SQL Editor do Supabase (após supabase_compactacao_doses.sql)
+-- (apenas se usar o webhook_worker.py)
+--
+-- O webhook_worker.py resolve os clientes dos webhooks por email em lote
+-- (email=in.(...)), e essa comparação diferencia maiúsculas: um perfil com
+-- "Cliente@Exemplo.com" não era encontrado pelo email do pagamento (que o
+-- worker já normaliza para minúsculas). A busca passa a usar esta coluna,
+-- calculada pelo banco a partir de profiles.email.
+-- ilike não serve aqui: "_" (comum em emails) é curinga no LIKE.
+
+ALTER TABLE profiles
+    ADD COLUMN IF NOT EXISTS email_normalizado TEXT GENERATED ALWAYS AS (lower(btrim(email))) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_profiles_email_normalizado ON profiles(email_normalizado);
+
+-- Conferência: emails que só diferem por maiúsculas (o worker usa o mais antigo)
+-- SELECT email_normalizado, array_agg(email ORDER BY created_at) FROM profiles
+-- GROUP BY email_normalizado HAVING COUNT(*) > 1;
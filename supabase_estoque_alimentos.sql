@@ -0,0 +1,50 @@
+-- ==================== ESTOQUE DE ALIMENTOS ====================
+-- Execute estes comandos no SQL Editor do Supabase (após supabase_busca.sql)
+--
+-- Quantidade em estoque de cada marca/alimento, informada pelo usuário.
+-- O consumo diário vem dos planos alimentares (quantidade × refeições);
+-- o app projeta o estoque atual e em quantos dias ele acaba.
+-- Uma linha por marca: o estoque é compartilhado pelos pets que comem
+-- a mesma ração.
+
+-- ========================================
+-- 1. TABELA
+-- ========================================
+
+CREATE TABLE IF NOT EXISTS estoques_alimento (
+    id BIGSERIAL PRIMARY KEY,
+    user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    marca_nome TEXT NOT NULL, -- normalizada (minúsculas, sem espaços nas pontas)
+    estoque_kg DECIMAL(10,3) NOT NULL CHECK (estoque_kg >= 0),
+    atualizado_em TIMESTAMP DEFAULT NOW(),
+    UNIQUE (user_id, marca_nome)
+);
+
+ALTER TABLE estoques_alimento ENABLE ROW LEVEL SECURITY;
+
+-- ========================================
+-- 2. POLÍTICAS RLS
+-- ========================================
+
+DROP POLICY IF EXISTS "Usuários veem apenas seus estoques" ON estoques_alimento;
+CREATE POLICY "Usuários veem apenas seus estoques"
+ON estoques_alimento FOR SELECT
+USING (auth.uid() = user_id);
+
+DROP POLICY IF EXISTS "Usuários criam apenas seus estoques" ON estoques_alimento;
+CREATE POLICY "Usuários criam apenas seus estoques"
+ON estoques_alimento FOR INSERT
+WITH CHECK (auth.uid() = user_id);
+
+DROP POLICY IF EXISTS "Usuários editam apenas seus estoques" ON estoques_alimento;
+CREATE POLICY "Usuários editam apenas seus estoques"
+ON estoques_alimento FOR UPDATE
+USING (auth.uid() = user_id);
+
+DROP POLICY IF EXISTS "Usuários deletam apenas seus estoques" ON estoques_alimento;
+CREATE POLICY "Usuários deletam apenas seus estoques"
+ON estoques_alimento FOR DELETE
+USING (auth.uid() = user_id);
+
+GRANT SELECT, INSERT, UPDATE, DELETE ON estoques_alimento TO authenticated;
+GRANT USAGE, SELECT ON SEQUENCE estoques_alimento_id_seq TO authenticated;
@@ -0,0 +1,55 @@
+-- ==================== ÍNDICES ALINHADOS AOS PADRÕES DE ACESSO ====================
+-- Execute estes comandos no SQL Editor do Supabase (após supabase_pet_id.sql)
+--
+-- Toda leitura do app passa pelo RLS (user_id = auth.uid()), filtra por pet
+-- e ordena por data. Os índices compostos (user_id, pet_id, data) foram
+-- criados em supabase_pet_id.sql; aqui ficam os índices parciais de
+-- pendências e a limpeza dos índices que passaram a ser redundantes.
+--
+-- Benchmark reproduzível: python scripts/bench_indices.py --dsn <postgres local>
+
+-- ========================================
+-- 1. PENDÊNCIAS (PRÓXIMA DOSE NÃO CONCLUÍDA)
+-- ========================================
+-- Apenas registros pendentes entram no índice, que fica pequeno mesmo
+-- com anos de histórico concluído.
+
+CREATE INDEX IF NOT EXISTS idx_vacinas_pendentes
+    ON vacinas(user_id, proxima_dose)
+    WHERE concluido = FALSE AND proxima_dose IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_preventivos_pendentes
+    ON preventivos(user_id, proxima_dose)
+    WHERE concluido = FALSE AND proxima_dose IS NOT NULL;
+
+-- ========================================
+-- 2. LOG DE DOSES (medicamento_id, numero_dose)
+-- ========================================
+-- Inclui user_id (filtro do RLS) e realizado para que a view
+-- medicamentos_progresso e a lista de doses sejam atendidas só pelo índice.
+-- O índice só por medicamento_id passa a ser um prefixo redundante.
+
+CREATE INDEX IF NOT EXISTS idx_medicamentos_log_medicamento_dose
+    ON medicamentos_log(medicamento_id, numero_dose) INCLUDE (user_id, realizado);
+
+DROP INDEX IF EXISTS idx_medicamentos_log_medicamento_id;
+
+-- ========================================
+-- 3. ÍNDICES SÓ POR user_id COBERTOS PELOS COMPOSTOS
+-- ========================================
+
+DROP INDEX IF EXISTS idx_vacinas_user_id;
+DROP INDEX IF EXISTS idx_alimentacao_user_id;
+DROP INDEX IF EXISTS idx_veterinario_user_id;
+DROP INDEX IF EXISTS idx_medicamentos_user_id;
+DROP INDEX IF EXISTS idx_preventivos_user_id;
+DROP INDEX IF EXISTS idx_peso_user_id;
+DROP INDEX IF EXISTS idx_notas_user_id;
+
+-- ========================================
+-- 4. ATUALIZAR ESTATÍSTICAS
+-- ========================================
+
+ANALYZE vacinas;
+ANALYZE preventivos;
+ANALYZE medicamentos_log;
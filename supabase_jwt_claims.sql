@@ -0,0 +1,49 @@
+-- ==================== PLANO E STATUS NAS CLAIMS DO JWT ====================
+-- Execute estes comandos no SQL Editor do Supabase (após supabase_auth_setup.sql)
+--
+-- Custom Access Token Hook: grava plano e status do perfil em
+-- app_metadata do token. O app lê esses valores do JWT verificado
+-- localmente, sem consultar profiles a cada rerun. Os valores são
+-- atualizados a cada renovação do token.
+--
+-- Depois de executar, habilite em:
+-- Authentication > Hooks > Custom Access Token > public.custom_access_token_hook
+
+CREATE OR REPLACE FUNCTION public.custom_access_token_hook(event JSONB)
+RETURNS JSONB AS $$
+DECLARE
+    claims JSONB;
+    perfil RECORD;
+BEGIN
+    SELECT plano, status INTO perfil
+    FROM public.profiles
+    WHERE id = (event->>'user_id')::UUID;
+
+    claims := event->'claims';
+
+    IF FOUND THEN
+        claims := jsonb_set(
+            claims,
+            '{app_metadata}',
+            COALESCE(claims->'app_metadata', '{}'::JSONB)
+                || jsonb_build_object('plano', perfil.plano, 'status', perfil.status)
+        );
+    END IF;
+
+    RETURN jsonb_set(event, '{claims}', claims);
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- Apenas o serviço de autenticação pode executar o hook
+GRANT USAGE ON SCHEMA public TO supabase_auth_admin;
+GRANT EXECUTE ON FUNCTION public.custom_access_token_hook TO supabase_auth_admin;
+REVOKE EXECUTE ON FUNCTION public.custom_access_token_hook FROM authenticated, anon, public;
+
+-- O hook lê profiles com o papel supabase_auth_admin
+GRANT SELECT ON TABLE public.profiles TO supabase_auth_admin;
+
+DROP POLICY IF EXISTS "Auth admin lê perfis para claims" ON profiles;
+CREATE POLICY "Auth admin lê perfis para claims"
+ON profiles FOR SELECT
+TO supabase_auth_admin
+USING (true);
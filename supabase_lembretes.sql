@@ -0,0 +1,82 @@
+-- ==================== LEMBRETES AGENDADOS ====================
+-- Execute estes comandos no SQL Editor do Supabase (após supabase_estoque_alimentos.sql)
+--
+-- Usado pelo lembretes.py: varre vacinas, preventivos e doses pendentes de
+-- todos os usuários (service role) e envia um aviso por pendência. A tabela
+-- lembretes_enviados garante que cada aviso sai uma única vez: a mesma
+-- pendência na mesma etapa (vence em breve, vencido...) não é reenviada.
+
+-- ========================================
+-- 1. LEMBRETES ENVIADOS
+-- ========================================
+
+CREATE TABLE IF NOT EXISTS lembretes_enviados (
+    tipo TEXT NOT NULL, -- 'vacina', 'preventivo' ou 'dose'
+    registro_id BIGINT NOT NULL, -- id da vacina/preventivo ou do medicamento
+    referencia DATE NOT NULL, -- data da pendência (proxima_dose ou data da dose)
+    etapa TEXT NOT NULL, -- 'vence_em_breve', 'vencido', 'hoje' ou 'atrasada'
+    user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    enviado_em TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (tipo, registro_id, referencia, etapa)
+);
+
+CREATE INDEX IF NOT EXISTS idx_lembretes_enviados_enviado_em
+    ON lembretes_enviados(enviado_em);
+
+-- RLS sem políticas: apenas a service role (que ignora o RLS) acessa a tabela.
+ALTER TABLE lembretes_enviados ENABLE ROW LEVEL SECURITY;
+REVOKE ALL ON TABLE lembretes_enviados FROM anon, authenticated;
+
+-- ========================================
+-- 2. ÍNDICES DA VARREDURA
+-- ========================================
+-- A varredura percorre todos os usuários em ordem de (proxima_dose, id),
+-- só dentro da janela de datas do dia. Os índices de pendências por
+-- usuário (supabase_indices.sql) começam por user_id e não servem aqui.
+
+CREATE INDEX IF NOT EXISTS idx_vacinas_lembretes
+    ON vacinas(proxima_dose, id)
+    WHERE concluido = FALSE AND proxima_dose IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_preventivos_lembretes
+    ON preventivos(proxima_dose, id)
+    WHERE concluido = FALSE AND proxima_dose IS NOT NULL;
+
+-- ========================================
+-- 3. DOSES PENDENTES (TODOS OS USUÁRIOS)
+-- ========================================
+-- Próxima dose pendente de cada medicamento em andamento, quando ela já
+-- está programada (entre desde e hoje). Paginação por medicamento_id
+-- (keyset): passe o último id recebido em apos.
+
+CREATE OR REPLACE FUNCTION lembretes_doses_pendentes(
+    hoje DATE,
+    desde DATE,
+    apos BIGINT DEFAULT 0,
+    limite INTEGER DEFAULT 1000
+)
+RETURNS TABLE (
+    medicamento_id BIGINT,
+    user_id UUID,
+    pet_id BIGINT,
+    nome_remedio TEXT,
+    proxima_dose_numero INTEGER,
+    proxima_dose_data DATE
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT m.id, m.user_id, m.pet_id, m.nome_remedio, p.proxima_dose_numero, p.proxima_dose_data
+    FROM medicamentos m
+    JOIN medicamentos_progresso p ON p.medicamento_id = m.id
+    WHERE m.concluido = FALSE
+      AND m.id > apos
+      AND m.data_inicio <= hoje
+      AND m.data_fim >= desde
+      AND p.proxima_dose_data BETWEEN desde AND hoje
+    ORDER BY m.id
+    LIMIT limite;
+$$;
+
+REVOKE EXECUTE ON FUNCTION lembretes_doses_pendentes(DATE, DATE, BIGINT, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION lembretes_doses_pendentes(DATE, DATE, BIGINT, INTEGER) TO service_role;
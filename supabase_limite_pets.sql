@@ -0,0 +1,59 @@
+-- ==================== LIMITE DE PETS POR PLANO ====================
+-- Execute estes comandos no SQL Editor do Supabase (após supabase_admin.sql)
+--
+-- O app confere o limite antes de mostrar o formulário, mas um segundo
+-- dispositivo ou uma chamada direta à API passavam por cima dele. Este
+-- gatilho confere o limite do plano (profiles.plano) em todo INSERT em
+-- pets. Um advisory lock por usuário serializa inserções simultâneas do
+-- mesmo usuário: a contagem de uma só acontece depois que a outra terminou.
+
+-- Mesmos limites de PLANOS em app.py
+CREATE OR REPLACE FUNCTION limite_de_pets(plano TEXT)
+RETURNS INTEGER
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT CASE plano
+        WHEN 'Essencial' THEN 1
+        WHEN 'Plus' THEN 4
+        WHEN 'Elite' THEN 15
+        ELSE 1
+    END;
+$$;
+
+-- A contagem por usuário usa este índice (também criado em supabase_admin.sql)
+CREATE INDEX IF NOT EXISTS idx_pets_user_id ON pets(user_id);
+
+CREATE OR REPLACE FUNCTION verificar_limite_pets()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public, pg_temp
+AS $$
+DECLARE
+    plano_usuario TEXT;
+    limite INTEGER;
+    cadastrados INTEGER;
+BEGIN
+    -- Liberado no fim da transação
+    PERFORM pg_advisory_xact_lock(hashtextextended('pets:' || NEW.user_id::TEXT, 0));
+
+    SELECT plano INTO plano_usuario FROM profiles WHERE id = NEW.user_id;
+    limite := limite_de_pets(plano_usuario);
+
+    SELECT COUNT(*) INTO cadastrados FROM pets WHERE user_id = NEW.user_id;
+    IF cadastrados >= limite THEN
+        RAISE EXCEPTION 'Limite de % pet(s) do plano % atingido. Faça upgrade para cadastrar mais pets.',
+            limite, COALESCE(plano_usuario, 'Essencial')
+            USING ERRCODE = 'check_violation';
+    END IF;
+
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trigger_limite_pets ON pets;
+CREATE TRIGGER trigger_limite_pets
+    BEFORE INSERT ON pets
+    FOR EACH ROW
+    EXECUTE FUNCTION verificar_limite_pets();
@@ -0,0 +1,121 @@
+-- ==================== CHAVE pet_id NAS TABELAS FILHAS ====================
+-- Execute estes comandos no SQL Editor do Supabase (após supabase_auth_setup.sql)
+--
+-- As tabelas filhas passam a apontar para o pet por uma chave inteira
+-- (pet_id) em vez do nome do pet (coluna texto "pet").
+
+-- ========================================
+-- 1. ADICIONAR pet_id EM TODAS AS TABELAS FILHAS
+-- ========================================
+
+ALTER TABLE vacinas ADD COLUMN IF NOT EXISTS pet_id BIGINT REFERENCES pets(id) ON DELETE CASCADE;
+ALTER TABLE alimentacao ADD COLUMN IF NOT EXISTS pet_id BIGINT REFERENCES pets(id) ON DELETE CASCADE;
+ALTER TABLE veterinario ADD COLUMN IF NOT EXISTS pet_id BIGINT REFERENCES pets(id) ON DELETE CASCADE;
+ALTER TABLE medicamentos ADD COLUMN IF NOT EXISTS pet_id BIGINT REFERENCES pets(id) ON DELETE CASCADE;
+ALTER TABLE preventivos ADD COLUMN IF NOT EXISTS pet_id BIGINT REFERENCES pets(id) ON DELETE CASCADE;
+ALTER TABLE peso ADD COLUMN IF NOT EXISTS pet_id BIGINT REFERENCES pets(id) ON DELETE CASCADE;
+ALTER TABLE notas ADD COLUMN IF NOT EXISTS pet_id BIGINT REFERENCES pets(id) ON DELETE CASCADE;
+
+-- ========================================
+-- 2. PREENCHER pet_id A PARTIR DO NOME (MESMO USUÁRIO)
+-- ========================================
+-- Se o usuário tiver dois pets com o mesmo nome, os registros antigos
+-- ficam com o pet mais antigo (menor id), que era o comportamento visível no app.
+
+CREATE TEMP TABLE pets_por_nome AS
+SELECT DISTINCT ON (user_id, nome) id, user_id, nome
+FROM pets
+ORDER BY user_id, nome, id;
+
+UPDATE vacinas t SET pet_id = p.id FROM pets_por_nome p
+WHERE t.pet_id IS NULL AND t.pet = p.nome AND t.user_id IS NOT DISTINCT FROM p.user_id;
+
+UPDATE alimentacao t SET pet_id = p.id FROM pets_por_nome p
+WHERE t.pet_id IS NULL AND t.pet = p.nome AND t.user_id IS NOT DISTINCT FROM p.user_id;
+
+UPDATE veterinario t SET pet_id = p.id FROM pets_por_nome p
+WHERE t.pet_id IS NULL AND t.pet = p.nome AND t.user_id IS NOT DISTINCT FROM p.user_id;
+
+UPDATE medicamentos t SET pet_id = p.id FROM pets_por_nome p
+WHERE t.pet_id IS NULL AND t.pet = p.nome AND t.user_id IS NOT DISTINCT FROM p.user_id;
+
+UPDATE preventivos t SET pet_id = p.id FROM pets_por_nome p
+WHERE t.pet_id IS NULL AND t.pet = p.nome AND t.user_id IS NOT DISTINCT FROM p.user_id;
+
+UPDATE peso t SET pet_id = p.id FROM pets_por_nome p
+WHERE t.pet_id IS NULL AND t.pet = p.nome AND t.user_id IS NOT DISTINCT FROM p.user_id;
+
+UPDATE notas t SET pet_id = p.id FROM pets_por_nome p
+WHERE t.pet_id IS NULL AND t.pet = p.nome AND t.user_id IS NOT DISTINCT FROM p.user_id;
+
+DROP TABLE pets_por_nome;
+
+-- Conferir registros que não encontraram o pet (pet excluído ou renomeado)
+-- SELECT 'vacinas' AS tabela, COUNT(*) FROM vacinas WHERE pet_id IS NULL
+-- UNION ALL SELECT 'alimentacao', COUNT(*) FROM alimentacao WHERE pet_id IS NULL
+-- UNION ALL SELECT 'veterinario', COUNT(*) FROM veterinario WHERE pet_id IS NULL
+-- UNION ALL SELECT 'medicamentos', COUNT(*) FROM medicamentos WHERE pet_id IS NULL
+-- UNION ALL SELECT 'preventivos', COUNT(*) FROM preventivos WHERE pet_id IS NULL
+-- UNION ALL SELECT 'peso', COUNT(*) FROM peso WHERE pet_id IS NULL
+-- UNION ALL SELECT 'notas', COUNT(*) FROM notas WHERE pet_id IS NULL;
+
+-- ========================================
+-- 3. A COLUNA TEXTO "pet" DEIXA DE SER OBRIGATÓRIA
+-- ========================================
+
+ALTER TABLE vacinas ALTER COLUMN pet DROP NOT NULL;
+ALTER TABLE alimentacao ALTER COLUMN pet DROP NOT NULL;
+ALTER TABLE veterinario ALTER COLUMN pet DROP NOT NULL;
+ALTER TABLE medicamentos ALTER COLUMN pet DROP NOT NULL;
+ALTER TABLE preventivos ALTER COLUMN pet DROP NOT NULL;
+ALTER TABLE peso ALTER COLUMN pet DROP NOT NULL;
+ALTER TABLE notas ALTER COLUMN pet DROP NOT NULL;
+
+-- ========================================
+-- 4. medicamentos_log ACOMPANHA A EXCLUSÃO DO MEDICAMENTO
+-- ========================================
+
+DELETE FROM medicamentos_log l
+WHERE NOT EXISTS (SELECT 1 FROM medicamentos m WHERE m.id = l.medicamento_id);
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'medicamentos_log_medicamento_id_fkey'
+    ) THEN
+        ALTER TABLE medicamentos_log
+            ADD CONSTRAINT medicamentos_log_medicamento_id_fkey
+            FOREIGN KEY (medicamento_id) REFERENCES medicamentos(id) ON DELETE CASCADE;
+    END IF;
+END $$;
+
+-- ========================================
+-- 5. ÍNDICES
+-- ========================================
+
+-- Leitura do app: RLS por user_id, filtro por pet, ordenação por data
+CREATE INDEX IF NOT EXISTS idx_vacinas_user_pet_data ON vacinas(user_id, pet_id, data_aplicacao);
+CREATE INDEX IF NOT EXISTS idx_alimentacao_user_pet_data ON alimentacao(user_id, pet_id, data_registro);
+CREATE INDEX IF NOT EXISTS idx_veterinario_user_pet_data ON veterinario(user_id, pet_id, data_consulta);
+CREATE INDEX IF NOT EXISTS idx_medicamentos_user_pet_data ON medicamentos(user_id, pet_id, data_inicio);
+CREATE INDEX IF NOT EXISTS idx_preventivos_user_pet_data ON preventivos(user_id, pet_id, data_aplicacao);
+CREATE INDEX IF NOT EXISTS idx_peso_user_pet_data ON peso(user_id, pet_id, data_pesagem);
+CREATE INDEX IF NOT EXISTS idx_notas_user_pet_data ON notas(user_id, pet_id, data_criacao);
+
+-- Exclusão em cascata a partir de pets (ON DELETE CASCADE busca por pet_id)
+CREATE INDEX IF NOT EXISTS idx_vacinas_pet_id ON vacinas(pet_id);
+CREATE INDEX IF NOT EXISTS idx_alimentacao_pet_id ON alimentacao(pet_id);
+CREATE INDEX IF NOT EXISTS idx_veterinario_pet_id ON veterinario(pet_id);
+CREATE INDEX IF NOT EXISTS idx_medicamentos_pet_id ON medicamentos(pet_id);
+CREATE INDEX IF NOT EXISTS idx_preventivos_pet_id ON preventivos(pet_id);
+CREATE INDEX IF NOT EXISTS idx_peso_pet_id ON peso(pet_id);
+CREATE INDEX IF NOT EXISTS idx_notas_pet_id ON notas(pet_id);
+
+-- Os índices por nome do pet não são mais usados
+DROP INDEX IF EXISTS idx_vacinas_pet;
+DROP INDEX IF EXISTS idx_alimentacao_pet;
+DROP INDEX IF EXISTS idx_veterinario_pet;
+DROP INDEX IF EXISTS idx_medicamentos_pet;
+DROP INDEX IF EXISTS idx_preventivos_pet;
+DROP INDEX IF EXISTS idx_peso_pet;
+DROP INDEX IF EXISTS idx_notas_pet;
@@ -0,0 +1,54 @@
+-- ==================== PROGRESSO DE MEDICAMENTOS (AGREGADO) ====================
+-- Execute estes comandos no SQL Editor do Supabase (após supabase_doses_esparsas.sql)
+--
+-- Uma linha por medicamento com total de doses, doses realizadas, doses
+-- pendentes e a próxima dose pendente. O app lê esta view em vez de baixar
+-- todas as linhas de medicamentos_log.
+
+CREATE OR REPLACE VIEW medicamentos_progresso
+WITH (security_invoker = true) AS
+SELECT
+    m.id AS medicamento_id,
+    m.user_id,
+    t.total_doses,
+    r.doses_realizadas,
+    t.total_doses - r.doses_realizadas AS doses_pendentes,
+    p.numero_dose AS proxima_dose_numero,
+    m.data_inicio + ((p.numero_dose - 1) / t.doses_por_dia) AS proxima_dose_data
+FROM medicamentos m
+CROSS JOIN LATERAL (
+    SELECT
+        GREATEST(COALESCE(m.doses_por_dia, 1), 1) AS doses_por_dia,
+        m.duracao * GREATEST(COALESCE(m.doses_por_dia, 1), 1) AS total_doses
+) t
+-- Contagem agrupada por medicamento (usa idx_medicamentos_log_medicamento_id)
+CROSS JOIN LATERAL (
+    SELECT COUNT(*)::INTEGER AS doses_realizadas
+    FROM medicamentos_log l
+    WHERE l.medicamento_id = m.id
+      AND l.realizado
+      AND l.numero_dose BETWEEN 1 AND t.total_doses
+) r
+-- Próxima dose pendente: a dose 1 ou a primeira lacuna após uma dose realizada
+LEFT JOIN LATERAL (
+    SELECT c.numero_dose
+    FROM (
+        SELECT 1 AS numero_dose
+        UNION ALL
+        SELECT l.numero_dose + 1
+        FROM medicamentos_log l
+        WHERE l.medicamento_id = m.id AND l.realizado
+    ) c
+    WHERE c.numero_dose <= t.total_doses
+      AND NOT EXISTS (
+          SELECT 1 FROM medicamentos_log x
+          WHERE x.medicamento_id = m.id
+            AND x.numero_dose = c.numero_dose
+            AND x.realizado
+      )
+    ORDER BY c.numero_dose
+    LIMIT 1
+) p ON TRUE;
+
+-- Permitir leitura pela API (o RLS das tabelas base continua valendo)
+GRANT SELECT ON medicamentos_progresso TO authenticated;
@@ -0,0 +1,42 @@
+-- ==================== ALTERAÇÕES EM TEMPO REAL ====================
+-- Execute estes comandos no SQL Editor do Supabase (após supabase_limite_pets.sql)
+--
+-- Publica as alterações das tabelas do usuário no Supabase Realtime
+-- (publicação supabase_realtime). Com [tempo_real] ativo = true no
+-- secrets.toml, o app assina as alterações das próprias linhas e as aplica
+-- à sessão sem recarregar os dados. O Realtime respeita as políticas RLS
+-- já existentes: cada usuário só recebe INSERT/UPDATE das suas linhas, e
+-- DELETE chega apenas com o id.
+
+-- ========================================
+-- 1. PUBLICAÇÃO
+-- ========================================
+
+DO $$
+DECLARE
+    tabela TEXT;
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_publication WHERE pubname = 'supabase_realtime') THEN
+        CREATE PUBLICATION supabase_realtime;
+    END IF;
+
+    FOREACH tabela IN ARRAY ARRAY[
+        'profiles', 'pets', 'vacinas', 'alimentacao', 'estoques_alimento', 'veterinario',
+        'medicamentos', 'medicamentos_log', 'preventivos', 'peso', 'notas'
+    ]
+    LOOP
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_publication_tables
+            WHERE pubname = 'supabase_realtime' AND schemaname = 'public' AND tablename = tabela
+        ) THEN
+            EXECUTE format('ALTER PUBLICATION supabase_realtime ADD TABLE public.%I', tabela);
+        END IF;
+    END LOOP;
+END;
+$$;
+
+-- ========================================
+-- 2. CONFERÊNCIA
+-- ========================================
+
+-- SELECT tablename FROM pg_publication_tables WHERE pubname = 'supabase_realtime' ORDER BY tablename;
@@ -0,0 +1,40 @@
+-- ==================== CAIXA DE ENTRADA DE WEBHOOKS ====================
+-- Execute estes comandos no SQL Editor do Supabase (após supabase_jwt_claims.sql)
+--
+-- Usada pelo webhook_worker.py: cada evento da Kiwify/Hotmart é gravado
+-- uma única vez (chave de idempotência como chave primária) e processado
+-- depois, em lotes. Reenvios da plataforma batem na chave e são ignorados.
+
+-- ========================================
+-- 1. TABELA
+-- ========================================
+
+CREATE TABLE IF NOT EXISTS webhook_inbox (
+    chave TEXT PRIMARY KEY, -- 'kiwify:<order_id>:<status>', 'hotmart:<id>' ou hash do corpo
+    fonte TEXT NOT NULL, -- 'kiwify' ou 'hotmart'
+    payload JSONB NOT NULL,
+    recebido_em TIMESTAMP DEFAULT NOW(),
+    processado_em TIMESTAMP,
+    tentativas INTEGER DEFAULT 0,
+    erro TEXT
+);
+
+-- ========================================
+-- 2. ÍNDICE DA FILA
+-- ========================================
+-- Só os eventos pendentes entram no índice; o worker lê em ordem de chegada.
+
+CREATE INDEX IF NOT EXISTS idx_webhook_inbox_pendentes
+    ON webhook_inbox(recebido_em)
+    WHERE processado_em IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_webhook_inbox_recebido_em
+    ON webhook_inbox(recebido_em);
+
+-- ========================================
+-- 3. SEGURANÇA
+-- ========================================
+-- RLS sem políticas: apenas a service role (que ignora o RLS) acessa a tabela.
+
+ALTER TABLE webhook_inbox ENABLE ROW LEVEL SECURITY;
+REVOKE ALL ON TABLE webhook_inbox FROM anon, authenticated;
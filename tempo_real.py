@@ -0,0 +1,291 @@
+# ==================== ALTERAÇÕES EM TEMPO REAL ====================
+# Assinatura das alterações do Postgres (Supabase Realtime, protocolo Phoenix)
+# para as linhas do usuário. Uma thread por sessão mantém o websocket aberto
+# (tornado, já instalado com o Streamlit) e enfileira os eventos; o app os
+# aplica às tabelas da sessão no próximo rerun, sem recarregar tudo.
+# Mudanças do perfil (ex.: status alterado pelo webhook) ficam em `perfil`.
+# Depois de uma reconexão os eventos perdidos não voltam: `precisa_recarregar`
+# avisa o app para fazer uma recarga completa.
+
+import asyncio
+import itertools
+import json
+import threading
+import time
+
+from tornado import websocket
+
+# Tabelas do usuário acompanhadas (todas filtradas por user_id)
+TABELAS_TEMPO_REAL = ['pets', 'vacinas', 'alimentacao', 'estoques_alimento', 'veterinario', 'medicamentos',
+                      'medicamentos_log', 'preventivos', 'peso', 'notas']
+
+# Intervalo do heartbeat exigido pelo servidor Phoenix (fecha a conexão após ~60 s sem ele)
+HEARTBEAT_SEGUNDOS = 25
+# Espera entre tentativas de reconexão (dobra a cada falha até o máximo)
+RECONEXAO_SEGUNDOS = 1
+RECONEXAO_MAX_SEGUNDOS = 30
+# Tempo máximo esperando a resposta ao phx_join
+ENTRADA_SEGUNDOS = 10
+
+
+def url_tempo_real(supabase_url, chave):
+    """Endereço do websocket do Realtime a partir da URL do projeto"""
+    base = supabase_url.replace('https://', 'wss://').replace('http://', 'ws://')
+    return f'{base}/realtime/v1/websocket?apikey={chave}&vsn=1.0.0'
+
+
+def mensagem_de_entrada(topico, user_id, access_token, ref):
+    """phx_join com uma assinatura postgres_changes por tabela do usuário (e o próprio perfil)"""
+    assinaturas = [
+        {'event': '*', 'schema': 'public', 'table': tabela, 'filter': f'user_id=eq.{user_id}'}
+        for tabela in TABELAS_TEMPO_REAL
+    ]
+    assinaturas.append({'event': 'UPDATE', 'schema': 'public', 'table': 'profiles', 'filter': f'id=eq.{user_id}'})
+    return {
+        'topic': topico,
+        'event': 'phx_join',
+        'payload': {
+            'config': {'broadcast': {'self': False}, 'presence': {'key': ''}, 'postgres_changes': assinaturas},
+            'access_token': access_token
+        },
+        'ref': ref,
+        'join_ref': ref
+    }
+
+
+def evento_da_mensagem(mensagem):
+    """Evento normalizado {tabela, tipo, registro, antigo} de uma mensagem postgres_changes (ou None)"""
+    if mensagem.get('event') != 'postgres_changes':
+        return None
+    dados = (mensagem.get('payload') or {}).get('data') or {}
+    if not dados.get('table') or dados.get('type') not in ('INSERT', 'UPDATE', 'DELETE'):
+        return None
+    return {
+        'tabela': dados['table'],
+        'tipo': dados['type'],
+        'registro': dados.get('record') or {},
+        # Em DELETE com RLS, o registro antigo traz apenas a chave primária
+        'antigo': dados.get('old_record') or {}
+    }
+
+
+def aplicar_eventos(colecoes, eventos, converter=None):
+    """Aplicar INSERT/UPDATE/DELETE às listas de registros de cada tabela (pelo id), no lugar
+    converter: função aplicada a cada registro novo (ex.: datas em texto para date)
+    Retorna o conjunto das tabelas alteradas; tabelas fora de `colecoes` só entram no retorno
+    """
+    alteradas = set()
+    posicoes = {}
+    removidos = set()
+    for evento in eventos:
+        tabela = evento['tabela']
+        alteradas.add(tabela)
+        registros = colecoes.get(tabela)
+        if registros is None:
+            continue
+        if tabela not in posicoes:
+            posicoes[tabela] = {registro.get('id'): i for i, registro in enumerate(registros)}
+        indice = posicoes[tabela]
+
+        if evento['tipo'] == 'DELETE':
+            posicao = indice.pop(evento['antigo'].get('id'), None)
+            if posicao is not None:
+                registros[posicao] = None
+                removidos.add(tabela)
+            continue
+
+        registro = evento['registro']
+        if converter:
+            registro = converter(registro)
+        posicao = indice.get(registro.get('id'))
+        if posicao is None:
+            indice[registro.get('id')] = len(registros)
+            registros.append(registro)
+        else:
+            # Evento repetido ou UPDATE: a versão mais nova substitui a anterior
+            registros[posicao] = registro
+
+    for tabela in removidos:
+        colecoes[tabela][:] = [registro for registro in colecoes[tabela] if registro is not None]
+    return alteradas
+
+
+class AssinaturaTempoReal:
+    """Websocket do Realtime de uma sessão, em uma thread própria
+    ao_receber: chamada (na thread do websocket) quando chegam eventos depois do último drenar();
+    se retornar False, a sessão não existe mais e a assinatura é encerrada
+    sessao_ativa: conferida a cada heartbeat; False encerra a assinatura (aba fechada)
+    """
+
+    def __init__(self, url, user_id, access_token, ao_receber=None, sessao_ativa=None):
+        self.url = url
+        self.user_id = user_id
+        self.token = access_token
+        self.ao_receber = ao_receber
+        self.sessao_ativa = sessao_ativa
+        self.topico = f'realtime:petcontrol-{user_id}'
+        self.trava = threading.Lock()
+        self.eventos = []
+        self.perfil = None
+        self.estado = 'conectando'
+        self.erro = None
+        self.conexoes = 0
+        self.recebidos = 0
+        self.recebido_em = None
+        self.precisa_recarregar = False
+        self.aviso_pendente = False
+        self.encerrada = False
+        self._refs = itertools.count(1)
+        self._loop = None
+        self._conexao = None
+        self._thread = threading.Thread(target=self._executar, name=f'tempo-real-{user_id[:8]}', daemon=True)
+
+    def iniciar(self):
+        self._thread.start()
+        return self
+
+    def drenar(self):
+        """Eventos recebidos desde a última chamada (em ordem de chegada)"""
+        with self.trava:
+            eventos, self.eventos = self.eventos, []
+            self.aviso_pendente = False
+        return eventos
+
+    def descartar_pendentes(self):
+        """Esquecer os eventos enfileirados (antes de uma recarga completa)"""
+        with self.trava:
+            self.eventos = []
+            self.precisa_recarregar = False
+            self.aviso_pendente = False
+
+    def atualizar_token(self, access_token):
+        """Enviar ao servidor o token renovado (as políticas RLS usam o token do canal)"""
+        self.token = access_token
+        self._na_thread(self._enviar_token)
+
+    def parar(self):
+        self.encerrada = True
+        self._na_thread(self._fechar)
+
+    def _na_thread(self, funcao):
+        try:
+            self._loop.call_soon_threadsafe(funcao)
+        except (AttributeError, RuntimeError):
+            # Loop ainda não criado (a conexão nova já usa o estado atual) ou já encerrado
+            pass
+
+    def _fechar(self):
+        if self._conexao is not None:
+            self._conexao.close()
+        for tarefa in asyncio.all_tasks(self._loop):
+            tarefa.cancel()
+
+    def _enviar_token(self):
+        if self._conexao is not None:
+            self._conexao.write_message(json.dumps({
+                'topic': self.topico, 'event': 'access_token',
+                'payload': {'access_token': self.token}, 'ref': str(next(self._refs))
+            }))
+
+    def _executar(self):
+        try:
+            asyncio.run(self._manter_conectada())
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:  # noqa: BLE001 - a thread não pode derrubar o processo
+            self.erro = str(e)
+        finally:
+            self.estado = 'encerrada'
+            self.encerrada = True
+
+    async def _manter_conectada(self):
+        self._loop = asyncio.get_running_loop()
+        espera = RECONEXAO_SEGUNDOS
+        while not self.encerrada:
+            try:
+                await self._sessao_websocket()
+                espera = RECONEXAO_SEGUNDOS
+            except asyncio.CancelledError:
+                return
+            except Exception as e:  # noqa: BLE001 - rede: tentar de novo
+                self.erro = str(e)
+            if self.encerrada:
+                return
+            self.estado = 'reconectando'
+            await asyncio.sleep(espera)
+            espera = min(espera * 2, RECONEXAO_MAX_SEGUNDOS)
+
+    async def _sessao_websocket(self):
+        self._conexao = await websocket.websocket_connect(self.url, ping_interval=None)
+        try:
+            ref = str(next(self._refs))
+            await self._conexao.write_message(json.dumps(mensagem_de_entrada(self.topico, self.user_id, self.token, ref)))
+            resposta = await asyncio.wait_for(self._ler(), ENTRADA_SEGUNDOS)
+            while resposta is not None and resposta.get('ref') != ref:
+                resposta = await asyncio.wait_for(self._ler(), ENTRADA_SEGUNDOS)
+            if resposta is None or (resposta.get('payload') or {}).get('status') != 'ok':
+                raise ConnectionError(f'Assinatura recusada: {resposta}')
+
+            self.conexoes += 1
+            self.estado = 'conectada'
+            self.erro = None
+            if self.conexoes > 1:
+                # Alterações feitas enquanto estava desconectada não serão reenviadas
+                with self.trava:
+                    self.precisa_recarregar = True
+                self._avisar()
+
+            heartbeat = asyncio.create_task(self._heartbeat())
+            try:
+                while True:
+                    mensagem = await self._ler()
+                    if mensagem is None:
+                        return
+                    self._receber(mensagem)
+            finally:
+                heartbeat.cancel()
+        finally:
+            self._conexao.close()
+            self._conexao = None
+
+    async def _ler(self):
+        texto = await self._conexao.read_message()
+        return None if texto is None else json.loads(texto)
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(HEARTBEAT_SEGUNDOS)
+            if self.sessao_ativa is not None and not self.sessao_ativa():
+                self.parar()
+                return
+            await self._conexao.write_message(json.dumps(
+                {'topic': 'phoenix', 'event': 'heartbeat', 'payload': {}, 'ref': str(next(self._refs))}
+            ))
+
+    def _receber(self, mensagem):
+        if mensagem.get('event') in ('phx_error', 'phx_close') and mensagem.get('topic') == self.topico:
+            raise ConnectionError(f"Canal encerrado pelo servidor: {mensagem.get('event')}")
+        evento = evento_da_mensagem(mensagem)
+        if evento is None:
+            return
+        self.recebidos += 1
+        self.recebido_em = time.time()
+        with self.trava:
+            if evento['tabela'] == 'profiles':
+                self.perfil = {**(self.perfil or {}), **evento['registro']}
+            else:
+                self.eventos.append(evento)
+        self._avisar()
+
+    def _avisar(self):
+        # Um aviso por rajada: os seguintes esperam o app drenar a fila
+        with self.trava:
+            if self.aviso_pendente or self.ao_receber is None:
+                return
+            self.aviso_pendente = True
+        try:
+            sessao_existe = self.ao_receber()
+        except Exception:  # noqa: BLE001 - falha no aviso não derruba a conexão
+            sessao_existe = True
+        if sessao_existe is False:
+            self.parar()
@@ -0,0 +1,126 @@
+import json
+import os
+import sys
+import tempfile
+from datetime import date
+from pathlib import Path
+
+import pytest
+from streamlit.runtime.scriptrunner import ScriptRunnerEvent
+from streamlit.testing.v1 import AppTest, element_tree
+from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import supabase_simulado  # noqa: E402
+
+BASELINES = Path(__file__).resolve().parent / 'baselines_latencia.json'
+# Tempo aceito: baseline × FOLGA + MARGEM_MS (máquinas diferentes, ruído do agendador)
+FOLGA = float(os.environ.get('PETCONTROL_FOLGA_LATENCIA', 2.0))
+MARGEM_MS = float(os.environ.get('PETCONTROL_MARGEM_LATENCIA_MS', 100))
+
+
+# AppTest (Streamlit 1.31) não remonta o estado de selectboxes com format_func:
+# as opções chegam formatadas e o valor não, e Selectbox.index falha no rerun
+# seguinte. Nesse caso vale o índice que a sessão já guardou para o widget.
+_indice_original = element_tree.Selectbox.index
+
+
+def _indice_da_selecao(self):
+    try:
+        return _indice_original.fget(self)
+    except ValueError:
+        for estado in self.root.session_state.get_widget_states():
+            if estado.id == self.id:
+                return estado.int_value
+        return self.proto.default
+
+
+element_tree.Selectbox.index = property(_indice_da_selecao)
+
+# Depois de um st.rerun() no meio da execução (o login, por exemplo), a árvore do
+# AppTest mantém widgets da execução interrompida que o navegador descartaria;
+# o estado deles já saiu da sessão e eles não entram no próximo rerun.
+_estado_original = element_tree.get_widget_state
+
+
+def _estado_do_widget(no):
+    try:
+        return _estado_original(no)
+    except KeyError:
+        return None
+
+
+element_tree.get_widget_state = _estado_do_widget
+
+# O runtime zera os gatilhos (botões, submit de formulário) quando o script
+# termina em st.rerun(); o LocalScriptRunner não, e o formulário seria enviado
+# de novo a cada rerun, sem fim.
+_fim_original = LocalScriptRunner._on_script_finished
+
+
+def _fim_do_script(self, ctx, event, premature_stop):
+    if event == ScriptRunnerEvent.SCRIPT_STOPPED_FOR_RERUN:
+        self._session_state._state._reset_triggers()
+    _fim_original(self, ctx, event, premature_stop)
+
+
+LocalScriptRunner._on_script_finished = _fim_do_script
+
+
+def pytest_addoption(parser):
+    parser.addoption('--atualizar-baselines', action='store_true',
+                     help='Gravar as medições atuais em tests/baselines_latencia.json')
+
+
+@pytest.fixture(scope='session')
+def supabase():
+    """Supabase simulado com as contas pequena, media e enorme"""
+    banco = supabase_simulado.Banco()
+    url = supabase_simulado.iniciar_servidor(banco)
+    emails = {conta: supabase_simulado.semear_conta(banco, conta) for conta in supabase_simulado.CONTAS}
+    # Histórico frio já movido para as tabelas *_arquivo e doses de tratamentos terminados
+    # compactadas, como fazem os agendamentos diários
+    banco.arquivar(date.today())
+    banco.compactar(date.today())
+    # Aquecimento: a primeira execução do app paga a importação de pandas e httpx
+    # e o primeiro gráfico a do altair; sem isso a primeira conta medida sai inflada.
+    aquecimento = AppTest.from_file(str(RAIZ / 'app.py'), default_timeout=60)
+    aquecimento.secrets['supabase'] = {'url': url, 'key': supabase_simulado.CHAVE_ANON}
+    aquecimento.run()
+    AppTest.from_string("import pandas as pd\nimport streamlit as st\nst.line_chart(pd.DataFrame({'kg': [1, 2]}))").run()
+    return banco, url, emails
+
+
+@pytest.fixture(scope='session')
+def baselines(request):
+    """Medições de referência por conta e interação; gravadas no fim com --atualizar-baselines"""
+    atualizar = request.config.getoption('--atualizar-baselines')
+    referencias = json.loads(BASELINES.read_text(encoding='utf-8')) if BASELINES.exists() else {}
+    medicoes = {}
+    request.config._medicoes_latencia = medicoes
+    yield referencias, medicoes, atualizar
+    if atualizar and medicoes:
+        for conta, interacoes in medicoes.items():
+            referencias[conta] = interacoes
+        BASELINES.write_text(json.dumps(referencias, indent=2, ensure_ascii=False) + '\n', encoding='utf-8')
+
+
+@pytest.fixture
+def diretorio_fila():
+    with tempfile.TemporaryDirectory(prefix='fila_escrita_') as diretorio:
+        yield diretorio
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    medicoes = getattr(config, '_medicoes_latencia', None)
+    if not medicoes:
+        return
+    terminalreporter.section('latência dos reruns')
+    for conta, interacoes in medicoes.items():
+        terminalreporter.write_line(f'{conta}:')
+        for nome, medida in interacoes.items():
+            requisicoes = '' if medida.get('requisicoes') is None else f"{medida['requisicoes']:>4} req"
+            terminalreporter.write_line(f"  {nome:<28}{medida['ms']:>9.1f} ms {requisicoes}")
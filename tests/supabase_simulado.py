@@ -0,0 +1,473 @@
+"""Supabase simulado para os testes de ponta a ponta
+
+Um servidor tornado em uma thread responde como o PostgREST (/rest/v1) e o
+Supabase Auth (/auth/v1) com o estado em memória. O app conversa com ele
+por HTTP de verdade, então as chamadas síncronas (httpx.get/post), a
+camada assíncrona (supabase_assincrono) e a fila de escrita passam pelo
+mesmo caminho que em produção, e cada requisição é contada.
+
+Cobertura do PostgREST: filtros eq/neq/gt/gte/lt/lte/in/is, select de
+colunas, order, limit/offset, HEAD com Prefer: count=exact, upsert com
+on_conflict (ignore/merge-duplicates), PATCH/DELETE com filtros, a view
+medicamentos_progresso e as funções is_admin (buscar_registros ausente,
+como em um banco sem supabase_busca.sql). As políticas RLS são emuladas
+pelo user_id do token.
+"""
+
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+import jwt
+from tornado import httpserver, netutil, web
+
+import agenda_doses
+
+SEGREDO_JWT = 'segredo-dos-testes-com-pelo-menos-32-bytes'
+CHAVE_ANON = 'chave-anon-dos-testes'
+
+# Tabelas do usuário (filtradas pelo user_id do token) e valores padrão do banco
+TABELAS = ['pets', 'vacinas', 'alimentacao', 'estoques_alimento', 'veterinario', 'medicamentos',
+           'medicamentos_log', 'medicamentos_resumo', 'preventivos', 'peso', 'notas',
+           'vacinas_arquivo', 'preventivos_arquivo', 'medicamentos_arquivo', 'medicamentos_log_arquivo']
+PADROES = {
+    'pets': {'data_cadastro': 'agora'},
+    'vacinas': {'concluido': False},
+    'alimentacao': {'data_registro': 'agora', 'concluido': False},
+    'medicamentos': {'concluido': False},
+    'medicamentos_log': {'realizado': False},
+    'preventivos': {'concluido': False},
+    'notas': {'data_criacao': 'agora'},
+    'estoques_alimento': {'atualizado_em': 'agora'},
+}
+
+
+class Banco:
+    """Estado do Supabase simulado: usuários, perfis, tabelas e contadores de requisições"""
+
+    def __init__(self, latencia=0.0):
+        self.latencia = latencia
+        self.usuarios = {}
+        self.perfis = []
+        self.tabelas = {tabela: [] for tabela in TABELAS}
+        self.proximo_id = 1
+        self.requisicoes = 0
+        self.por_rota = Counter()
+        self.trava = threading.Lock()
+
+    # ---------- carga ----------
+
+    def criar_usuario(self, email, senha, plano, status='ativo'):
+        user_id = str(uuid.uuid5(uuid.NAMESPACE_URL, email))
+        self.usuarios[email] = {'id': user_id, 'email': email, 'senha': senha}
+        self.perfis.append({'id': user_id, 'email': email, 'plano': plano, 'status': status})
+        return user_id
+
+    def inserir(self, tabela, registro):
+        linha = dict(registro, id=self.proximo_id)
+        self.proximo_id += 1
+        agora = datetime.now().isoformat()
+        for coluna, valor in PADROES.get(tabela, {}).items():
+            if linha.get(coluna) is None:
+                linha[coluna] = agora if valor == 'agora' else valor
+        linha.setdefault('created_at', agora)
+        self.tabelas[tabela].append(linha)
+        return linha
+
+    def zerar_contadores(self):
+        with self.trava:
+            self.requisicoes = 0
+            self.por_rota.clear()
+
+    def contar(self, metodo, rota):
+        with self.trava:
+            self.requisicoes += 1
+            self.por_rota[f'{metodo} {rota}'] += 1
+
+    # ---------- compactação e arquivamento ----------
+
+    def compactar(self, hoje, dias=7):
+        """Mesmas regras de compactar_doses() (supabase_compactacao_doses.sql), para todos os usuários"""
+        limite = (hoje - timedelta(days=dias)).isoformat()
+        self._compactar({m['id'] for m in self.tabelas['medicamentos'] if m['data_fim'] < limite})
+
+    def _compactar(self, ids):
+        """Resumo (log ∪ mapa já existente) dos medicamentos `ids` em medicamentos_resumo, sem o log"""
+        agora = datetime.now().isoformat()
+        realizadas = agenda_doses.agrupar_doses_realizadas(
+            [d for d in self.tabelas['medicamentos_log'] if d['medicamento_id'] in ids]
+        )
+        resumos = {r['medicamento_id']: r for r in self.tabelas['medicamentos_resumo']}
+        for m in self.tabelas['medicamentos']:
+            if m['id'] not in ids:
+                continue
+            total = agenda_doses.total_doses(m)
+            feitas = realizadas.get(m['id'], set())
+            if m['id'] in resumos:
+                feitas |= agenda_doses.decodificar_mapa(resumos[m['id']]['mapa'], total)
+            mapa = agenda_doses.codificar_mapa(feitas, total)
+            tomadas = sum(1 for n in feitas if 1 <= n <= total)
+            campos = {'total_doses': total, 'doses_tomadas': tomadas, 'doses_perdidas': total - tomadas,
+                      'mapa': '\\x' + mapa.hex(), 'compactado_em': agora}
+            if m['id'] in resumos:
+                resumos[m['id']].update(campos)
+            else:
+                self.inserir('medicamentos_resumo', {'medicamento_id': m['id'], 'user_id': m['user_id'], **campos})
+        self.tabelas['medicamentos_log'] = [d for d in self.tabelas['medicamentos_log']
+                                            if d['medicamento_id'] not in ids]
+
+    def arquivar(self, hoje, dias_medicamentos=30, dias_vacinas=365, dias_preventivos=180):
+        """Mesmas regras de arquivar_historico() (supabase_arquivo.sql e supabase_compactacao_doses.sql),
+        para todos os usuários
+        """
+        agora = datetime.now().isoformat()
+        limite = (hoje - timedelta(days=dias_medicamentos)).isoformat()
+        frios = {m['id'] for m in self.tabelas['medicamentos'] if m['data_fim'] < limite}
+        self._compactar(frios)
+        resumos = {r['medicamento_id']: r for r in self.tabelas['medicamentos_resumo']}
+        for m in self.tabelas['medicamentos']:
+            if m['id'] in frios:
+                resumo = resumos[m['id']]
+                self.tabelas['medicamentos_arquivo'].append(dict(
+                    m, doses_realizadas=resumo['doses_tomadas'], arquivado_em=agora, doses_mapa=resumo['mapa']
+                ))
+        self.tabelas['medicamentos_resumo'] = [r for r in self.tabelas['medicamentos_resumo']
+                                               if r['medicamento_id'] not in frios]
+        self.tabelas['medicamentos'] = [m for m in self.tabelas['medicamentos'] if m['id'] not in frios]
+
+        for tabela, coluna, dias in (('vacinas', 'nome_vacina', dias_vacinas),
+                                     ('preventivos', 'tipo_preventivo', dias_preventivos)):
+            limite = (hoje - timedelta(days=dias)).isoformat()
+            mais_recente = {}
+            for linha in self.tabelas[tabela]:
+                chave = (linha['pet_id'], linha[coluna])
+                mais_recente[chave] = max(mais_recente.get(chave, ''), linha['data_aplicacao'])
+            self._mover(tabela, lambda linha: (
+                linha['concluido'] and linha['data_aplicacao'] < limite
+                and (linha.get('proxima_dose') is None
+                     or mais_recente[(linha['pet_id'], linha[coluna])] > linha['data_aplicacao'])
+            ), agora)
+
+    def _mover(self, tabela, frio, agora):
+        quentes = []
+        for linha in self.tabelas[tabela]:
+            if frio(linha):
+                self.tabelas[f'{tabela}_arquivo'].append(dict(linha, arquivado_em=agora))
+            else:
+                quentes.append(linha)
+        self.tabelas[tabela] = quentes
+
+    # ---------- leitura ----------
+
+    def perfil(self, user_id):
+        return next((p for p in self.perfis if p['id'] == user_id), None)
+
+    def linhas(self, tabela, user_id):
+        """Linhas visíveis ao usuário (RLS); a view medicamentos_progresso é calculada na hora"""
+        if tabela == 'profiles':
+            return [p for p in self.perfis if user_id is None or p['id'] == user_id]
+        if tabela == 'medicamentos_progresso':
+            return self.progresso(user_id)
+        return [linha for linha in self.tabelas[tabela] if linha.get('user_id') == user_id]
+
+    def progresso(self, user_id):
+        realizadas = agenda_doses.agrupar_doses_realizadas(self.linhas('medicamentos_log', user_id))
+        for resumo in self.linhas('medicamentos_resumo', user_id):
+            realizadas.setdefault(resumo['medicamento_id'], set()).update(
+                agenda_doses.decodificar_mapa(resumo['mapa'], resumo['total_doses'])
+            )
+        resultado = []
+        for linha in self.linhas('medicamentos', user_id):
+            medicamento = dict(linha, data_inicio=date.fromisoformat(linha['data_inicio']))
+            agregado = agenda_doses.atualizar_agregado(medicamento, realizadas.get(linha['id'], set()))
+            if agregado['proxima_dose_data'] is not None:
+                agregado['proxima_dose_data'] = agregado['proxima_dose_data'].isoformat()
+            resultado.append(dict(agregado, user_id=user_id))
+        return resultado
+
+
+# ---------- filtros do PostgREST ----------
+
+def _converter(valor_texto, exemplo):
+    if valor_texto == 'null':
+        return None
+    if isinstance(exemplo, bool):
+        return valor_texto == 'true'
+    if isinstance(exemplo, int):
+        return int(valor_texto)
+    if isinstance(exemplo, float):
+        return float(valor_texto)
+    return valor_texto
+
+
+def _atende(linha, coluna, expressao):
+    operador, _, valor = expressao.partition('.')
+    atual = linha.get(coluna)
+    if operador == 'is':
+        return atual is None if valor == 'null' else atual is (valor == 'true')
+    if operador == 'in':
+        return atual in {_converter(v, atual) for v in valor.strip('()').split(',')}
+    if atual is None:
+        return False
+    esperado = _converter(valor, atual)
+    return {
+        'eq': atual == esperado, 'neq': atual != esperado, 'gt': atual > esperado,
+        'gte': atual >= esperado, 'lt': atual < esperado, 'lte': atual <= esperado,
+    }[operador]
+
+
+PARAMETROS_ESPECIAIS = {'select', 'order', 'limit', 'offset', 'on_conflict'}
+
+
+def filtrar(linhas, argumentos):
+    """Aplicar filtros, ordem, paginação e select dos parâmetros da URL"""
+    for coluna, expressoes in argumentos.items():
+        if coluna not in PARAMETROS_ESPECIAIS:
+            for expressao in expressoes:
+                linhas = [linha for linha in linhas if _atende(linha, coluna, expressao)]
+    if 'order' in argumentos:
+        for criterio in reversed(argumentos['order'][0].split(',')):
+            coluna, _, direcao = criterio.partition('.')
+            linhas = sorted(linhas, key=lambda l: (l.get(coluna) is None, l.get(coluna)), reverse=direcao == 'desc')
+    inicio = int(argumentos.get('offset', ['0'])[0])
+    if 'limit' in argumentos:
+        linhas = linhas[inicio:inicio + int(argumentos['limit'][0])]
+    elif inicio:
+        linhas = linhas[inicio:]
+    if 'select' in argumentos and argumentos['select'][0] != '*':
+        colunas = argumentos['select'][0].split(',')
+        linhas = [{c: linha.get(c) for c in colunas} for linha in linhas]
+    return linhas
+
+
+# ---------- rotas ----------
+
+class Rota(web.RequestHandler):
+    def initialize(self, banco):
+        self.banco = banco
+
+    async def prepare(self):
+        self.banco.contar(self.request.method, self.request.path.split('/v1/', 1)[-1])
+        if self.banco.latencia:
+            await asyncio.sleep(self.banco.latencia)
+
+    def responder(self, status, corpo=None, **headers):
+        self.set_status(status)
+        for nome, valor in headers.items():
+            self.set_header(nome.replace('_', '-'), valor)
+        if corpo is not None:
+            self.set_header('Content-Type', 'application/json')
+            self.finish(json.dumps(corpo))
+
+    def user_id(self):
+        """Usuário do token (None para a chave anon, que vê tudo como o service role do teste)"""
+        token = self.request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if token == CHAVE_ANON:
+            return None
+        return jwt.decode(token, SEGREDO_JWT, algorithms=['HS256'], audience='authenticated')['sub']
+
+    def argumentos(self):
+        return {chave: [v.decode() for v in valores] for chave, valores in self.request.query_arguments.items()}
+
+    def corpo(self):
+        return json.loads(self.request.body) if self.request.body else None
+
+
+class Autenticacao(Rota):
+    def post(self, acao):
+        corpo = self.corpo()
+        if self.get_argument('grant_type') == 'password':
+            usuario = self.banco.usuarios.get(corpo['email'])
+            if not usuario or usuario['senha'] != corpo['password']:
+                return self.responder(400, {'error': 'invalid_grant'})
+        else:
+            email = corpo['refresh_token'].removeprefix('renovar:')
+            usuario = self.banco.usuarios.get(email)
+            if not usuario:
+                return self.responder(400, {'error': 'invalid_grant'})
+        self.responder(200, emitir_token(self.banco, usuario))
+
+    def get(self, acao):
+        usuario = self.user_id()
+        self.responder(200, {'id': usuario})
+
+
+class Tabela(Rota):
+    def get(self, tabela):
+        self.responder(200, filtrar(self.banco.linhas(tabela, self.user_id()), self.argumentos()))
+
+    def head(self, tabela):
+        total = len(filtrar(self.banco.linhas(tabela, self.user_id()), self.argumentos()))
+        self.responder(200, content_range=f'0-{total - 1}/{total}' if total else '*/0')
+        self.finish()
+
+    def post(self, tabela):
+        user_id = self.user_id()
+        corpo = self.corpo()
+        registros = corpo if isinstance(corpo, list) else [corpo]
+        argumentos = self.argumentos()
+        chave = argumentos.get('on_conflict', [''])[0].split(',') if 'on_conflict' in argumentos else None
+        mesclar = 'merge-duplicates' in self.request.headers.get('Prefer', '')
+        gravados = []
+        with self.banco.trava:
+            for registro in registros:
+                registro = dict(registro, user_id=registro.get('user_id', user_id))
+                if chave:
+                    existente = next((l for l in self.banco.tabelas[tabela]
+                                      if all(l.get(c) == registro.get(c) for c in chave)), None)
+                    if existente is not None:
+                        if mesclar:
+                            existente.update(registro)
+                            gravados.append(existente)
+                        continue
+                gravados.append(self.banco.inserir(tabela, registro))
+        self.responder(201, gravados)
+
+    def patch(self, tabela):
+        campos = self.corpo()
+        with self.banco.trava:
+            linhas = filtrar(self.banco.linhas(tabela, self.user_id()), self.argumentos())
+            for linha in linhas:
+                linha.update(campos)
+        self.responder(200, linhas)
+
+    def delete(self, tabela):
+        with self.banco.trava:
+            removidas = filtrar(self.banco.linhas(tabela, self.user_id()), self.argumentos())
+            ids = {id(linha) for linha in removidas}
+            self.banco.tabelas[tabela] = [l for l in self.banco.tabelas[tabela] if id(l) not in ids]
+        self.responder(200, removidas)
+
+
+class Funcao(Rota):
+    def post(self, funcao):
+        if funcao == 'is_admin':
+            return self.responder(200, False)
+        # Função ausente no banco: o app usa o recurso local
+        self.responder(404, {'message': f'Could not find the function public.{funcao}'})
+
+
+def emitir_token(banco, usuario):
+    perfil = banco.perfil(usuario['id'])
+    expira = int(time.time()) + 3600
+    claims = {
+        'sub': usuario['id'], 'email': usuario['email'], 'aud': 'authenticated', 'role': 'authenticated',
+        'exp': expira, 'app_metadata': {'plano': perfil['plano'], 'status': perfil['status']}
+    }
+    return {
+        'access_token': jwt.encode(claims, SEGREDO_JWT, algorithm='HS256'),
+        'refresh_token': f"renovar:{usuario['email']}",
+        'token_type': 'bearer',
+        'expires_in': 3600,
+        'expires_at': expira,
+        'user': {'id': usuario['id'], 'email': usuario['email']}
+    }
+
+
+def iniciar_servidor(banco):
+    """Servidor em uma thread com loop próprio; retorna a URL base do projeto"""
+    # Sem uma linha de log por requisição na saída dos testes
+    logging.getLogger('tornado.access').setLevel(logging.WARNING)
+    pronto = threading.Event()
+    porta = []
+
+    def executar():
+        async def principal():
+            rotas = [
+                (r'/auth/v1/(token|user)', Autenticacao, {'banco': banco}),
+                (r'/rest/v1/rpc/(\w+)', Funcao, {'banco': banco}),
+                (r'/rest/v1/(\w+)', Tabela, {'banco': banco}),
+            ]
+            http = httpserver.HTTPServer(web.Application(rotas))
+            sockets = netutil.bind_sockets(0, '127.0.0.1')
+            http.add_sockets(sockets)
+            porta.append(sockets[0].getsockname()[1])
+            pronto.set()
+            await asyncio.Event().wait()
+        asyncio.run(principal())
+
+    threading.Thread(target=executar, name='supabase-simulado', daemon=True).start()
+    pronto.wait()
+    return f'http://127.0.0.1:{porta[0]}'
+
+
+# ---------- contas de teste ----------
+
+# (plano, pets, registros por pet em cada tabela, medicamentos por pet, dias de tratamento)
+CONTAS = {
+    'pequena': {'plano': 'Essencial', 'pets': 1, 'vacinas': 3, 'alimentacao': 1, 'veterinario': 2,
+                'medicamentos': 1, 'duracao': 7, 'preventivos': 2, 'peso': 6, 'notas': 3},
+    'media': {'plano': 'Plus', 'pets': 4, 'vacinas': 10, 'alimentacao': 2, 'veterinario': 8,
+              'medicamentos': 3, 'duracao': 30, 'preventivos': 8, 'peso': 60, 'notas': 15},
+    'enorme': {'plano': 'Elite', 'pets': 15, 'vacinas': 25, 'alimentacao': 3, 'veterinario': 20,
+               'medicamentos': 6, 'duracao': 90, 'preventivos': 20, 'peso': 400, 'notas': 40},
+}
+SENHA = 'senha-dos-testes'
+
+
+def semear_conta(banco, nome, semente=7):
+    """Criar o usuário `nome`@petcontrol.test com os dados do tamanho CONTAS[nome]; retorna o email"""
+    tamanho = CONTAS[nome]
+    aleatorio = random.Random(semente)
+    email = f'{nome}@petcontrol.test'
+    user_id = banco.criar_usuario(email, SENHA, tamanho['plano'])
+    hoje = date.today()
+
+    def dia(dias_atras):
+        return (hoje - timedelta(days=dias_atras)).isoformat()
+
+    for p in range(tamanho['pets']):
+        pet = banco.inserir('pets', {
+            'user_id': user_id, 'nome': f'Pet {p + 1}', 'especie': aleatorio.choice(['Cão', 'Gato']),
+            'raca': 'SRD', 'data_nascimento': dia(400 + 90 * p), 'peso': 8.0 + p, 'cor': 'Caramelo',
+            'observacoes': ''
+        })
+        base = {'user_id': user_id, 'pet_id': pet['id']}
+        for v in range(tamanho['vacinas']):
+            aplicada = aleatorio.randint(0, 1500)
+            banco.inserir('vacinas', {**base, 'nome_vacina': aleatorio.choice(['V10', 'Antirrábica', 'Gripe']),
+                                      'data_aplicacao': dia(aplicada), 'lote': f'L{v}', 'veterinario': 'Dra. Ana',
+                                      'proxima_dose': dia(aplicada - 365), 'observacoes': '',
+                                      'concluido': aplicada > 365})
+        for a in range(tamanho['alimentacao']):
+            banco.inserir('alimentacao', {**base, 'tipo_alimento': 'Ração', 'marca_nome': f'Marca {a + 1}',
+                                          'quantidade': 120.0, 'frequencia': 2, 'horarios': '08:00, 18:00'})
+        for c in range(tamanho['veterinario']):
+            banco.inserir('veterinario', {**base, 'nome_veterinario': 'Clínica Central', 'motivo': 'Rotina',
+                                          'data_consulta': dia(aleatorio.randint(0, 1500)),
+                                          'diagnostico': aleatorio.choice(['Saudável', 'Otite', 'Alergia']),
+                                          'prescricoes': ''})
+        for m in range(tamanho['medicamentos']):
+            # O primeiro de cada pet está em andamento, o segundo terminou há 10 dias
+            # (compactado) e os outros há mais tempo (arquivados)
+            inicio = 3 if m == 0 else tamanho['duracao'] + 10 if m == 1 else 200 + 100 * m
+            medicamento = banco.inserir('medicamentos', {
+                **base, 'nome_remedio': f'Remédio {m + 1}', 'dosagem': '5mg', 'frequencia': '12/12h',
+                'horarios_admin': '08:00, 20:00', 'duracao': tamanho['duracao'], 'doses_por_dia': 2,
+                'data_inicio': dia(inicio), 'data_fim': dia(inicio - tamanho['duracao'])
+            })
+            feitas = min(2 * (inicio + 1), 2 * tamanho['duracao'])
+            for numero in range(1, feitas + 1):
+                if aleatorio.random() < 0.9:
+                    banco.inserir('medicamentos_log', {
+                        'user_id': user_id, 'medicamento_id': medicamento['id'], 'numero_dose': numero,
+                        'data_dose': dia(inicio - (numero - 1) // 2), 'realizado': True
+                    })
+        for r in range(tamanho['preventivos']):
+            aplicada = aleatorio.randint(0, 700)
+            banco.inserir('preventivos', {**base, 'nome_produto': 'Bravecto', 'tipo_preventivo': 'Antipulgas',
+                                          'data_aplicacao': dia(aplicada), 'proxima_dose': dia(aplicada - 90),
+                                          'concluido': aplicada > 90})
+        for k in range(tamanho['peso']):
+            banco.inserir('peso', {**base, 'data_pesagem': dia(3 * (tamanho['peso'] - k)),
+                                   'peso': round(8.0 + p + aleatorio.uniform(-0.3, 0.3), 2)})
+        for n in range(tamanho['notas']):
+            banco.inserir('notas', {**base, 'titulo': f'Nota {n + 1}',
+                                    'texto': aleatorio.choice(['Comeu bem', 'Coceira na orelha', 'Vomitou'])})
+    return email
@@ -0,0 +1,171 @@
+"""Latência de ponta a ponta dos reruns do app.py (AppTest + Supabase simulado)
+
+Para cada conta (pequena, media, enorme) o roteiro faz login, um rerun sem
+interação (todas as abas), abre o histórico arquivado e as doses de um
+tratamento compactado, marca checkboxes, abre as doses de um medicamento,
+filtra e busca, envia formulários e sai. Cada interação mede o tempo do
+rerun e as requisições que chegaram ao Supabase e falha se passar do
+baseline guardado em tests/baselines_latencia.json (requisições: nenhuma a
+mais; tempo: baseline × FOLGA + MARGEM_MS). Para regravar os baselines:
+
+    python -m pytest tests --atualizar-baselines
+"""
+
+import gc
+import time
+from pathlib import Path
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from conftest import FOLGA, MARGEM_MS
+import supabase_simulado
+
+APP = str(Path(__file__).resolve().parent.parent / 'app.py')
+ABAS = ['inicio', 'vacinas', 'alimentacao', 'veterinario', 'medicamentos', 'preventivos', 'peso', 'notas',
+        'configuracoes']
+
+
+class Roteiro:
+    """Sessão do AppTest com medição de tempo e requisições por interação"""
+
+    def __init__(self, banco, url, diretorio_fila):
+        self.banco = banco
+        self.medicoes = {}
+        self.app = AppTest.from_file(APP, default_timeout=120)
+        self.app.secrets['supabase'] = {
+            'url': url, 'key': supabase_simulado.CHAVE_ANON, 'jwt_secret': supabase_simulado.SEGREDO_JWT
+        }
+        # Gravações só na recarga e no logout: contagens determinísticas
+        self.app.secrets['fila_escrita'] = {'atraso': 3600, 'diretorio': diretorio_fila}
+        # Trechos de cada aba (o arquivo OTLP e o log de lentos ficam desligados)
+        self.app.secrets['rastreamento'] = {'ativo': True, 'arquivo': '', 'lentos': ''}
+
+    def medir(self, nome, acao):
+        """Executar `acao` (que roda o script) e guardar tempo e requisições"""
+        self.banco.zerar_contadores()
+        gc.collect()  # coleta das execuções anteriores fora da medição
+        inicio = time.perf_counter()
+        acao()
+        ms = (time.perf_counter() - inicio) * 1000
+        assert not self.app.exception, f"{nome}: {self.app.exception[0].message}"
+        self.medicoes[nome] = {'ms': round(ms, 1), 'requisicoes': self.banco.requisicoes}
+        return self.medicoes[nome]
+
+    def medir_abas(self, prefixo):
+        """Tempo de cada aba no último rerun (trechos aba.* do rastreamento)"""
+        rastro = self.app.session_state['rastro']
+        abas = {t.nome: t.duracao_ms for t in rastro.trechos if t.nome.startswith('aba.')}
+        assert sorted(abas) == sorted(f'aba.{aba}' for aba in ABAS)
+        for nome, ms in abas.items():
+            self.medicoes[f'{prefixo}/{nome}'] = {'ms': round(ms, 1), 'requisicoes': None}
+
+    def botao(self, rotulo):
+        return next(b for b in self.app.button if b.label == rotulo)
+
+    def widget(self, tipo, rotulo):
+        return next(w for w in getattr(self.app, tipo) if w.label == rotulo)
+
+
+def linhas_do_usuario(banco, tabela, email):
+    user_id = banco.usuarios[email]['id']
+    return [linha for linha in banco.tabelas[tabela] if linha.get('user_id') == user_id]
+
+
+def conferir_baselines(conta, medicoes, referencias):
+    regressoes = []
+    for nome, medida in medicoes.items():
+        base = referencias.get(conta, {}).get(nome)
+        if base is None:
+            regressoes.append(f"{nome}: sem baseline (rode com --atualizar-baselines)")
+            continue
+        if medida['requisicoes'] is not None and medida['requisicoes'] > base['requisicoes']:
+            regressoes.append(f"{nome}: {medida['requisicoes']} requisições (baseline {base['requisicoes']})")
+        limite = base['ms'] * FOLGA + MARGEM_MS
+        if medida['ms'] > limite:
+            regressoes.append(f"{nome}: {medida['ms']:.0f} ms (baseline {base['ms']:.0f} ms, limite {limite:.0f} ms)")
+    return regressoes
+
+
+@pytest.mark.parametrize('conta', list(supabase_simulado.CONTAS))
+def test_latencia_dos_reruns(conta, supabase, baselines, diretorio_fila):
+    banco, url, emails = supabase
+    referencias, medicoes, atualizar = baselines
+    email = emails[conta]
+    roteiro = Roteiro(banco, url, diretorio_fila)
+    at = roteiro.app
+
+    # Login
+    roteiro.medir('pagina_login', at.run)
+    at.text_input[0].input(email)
+    at.text_input[1].input(supabase_simulado.SENHA)
+    roteiro.medir('login', roteiro.botao('Entrar').click().run)
+    assert 'user' in at.session_state
+
+    # Rerun sem interação: nenhum acesso ao Supabase, todas as abas desenhadas
+    ocioso = roteiro.medir('rerun_ocioso', at.run)
+    assert ocioso['requisicoes'] == 0
+    roteiro.medir_abas('rerun_ocioso')
+
+    # Histórico completo: o arquivo só é buscado quando aberto (uma requisição)
+    historico = roteiro.medir('historico_vacinas', at.toggle(key='historico_vacinas').set_value(True).run)
+    assert historico['requisicoes'] == 1
+    arquivadas = linhas_do_usuario(banco, 'vacinas_arquivo', email)
+    if arquivadas:
+        tabela = next(df for df in at.dataframe if 'Vacina' in df.value.columns)
+        assert len(tabela.value) == len(arquivadas)
+
+    # Tratamento finalizado compactado: o mapa de doses só é buscado ao abrir (uma requisição)
+    resumo = next(iter(linhas_do_usuario(banco, 'medicamentos_resumo', email)), None)
+    if resumo:
+        doses = roteiro.medir('doses_finalizado',
+                              at.toggle(key=f"doses_finalizado_{resumo['medicamento_id']}").set_value(True).run)
+        assert doses['requisicoes'] == 1
+        perdidas = [m for m in at.markdown if m.value.startswith('❌ Dose ')]
+        assert len(perdidas) == min(resumo['doses_perdidas'], 50)
+
+    # Checkboxes: gravados pela fila de escrita, sem requisição no clique
+    vacina = linhas_do_usuario(banco, 'vacinas', email)[0]
+    preventivo = linhas_do_usuario(banco, 'preventivos', email)[0]
+    marcada = not vacina['concluido']
+    preventivo_marcado = not preventivo['concluido']
+    roteiro.medir('marcar_vacina', at.checkbox(key=f"status_vac_{vacina['id']}").set_value(marcada).run)
+    roteiro.medir('desmarcar_vacina', at.checkbox(key=f"status_vac_{vacina['id']}").set_value(not marcada).run)
+    roteiro.medir('marcar_vacina_de_novo', at.checkbox(key=f"status_vac_{vacina['id']}").set_value(marcada).run)
+    roteiro.medir('marcar_preventivo',
+                  at.checkbox(key=f"status_prev_{preventivo['id']}").set_value(preventivo_marcado).run)
+    assert roteiro.medicoes['marcar_vacina']['requisicoes'] == 0
+
+    # Doses: buscadas ao abrir o controle; a marcação vai para a fila
+    medicamento = next(m for m in linhas_do_usuario(banco, 'medicamentos', email)
+                       if m['data_fim'] >= time.strftime('%Y-%m-%d'))
+    roteiro.medir('abrir_doses', at.toggle(key=f"mostrar_doses_{medicamento['id']}").set_value(True).run)
+    dose = next(c for c in at.checkbox if c.key.startswith(f"dose_{medicamento['id']}_"))
+    numero_dose = int(dose.key.rsplit('_', 1)[1])
+    roteiro.medir('marcar_dose', dose.check().run)
+
+    # Filtro com gráfico e busca (índice local: o banco simulado não tem buscar_registros)
+    roteiro.medir('filtrar_peso', at.selectbox(key='filtro_peso').select_index(1).run)
+    roteiro.medir('buscar', at.text_input(key='termo_busca').input('otite').run)
+
+    # Formulários: gravação + recarga (que antes descarrega a fila)
+    roteiro.widget('number_input', 'Peso (kg)').set_value(9.5)
+    roteiro.medir('salvar_pesagem', roteiro.botao('Salvar Pesagem').click().run)
+    roteiro.widget('text_input', 'Título da Nota').input('Consulta de rotina')
+    roteiro.widget('text_area', 'Texto da Nota').input('Tudo certo')
+    roteiro.medir('salvar_nota', roteiro.botao('Salvar Nota').click().run)
+
+    # O que foi marcado chegou ao banco
+    assert vacina['concluido'] == marcada
+    assert preventivo['concluido'] == preventivo_marcado
+    assert any(d['medicamento_id'] == medicamento['id'] and d['numero_dose'] == numero_dose and d['realizado']
+               for d in linhas_do_usuario(banco, 'medicamentos_log', email))
+    assert any(n['titulo'] == 'Consulta de rotina' for n in linhas_do_usuario(banco, 'notas', email))
+
+    roteiro.medir('sair', at.button(key='logout_btn').click().run)
+    assert 'user' not in at.session_state
+
+    medicoes[conta] = roteiro.medicoes
+    if not atualizar:
+        regressoes = conferir_baselines(conta, roteiro.medicoes, referencias)
+        assert not regressoes, f"Regressões na conta {conta}:\n" + "\n".join(regressoes)
@@ -0,0 +1,419 @@
+"""Serviço de ingestão de webhooks (Kiwify/Hotmart) com caixa de entrada idempotente
+
+Recebe os mesmos payloads da edge_function_webhook.ts, grava cada evento
+na tabela webhook_inbox (chave de idempotência como chave primária, então
+reenvios da plataforma não geram trabalho duplicado) e responde 202 na
+hora. Um worker processa a caixa de entrada em lotes: resolve os usuários
+pelo email, sem diferenciar maiúsculas (uma consulta por lote), cria apenas
+os usuários novos e faz upsert de todos os perfis do lote em uma única
+requisição.
+
+Uso:
+    export SUPABASE_URL=https://SEU-PROJETO.supabase.co
+    export SUPABASE_SERVICE_ROLE_KEY=...
+    python webhook_worker.py servir --porta 8080
+    python webhook_worker.py reprocessar --desde 2026-01-01
+    python webhook_worker.py importar eventos.jsonl
+
+Execute supabase_webhook_inbox.sql e supabase_email_normalizado.sql antes de usar.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+# Mapear IDs de produtos para planos
+# IMPORTANTE: Substitua pelos IDs reais dos seus produtos (os mesmos da edge function)
+PLANOS_KIWIFY = {
+    'prod_xxxxxxxxx': 'Essencial',
+    'prod_yyyyyyyyy': 'Plus',
+    'prod_zzzzzzzzz': 'Elite'
+}
+
+PLANOS_HOTMART = {
+    'PROD_XXXXX': 'Essencial',
+    'PROD_YYYYY': 'Plus',
+    'PROD_ZZZZZ': 'Elite'
+}
+
+TAMANHO_LOTE = 200
+MAX_TENTATIVAS = 5
+# Usuários novos são criados no Auth em paralelo (não há criação em lote)
+CRIACOES_SIMULTANEAS = 8
+
+
+# ==================== INTERPRETAÇÃO DOS PAYLOADS ====================
+def interpretar_evento(payload):
+    """Extrair fonte, email, plano e status do payload (mesmas regras da edge function)
+    Lança ValueError para formatos não reconhecidos
+    """
+    if payload.get('Product'):
+        email = (payload.get('Customer') or {}).get('email')
+        if not email:
+            raise ValueError('Email não encontrado no payload')
+        return {
+            'fonte': 'kiwify',
+            'email': email.strip().lower(),
+            'plano': PLANOS_KIWIFY.get(payload['Product'].get('id'), 'Essencial'),
+            'status': 'ativo' if payload.get('order_status') == 'paid' else 'inativo'
+        }
+
+    if payload.get('event'):
+        dados = payload.get('data') or {}
+        email = (dados.get('buyer') or {}).get('email')
+        if not email:
+            raise ValueError('Email não encontrado no payload')
+        evento = payload['event']
+        status = 'inativo'
+        if evento == 'PURCHASE_APPROVED':
+            status = 'ativo'
+        elif evento in ('PURCHASE_CANCELED', 'PURCHASE_REFUNDED'):
+            status = 'cancelado'
+        return {
+            'fonte': 'hotmart',
+            'email': email.strip().lower(),
+            'plano': PLANOS_HOTMART.get((dados.get('product') or {}).get('id'), 'Essencial'),
+            'status': status
+        }
+
+    raise ValueError('Formato de webhook não reconhecido')
+
+
+def chave_idempotencia(payload, fonte):
+    """Chave estável do evento: id da plataforma quando existe, senão hash do corpo"""
+    if fonte == 'kiwify' and payload.get('order_id'):
+        return f"kiwify:{payload['order_id']}:{payload.get('order_status', '')}"
+    if fonte == 'hotmart' and payload.get('id'):
+        return f"hotmart:{payload['id']}"
+    corpo = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return f"{fonte}:sha256:{hashlib.sha256(corpo.encode('utf-8')).hexdigest()}"
+
+
+def agora_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+# ==================== CAIXA DE ENTRADA NO SUPABASE ====================
+class InboxSupabase:
+    """Acesso à webhook_inbox e a profiles via PostgREST (service role)"""
+
+    def __init__(self, url, service_key, timeout=15.0):
+        self.api_url = f'{url}/rest/v1'
+        self.auth_url = f'{url}/auth/v1'
+        self.cliente = httpx.Client(
+            headers={
+                'apikey': service_key,
+                'Authorization': f'Bearer {service_key}',
+                'Content-Type': 'application/json'
+            },
+            timeout=timeout
+        )
+
+    def inserir(self, chave, fonte, payload):
+        """Gravar o evento; retorna False se a chave já estava na caixa de entrada"""
+        response = self.cliente.post(
+            f'{self.api_url}/webhook_inbox?on_conflict=chave',
+            headers={'Prefer': 'return=representation,resolution=ignore-duplicates'},
+            json={'chave': chave, 'fonte': fonte, 'payload': payload}
+        )
+        response.raise_for_status()
+        return len(response.json()) > 0
+
+    def pendentes(self, limite):
+        """Próximos eventos não processados, em ordem de chegada"""
+        response = self.cliente.get(
+            f'{self.api_url}/webhook_inbox',
+            params={
+                'select': 'chave,fonte,payload,tentativas',
+                'processado_em': 'is.null',
+                'tentativas': f'lt.{MAX_TENTATIVAS}',
+                'order': 'recebido_em.asc',
+                'limit': str(limite)
+            }
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def perfis_por_email(self, emails):
+        """Resolver vários emails em uma consulta, sem diferenciar maiúsculas
+        (coluna profiles.email_normalizado, de supabase_email_normalizado.sql)
+        """
+        if not emails:
+            return {}
+        lista = ','.join(json.dumps(email.strip().lower()) for email in emails)
+        response = self.cliente.get(
+            f'{self.api_url}/profiles',
+            # Mais antigos por último: com emails repetidos, vence o perfil mais antigo
+            params={'select': 'id,email_normalizado', 'email_normalizado': f'in.({lista})',
+                    'order': 'created_at.desc'}
+        )
+        response.raise_for_status()
+        return {perfil['email_normalizado']: perfil['id'] for perfil in response.json()}
+
+    def criar_usuario(self, email, fonte, plano):
+        """Criar o usuário no Auth (somente clientes novos)"""
+        response = self.cliente.post(
+            f'{self.auth_url}/admin/users',
+            json={'email': email, 'email_confirm': True, 'user_metadata': {'source': fonte, 'plano': plano}}
+        )
+        response.raise_for_status()
+        return response.json()['id']
+
+    def atualizar_perfis(self, perfis):
+        """Upsert de todos os perfis do lote em uma única requisição"""
+        if not perfis:
+            return
+        response = self.cliente.post(
+            f'{self.api_url}/profiles?on_conflict=id',
+            headers={'Prefer': 'return=minimal,resolution=merge-duplicates'},
+            json=perfis
+        )
+        response.raise_for_status()
+
+    def concluir(self, chaves):
+        """Marcar eventos como processados"""
+        if not chaves:
+            return
+        lista = ','.join(json.dumps(chave) for chave in chaves)
+        response = self.cliente.patch(
+            f'{self.api_url}/webhook_inbox',
+            params={'chave': f'in.({lista})'},
+            json={'processado_em': agora_iso(), 'erro': None}
+        )
+        response.raise_for_status()
+
+    def registrar_falha(self, chave, tentativas, erro):
+        """Registrar erro do evento (volta para a fila até MAX_TENTATIVAS)"""
+        response = self.cliente.patch(
+            f'{self.api_url}/webhook_inbox',
+            params={'chave': f'eq.{chave}'},
+            json={'tentativas': tentativas + 1, 'erro': erro[:500]}
+        )
+        response.raise_for_status()
+
+    def reabrir(self, desde=None, chave=None):
+        """Voltar eventos para a fila (reprocessamento); retorna quantos foram reabertos"""
+        params = {}
+        if chave:
+            params['chave'] = f'eq.{chave}'
+        if desde:
+            params['recebido_em'] = f'gte.{desde}'
+        response = self.cliente.patch(
+            f'{self.api_url}/webhook_inbox',
+            params=params or {'chave': 'not.is.null'},
+            headers={'Prefer': 'return=representation'},
+            json={'processado_em': None, 'tentativas': 0, 'erro': None}
+        )
+        response.raise_for_status()
+        return len(response.json())
+
+
+# ==================== PROCESSAMENTO EM LOTES ====================
+class ProcessadorWebhooks:
+    """Processa a caixa de entrada em lotes (um worker por instância)"""
+
+    def __init__(self, inbox, tamanho_lote=TAMANHO_LOTE):
+        self.inbox = inbox
+        self.tamanho_lote = tamanho_lote
+        self.processados = 0
+        self.falhas = 0
+
+    def processar_lote(self):
+        """Processar um lote; retorna quantos eventos foram retirados da fila"""
+        linhas = self.inbox.pendentes(self.tamanho_lote)
+        if not linhas:
+            return 0
+
+        # O evento mais recente de cada email vence (linhas em ordem de chegada)
+        ultimo_por_email = {}
+        concluidas = []
+        for linha in linhas:
+            try:
+                evento = interpretar_evento(linha['payload'])
+            except ValueError as e:
+                self.inbox.registrar_falha(linha['chave'], MAX_TENTATIVAS - 1, str(e))
+                self.falhas += 1
+                continue
+            ultimo_por_email[evento['email']] = (evento, linha)
+            concluidas.append(linha['chave'])
+
+        ids = self.inbox.perfis_por_email(list(ultimo_por_email))
+        novos = [email for email in ultimo_por_email if email not in ids]
+        if novos:
+            with ThreadPoolExecutor(min(CRIACOES_SIMULTANEAS, len(novos))) as executor:
+                for email, resultado in zip(novos, executor.map(self._criar_usuario, novos,
+                                                                  [ultimo_por_email[e][0] for e in novos])):
+                    if isinstance(resultado, Exception):
+                        linha = ultimo_por_email[email][1]
+                        self.inbox.registrar_falha(linha['chave'], linha.get('tentativas', 0), str(resultado))
+                        concluidas.remove(linha['chave'])
+                        self.falhas += 1
+                    else:
+                        ids[email] = resultado
+
+        perfis = []
+        for email, (evento, linha) in ultimo_por_email.items():
+            if email not in ids:
+                continue
+            perfis.append({
+                'id': ids[email],
+                'email': email,
+                'plano': evento['plano'],
+                'status': evento['status'],
+                'webhook_source': evento['fonte'],
+                'webhook_data': linha['payload'],
+                'updated_at': agora_iso()
+            })
+
+        self.inbox.atualizar_perfis(perfis)
+        self.inbox.concluir(concluidas)
+        self.processados += len(concluidas)
+        return len(linhas)
+
+    def _criar_usuario(self, email, evento):
+        try:
+            return self.inbox.criar_usuario(email, evento['fonte'], evento['plano'])
+        except Exception as e:
+            return e
+
+    def processar_tudo(self):
+        """Esvaziar a caixa de entrada; retorna o total processado"""
+        total = 0
+        while True:
+            n = self.processar_lote()
+            if n == 0:
+                return total
+            total += n
+
+    def executar(self, parar, intervalo=1.0):
+        """Laço do worker até o evento `parar` ser sinalizado"""
+        while not parar.is_set():
+            try:
+                if self.processar_lote() == 0:
+                    parar.wait(intervalo)
+            except httpx.HTTPError as e:
+                print(f"Erro ao processar lote: {e}", file=sys.stderr)
+                parar.wait(intervalo * 5)
+
+
+def receber(inbox, corpo):
+    """Validar e gravar um webhook; retorna (status HTTP, resposta)"""
+    try:
+        payload = json.loads(corpo)
+        evento = interpretar_evento(payload)
+    except (ValueError, AttributeError) as e:
+        return 400, {'error': str(e)}
+    novo = inbox.inserir(chave_idempotencia(payload, evento['fonte']), evento['fonte'], payload)
+    return 202, {'recebido': True, 'duplicado': not novo}
+
+
+# ==================== SERVIDOR HTTP ====================
+def criar_servidor(inbox, porta, token=None):
+    """Servidor HTTP que só grava na caixa de entrada (processamento é assíncrono)"""
+
+    class Handler(BaseHTTPRequestHandler):
+        # Mantém a conexão aberta entre webhooks consecutivos
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def _responder(self, status, corpo):
+            dados = json.dumps(corpo).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(dados)))
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def do_POST(self):
+            if token and f'token={token}' not in self.path:
+                self._responder(401, {'error': 'Token inválido'})
+                return
+            corpo = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            try:
+                self._responder(*receber(inbox, corpo))
+            except httpx.HTTPError as e:
+                # Sem gravação não há confirmação: a plataforma reenvia
+                self._responder(503, {'error': str(e)})
+
+        def log_message(self, formato, *args):
+            pass
+
+    return ThreadingHTTPServer(('0.0.0.0', porta), Handler)
+
+
+def inbox_do_ambiente():
+    url = os.environ.get('SUPABASE_URL')
+    chave = os.environ.get('SUPABASE_SERVICE_ROLE_KEY')
+    if not url or not chave:
+        sys.exit("Defina SUPABASE_URL e SUPABASE_SERVICE_ROLE_KEY")
+    return InboxSupabase(url, chave)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    servir = comandos.add_parser('servir', help='Receber webhooks e processar a caixa de entrada')
+    servir.add_argument('--porta', type=int, default=8080)
+    servir.add_argument('--lote', type=int, default=TAMANHO_LOTE)
+    servir.add_argument('--token', default=os.environ.get('WEBHOOK_TOKEN'), help='Exigir ?token=... na URL')
+
+    reprocessar = comandos.add_parser('reprocessar', help='Voltar eventos já processados para a fila')
+    reprocessar.add_argument('--desde', help='Data/hora ISO mínima de recebimento')
+    reprocessar.add_argument('--chave', help='Reprocessar apenas esta chave')
+
+    importar = comandos.add_parser('importar', help='Gravar payloads de um arquivo JSON Lines na caixa de entrada')
+    importar.add_argument('arquivo')
+
+    args = parser.parse_args()
+    inbox = inbox_do_ambiente()
+
+    if args.comando == 'servir':
+        parar = threading.Event()
+        processador = ProcessadorWebhooks(inbox, args.lote)
+        worker = threading.Thread(target=processador.executar, args=(parar,), daemon=True)
+        worker.start()
+        servidor = criar_servidor(inbox, args.porta, args.token)
+        print(f"Recebendo webhooks na porta {args.porta}")
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            parar.set()
+            servidor.server_close()
+            worker.join()
+
+    elif args.comando == 'reprocessar':
+        print(f"Eventos reabertos: {inbox.reabrir(desde=args.desde, chave=args.chave)}")
+
+    elif args.comando == 'importar':
+        novos = duplicados = invalidos = 0
+        with open(args.arquivo, encoding='utf-8') as arquivo:
+            for linha in arquivo:
+                if not linha.strip():
+                    continue
+                status, resposta = receber(inbox, linha)
+                if status != 202:
+                    invalidos += 1
+                elif resposta['duplicado']:
+                    duplicados += 1
+                else:
+                    novos += 1
+        print(f"Novos: {novos} | Duplicados: {duplicados} | Inválidos: {invalidos}")
+        ProcessadorWebhooks(inbox).processar_tudo()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())